@@ -5,6 +5,11 @@ import os
 from flask import Blueprint, request, jsonify, current_app
 
 from services.alert_service import AlertService
+from services.alert_dispatcher import alert_dispatcher, STATUS_PENDING, STATUS_SENT, STATUS_DEAD
+from services.alert_pipeline import alert_pipeline
+from services.alert_cleanup import alert_cleanup
+from services.alert_rules import rules_engine
+from utils.message_queue import relay, RelayError
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -33,12 +38,35 @@ def login_required():
 
 @admin_bp.route('/api/alerts', methods=['GET'])
 def get_alerts():
-    """获取所有告警"""
+    """
+    分页获取告警
+
+    支持 client_id、type、resolved（true / false）过滤；还有下一页时通过 X-Next-Cursor 响应头返回游标，
+    作为下一次请求的 cursor 参数。
+    """
     if not login_required():
         return jsonify({'error': '未登录，请先登录'}), 401
 
-    alerts = AlertService.get_all_alerts()
-    return jsonify(alerts)
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    resolved = request.args.get('resolved')
+    if resolved not in (None, 'true', 'false'):
+        return jsonify({'error': 'resolved 参数无效'}), 400
+
+    try:
+        alerts, next_cursor = AlertService.list_alerts(
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            client_id=request.args.get('client_id', type=int),
+            alert_type=request.args.get('type'),
+            resolved=None if resolved is None else resolved == 'true'
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify(alerts)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 
 @admin_bp.route('/api/alerts/<int:alert_id>/resolve', methods=['POST'])
@@ -58,16 +86,31 @@ def resolve_alert(alert_id):
         return jsonify(result), 400
 
 
-@admin_bp.route('/api/alerts/clear', methods=['POST'])
-def clear_alerts():
-    """清除已解决的告警"""
+@admin_bp.route('/api/alerts/resolve', methods=['POST'])
+def resolve_alerts():
+    """
+    批量标记告警为已解决
+
+    请求体: {"ids": [1, 2]}，或按过滤条件 {"client_id": 1, "type": "offline"}，两者可组合
+    """
     if not login_required():
         return jsonify({'error': '未登录，请先登录'}), 401
 
     if not verify_csrf_token():
         return jsonify({'error': 'CSRF 验证失败'}), 403
 
-    success, result = AlertService.clear_resolved_alerts()
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    client_id = data.get('client_id')
+    alert_type = data.get('type')
+    if ids is not None and (not isinstance(ids, list) or not all(type(i) is int for i in ids)):
+        return jsonify({'error': 'ids 必须是告警 ID 列表'}), 400
+    if client_id is not None and type(client_id) is not int:
+        return jsonify({'error': 'client_id 参数无效'}), 400
+    if alert_type is not None and not isinstance(alert_type, str):
+        return jsonify({'error': 'type 参数无效'}), 400
+
+    success, result = AlertService.resolve_alerts(ids, client_id, alert_type)
 
     if success:
         return jsonify(result)
@@ -75,6 +118,38 @@ def clear_alerts():
         return jsonify(result), 400
 
 
+@admin_bp.route('/api/alerts/clear', methods=['POST'])
+def clear_alerts():
+    """在后台分批清除已解决的告警"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    if not verify_csrf_token():
+        return jsonify({'error': 'CSRF 验证失败'}), 403
+
+    try:
+        started, job = relay.request(alert_cleanup.start)
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+
+    if started:
+        return jsonify({'message': '已开始清除已解决的告警', 'job': job}), 202
+    else:
+        return jsonify({'error': '已有清除任务正在运行', 'job': job}), 409
+
+
+@admin_bp.route('/api/alerts/clear', methods=['GET'])
+def get_clear_alerts_status():
+    """获取最近一次清除任务的进度"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    try:
+        return jsonify({'job': relay.request(alert_cleanup.get_status)})
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+
+
 @admin_bp.route('/api/alerts/stats', methods=['GET'])
 def get_alert_stats():
     """获取告警统计信息"""
@@ -83,3 +158,67 @@ def get_alert_stats():
 
     stats = AlertService.get_alert_stats()
     return jsonify(stats)
+
+
+@admin_bp.route('/api/alerts/outbox', methods=['GET'])
+def get_alert_outbox():
+    """获取告警通知发送队列"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    status = request.args.get('status')
+    if status and status not in (STATUS_PENDING, STATUS_SENT, STATUS_DEAD):
+        return jsonify({'error': 'status 参数无效'}), 400
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+
+    return jsonify(alert_dispatcher.get_entries(status, limit))
+
+
+@admin_bp.route('/api/alerts/outbox/<int:outbox_id>/retry', methods=['POST'])
+def retry_alert_email(outbox_id):
+    """重新发送已放弃的告警通知"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    if not verify_csrf_token():
+        return jsonify({'error': 'CSRF 验证失败'}), 403
+
+    if not alert_dispatcher.retry(outbox_id):
+        return jsonify({'error': '通知不存在或不是 dead 状态'}), 404
+    return jsonify({'message': '已重新加入发送队列'})
+
+
+@admin_bp.route('/api/alerts/channels', methods=['GET'])
+def get_alert_channels():
+    """获取告警通知通道的启用状态和正在投递的通知数"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    try:
+        return jsonify(relay.request(alert_dispatcher.get_channels))
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+
+
+@admin_bp.route('/api/alerts/pipeline', methods=['GET'])
+def get_alert_pipeline():
+    """获取告警去重索引、待发送通知和投递目标限流状态"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    try:
+        return jsonify(relay.request(alert_pipeline.get_status))
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+
+
+@admin_bp.route('/api/alerts/rules', methods=['GET'])
+def get_alert_rules():
+    """获取告警规则及正在触发的客户端"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    try:
+        return jsonify(relay.request(rules_engine.get_status))
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
@@ -4,8 +4,11 @@
 from flask import Blueprint, request, jsonify, current_app
 
 from services.client_service import ClientService
+from services.revision_service import ConfigRevisionService
+from services.pull_tracker import pull_tracker
 from services.process_service import ConfigService
 from utils.logger import ColorLogger
+from utils.message_queue import relay
 from config import Config
 
 clients_bp = Blueprint('clients', __name__)
@@ -22,6 +25,41 @@ def verify_csrf_token():
     return True
 
 
+def get_expected_version():
+    """
+    读取客户端期望的版本号：优先 If-Match 请求头，其次请求体中的 version
+
+    Returns:
+        (是否有效, 版本号)，未提供或为 * 时版本号为 None
+    """
+    if_match = request.headers.get('If-Match')
+    if if_match:
+        value = if_match.strip()
+        if value == '*':
+            return True, None
+        if value.startswith('W/'):
+            value = value[2:]
+        value = value.strip('"')
+    else:
+        value = (request.json or {}).get('version') if request.is_json else None
+        if value is None:
+            return True, None
+    try:
+        return True, int(value)
+    except (TypeError, ValueError):
+        return False, None
+
+
+def version_response(result, status=200):
+    """生成带 ETag 的响应，冲突时返回 409"""
+    if result.get('conflict'):
+        status = 409
+    response = jsonify(result)
+    if result.get('version') is not None:
+        response.set_etag(str(result['version']))
+    return response, status
+
+
 def login_required():
     """检查登录状态"""
     from services.auth_service import AuthService
@@ -82,13 +120,17 @@ def update_client(client_id):
     if not verify_csrf_token():
         return jsonify({'error': 'CSRF 验证失败'}), 403
 
+    valid, expected_version = get_expected_version()
+    if not valid:
+        return jsonify({'error': '版本号格式错误'}), 400
+
     data = request.json
-    success, result = ClientService.update_client(client_id, data)
+    success, result = ClientService.update_client(client_id, data, expected_version)
 
     if success:
-        return jsonify(result)
+        return version_response(result)
     else:
-        return jsonify(result), 400
+        return version_response(result, 400)
 
 
 @clients_bp.route('/api/clients/<int:client_id>', methods=['DELETE'])
@@ -117,7 +159,7 @@ def get_client_config(client_id):
     success, result = ClientService.get_client_config(client_id)
 
     if success:
-        return jsonify(result)
+        return version_response(result)
     else:
         return jsonify(result), 400
 
@@ -131,10 +173,71 @@ def update_client_config(client_id):
     if not verify_csrf_token():
         return jsonify({'error': 'CSRF 验证失败'}), 403
 
+    valid, expected_version = get_expected_version()
+    if not valid:
+        return jsonify({'error': '版本号格式错误'}), 400
+
     data = request.json
     config_content = data.get('config', '')
 
-    success, result = ClientService.update_client_config(client_id, config_content)
+    success, result = ClientService.update_client_config(client_id, config_content, expected_version)
+
+    if success:
+        return version_response(result)
+    else:
+        return version_response(result, 400)
+
+
+@clients_bp.route('/api/clients/<int:client_id>/revisions', methods=['GET'])
+def get_config_revisions(client_id):
+    """获取客户端配置修订列表"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    return jsonify(ConfigRevisionService.list_revisions(client_id))
+
+
+@clients_bp.route('/api/clients/<int:client_id>/revisions/<int:revision>', methods=['GET'])
+def get_config_revision(client_id, revision):
+    """获取指定版本的客户端配置"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    config_content = ConfigRevisionService.get_revision_content(client_id, revision)
+    if config_content is None:
+        return jsonify({'error': '修订版本不存在'}), 404
+    return jsonify({'revision': revision, 'config': config_content})
+
+
+@clients_bp.route('/api/clients/<int:client_id>/revisions/diff', methods=['GET'])
+def diff_config_revisions(client_id):
+    """对比两个配置版本"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    from_revision = request.args.get('from', type=int)
+    to_revision = request.args.get('to', type=int)
+    if from_revision is None or to_revision is None:
+        return jsonify({'error': '缺少 from 或 to 参数'}), 400
+
+    success, result = ConfigRevisionService.diff_revisions(client_id, from_revision, to_revision)
+
+    if success:
+        return jsonify(result)
+    else:
+        return jsonify(result), 404
+
+
+@clients_bp.route('/api/clients/<int:client_id>/revisions/<int:revision>/rollback', methods=['POST'])
+def rollback_config_revision(client_id, revision):
+    """回滚客户端配置到指定版本"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    if not verify_csrf_token():
+        return jsonify({'error': 'CSRF 验证失败'}), 403
+
+    success, result = ClientService.rollback_client_config(client_id, revision)
 
     if success:
         return jsonify(result)
@@ -163,6 +266,9 @@ def export_client_config(client_id):
     if not success:
         return jsonify(result), 404
 
+    # 记录拉取（只更新内存，后台批量写入；多进程部署时转发到后台任务进程）
+    relay.call(pull_tracker.record, client_id, request.remote_addr, result.get('config_version'))
+
     # 返回纯文本配置（不是 JSON）
     config_content = result.get('config', '')
     
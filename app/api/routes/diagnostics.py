@@ -0,0 +1,79 @@
+"""
+诊断路由（仅管理员）
+提供请求追踪记录查询和运行中进程的采样分析
+"""
+from flask import Blueprint, Response, request, jsonify, session
+
+from config import Config
+from services.audit_log_service import AuditLogService
+from utils import profiler, tracing
+from utils.csrf import verify_csrf_token
+from utils.decorators import login_required, admin_required
+
+diagnostics_bp = Blueprint('diagnostics', __name__)
+
+
+@diagnostics_bp.route('/api/diagnostics/traces', methods=['GET'])
+@login_required
+@admin_required
+def get_traces():
+    """获取最近记录中最慢的请求和 SQL"""
+    limit = request.args.get('limit', 20, type=int)
+    limit = max(1, min(limit, Config.TRACING_BUFFER_SIZE))
+    return jsonify({
+        'enabled': tracing.enabled,
+        'buffer_size': Config.TRACING_BUFFER_SIZE,
+        **tracing.slowest(limit)
+    })
+
+
+@diagnostics_bp.route('/api/diagnostics/traces', methods=['DELETE'])
+@login_required
+@admin_required
+def clear_traces():
+    """清空追踪记录"""
+    if not verify_csrf_token(request.headers.get('X-CSRF-Token')):
+        return jsonify({'success': False, 'error': '无效的 CSRF Token'}), 403
+
+    tracing.reset()
+    return jsonify({'success': True})
+
+
+@diagnostics_bp.route('/api/diagnostics/profile', methods=['GET'])
+@login_required
+@admin_required
+def run_profile():
+    """
+    采样所有线程的调用栈，返回折叠栈（可直接交给 flamegraph.pl 或 speedscope）
+
+    参数: seconds（默认 5）、interval_ms（默认 10）、idle（是否包含空闲线程）、format=json
+    """
+    seconds = request.args.get('seconds', 5, type=float)
+    interval_ms = request.args.get('interval_ms', 10, type=float)
+    include_idle = request.args.get('idle', 'false').lower() == 'true'
+
+    try:
+        result, elapsed = profiler.profile(seconds, interval_ms / 1000, include_idle)
+    except profiler.ProfilerBusy as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.status_code = 429
+        if e.retry_after:
+            response.headers['Retry-After'] = str(e.retry_after)
+        return response
+
+    AuditLogService.log(
+        AuditLogService.ACTION_PROFILE_RUN,
+        {'seconds': round(elapsed, 2), 'samples': result.samples, 'user': session.get('username')}
+    )
+
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'duration': round(elapsed, 3),
+            'samples': result.samples,
+            'stacks': dict(result.stacks.most_common()),
+        })
+
+    response = Response(result.collapsed(), mimetype='text/plain')
+    response.headers['X-Profile-Samples'] = str(result.samples)
+    response.headers['X-Profile-Duration'] = f'{elapsed:.3f}'
+    return response
@@ -0,0 +1,85 @@
+"""
+运行指标路由
+以 Prometheus 文本格式输出控制台和采集器的运行指标，单进程部署时记录每个路由的请求耗时
+"""
+import secrets
+import time
+
+from flask import Blueprint, Response, g, jsonify, request
+
+from config import Config
+from utils.instrumentation import CONTENT_TYPE, registry
+from utils.message_queue import relay, RelayError
+
+metrics_bp = Blueprint('metrics', __name__)
+
+relay.register('metrics', registry, 'render')
+
+
+def login_required():
+    """检查登录状态"""
+    from services.auth_service import AuthService
+    if not AuthService.is_logged_in():
+        return False
+    return True
+
+
+def token_valid():
+    """检查抓取令牌（METRICS_TOKEN 未配置时不接受令牌）"""
+    if not Config.METRICS_TOKEN:
+        return False
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return False
+    return secrets.compare_digest(auth_header[7:], Config.METRICS_TOKEN)
+
+
+def start_timer():
+    """记录请求开始时间"""
+    g.request_start = time.perf_counter()
+
+
+def record_request(response):
+    """按路由记录请求耗时（未匹配路由的请求归为 unmatched，避免标签数量失控）"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - start)
+        REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+    return response
+
+
+# 多进程部署时 /metrics 只输出后台进程的注册表，请求指标只能覆盖该进程处理的请求，
+# 不完整的数据不如不输出，因此只在单进程部署时记录
+if Config.SERVER_WORKERS == 1:
+    REQUEST_SECONDS = registry.histogram(
+        'frp_console_http_request_seconds',
+        'HTTP request latency by route',
+        ('endpoint', 'method')
+    )
+    REQUESTS = registry.counter(
+        'frp_console_http_requests',
+        'HTTP requests by route and status code',
+        ('endpoint', 'method', 'status')
+    )
+    metrics_bp.before_app_request(start_timer)
+    metrics_bp.after_app_request(record_request)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    输出运行指标
+    支持 Bearer METRICS_TOKEN 认证（供 Prometheus 抓取）或登录会话
+
+    采集器、告警等指标只存在于运行后台任务的进程中，多进程部署时由该进程生成输出，
+    不包含 HTTP 请求指标。
+    """
+    if not token_valid() and not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    try:
+        body = relay.request(registry.render)
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+    return Response(body, content_type=CONTENT_TYPE)
@@ -0,0 +1,119 @@
+"""
+监控数据路由
+提供客户端流量和连接数据查询
+"""
+from flask import Blueprint, request, jsonify
+
+import monitor
+from config import Config
+from utils.message_queue import relay, RelayError
+
+monitor_bp = Blueprint('monitor', __name__)
+
+# 单次查询最多返回的点数
+MAX_POINTS = 5000
+
+
+def login_required():
+    """检查登录状态"""
+    from services.auth_service import AuthService
+    if not AuthService.is_logged_in():
+        return False
+    return True
+
+
+@monitor_bp.route('/api/monitor/metrics', methods=['GET'])
+def get_all_metrics():
+    """获取所有客户端的最新指标"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    try:
+        metrics = relay.request(monitor.get_latest_metrics)
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({str(client_id): data for client_id, data in metrics.items()})
+
+
+@monitor_bp.route('/api/monitor/metrics/<int:client_id>', methods=['GET'])
+def get_client_metrics(client_id):
+    """获取单个客户端的最新指标"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    try:
+        metrics = relay.request(monitor.get_latest_metrics, client_id)
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+    if metrics is None:
+        return jsonify({'error': '暂无监控数据'}), 404
+    return jsonify(metrics)
+
+
+@monitor_bp.route('/api/monitor/metrics/<int:client_id>/history', methods=['GET'])
+def get_client_metrics_history(client_id):
+    """获取单个客户端的历史指标（按 max_points 自动选择精度）"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    # 最长可查询到 1 小时汇总的保留期
+    max_hours = Config.METRICS_HOUR_RETENTION_DAYS * 24
+    hours = request.args.get('hours', 1, type=float)
+    if hours <= 0 or hours > max_hours:
+        return jsonify({'error': f'hours 必须在 0 到 {max_hours} 之间'}), 400
+
+    max_points = request.args.get('max_points', type=int)
+    if max_points is not None and not 1 <= max_points <= MAX_POINTS:
+        return jsonify({'error': f'max_points 必须在 1 到 {MAX_POINTS} 之间'}), 400
+
+    # 当前未写入的数据块在后台任务进程的内存中
+    try:
+        return jsonify(relay.request(monitor.get_metrics_series, client_id, hours, max_points))
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+
+
+@monitor_bp.route('/api/monitor/scheduler', methods=['GET'])
+def get_scheduler_state():
+    """查看采集调度器状态（每个客户端的采集间隔、原因和下一次到期时间）"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    from services.collection_scheduler import scheduler
+    try:
+        state = relay.request(scheduler.snapshot)
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+    limit = request.args.get('limit', 100, type=int)
+    state['entries'] = state['entries'][:max(0, min(limit, 1000))]
+    return jsonify(state)
+
+
+@monitor_bp.route('/api/monitor/health', methods=['GET'])
+def get_all_health():
+    """获取所有客户端的隧道健康状态"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    from services.health_checker import health_checker
+    try:
+        status = relay.request(health_checker.get_status)
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({str(client_id): data for client_id, data in status.items()})
+
+
+@monitor_bp.route('/api/monitor/health/<int:client_id>', methods=['GET'])
+def get_client_health(client_id):
+    """获取单个客户端的隧道健康状态"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    from services.health_checker import health_checker
+    try:
+        status = relay.request(health_checker.get_status, client_id)
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+    if status is None:
+        return jsonify({'error': '暂无该客户端的健康检查数据'}), 404
+    return jsonify(status)
@@ -2,14 +2,23 @@
 服务控制路由
 用于控制 frpc systemd 服务
 """
-import subprocess
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 
-from utils.logger import ColorLogger
+from services.service_control import service_control, ACTION_NAMES, REJECT_BUSY
+from services.service_status import service_status
+from utils.message_queue import relay, RelayError
 
 service_bp = Blueprint('service', __name__)
 
 
+def verify_csrf_token():
+    """验证 CSRF token"""
+    from services.auth_service import AuthService
+    token = request.headers.get('X-CSRF-Token') or \
+            (request.json.get('csrf_token') if request.is_json else None)
+    return AuthService.verify_csrf_token(token)
+
+
 def login_required():
     """检查登录状态"""
     from services.auth_service import AuthService
@@ -18,85 +27,70 @@ def login_required():
     return True
 
 
-@service_bp.route('/api/service/start', methods=['POST'])
-def start_service():
-    """启动 frpc 服务"""
+@service_bp.route('/api/service/<any(start, stop, restart):action>', methods=['POST'])
+def control_service(action):
+    """
+    启动、停止或重启 frpc 服务
+
+    操作在后台执行，立即返回任务；结果通过 Socket.IO 的 service_job 事件推送，
+    也可通过 /api/service/jobs/<id> 查询。请求体可选 {"force": true} 忽略重启频率限制。
+    """
     if not login_required():
         return jsonify({'error': '未登录'}), 401
 
+    if not verify_csrf_token():
+        return jsonify({'error': 'CSRF 验证失败'}), 403
+
+    data = request.get_json(silent=True) or {}
+    force = data.get('force') is True
+
     try:
-        result = subprocess.run(
-            ['systemctl', 'start', 'frpc'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        ColorLogger.success('frpc 服务已启动', 'Service')
-        return jsonify({'message': '服务启动成功'})
-    except subprocess.CalledProcessError as e:
-        ColorLogger.error(f'启动 frpc 服务失败: {e.stderr}', 'Service')
-        return jsonify({'error': f'启动失败: {e.stderr}'}), 500
-
-
-@service_bp.route('/api/service/stop', methods=['POST'])
-def stop_service():
-    """停止 frpc 服务"""
+        submitted, result = relay.request(service_control.submit, action, force)
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+
+    if submitted:
+        return jsonify({'message': f'已提交{ACTION_NAMES[action]}任务', 'job': result}), 202
+    if result['reason'] == REJECT_BUSY:
+        return jsonify({'error': result['error'], 'job': result['job']}), 409
+    return jsonify({'error': result['error']}), 429
+
+
+@service_bp.route('/api/service/jobs', methods=['GET'])
+def list_service_jobs():
+    """获取最近的服务操作任务"""
     if not login_required():
         return jsonify({'error': '未登录'}), 401
 
     try:
-        result = subprocess.run(
-            ['systemctl', 'stop', 'frpc'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        ColorLogger.success('frpc 服务已停止', 'Service')
-        return jsonify({'message': '服务停止成功'})
-    except subprocess.CalledProcessError as e:
-        ColorLogger.error(f'停止 frpc 服务失败: {e.stderr}', 'Service')
-        return jsonify({'error': f'停止失败: {e.stderr}'}), 500
-
-
-@service_bp.route('/api/service/restart', methods=['POST'])
-def restart_service():
-    """重启 frpc 服务"""
+        return jsonify({'jobs': relay.request(service_control.list_jobs)})
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+
+
+@service_bp.route('/api/service/jobs/<int:job_id>', methods=['GET'])
+def get_service_job(job_id):
+    """获取服务操作任务的状态"""
     if not login_required():
         return jsonify({'error': '未登录'}), 401
 
     try:
-        result = subprocess.run(
-            ['systemctl', 'restart', 'frpc'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        ColorLogger.success('frpc 服务已重启', 'Service')
-        return jsonify({'message': '服务重启成功'})
-    except subprocess.CalledProcessError as e:
-        ColorLogger.error(f'重启 frpc 服务失败: {e.stderr}', 'Service')
-        return jsonify({'error': f'重启失败: {e.stderr}'}), 500
+        job = relay.request(service_control.get_job, job_id)
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
+
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify({'job': job})
 
 
 @service_bp.route('/api/service/status', methods=['GET'])
 def get_service_status():
-    """获取 frpc 服务状态"""
+    """获取 frpc 服务状态（后台定期检查的缓存，checked_at 为检查时间）"""
     if not login_required():
         return jsonify({'error': '未登录'}), 401
 
     try:
-        result = subprocess.run(
-            ['systemctl', 'is-active', 'frpc'],
-            capture_output=True,
-            text=True
-        )
-        is_active = result.returncode == 0
-        status = 'running' if is_active else 'stopped'
-
-        return jsonify({
-            'status': status,
-            'active': is_active
-        })
-    except Exception as e:
-        ColorLogger.error(f'获取 frpc 服务状态失败: {e}', 'Service')
-        return jsonify({'error': str(e)}), 500
+        return jsonify(relay.request(service_status.get_status))
+    except RelayError as e:
+        return jsonify({'error': str(e)}), 503
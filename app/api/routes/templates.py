@@ -0,0 +1,102 @@
+"""
+配置模板管理路由
+"""
+from flask import Blueprint, request, jsonify
+
+from services.template_service import TemplateService
+
+templates_bp = Blueprint('templates', __name__)
+
+
+def verify_csrf_token():
+    """验证 CSRF token"""
+    from services.auth_service import AuthService
+    token = request.headers.get('X-CSRF-Token') or \
+            request.form.get('csrf_token') or \
+            (request.json.get('csrf_token') if request.is_json else None)
+    if not AuthService.verify_csrf_token(token):
+        return False
+    return True
+
+
+def login_required():
+    """检查登录状态"""
+    from services.auth_service import AuthService
+    if not AuthService.is_logged_in():
+        return False
+    return True
+
+
+@templates_bp.route('/api/templates', methods=['GET'])
+def get_templates():
+    """获取所有配置模板"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    return jsonify(TemplateService.get_all_templates())
+
+
+@templates_bp.route('/api/templates', methods=['POST'])
+def create_template():
+    """创建配置模板"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    if not verify_csrf_token():
+        return jsonify({'error': 'CSRF 验证失败'}), 403
+
+    success, result = TemplateService.create_template(request.json or {})
+
+    if success:
+        return jsonify(result), 201
+    else:
+        return jsonify(result), 400
+
+
+@templates_bp.route('/api/templates/<int:template_id>', methods=['GET'])
+def get_template(template_id):
+    """获取单个配置模板"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    template = TemplateService.get_template(template_id)
+    if template is None:
+        return jsonify({'error': '模板不存在'}), 404
+    return jsonify(template)
+
+
+@templates_bp.route('/api/templates/<int:template_id>', methods=['PUT'])
+def update_template(template_id):
+    """更新配置模板"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    if not verify_csrf_token():
+        return jsonify({'error': 'CSRF 验证失败'}), 403
+
+    success, result = TemplateService.update_template(template_id, request.json or {})
+
+    if success:
+        return jsonify(result)
+    elif 'clients' in result:
+        # 新内容与现有客户端的变量不兼容
+        return jsonify(result), 409
+    else:
+        return jsonify(result), 400
+
+
+@templates_bp.route('/api/templates/<int:template_id>', methods=['DELETE'])
+def delete_template(template_id):
+    """删除配置模板"""
+    if not login_required():
+        return jsonify({'error': '未登录，请先登录'}), 401
+
+    if not verify_csrf_token():
+        return jsonify({'error': 'CSRF 验证失败'}), 403
+
+    success, result = TemplateService.delete_template(template_id)
+
+    if success:
+        return jsonify(result)
+    else:
+        return jsonify(result), 400
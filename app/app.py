@@ -5,7 +5,7 @@ FRP Console 主应用文件
 import os
 import sys
 from flask import Flask, session, render_template, g, request, jsonify
-from flask_socketio import SocketIO, emit, disconnect
+from flask_socketio import SocketIO, emit, disconnect, join_room, leave_room
 
 # 添加 app 目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -13,7 +13,11 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 # 导入配置和工具
 from config import Config
 from utils.logger import ColorLogger
-from models.database import init_db, get_db, close_db
+from utils.message_queue import relay, socketio_options
+from models.database import prepare_database, get_db, close_db
+from services.live_metrics import publisher, client_room, FLEET_ROOM
+from services.service_control import service_control
+from services.service_status import service_status
 
 # 导入蓝图
 from api.routes.auth import auth_bp
@@ -22,6 +26,10 @@ from api.routes.admin import admin_bp
 from api.routes.audit import audit_bp
 from api.routes.users import users_bp
 from api.routes.service import service_bp
+from api.routes.templates import templates_bp
+from api.routes.monitor import monitor_bp
+from api.routes.metrics import metrics_bp
+from api.routes.diagnostics import diagnostics_bp
 
 
 def create_app(testing=False):
@@ -64,6 +72,12 @@ def create_app(testing=False):
     # 注册数据库关闭函数
     app_instance.teardown_appcontext(close_db)
 
+    # 请求追踪（可选）
+    if Config.TRACING_ENABLED:
+        from utils import tracing
+        tracing.init_app(app_instance)
+        ColorLogger.info('已启用请求追踪 (Server-Timing)', 'Tracing')
+
     # 注册蓝图
     app_instance.register_blueprint(auth_bp)
     app_instance.register_blueprint(clients_bp)
@@ -71,6 +85,10 @@ def create_app(testing=False):
     app_instance.register_blueprint(audit_bp)
     app_instance.register_blueprint(users_bp)
     app_instance.register_blueprint(service_bp)
+    app_instance.register_blueprint(templates_bp)
+    app_instance.register_blueprint(monitor_bp)
+    app_instance.register_blueprint(metrics_bp)
+    app_instance.register_blueprint(diagnostics_bp)
 
     # SPA Catch-all Route
     @app_instance.route("/", defaults={"path": ""})
@@ -107,7 +125,16 @@ else:
     # 默认只允许同源
     allowed_origins = None  # SocketIO 默认行为
 
-socketio = SocketIO(app, cors_allowed_origins=allowed_origins or "*", async_mode='threading')
+# 多个工作进程时只允许 WebSocket 传输：长轮询的后续请求可能落到其他进程，
+# 而一个 WebSocket 连接始终由建立它的进程处理，无需负载均衡器做会话保持。
+# 各进程通过消息队列（SOCKETIO_MESSAGE_QUEUE）转发 emit，后台任务进程的推送能送达所有连接
+socketio = SocketIO(
+    app,
+    cors_allowed_origins=allowed_origins or "*",
+    async_mode=Config.SOCKETIO_ASYNC_MODE,
+    transports=['websocket'] if Config.SERVER_WORKERS > 1 else ['polling', 'websocket'],
+    **socketio_options()
+)
 
 if allowed_origins:
     ColorLogger.info(f'CORS 限制为: {allowed_origins}', 'Security')
@@ -115,35 +142,108 @@ else:
     ColorLogger.warning('CORS 未限制，允许所有来源', 'Security')
 
 
+# 实时指标通过 Socket.IO 房间推送，服务操作任务的进度和服务状态变化推送给所有已登录的连接
+publisher.set_emitter(socketio.emit)
+service_control.set_emitter(socketio.emit)
+service_status.set_emitter(socketio.emit)
+
+
 # ==================== WebSocket 事件处理 ====================
 @socketio.on('connect')
 def handle_connect():
-    """WebSocket 连接处理"""
+    """WebSocket 连接处理（仅允许已登录用户）"""
+    from services.auth_service import AuthService
+    if not AuthService.is_logged_in():
+        return False
     emit('connected', {'message': 'Connected to server'})
 
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """WebSocket 断开处理"""
-    pass
+    relay.call(publisher.disconnect, request.sid)
+
+
+def resolve_metrics_room(data):
+    """
+    解析订阅请求中的房间
+
+    Args:
+        data: {'client_id': int} 或 {'room': 'fleet'}
+
+    Returns:
+        房间名，无效时返回 None
+    """
+    if not isinstance(data, dict):
+        return None
+    if data.get('room') == FLEET_ROOM:
+        return FLEET_ROOM
+    client_id = data.get('client_id')
+    if isinstance(client_id, int) and not isinstance(client_id, bool) and client_id > 0:
+        return client_room(client_id)
+    return None
+
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """订阅实时指标，订阅后立即收到一帧完整状态"""
+    room = resolve_metrics_room(data)
+    if room is None:
+        emit('error', {'error': '无效的订阅'})
+        return
+    join_room(room)
+    relay.call(publisher.subscribe, request.sid, room)
+
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """取消订阅实时指标"""
+    room = resolve_metrics_room(data)
+    if room is None:
+        return
+    leave_room(room)
+    relay.call(publisher.unsubscribe, request.sid, room)
 
 
 # ==================== 主程序入口 ====================
-if __name__ == '__main__':
-    # 初始化数据库
-    init_db()
+def start_background_services():
+    """启动后台任务（多进程部署时只在一个进程中启动）"""
+    # 执行其他工作进程转发的后台组件调用
+    relay.start()
+
+    # 启动监控数据采集
+    if Config.MONITOR_ENABLED:
+        from monitor import start_monitor
+        start_monitor()
+
+    # 启动隧道健康检查
+    if Config.HEALTH_CHECK_ENABLED:
+        from services.health_checker import health_checker
+        health_checker.start()
+
+    # 启动告警通知发送队列（同时发送上次退出前未发送的通知）和告警分组
+    from services.alert_dispatcher import alert_dispatcher
+    from services.alert_pipeline import alert_pipeline
+    alert_dispatcher.start()
+    alert_pipeline.start()
 
-    # 运行用户表迁移
-    try:
-        from migrations.migrate_users import run_migrations
-        run_migrations()
-    except Exception as e:
-        ColorLogger.warning(f"用户表迁移失败（可能已存在）: {e}", 'App')
+    # 启动告警规则引擎
+    from services.alert_rules import rules_engine
+    rules_engine.start()
+
+    # 启动 frpc 服务状态检查
+    service_status.start()
+
+
+if __name__ == '__main__':
+    prepare_database()
+    start_background_services()
 
-    # 启动服务
+    # 启动服务（开发模式，生产环境使用 app/serve.py）
     ColorLogger.success(f"FRP Console 启动成功，监听端口: {Config.PORT}", 'App')
     ColorLogger.info(f"访问地址: http://0.0.0.0:{Config.PORT}", 'App')
     ColorLogger.info("注意：Web 端只管理配置，frpc 需要在目标服务器独立部署", 'App')
+    ColorLogger.warning("当前使用开发服务器，生产环境请运行 python app/serve.py", 'App')
 
     socketio.run(
         app,
@@ -40,6 +40,106 @@ class Config:
         f'sqlite:///{DATA_DIR}/frpc.db'
     ).replace('sqlite:///', '')
 
+    # 生产服务（app/serve.py 通过 gunicorn 启动）
+    # 工作模型：gthread（线程）、eventlet 或 gevent（协程）；Socket.IO 的 async_mode 随之确定
+    SERVER_WORKER_CLASS = os.environ.get('SERVER_WORKER_CLASS', 'gthread')
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 1))
+    # gthread 每个进程的线程数（每个 WebSocket 连接占用一个线程）；eventlet / gevent 每个进程的最大连接数
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 32))
+    SERVER_WORKER_CONNECTIONS = int(os.environ.get('SERVER_WORKER_CONNECTIONS', 1000))
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 60))
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
+    SERVER_KEEPALIVE = int(os.environ.get('SERVER_KEEPALIVE', 5))
+    # Socket.IO 异步模式，由 gunicorn.conf.py 按工作模型设置；直接运行 app.py 时为 threading
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+
+    # 多进程协调（SERVER_WORKERS > 1 时默认启用）
+    # 共享状态后端：memory（单进程）或 sqlite（同一主机的多个进程共享 SHARED_STATE_PATH）
+    SHARED_STATE_BACKEND = os.environ.get(
+        'SHARED_STATE_BACKEND', 'sqlite' if SERVER_WORKERS > 1 else 'memory'
+    )
+    SHARED_STATE_PATH = os.environ.get('SHARED_STATE_PATH', os.path.join(DATA_DIR, 'shared_state.db'))
+    # Socket.IO 消息队列：空（单进程）、sqlite（使用 SHARED_STATE_PATH，无需外部服务）
+    # 或 redis:// / amqp:// 等地址（由 Flask-SocketIO 连接外部消息队列）
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get(
+        'SOCKETIO_MESSAGE_QUEUE', 'sqlite' if SERVER_WORKERS > 1 else ''
+    )
+    # SQLite 消息队列的轮询间隔（毫秒）和消息保留时间（秒）
+    MESSAGE_QUEUE_POLL_MS = float(os.environ.get('MESSAGE_QUEUE_POLL_MS', 10))
+    MESSAGE_QUEUE_RETENTION = int(os.environ.get('MESSAGE_QUEUE_RETENTION', 60))
+    # Web 工作进程等待后台任务进程回复的超时时间（秒）
+    RELAY_TIMEOUT = float(os.environ.get('RELAY_TIMEOUT', 5))
+
+    # 配置模板
+    DEFAULT_CONFIG_TEMPLATE = os.environ.get('DEFAULT_CONFIG_TEMPLATE', 'default')
+    TEMPLATE_RENDER_CACHE_SIZE = int(os.environ.get('TEMPLATE_RENDER_CACHE_SIZE', 4096))
+
+    # 配置拉取记录：批量写入间隔，以及超过多久未拉取视为失联（秒）
+    PULL_FLUSH_INTERVAL = float(os.environ.get('PULL_FLUSH_INTERVAL', 5))
+    PULL_STALE_SECONDS = int(os.environ.get('PULL_STALE_SECONDS', 3600))
+
+    # 配置修订历史
+    CONFIG_REVISION_SNAPSHOT_INTERVAL = int(os.environ.get('CONFIG_REVISION_SNAPSHOT_INTERVAL', 10))
+    CONFIG_REVISION_RETENTION = int(os.environ.get('CONFIG_REVISION_RETENTION', 50))
+
+    # 监控采集配置（frpc admin API 端口为 FRPC_ADMIN_PORT_BASE + 客户端 ID）
+    MONITOR_ENABLED = os.environ.get('MONITOR_ENABLED', 'true').lower() == 'true'
+    FRPC_ADMIN_HOST = os.environ.get('FRPC_ADMIN_HOST', '127.0.0.1')
+    FRPC_ADMIN_PORT_BASE = int(os.environ.get('FRPC_ADMIN_PORT_BASE', 7400))
+    FRPC_ADMIN_USER = os.environ.get('FRPC_ADMIN_USER', 'admin')
+    FRPC_ADMIN_PASSWORD = os.environ.get('FRPC_ADMIN_PASSWORD', 'admin')
+    # 采集线程数；启用的客户端多于该值时，无响应的目标会让其余目标排队等待空闲线程
+    MONITOR_CONCURRENCY = int(os.environ.get('MONITOR_CONCURRENCY', 128))
+    MONITOR_CONNECT_TIMEOUT = float(os.environ.get('MONITOR_CONNECT_TIMEOUT', 2))
+    MONITOR_READ_TIMEOUT = float(os.environ.get('MONITOR_READ_TIMEOUT', 5))
+    MONITOR_JITTER = float(os.environ.get('MONITOR_JITTER', 0.1))
+    # 自适应采集间隔（秒）
+    MONITOR_WATCHED_INTERVAL = float(os.environ.get('MONITOR_WATCHED_INTERVAL', 1))
+    MONITOR_ACTIVE_INTERVAL = float(os.environ.get('MONITOR_ACTIVE_INTERVAL', 5))
+    MONITOR_IDLE_MAX_INTERVAL = float(os.environ.get('MONITOR_IDLE_MAX_INTERVAL', 60))
+    MONITOR_BACKOFF_MAX_INTERVAL = float(os.environ.get('MONITOR_BACKOFF_MAX_INTERVAL', 300))
+    MONITOR_SYNC_INTERVAL = float(os.environ.get('MONITOR_SYNC_INTERVAL', 30))
+
+    # 隧道健康检查（TCP 探测 server_addr:remote_port）
+    HEALTH_CHECK_ENABLED = os.environ.get('HEALTH_CHECK_ENABLED', 'true').lower() == 'true'
+    HEALTH_CHECK_INTERVAL = float(os.environ.get('HEALTH_CHECK_INTERVAL', 30))
+    HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', 3))
+    HEALTH_CHECK_CONCURRENCY = int(os.environ.get('HEALTH_CHECK_CONCURRENCY', 256))
+    # 连续失败达到阈值时判定为不可用并打开熔断，熔断期间不再探测，半开探测失败时熔断时间加倍
+    HEALTH_FAILURE_THRESHOLD = int(os.environ.get('HEALTH_FAILURE_THRESHOLD', 3))
+    HEALTH_BREAKER_COOLDOWN = float(os.environ.get('HEALTH_BREAKER_COOLDOWN', 60))
+    HEALTH_BREAKER_MAX_COOLDOWN = float(os.environ.get('HEALTH_BREAKER_MAX_COOLDOWN', 900))
+
+    # 监控指标存储（按块压缩存储，整块过期删除）
+    METRICS_BLOCK_SECONDS = int(os.environ.get('METRICS_BLOCK_SECONDS', 60))
+    METRICS_RETENTION_DAYS = int(os.environ.get('METRICS_RETENTION_DAYS', 7))
+    METRICS_MINUTE_RETENTION_DAYS = int(os.environ.get('METRICS_MINUTE_RETENTION_DAYS', 30))
+    METRICS_HOUR_RETENTION_DAYS = int(os.environ.get('METRICS_HOUR_RETENTION_DAYS', 365))
+    METRICS_MAX_POINTS = int(os.environ.get('METRICS_MAX_POINTS', 500))
+
+    # 运行指标（/metrics）抓取令牌，未设置时只允许登录会话访问
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # 请求追踪（Server-Timing 响应头和最近最慢的请求/SQL 记录），默认关闭
+    TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'false').lower() == 'true'
+    TRACING_BUFFER_SIZE = int(os.environ.get('TRACING_BUFFER_SIZE', 1000))
+
+    # 采样分析（/api/diagnostics/profile）：单次最长时长和两次采样的最短间隔（秒）
+    PROFILER_MAX_SECONDS = float(os.environ.get('PROFILER_MAX_SECONDS', 30))
+    PROFILER_COOLDOWN = float(os.environ.get('PROFILER_COOLDOWN', 60))
+
+    # frpc systemd 服务控制：systemctl 路径、服务单元和单次操作超时（秒）
+    SYSTEMCTL_PATH = os.environ.get('SYSTEMCTL_PATH', 'systemctl')
+    FRPC_SERVICE_UNIT = os.environ.get('FRPC_SERVICE_UNIT', 'frpc')
+    SERVICE_ACTION_TIMEOUT = float(os.environ.get('SERVICE_ACTION_TIMEOUT', 60))
+    # 服务状态缓存：后台刷新间隔和 systemctl show 超时（秒）
+    SERVICE_STATUS_INTERVAL = float(os.environ.get('SERVICE_STATUS_INTERVAL', 5))
+    SERVICE_STATUS_TIMEOUT = float(os.environ.get('SERVICE_STATUS_TIMEOUT', 5))
+    # 启动/重启频率限制：两次操作的最短间隔（秒），时间窗口内最多失败次数
+    SERVICE_RESTART_COOLDOWN = int(os.environ.get('SERVICE_RESTART_COOLDOWN', 10))
+    SERVICE_RESTART_LIMIT = int(os.environ.get('SERVICE_RESTART_LIMIT', 3))
+    SERVICE_RESTART_WINDOW = int(os.environ.get('SERVICE_RESTART_WINDOW', 300))
+
     # Session 配置
     PERMANENT_SESSION_LIFETIME = 86400  # 24小时
     SESSION_REFRESH_EACH_REQUEST = True
@@ -59,9 +159,43 @@ class Config:
         'port': int(os.environ.get('SMTP_PORT', 587)) if os.environ.get('SMTP_PORT') else None,
         'user': os.environ.get('SMTP_USER'),
         'password': os.environ.get('SMTP_PASSWORD'),
-        'to': os.environ.get('ALERT_TO', '').split(',') if os.environ.get('ALERT_TO') else []
+        'to': os.environ.get('ALERT_TO', '').split(',') if os.environ.get('ALERT_TO') else [],
+        'starttls': os.environ.get('SMTP_STARTTLS', 'true').lower() == 'true'
     }
 
+    # 告警发送队列：SMTP 超时、空闲连接保持时间、重试退避和最大尝试次数
+    ALERT_SMTP_TIMEOUT = float(os.environ.get('ALERT_SMTP_TIMEOUT', 10))
+    ALERT_SMTP_IDLE_SECONDS = float(os.environ.get('ALERT_SMTP_IDLE_SECONDS', 60))
+    ALERT_RETRY_BASE_SECONDS = float(os.environ.get('ALERT_RETRY_BASE_SECONDS', 30))
+    ALERT_RETRY_MAX_SECONDS = float(os.environ.get('ALERT_RETRY_MAX_SECONDS', 3600))
+    ALERT_MAX_ATTEMPTS = int(os.environ.get('ALERT_MAX_ATTEMPTS', 8))
+    ALERT_OUTBOX_RETENTION_DAYS = int(os.environ.get('ALERT_OUTBOX_RETENTION_DAYS', 7))
+
+    # 告警通知通道：每个通道的线程数相互独立，慢通道不影响其他通道
+    ALERT_SMTP_WORKERS = int(os.environ.get('ALERT_SMTP_WORKERS', 1))
+    ALERT_WEBHOOK_URL = os.environ.get('ALERT_WEBHOOK_URL') or None
+    ALERT_WEBHOOK_TOKEN = os.environ.get('ALERT_WEBHOOK_TOKEN') or None
+    ALERT_WEBHOOK_TIMEOUT = float(os.environ.get('ALERT_WEBHOOK_TIMEOUT', 10))
+    ALERT_WEBHOOK_WORKERS = int(os.environ.get('ALERT_WEBHOOK_WORKERS', 4))
+    ALERT_COMMAND = os.environ.get('ALERT_COMMAND') or None
+    ALERT_COMMAND_TIMEOUT = float(os.environ.get('ALERT_COMMAND_TIMEOUT', 30))
+    ALERT_COMMAND_WORKERS = int(os.environ.get('ALERT_COMMAND_WORKERS', 2))
+
+    # 告警去重和分组：去重窗口、分组等待时间、每个收件人在限流窗口内的最大邮件数
+    ALERT_DEDUP_WINDOW = int(os.environ.get('ALERT_DEDUP_WINDOW', 3600))
+    ALERT_GROUP_WAIT = float(os.environ.get('ALERT_GROUP_WAIT', 30))
+    ALERT_RATE_LIMIT = int(os.environ.get('ALERT_RATE_LIMIT', 10))
+    ALERT_RATE_WINDOW = int(os.environ.get('ALERT_RATE_WINDOW', 3600))
+
+    # 告警规则：规则文件（JSON，为空时使用内置规则）、到期检查周期（秒）和每周期的时间预算（毫秒）
+    ALERT_RULES_FILE = os.environ.get('ALERT_RULES_FILE') or None
+    RULES_TICK_INTERVAL = float(os.environ.get('RULES_TICK_INTERVAL', 1))
+    RULES_TICK_BUDGET_MS = float(os.environ.get('RULES_TICK_BUDGET_MS', 50))
+
+    # 清除已解决告警：每批删除的行数和批次之间的暂停时间（毫秒），暂停期间其他写入者可获得写锁
+    ALERT_CLEAR_BATCH_SIZE = int(os.environ.get('ALERT_CLEAR_BATCH_SIZE', 500))
+    ALERT_CLEAR_PAUSE_MS = float(os.environ.get('ALERT_CLEAR_PAUSE_MS', 20))
+
     @classmethod
     def load_admin_config(cls) -> tuple:
         """从配置文件或环境变量加载管理员配置"""
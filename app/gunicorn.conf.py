@@ -0,0 +1,80 @@
+"""
+gunicorn 配置（由 app/serve.py 使用，也可直接运行 gunicorn -c app/gunicorn.conf.py）
+
+工作模型、进程数和线程数来自 Config（环境变量 SERVER_*），Socket.IO 的 async_mode 按工作模型设置。
+数据库初始化在主进程中执行一次；监控采集、健康检查、告警等后台任务只在取得
+data/background.lock 文件锁的一个工作进程中运行，该进程退出后由重启的工作进程接管。
+多个工作进程之间通过共享状态（SHARED_STATE_BACKEND）和消息队列（SOCKETIO_MESSAGE_QUEUE）协调。
+"""
+import fcntl
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from config import Config  # noqa: E402
+
+# 工作模型对应的 Socket.IO 异步模式
+ASYNC_MODES = {
+    'gthread': 'threading',
+    'eventlet': 'eventlet',
+    'gevent': 'gevent',
+}
+
+if Config.SERVER_WORKER_CLASS not in ASYNC_MODES:
+    raise ValueError(f"SERVER_WORKER_CLASS 无效: {Config.SERVER_WORKER_CLASS}（可选 {', '.join(ASYNC_MODES)}）")
+
+# 在工作进程导入应用之前设置，工作进程继承
+Config.SOCKETIO_ASYNC_MODE = ASYNC_MODES[Config.SERVER_WORKER_CLASS]
+os.environ['SOCKETIO_ASYNC_MODE'] = Config.SOCKETIO_ASYNC_MODE
+
+chdir = APP_DIR
+wsgi_app = 'app:app'
+bind = [f'0.0.0.0:{Config.PORT}']
+worker_class = Config.SERVER_WORKER_CLASS
+workers = Config.SERVER_WORKERS
+threads = Config.SERVER_THREADS
+worker_connections = Config.SERVER_WORKER_CONNECTIONS
+timeout = Config.SERVER_TIMEOUT
+graceful_timeout = Config.SERVER_GRACEFUL_TIMEOUT
+keepalive = Config.SERVER_KEEPALIVE
+# 每个工作进程各自导入应用，协程工作模型的 monkey patch 才能在导入前生效
+preload_app = False
+accesslog = None
+errorlog = '-'
+
+_background_lock = None
+
+
+def on_starting(server):
+    """主进程启动时初始化数据库（不导入应用，工作进程各自导入）"""
+    from models.database import prepare_database
+    from utils.logger import ColorLogger
+
+    prepare_database()
+    if Config.SERVER_WORKERS > 1:
+        if Config.SHARED_STATE_BACKEND != 'sqlite':
+            ColorLogger.warning('多个工作进程使用进程内共享状态，登录和重启限流在各进程中分别计数', 'App')
+        if not Config.SOCKETIO_MESSAGE_QUEUE:
+            ColorLogger.warning('多个工作进程未配置 SOCKETIO_MESSAGE_QUEUE，实时推送只能送达部分连接', 'App')
+
+
+def post_worker_init(worker):
+    """取得后台任务锁的工作进程启动后台任务"""
+    global _background_lock
+    from app import start_background_services
+    from utils.logger import ColorLogger
+
+    os.makedirs(Config.DATA_DIR, exist_ok=True)
+    lock = open(os.path.join(Config.DATA_DIR, 'background.lock'), 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return
+    # 进程存活期间保持文件锁
+    _background_lock = lock
+    ColorLogger.info(f"工作进程 {worker.pid} 负责运行后台任务", 'App')
+    start_background_services()
@@ -2,17 +2,111 @@
 数据库连接和初始化模块
 """
 import sqlite3
+import time
 from flask import g
 
 from config import Config
+from utils import tracing
+from utils.instrumentation import registry
 from utils.logger import ColorLogger
 
 
+# 表单模式默认模板，变量使用 ${name} 语法
+DEFAULT_TEMPLATE_CONTENT = """[common]
+server_addr = ${server_addr}
+server_port = ${server_port}
+tls_enable = false
+user = ${user}
+token = ${token}
+
+[proxy]
+type = tcp
+local_ip = 127.0.0.1
+local_port = ${local_port}
+remote_port = ${remote_port}
+"""
+
+
+LOGS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id INTEGER,
+        level TEXT,
+        message TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE
+    )
+"""
+
+ALERTS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id INTEGER,
+        alert_type TEXT,
+        message TEXT,
+        sent_to TEXT,
+        sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        resolved BOOLEAN DEFAULT 0,
+        occurrences INTEGER NOT NULL DEFAULT 1,
+        last_seen_at INTEGER,
+        notified_at INTEGER,
+        resolved_at INTEGER,
+        FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE
+    )
+"""
+
+
+def _ensure_cascade(cursor, table: str, create_sql: str) -> None:
+    """
+    将旧表中引用 clients 的外键重建为 ON DELETE CASCADE
+
+    SQLite 不支持修改外键约束，只能按新定义重建表并复制数据。
+
+    Args:
+        cursor: 数据库游标
+        table: 表名
+        create_sql: 新表的 CREATE TABLE 语句
+    """
+    foreign_keys = cursor.execute(f'PRAGMA foreign_key_list({table})').fetchall()
+    # foreign_key_list 列: id, seq, table, from, to, on_update, on_delete, match
+    if all(row[2] != 'clients' or row[6] == 'CASCADE' for row in foreign_keys):
+        return
+
+    old_columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()]
+    cursor.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+    cursor.execute(create_sql)
+    new_columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()]
+    columns = ', '.join(column for column in new_columns if column in old_columns)
+    cursor.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_old')
+    cursor.execute(f'DROP TABLE {table}_old')
+    ColorLogger.info(f'已将 {table} 表的外键重建为级联删除', 'Database')
+
+
+def _ensure_column(cursor, table: str, column: str, definition: str) -> None:
+    """
+    为已有表补充缺失的列（CREATE TABLE IF NOT EXISTS 不会修改旧表）
+
+    Args:
+        cursor: 数据库游标
+        table: 表名
+        column: 列名
+        definition: 列定义
+    """
+    columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()]
+    if column not in columns:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        ColorLogger.info(f'已为 {table} 表添加 {column} 字段', 'Database')
+
+
 def init_db() -> None:
     """初始化数据库，创建所有表和索引"""
     conn = sqlite3.connect(Config.DATABASE_URL)
     c = conn.cursor()
 
+    # 启用 WAL 模式以提高并发性能（PRAGMA 不能在事务中修改，需最先执行）
+    c.execute('PRAGMA journal_mode=WAL')
+    c.execute('PRAGMA synchronous=NORMAL')
+
     # 客户端表 - 配置内容直接存储在数据库中
     c.execute('''
         CREATE TABLE IF NOT EXISTS clients (
@@ -38,31 +132,139 @@ def init_db() -> None:
         # 不存在 config_path 字段，说明是新数据库或已迁移
         pass
 
-    # 日志表
+    # 配置模板表 - 公共配置只存一份，客户端仅保存模板变量
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS config_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            description TEXT,
+            content TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # 客户端模板字段（旧数据库需要补充列）
+    _ensure_column(c, 'clients', 'template_id', 'INTEGER REFERENCES config_templates (id)')
+    _ensure_column(c, 'clients', 'template_vars', 'TEXT')
+
+    # 乐观并发控制版本号，每次修改客户端时递增
+    _ensure_column(c, 'clients', 'version', 'INTEGER NOT NULL DEFAULT 1')
+
+    # 配置修订历史表 - 每个版本存储为相对前一版本的差异，定期存储完整快照
     c.execute('''
-        CREATE TABLE IF NOT EXISTS logs (
+        CREATE TABLE IF NOT EXISTS client_config_revisions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            client_id INTEGER,
-            level TEXT,
-            message TEXT,
+            client_id INTEGER NOT NULL,
+            revision INTEGER NOT NULL,
+            is_snapshot BOOLEAN NOT NULL DEFAULT 0,
+            payload TEXT NOT NULL,
+            content_size INTEGER NOT NULL DEFAULT 0,
+            created_by TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (client_id) REFERENCES clients (id)
+            UNIQUE (client_id, revision),
+            FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE
+        )
+    ''')
+
+    # 监控指标块表 - 每个客户端每分钟一行，样本按列差分后压缩存储
+    # 已删除客户端的数据不做级联删除，随保留期过期清理
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS metric_blocks (
+            client_id INTEGER NOT NULL,
+            block_ts INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (client_id, block_ts)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_metric_blocks_block_ts ON metric_blocks(block_ts)')
+
+    # 监控指标汇总表 - 1 分钟精度每小时一行，1 小时精度每天一行
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS metric_rollups (
+            client_id INTEGER NOT NULL,
+            resolution INTEGER NOT NULL,
+            period_ts INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (client_id, resolution, period_ts)
+        ) WITHOUT ROWID
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_metric_rollups_period ON metric_rollups(resolution, period_ts)')
+
+    # 隧道健康状态表 - 每个客户端一行，由健康检查器整轮批量写入
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS client_health (
+            client_id INTEGER PRIMARY KEY,
+            state TEXT NOT NULL,
+            breaker TEXT NOT NULL,
+            failures INTEGER NOT NULL DEFAULT 0,
+            latency_ms REAL,
+            error TEXT,
+            checked_at INTEGER,
+            changed_at INTEGER,
+            FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE
         )
     ''')
 
-    # 告警表
+    # 配置拉取记录表 - 每个客户端一行，由 PullTracker 定期批量写入
     c.execute('''
-        CREATE TABLE IF NOT EXISTS alerts (
+        CREATE TABLE IF NOT EXISTS client_pulls (
+            client_id INTEGER PRIMARY KEY,
+            last_pull_at INTEGER NOT NULL,
+            last_ip TEXT,
+            last_version INTEGER,
+            pull_count INTEGER NOT NULL DEFAULT 0,
+            avg_interval REAL,
+            FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE
+        )
+    ''')
+
+    # 日志表和告警表 - 删除客户端时级联删除
+    c.execute(LOGS_TABLE_SQL)
+    c.execute(ALERTS_TABLE_SQL)
+    _ensure_cascade(c, 'logs', LOGS_TABLE_SQL)
+    _ensure_cascade(c, 'alerts', ALERTS_TABLE_SQL)
+    # 告警去重：重复触发次数、最近一次触发 / 通知 / 解决时间
+    _ensure_column(c, 'alerts', 'occurrences', 'INTEGER NOT NULL DEFAULT 1')
+    _ensure_column(c, 'alerts', 'last_seen_at', 'INTEGER')
+    _ensure_column(c, 'alerts', 'notified_at', 'INTEGER')
+    _ensure_column(c, 'alerts', 'resolved_at', 'INTEGER')
+    # 自动解决按 (alert_type, resolved = 0) 查找，只涉及当前未解决的告警，不再单独建指纹索引
+    c.execute('DROP INDEX IF EXISTS idx_alerts_fingerprint')
+    # 告警列表按 sent_at 倒序翻页（可按是否解决、客户端、类型过滤），统计扫描 (alert_type, resolved) 覆盖索引
+    c.execute('CREATE INDEX IF NOT EXISTS idx_alerts_sent_at ON alerts(sent_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_alerts_resolved_sent_at ON alerts(resolved, sent_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_alerts_client_sent_at ON alerts(client_id, sent_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_alerts_type_sent_at ON alerts(alert_type, sent_at)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_alerts_type_resolved ON alerts(alert_type, resolved)')
+
+    # 告警发送队列 - 待发送的告警通知持久化保存，进程崩溃后继续发送
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS alert_outbox (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            client_id INTEGER,
-            alert_type TEXT,
-            message TEXT,
-            sent_to TEXT,
-            sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            resolved BOOLEAN DEFAULT 0,
-            FOREIGN KEY (client_id) REFERENCES clients (id)
+            alert_id INTEGER,
+            channel TEXT NOT NULL DEFAULT 'smtp',
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            recipients TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            created_at INTEGER NOT NULL,
+            sent_at INTEGER,
+            FOREIGN KEY (alert_id) REFERENCES alerts (id) ON DELETE SET NULL
         )
     ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_alert_outbox_due ON alert_outbox(status, next_attempt_at)')
+    _ensure_column(c, 'alert_outbox', 'channel', "TEXT NOT NULL DEFAULT 'smtp'")
+    # 删除告警时按 alert_id 置空发送队列中的引用
+    c.execute('CREATE INDEX IF NOT EXISTS idx_alert_outbox_alert ON alert_outbox(alert_id)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_alert_outbox_channel_due '
+              'ON alert_outbox(channel, status, next_attempt_at)')
 
     # 审计日志表
     c.execute('''
@@ -101,15 +303,101 @@ def init_db() -> None:
     c.execute('CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)')
     c.execute('CREATE INDEX IF NOT EXISTS idx_users_role ON users(role)')
 
-    # 启用 WAL 模式以提高并发性能
-    c.execute('PRAGMA journal_mode=WAL')
-    c.execute('PRAGMA synchronous=NORMAL')
+    # 内置默认模板（表单模式使用）
+    c.execute(
+        'INSERT OR IGNORE INTO config_templates (name, description, content) VALUES (?, ?, ?)',
+        (Config.DEFAULT_CONFIG_TEMPLATE, '表单模式默认 TCP 模板', DEFAULT_TEMPLATE_CONTENT)
+    )
 
     conn.commit()
     conn.close()
     ColorLogger.success('数据库初始化完成', 'Database')
 
 
+QUERY_SECONDS = registry.histogram(
+    'frp_console_db_query_seconds',
+    'SQLite statement execution time (excluding row fetch)',
+    ('statement',),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+_STATEMENT_KINDS = frozenset(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'PRAGMA',
+                              'BEGIN', 'COMMIT', 'ROLLBACK', 'WITH', 'CREATE'))
+
+
+def prepare_database():
+    """初始化数据库并运行迁移（每次启动只需执行一次）"""
+    init_db()
+
+    # 运行用户表迁移
+    try:
+        from migrations.migrate_users import run_migrations
+        run_migrations()
+    except Exception as e:
+        ColorLogger.warning(f"用户表迁移失败（可能已存在）: {e}", 'App')
+
+
+def _observe_query(sql: str, start: float) -> None:
+    """按语句类型记录执行耗时，开启追踪时同时计入当前请求"""
+    elapsed = time.perf_counter() - start
+    head = sql.lstrip()[:8].split(None, 1)
+    kind = head[0].upper() if head else ''
+    QUERY_SECONDS.labels(kind if kind in _STATEMENT_KINDS else 'OTHER').observe(elapsed)
+    if tracing.enabled:
+        tracing.record_query(sql, elapsed)
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """记录执行耗时的游标"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observe_query(sql, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observe_query(sql, start)
+
+
+class _TimedConnection(sqlite3.Connection):
+    """
+    记录执行耗时的连接
+
+    Connection.execute 在 C 层直接执行，不经过 cursor()，因此两者都需要覆盖。
+    """
+
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _connect() -> sqlite3.Connection:
+    """
+    创建并配置数据库连接
+
+    Returns:
+        sqlite3.Connection: 数据库连接对象
+    """
+    conn = sqlite3.connect(Config.DATABASE_URL, timeout=30, factory=_TimedConnection)
+    conn.row_factory = sqlite3.Row
+    # 启用 WAL 模式以提高并发性能
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    # 外键约束默认关闭，需要按连接开启才能级联删除
+    conn.execute('PRAGMA foreign_keys=ON')
+    return conn
+
+
 def get_db():
     """
     获取数据库连接（用于请求上下文）
@@ -118,11 +406,7 @@ def get_db():
         sqlite3.Connection: 数据库连接对象
     """
     if 'db' not in g:
-        g.db = sqlite3.connect(Config.DATABASE_URL, timeout=30)
-        g.db.row_factory = sqlite3.Row
-        # 启用 WAL 模式以提高并发性能
-        g.db.execute('PRAGMA journal_mode=WAL')
-        g.db.execute('PRAGMA synchronous=NORMAL')
+        g.db = _connect()
     return g.db
 
 
@@ -133,12 +417,7 @@ def get_db_connection():
     Returns:
         sqlite3.Connection: 数据库连接对象
     """
-    conn = sqlite3.connect(Config.DATABASE_URL, timeout=30)
-    conn.row_factory = sqlite3.Row
-    # 启用 WAL 模式以提高并发性能
-    conn.execute('PRAGMA journal_mode=WAL')
-    conn.execute('PRAGMA synchronous=NORMAL')
-    return conn
+    return _connect()
 
 
 def close_db(exception=None) -> None:
@@ -1,20 +1,555 @@
 """
-FRP Web Multi - 监控模块（已移除）
-此模块已移除，所有监控功能已禁用。
+FRP Console - 监控数据采集器
+通过各客户端的 frpc admin API（/api/status）并发采集流量和连接数据
+
+采集使用有上限的线程池并发轮询启用的客户端，各线程的 HTTP 会话共享一个保持长连接的连接池；
+每个目标有独立的连接/读取超时。每个客户端的采集间隔由 CollectionScheduler 按订阅情况
+和数据变化自适应调整。
+
+最新指标和未写入的数据块只存在于运行后台任务的进程中，Web 请求通过 relay 读取。
 """
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from utils.instrumentation import registry
+from utils.logger import ColorLogger
+from utils.message_queue import relay
+from models.database import get_db_connection
+from services.metrics_store import metrics_store
+from services.live_metrics import publisher, client_room, FLEET_ROOM
+from services.collection_scheduler import scheduler
+from services.alert_rules import rules_engine
+
+
+# 共享连接池最多缓存的 admin 地址数量（每个客户端一个地址）
+MAX_ADMIN_POOLS = 4096
+
+# 过期指标清理间隔（秒）
+CLEANUP_INTERVAL = 3600
+
+# 推送、写入指标的周期（秒），同一周期内的更新合并处理
+TICK_INTERVAL = 1.0
+
+# 变化检测使用的字段
+CHANGE_FIELDS = ('traffic_in', 'traffic_out', 'connections_active')
+
+POLL_SECONDS = registry.histogram(
+    'frp_console_collector_poll_seconds',
+    'frpc admin API poll time',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+# 输出为每个客户端指标的样本字段: (指标名, 类型, 说明)
+CLIENT_GAUGES = (
+    ('traffic_in', 'frp_console_client_traffic_in_bytes', 'Inbound traffic today reported by frpc'),
+    ('traffic_out', 'frp_console_client_traffic_out_bytes', 'Outbound traffic today reported by frpc'),
+    ('connections_active', 'frp_console_client_connections', 'Active proxy connections'),
+    ('rate_in', 'frp_console_client_rate_in_bytes', 'Inbound rate in bytes per second'),
+    ('rate_out', 'frp_console_client_rate_out_bytes', 'Outbound rate in bytes per second'),
+)
+
+# 全局状态
+monitor_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+
+# 最新指标（client_id -> 数据），历史数据写入 metrics_store
+metrics_cache: Dict[int, Dict] = {}
+_metrics_lock = threading.Lock()
+
+# 尚未返回的轮询；上一轮仍在等待的目标不会被重复提交
+_in_flight: Set[int] = set()
+_in_flight_lock = threading.Lock()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_adapter: Optional[HTTPAdapter] = None
+_local = threading.local()
+_resource_lock = threading.Lock()
+
+
+def _empty_metrics(status: str, reachable: bool = True) -> Dict:
+    """
+    生成空的指标数据
+
+    Args:
+        status: 状态
+        reachable: admin 接口是否可访问（没有代理的 frpc 同样是 stopped，但接口可访问）
+    """
+    return {
+        'traffic_in': 0,
+        'traffic_out': 0,
+        'connections_active': 0,
+        'connections_total': 0,
+        'status': status,
+        'reachable': reachable
+    }
+
+
+def get_admin_port(client_id: int) -> int:
+    """根据客户端 ID 获取 admin 端口（client-1 -> 7401）"""
+    return Config.FRPC_ADMIN_PORT_BASE + client_id
+
+
+def _get_adapter() -> HTTPAdapter:
+    """
+    获取共享的连接池
+
+    每个 admin 地址保留一条长连接，下一轮采集无论由哪个线程执行都直接复用，避免重复建立 TCP 连接；
+    同一客户端同一时间只有一个轮询（_in_flight），每个地址一条连接即可。连接失败不重试，由下一轮采集自然重试。
+    """
+    global _adapter
+    with _resource_lock:
+        if _adapter is None:
+            _adapter = HTTPAdapter(pool_connections=MAX_ADMIN_POOLS, pool_maxsize=1, max_retries=0)
+        return _adapter
+
+
+def get_session() -> requests.Session:
+    """
+    获取当前线程的 HTTP 会话
+
+    requests.Session 不保证线程安全，每个采集线程使用自己的会话，所有会话挂载同一个连接池。
+    """
+    adapter = _get_adapter()
+    session = getattr(_local, 'session', None)
+    # 停止采集后连接池被替换，旧会话随之失效
+    if session is None or session.adapters.get('http://') is not adapter:
+        session = requests.Session()
+        session.auth = (Config.FRPC_ADMIN_USER, Config.FRPC_ADMIN_PASSWORD)
+        session.mount('http://', adapter)
+        _local.session = session
+    return session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """获取采集线程池（并发数由 MONITOR_CONCURRENCY 限制）"""
+    global _executor
+    with _resource_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.MONITOR_CONCURRENCY,
+                thread_name_prefix='monitor'
+            )
+        return _executor
+
+
+def parse_status(data: Dict) -> Dict:
+    """
+    汇总 /api/status 响应中所有代理的数据
+
+    Args:
+        data: admin API 返回的 JSON（按代理类型分组的代理列表）
+
+    Returns:
+        指标数据
+    """
+    # 支持多种代理类型 (tcp, udp, http, etc.)
+    proxies = []
+    for proxy_list in data.values():
+        if isinstance(proxy_list, list):
+            proxies.extend(proxy_list)
+
+    if not proxies:
+        return _empty_metrics('stopped')
+
+    total_in = 0
+    total_out = 0
+    total_active = 0
+    for proxy in proxies:
+        total_in += proxy.get('today_traffic_in', 0)
+        total_out += proxy.get('today_traffic_out', 0)
+        total_active += proxy.get('cur_conns', 0)
+
+    return {
+        'traffic_in': total_in,
+        'traffic_out': total_out,
+        'connections_active': total_active,
+        # API 不提供总连接数，使用当前连接数作为近似
+        'connections_total': total_active,
+        'status': 'running' if total_active > 0 else 'idle',
+        'reachable': True
+    }
+
+
+def fetch_metrics_from_admin(client_id: int) -> Optional[Dict]:
+    """
+    通过 frpc admin HTTP API 获取指标
+
+    Args:
+        client_id: 客户端 ID
+
+    Returns:
+        指标数据（reachable 表示 admin 接口是否有响应），获取失败返回 None
+    """
+    url = f'http://{Config.FRPC_ADMIN_HOST}:{get_admin_port(client_id)}/api/status'
+    try:
+        response = get_session().get(
+            url,
+            timeout=(Config.MONITOR_CONNECT_TIMEOUT, Config.MONITOR_READ_TIMEOUT)
+        )
+        if response.status_code != 200:
+            return None
+        return parse_status(response.json())
+    except requests.exceptions.ConnectionError:
+        # 连接失败（含连接超时），说明 frpc 未运行或 admin 接口未启用
+        return _empty_metrics('stopped', reachable=False)
+    except requests.exceptions.Timeout:
+        ColorLogger.warning(f"客户端 {client_id} admin 接口响应超时", 'Monitor')
+        return None
+    except Exception as e:
+        ColorLogger.error(f"获取客户端 {client_id} 数据失败: {e}", 'Monitor')
+        return None
+
+
+def _record_sample(client_id: int, data: Dict, now: float) -> bool:
+    """
+    计算速率并写入最新指标、指标存储和实时推送
+
+    Returns:
+        流量或连接数相对上一个样本是否有变化
+    """
+    with _metrics_lock:
+        previous = metrics_cache.get(client_id)
+        rate_in = rate_out = 0
+        if previous:
+            elapsed = now - previous['collected_at']
+            if elapsed > 0:
+                rate_in = max(0, int((data['traffic_in'] - previous['traffic_in']) / elapsed))
+                rate_out = max(0, int((data['traffic_out'] - previous['traffic_out']) / elapsed))
+
+        sample = {
+            **data,
+            'ts': int(now),
+            'collected_at': now,
+            'rate_in': rate_in,
+            'rate_out': rate_out
+        }
+        metrics_cache[client_id] = sample
+    metrics_store.append(client_id, sample)
+    publisher.publish(client_id, sample)
+    rules_engine.observe('metrics', client_id, {
+        'reachable': data['reachable'],
+        'rate_in': rate_in,
+        'rate_out': rate_out,
+        'connections_active': data['connections_active'],
+    })
+    return previous is None or any(previous[field] != data[field] for field in CHANGE_FIELDS)
+
+
+def _poll_client(client_id: int) -> Tuple[bool, bool]:
+    """
+    采集单个客户端（在线程池中执行）
+
+    Returns:
+        (admin API 是否可访问, 数据是否有变化)
+    """
+    try:
+        with POLL_SECONDS.time():
+            data = fetch_metrics_from_admin(client_id)
+        if not data:
+            rules_engine.observe('metrics', client_id, {'reachable': False})
+            return False, False
+        changed = _record_sample(client_id, data, time.time())
+        return data['reachable'], changed
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(client_id)
+
+
+def _on_polled(client_id: int, future) -> None:
+    """采集完成后按结果安排该客户端的下一次采集"""
+    reachable, changed = False, False
+    if not future.cancelled() and future.exception() is None:
+        reachable, changed = future.result()
+    scheduler.record(
+        client_id,
+        reachable,
+        changed,
+        watched=publisher.subscriber_count(client_room(client_id)) > 0,
+        fleet_watched=publisher.subscriber_count(FLEET_ROOM) > 0
+    )
+
+
+def get_enabled_client_ids() -> List[int]:
+    """获取所有启用的客户端 ID"""
+    conn = get_db_connection()
+    try:
+        rows = conn.execute('SELECT id FROM clients WHERE enabled = 1').fetchall()
+        return [row['id'] for row in rows]
+    finally:
+        conn.close()
+
+
+def _forget_clients(active_ids: Set[int]) -> None:
+    """移除已删除或已禁用客户端的缓存数据"""
+    with _metrics_lock:
+        for client_id in [cid for cid in metrics_cache if cid not in active_ids]:
+            metrics_cache.pop(client_id, None)
+            metrics_store.close_client(client_id)
+            publisher.remove_client(client_id)
+
+
+def _collector_metrics():
+    """采集器运行指标：每个客户端的最新流量和连接数，以及调度状态"""
+    with _metrics_lock:
+        samples = [(client_id, dict(sample)) for client_id, sample in metrics_cache.items()]
+    with _in_flight_lock:
+        in_flight = len(_in_flight)
+
+    families = [
+        (name, 'gauge', documentation,
+         [({'client_id': str(client_id)}, sample.get(field) or 0) for client_id, sample in samples])
+        for field, name, documentation in CLIENT_GAUGES
+    ]
+    families.append((
+        'frp_console_client_up', 'gauge', 'Whether the frpc admin API was reachable at the last poll',
+        [({'client_id': str(client_id)}, 0 if sample['status'] == 'stopped' else 1)
+         for client_id, sample in samples]
+    ))
+    families.append(('frp_console_collector_in_flight', 'gauge', 'Polls currently in flight',
+                     [({}, in_flight)]))
+    return families
+
+
+registry.register_collector(_collector_metrics)
+
+
+def collect_once(client_ids: Optional[Iterable[int]] = None, timeout: Optional[float] = None) -> Dict[str, int]:
+    """
+    执行一轮并发采集
+
+    所有目标同时提交到线程池，本轮最多等待 timeout 秒；仍未返回（或仍在排队）的轮询继续在后台完成，
+    并在下一轮中跳过，因此一轮采集的耗时不受无响应客户端影响。
+
+    线程池最多同时运行 MONITOR_CONCURRENCY 个轮询。目标数不超过该值时，所有目标都能在一个超时窗口内
+    得到结果；目标更多时排在后面的轮询要等前面的线程空闲，无响应的目标较多时可能需要多个超时窗口才能轮到。
+
+    Args:
+        client_ids: 要采集的客户端 ID，默认为所有启用的客户端
+        timeout: 本轮最长等待时间（秒），默认为连接超时 + 读取超时
+
+    Returns:
+        本轮统计（submitted, completed, pending, skipped）
+    """
+    if client_ids is None:
+        client_ids = get_enabled_client_ids()
+        _forget_clients(set(client_ids))
+    if timeout is None:
+        timeout = Config.MONITOR_CONNECT_TIMEOUT + Config.MONITOR_READ_TIMEOUT
+
+    executor = _get_executor()
+    futures = []
+    skipped = 0
+    with _in_flight_lock:
+        for client_id in client_ids:
+            if client_id in _in_flight:
+                skipped += 1
+                continue
+            _in_flight.add(client_id)
+            futures.append(executor.submit(_poll_client, client_id))
+
+    done, pending = wait(futures, timeout=timeout)
+    return {
+        'submitted': len(futures),
+        'completed': len(done),
+        'pending': len(pending),
+        'skipped': skipped
+    }
+
+
+def update_websocket_status(count: int) -> None:
+    """
+    更新 WebSocket 连接状态（兼容旧接口）
+
+    采集节奏由调度器按实时订阅和数据变化决定，这里只记录活跃时间。
+    """
+    if count > 0:
+        publisher.last_activity = time.time()
+
+
+def _dispatch_due() -> int:
+    """提交所有到期的客户端，返回提交数量"""
+    executor = _get_executor()
+    submitted = 0
+    for client_id in scheduler.pop_due():
+        with _in_flight_lock:
+            if client_id in _in_flight:
+                # 正在被 collect_once 采集，稍后重新调度
+                scheduler.reschedule(client_id, TICK_INTERVAL)
+                continue
+            _in_flight.add(client_id)
+        future = executor.submit(_poll_client, client_id)
+        future.add_done_callback(lambda f, cid=client_id: _on_polled(cid, f))
+        submitted += 1
+    return submitted
+
+
+def monitor_loop() -> None:
+    """
+    监控主循环
+
+    定期同步启用的客户端，提交调度器中到期的采集任务；每个周期合并推送实时指标、
+    写入指标存储，直到下一个客户端到期或订阅变化时醒来。
+    """
+    last_sync = last_tick = last_cleanup = 0.0
+    while not _stop_event.is_set():
+        now = time.monotonic()
+        try:
+            if now - last_sync >= Config.MONITOR_SYNC_INTERVAL:
+                client_ids = get_enabled_client_ids()
+                _forget_clients(set(client_ids))
+                scheduler.sync(client_ids)
+                last_sync = now
+
+            scheduler.expedite(publisher.watched_clients())
+            _dispatch_due()
+
+            if now - last_tick >= TICK_INTERVAL:
+                publisher.flush_tick()
+                metrics_store.flush()
+                last_tick = now
+
+            if now - last_cleanup >= CLEANUP_INTERVAL:
+                dropped = metrics_store.drop_expired()
+                if dropped:
+                    ColorLogger.info(f"清理了 {dropped} 个过期指标块", 'Monitor')
+                last_cleanup = now
+        except Exception as e:
+            ColorLogger.error(f"采集出错: {e}", 'Monitor')
+
+        # 至少每个周期醒来一次，以便合并推送
+        timeout = TICK_INTERVAL
+        next_due = scheduler.next_due()
+        if next_due is not None:
+            timeout = min(timeout, max(0.0, next_due - time.monotonic()))
+        _wait(timeout)
+
+
+def _wait(timeout: float) -> None:
+    """等待下一个到期时间；有新订阅时提前唤醒"""
+    publisher.demand_changed.clear()
+    if not _stop_event.is_set():
+        # stop_monitor_thread 也会设置 demand_changed，停止时同样立即返回
+        publisher.demand_changed.wait(timeout)
+
+
+def start_monitor() -> None:
+    """启动监控线程"""
+    global monitor_thread
+
+    if monitor_thread and monitor_thread.is_alive():
+        return
+
+    _stop_event.clear()
+    monitor_thread = threading.Thread(target=monitor_loop, name='monitor', daemon=True)
+    monitor_thread.start()
+    ColorLogger.success(
+        f"数据采集器已启动 (并发上限 {Config.MONITOR_CONCURRENCY})",
+        'Monitor'
+    )
+
+
+def stop_monitor_thread() -> None:
+    """停止监控线程，写入未保存的指标并释放线程池和 HTTP 连接"""
+    global monitor_thread, _executor, _adapter
+    _stop_event.set()
+    publisher.demand_changed.set()
+    if monitor_thread:
+        monitor_thread.join(timeout=5)
+        monitor_thread = None
+
+    with _resource_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        if _adapter is not None:
+            _adapter.close()
+            _adapter = None
+    with _in_flight_lock:
+        _in_flight.clear()
+
+    try:
+        metrics_store.flush(include_open=True)
+    except Exception as e:
+        ColorLogger.error(f"保存指标数据失败: {e}", 'Monitor')
+
+
+def _public_sample(sample: Dict) -> Dict:
+    """转换为对外输出的格式（ISO 时间戳，去掉内部字段）"""
+    result = {key: value for key, value in sample.items() if key not in ('ts', 'collected_at')}
+    result['timestamp'] = datetime.fromtimestamp(sample['ts']).isoformat()
+    return result
+
+
+def get_latest_metrics(client_id: Optional[int] = None):
+    """
+    获取最新指标数据
+
+    Args:
+        client_id: 客户端 ID，为空时返回所有客户端
+
+    Returns:
+        单个客户端的指标（不存在返回 None），或 client_id -> 指标 的字典
+    """
+    with _metrics_lock:
+        if client_id:
+            sample = metrics_cache.get(client_id)
+            return _public_sample(sample) if sample else None
+        return {cid: _public_sample(sample) for cid, sample in metrics_cache.items()}
+
+
+def get_metrics_history(client_id: int, hours: float = 1) -> List[Dict]:
+    """
+    获取历史数据
+
+    Args:
+        client_id: 客户端 ID
+        hours: 时间范围（小时）
+
+    Returns:
+        按时间升序排列的指标列表
+    """
+    samples = metrics_store.query(client_id, int(time.time() - hours * 3600))
+    return [
+        {
+            'timestamp': datetime.fromtimestamp(sample['ts']).isoformat(),
+            'traffic_in': sample['traffic_in'],
+            'traffic_out': sample['traffic_out'],
+            'connections_active': sample['connections_active'],
+            'rate_in': sample['rate_in'],
+            'rate_out': sample['rate_out']
+        }
+        for sample in samples
+    ]
+
 
-# 占位函数，防止导入错误
-def update_websocket_status(count):
-    pass
+def get_metrics_series(client_id: int, hours: float = 1, max_points: Optional[int] = None) -> Dict:
+    """
+    获取降采样后的历史数据，点数不超过 max_points
 
-def get_latest_metrics(client_id=None):
-    return {}
+    Args:
+        client_id: 客户端 ID
+        hours: 时间范围（小时）
+        max_points: 最大点数，默认为 METRICS_MAX_POINTS
 
-def get_metrics_history(client_id, hours=1):
-    return []
+    Returns:
+        {'resolution': 每个点覆盖的秒数（0 表示原始样本）, 'points': 按时间升序排列的汇总点}
+    """
+    series = metrics_store.query_series(
+        client_id,
+        int(time.time() - hours * 3600),
+        max_points=max_points or Config.METRICS_MAX_POINTS
+    )
+    for point in series['points']:
+        point['timestamp'] = datetime.fromtimestamp(point['ts']).isoformat()
+    return series
 
-def start_monitor():
-    pass
 
-def stop_monitor_thread():
-    pass
\ No newline at end of file
+relay.register('monitor', sys.modules[__name__], 'get_latest_metrics', 'get_metrics_series')
@@ -0,0 +1,59 @@
+"""
+生产环境启动入口
+使用 gunicorn 运行应用，配置见 gunicorn.conf.py（工作模型、进程数和线程数由环境变量 SERVER_* 设置）
+
+    python app/serve.py
+
+开发调试仍可直接运行 python app/app.py（Werkzeug 开发服务器）。
+"""
+import importlib.util
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, APP_DIR)
+
+from config import Config  # noqa: E402
+from utils.logger import ColorLogger  # noqa: E402
+
+# 工作模型需要的额外依赖
+WORKER_DEPENDENCIES = {
+    'gthread': [],
+    'eventlet': ['eventlet'],
+    'gevent': ['gevent'],
+}
+
+
+def missing_dependencies(worker_class: str) -> list:
+    """启动所选工作模型缺少的 Python 包"""
+    required = ['gunicorn'] + WORKER_DEPENDENCIES.get(worker_class, [])
+    return [name for name in required if importlib.util.find_spec(name) is None]
+
+
+def main() -> int:
+    worker_class = Config.SERVER_WORKER_CLASS
+    if worker_class not in WORKER_DEPENDENCIES:
+        ColorLogger.error(f"SERVER_WORKER_CLASS 无效: {worker_class}（可选 {', '.join(WORKER_DEPENDENCIES)}）", 'App')
+        return 2
+
+    missing = missing_dependencies(worker_class)
+    if missing:
+        ColorLogger.error(f"缺少依赖: {', '.join(missing)}，请先执行 pip install {' '.join(missing)}", 'App')
+        return 2
+
+    if Config.SERVER_WORKERS > 1:
+        ColorLogger.info(f"{Config.SERVER_WORKERS} 个工作进程，Socket.IO 仅使用 WebSocket 传输", 'App')
+    concurrency = Config.SERVER_THREADS if worker_class == 'gthread' else Config.SERVER_WORKER_CONNECTIONS
+    ColorLogger.success(
+        f"FRP Console 启动中: {worker_class} × {Config.SERVER_WORKERS} 进程，每进程并发 {concurrency}，"
+        f"监听端口 {Config.PORT}",
+        'App'
+    )
+
+    from gunicorn.app.wsgiapp import run
+    sys.argv = ['gunicorn', '--config', os.path.join(APP_DIR, 'gunicorn.conf.py')]
+    return run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+告警通知通道模块
+每种通道负责把一条通知投递到一个目标，由 AlertDispatcher 在该通道独立的线程池中调用
+
+- smtp: 邮件，目标为收件人地址，复用已登录的 SMTP 会话
+- webhook: 向 ALERT_WEBHOOK_URL POST JSON
+- command: 执行 ALERT_COMMAND，正文通过标准输入传入，主题等信息通过环境变量传入
+
+send() 失败时抛出异常；is_permanent() 判断该异常是否重试也无法成功。
+"""
+import os
+import shlex
+import smtplib
+import subprocess
+import threading
+import time
+from email.mime.text import MIMEText
+from typing import Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+
+def build_message(subject: str, body: str, recipients: List[str]) -> str:
+    """构建邮件内容"""
+    msg = MIMEText(body, 'plain', 'utf-8')
+    msg['Subject'] = subject
+    msg['From'] = Config.SMTP_CONFIG['user']
+    msg['To'] = ', '.join(recipients)
+    return msg.as_string()
+
+
+class SMTPSession:
+    """
+    可复用的 SMTP 会话
+
+    首次发送时建立连接（STARTTLS、登录），之后的邮件复用同一连接；
+    服务器已断开空闲连接时自动重连一次。
+    """
+
+    def __init__(self, factory: Callable = smtplib.SMTP, clock: Callable[[], float] = time.monotonic):
+        self._factory = factory
+        self._clock = clock
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self.connections = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        if self._server is None:
+            smtp = Config.SMTP_CONFIG
+            server = self._factory(smtp['host'], smtp['port'] or 0, timeout=Config.ALERT_SMTP_TIMEOUT)
+            try:
+                if smtp.get('starttls', True):
+                    server.starttls()
+                server.login(smtp['user'], smtp['password'])
+            except Exception:
+                server.close()
+                raise
+            self._server = server
+            self.connections += 1
+        return self._server
+
+    def send(self, recipients: List[str], message: str) -> None:
+        """发送一封邮件，失败时抛出异常"""
+        for attempt in (1, 2):
+            server = self._connect()
+            try:
+                server.sendmail(Config.SMTP_CONFIG['user'], recipients, message)
+                self._last_used = self._clock()
+                return
+            except smtplib.SMTPServerDisconnected:
+                # 复用的连接可能已被服务器关闭，重连后再试一次
+                self.close()
+                if attempt == 2:
+                    raise
+            except smtplib.SMTPRecipientsRefused:
+                self._last_used = self._clock()
+                raise
+            except Exception:
+                self.close()
+                raise
+
+    @property
+    def connected(self) -> bool:
+        return self._server is not None
+
+    def close_if_idle(self) -> None:
+        """空闲超过 ALERT_SMTP_IDLE_SECONDS 时断开"""
+        if self._server is not None and self._clock() - self._last_used > Config.ALERT_SMTP_IDLE_SECONDS:
+            self.close()
+
+    def close(self) -> None:
+        """断开连接"""
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+
+class Channel:
+    """通知通道基类"""
+
+    name = ''
+    workers = 1
+
+    def configured(self) -> bool:
+        """通道是否已配置"""
+        raise NotImplementedError
+
+    def targets(self) -> List[str]:
+        """投递目标，每个目标单独发送、单独限流"""
+        return ['']
+
+    def send(self, target: str, subject: str, body: str, alert_id: Optional[int]) -> None:
+        """投递一条通知，失败时抛出异常"""
+        raise NotImplementedError
+
+    def is_permanent(self, error: Exception) -> bool:
+        """是否为重试也无法成功的错误"""
+        return False
+
+    def close_idle(self) -> None:
+        """释放空闲资源（由发送队列周期调用）"""
+
+    def close(self) -> None:
+        """释放所有资源"""
+
+
+class SMTPChannel(Channel):
+    """
+    邮件通道
+
+    每个工作线程使用会话池中的一个会话，空闲会话超时后断开。
+    """
+
+    name = 'smtp'
+
+    def __init__(self, workers: Optional[int] = None, session_factory: Callable[[], SMTPSession] = SMTPSession):
+        self.workers = workers or Config.ALERT_SMTP_WORKERS
+        self._session_factory = session_factory
+        self._idle: List[SMTPSession] = []
+        self._lock = threading.Lock()
+
+    def configured(self) -> bool:
+        smtp = Config.SMTP_CONFIG
+        return bool(smtp.get('password') and smtp.get('host') and smtp.get('user'))
+
+    def targets(self) -> List[str]:
+        return list(Config.SMTP_CONFIG['to'])
+
+    def send(self, target: str, subject: str, body: str, alert_id: Optional[int]) -> None:
+        recipients = [address for address in target.split(',') if address]
+        with self._lock:
+            session = self._idle.pop() if self._idle else self._session_factory()
+        try:
+            session.send(recipients, build_message(subject, body, recipients))
+        finally:
+            with self._lock:
+                self._idle.append(session)
+
+    def is_permanent(self, error: Exception) -> bool:
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return True
+        if isinstance(error, smtplib.SMTPAuthenticationError):
+            # 认证失败通常是配置问题，修正配置后重试即可成功
+            return False
+        return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+    def close_idle(self) -> None:
+        with self._lock:
+            for session in self._idle:
+                session.close_if_idle()
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._idle = self._idle, []
+        for session in sessions:
+            session.close()
+
+
+class WebhookError(Exception):
+    """Webhook 返回错误状态码"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+
+
+class WebhookChannel(Channel):
+    """
+    Webhook 通道
+
+    POST {"subject", "body", "alert_id", "sent_at"}，ALERT_WEBHOOK_TOKEN 设置时附带 Bearer 认证。
+    """
+
+    name = 'webhook'
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or Config.ALERT_WEBHOOK_WORKERS
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+    def configured(self) -> bool:
+        return bool(Config.ALERT_WEBHOOK_URL)
+
+    def send(self, target: str, subject: str, body: str, alert_id: Optional[int]) -> None:
+        headers = {}
+        if Config.ALERT_WEBHOOK_TOKEN:
+            headers['Authorization'] = f'Bearer {Config.ALERT_WEBHOOK_TOKEN}'
+        response = self._session.post(
+            Config.ALERT_WEBHOOK_URL,
+            json={'subject': subject, 'body': body, 'alert_id': alert_id, 'sent_at': int(time.time())},
+            headers=headers,
+            timeout=Config.ALERT_WEBHOOK_TIMEOUT
+        )
+        if response.status_code >= 300:
+            raise WebhookError(response.status_code)
+
+    def is_permanent(self, error: Exception) -> bool:
+        # 4xx 表示请求本身有问题，408 / 429 除外
+        return isinstance(error, WebhookError) and 400 <= error.status_code < 500 \
+            and error.status_code not in (408, 429)
+
+    def close(self) -> None:
+        self._session.close()
+
+
+class CommandError(Exception):
+    """命令返回非零退出码"""
+
+
+class CommandChannel(Channel):
+    """
+    本地命令通道
+
+    正文写入标准输入；环境变量 FRP_ALERT_SUBJECT、FRP_ALERT_ID 提供主题和告警 ID。
+    命令超过 ALERT_COMMAND_TIMEOUT 秒未结束时终止并视为失败。
+    """
+
+    name = 'command'
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or Config.ALERT_COMMAND_WORKERS
+
+    def configured(self) -> bool:
+        return bool(Config.ALERT_COMMAND)
+
+    def send(self, target: str, subject: str, body: str, alert_id: Optional[int]) -> None:
+        env = dict(os.environ, FRP_ALERT_SUBJECT=subject, FRP_ALERT_ID=str(alert_id or ''))
+        result = subprocess.run(
+            shlex.split(Config.ALERT_COMMAND),
+            input=body.encode('utf-8'),
+            env=env,
+            capture_output=True,
+            timeout=Config.ALERT_COMMAND_TIMEOUT
+        )
+        if result.returncode != 0:
+            stderr = result.stderr.decode('utf-8', errors='replace').strip()[-200:]
+            raise CommandError(f'退出码 {result.returncode}: {stderr}')
+
+    def is_permanent(self, error: Exception) -> bool:
+        # 命令不存在或无权执行
+        return isinstance(error, (FileNotFoundError, PermissionError))
+
+
+def default_channels() -> Dict[str, Channel]:
+    """内置通道（是否启用由各自的配置决定）"""
+    return {channel.name: channel for channel in (SMTPChannel(), WebhookChannel(), CommandChannel())}
+
+
+def describe_target(channel: str, target: str) -> str:
+    """投递目标的显示名称"""
+    return f'{channel}:{target}' if target else channel
+
@@ -0,0 +1,149 @@
+"""
+告警清理任务模块
+在后台分批删除已解决的告警，每批单独提交并短暂暂停，让其他写入者在批次之间获得 SQLite 写锁
+
+同一时间只运行一个清理任务；进度可通过 get_status() 查询。
+"""
+import itertools
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config import Config
+from utils.instrumentation import registry
+from utils.logger import ColorLogger
+from utils.message_queue import relay
+from models.database import get_db_connection
+
+
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_CANCELLED = 'cancelled'
+STATUS_FAILED = 'failed'
+
+DELETED = registry.counter(
+    'frp_console_alerts_cleared',
+    'Resolved alerts deleted by batched clear jobs'
+)
+BATCH_SECONDS = registry.histogram(
+    'frp_console_alert_clear_batch_seconds',
+    'Time each alert clear batch holds the write lock',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+
+def delete_resolved_batch(conn, batch_size: int) -> int:
+    """
+    删除一批已解决的告警并提交
+
+    Returns:
+        删除的告警数
+    """
+    cursor = conn.execute('''
+        DELETE FROM alerts WHERE id IN (SELECT id FROM alerts WHERE resolved = 1 LIMIT ?)
+    ''', (batch_size,))
+    conn.commit()
+    return cursor.rowcount
+
+
+class AlertCleanup:
+    """已解决告警的后台分批清理"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._job: Optional[Dict] = None
+        self._thread: Optional[threading.Thread] = None
+        self._cancel = threading.Event()
+
+    def start(self) -> Tuple[bool, Dict]:
+        """
+        启动清理任务
+
+        Returns:
+            (是否已启动, 任务状态)；已有任务在运行时返回 False 和该任务的状态
+        """
+        with self._lock:
+            if self._job and self._job['status'] == STATUS_RUNNING:
+                return False, dict(self._job)
+
+            conn = get_db_connection()
+            try:
+                total = conn.execute('SELECT COUNT(*) AS count FROM alerts WHERE resolved = 1').fetchone()['count']
+            finally:
+                conn.close()
+
+            self._cancel.clear()
+            self._job = {
+                'id': next(self._ids),
+                'status': STATUS_RUNNING,
+                'total': total,
+                'deleted': 0,
+                'batches': 0,
+                'started_at': int(time.time()),
+                'finished_at': None,
+                'error': None,
+            }
+            job = dict(self._job)
+            self._thread = threading.Thread(target=self._run, args=(self._job,), name='alert-cleanup', daemon=True)
+            self._thread.start()
+        ColorLogger.info(f"开始清除已解决的告警，共 {total} 条", 'Alert')
+        return True, job
+
+    def _run(self, job: Dict) -> None:
+        batch_size = Config.ALERT_CLEAR_BATCH_SIZE
+        pause = Config.ALERT_CLEAR_PAUSE_MS / 1000
+        conn = get_db_connection()
+        try:
+            while not self._cancel.is_set():
+                start = time.perf_counter()
+                deleted = delete_resolved_batch(conn, batch_size)
+                BATCH_SECONDS.observe(time.perf_counter() - start)
+                DELETED.inc(deleted)
+                with self._lock:
+                    job['deleted'] += deleted
+                    job['batches'] += 1
+                if deleted < batch_size:
+                    break
+                # 释放写锁，让其他写入者在批次之间执行
+                self._cancel.wait(pause)
+            status = STATUS_CANCELLED if self._cancel.is_set() else STATUS_COMPLETED
+            error = None
+        except Exception as e:
+            status, error = STATUS_FAILED, str(e)
+            ColorLogger.error(f"清除已解决的告警失败: {e}", 'Alert')
+        finally:
+            conn.close()
+
+        with self._lock:
+            job['status'] = status
+            job['error'] = error
+            job['finished_at'] = int(time.time())
+        if status != STATUS_FAILED:
+            ColorLogger.info(f"已清除 {job['deleted']} 条已解决的告警（{job['batches']} 批）", 'Alert')
+
+    def get_status(self) -> Optional[Dict]:
+        """最近一次清理任务的状态，没有任务时返回 None"""
+        with self._lock:
+            return dict(self._job) if self._job else None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待当前任务结束，返回是否已结束"""
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def cancel(self) -> bool:
+        """取消正在运行的任务（当前批次完成后停止），返回是否有任务被取消"""
+        with self._lock:
+            running = bool(self._job and self._job['status'] == STATUS_RUNNING)
+        if running:
+            self._cancel.set()
+        return running
+
+
+# 全局告警清理实例
+alert_cleanup = AlertCleanup()
+relay.register('alert_cleanup', alert_cleanup, 'start', 'get_status', 'cancel')
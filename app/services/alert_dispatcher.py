@@ -0,0 +1,363 @@
+"""
+告警发送队列模块
+告警通知先写入 alert_outbox 表，由后台线程分发到各通知通道（见 alert_channels），调用方不等待投递
+
+- 每个通道有独立的线程池，慢通道只占用自己的线程，不影响其他通道；
+  每个通道同时排队的通知不超过 CHANNEL_QUEUE_LIMIT 条
+- 投递失败按指数退避重试，达到 ALERT_MAX_ATTEMPTS 次或遇到永久性错误后进入 dead 状态
+- 待发送的通知保存在数据库中，进程重启后继续发送（至少发送一次）
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from config import Config
+from utils.instrumentation import registry
+from utils.logger import ColorLogger
+from utils.message_queue import relay
+from models.database import get_db_connection
+from services.alert_channels import Channel, default_channels
+
+
+STATUS_PENDING = 'pending'
+STATUS_SENT = 'sent'
+STATUS_DEAD = 'dead'
+
+# 每个通道同时提交到线程池的最大通知数
+CHANNEL_QUEUE_LIMIT = 50
+
+# 没有待发送通知时最长等待时间（秒）
+IDLE_WAIT = 60
+
+# 已发送记录的清理间隔（秒）
+PRUNE_INTERVAL = 3600
+
+# 发送队列统计的缓存时间（秒），频繁抓取 /metrics 时不重复扫描 alert_outbox
+OUTBOX_METRICS_TTL = 10
+
+DELIVERIES = registry.counter(
+    'frp_console_alert_deliveries',
+    'Alert notification delivery attempts by channel and result',
+    ('channel', 'result')
+)
+DELIVERY_SECONDS = registry.histogram(
+    'frp_console_alert_delivery_seconds',
+    'Alert notification delivery time by channel',
+    ('channel',),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+
+def retry_delay(attempts: int) -> float:
+    """第 attempts 次失败后的重试等待时间"""
+    return min(Config.ALERT_RETRY_BASE_SECONDS * 2 ** (attempts - 1), Config.ALERT_RETRY_MAX_SECONDS)
+
+
+class AlertDispatcher:
+    """告警发送队列"""
+
+    def __init__(self, channels: Optional[Dict[str, Channel]] = None, clock: Callable[[], float] = time.time):
+        self.channels = channels if channels is not None else default_channels()
+        self._clock = clock
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._in_flight: Dict[int, str] = {}
+        self._futures: Set = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_prune = 0.0
+
+    def destinations(self) -> List[Tuple[str, str]]:
+        """已启用通道的所有投递目标 (通道, 目标)"""
+        return [(name, target) for name, channel in self.channels.items() if channel.configured()
+                for target in channel.targets()]
+
+    def enqueue(self, conn, subject: str, body: str, recipients: List[str],
+                alert_id: Optional[int] = None, channel: str = 'smtp') -> int:
+        """
+        加入发送队列（在调用方的事务中写入，由调用方提交）
+
+        Args:
+            conn: 数据库连接
+            subject: 主题
+            body: 正文
+            recipients: 投递目标（邮件为收件人地址，其他通道为空）
+            alert_id: 关联的告警 ID
+            channel: 通道名称
+
+        Returns:
+            队列记录 ID
+        """
+        now = self._clock()
+        cursor = conn.execute('''
+            INSERT INTO alert_outbox (alert_id, channel, subject, body, recipients, status, next_attempt_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (alert_id, channel, subject, body, ','.join(recipients), STATUS_PENDING, now, int(now)))
+        self._wake.set()
+        return cursor.lastrowid
+
+    def _executor(self, name: str) -> ThreadPoolExecutor:
+        executor = self._executors.get(name)
+        if executor is None:
+            executor = self._executors[name] = ThreadPoolExecutor(
+                max_workers=self.channels[name].workers, thread_name_prefix=f'alert-{name}'
+            )
+        return executor
+
+    def process_due(self) -> int:
+        """
+        将到期的通知提交到各通道的线程池（不等待投递完成）
+
+        Returns:
+            本次提交的通知数
+        """
+        now = self._clock()
+        submitted = 0
+        conn = get_db_connection()
+        try:
+            channels = [row['channel'] for row in conn.execute(
+                'SELECT DISTINCT channel FROM alert_outbox WHERE status = ? AND next_attempt_at <= ?',
+                (STATUS_PENDING, now)
+            )]
+            for name in channels:
+                with self._lock:
+                    in_flight = [outbox_id for outbox_id, channel in self._in_flight.items() if channel == name]
+                capacity = CHANNEL_QUEUE_LIMIT - len(in_flight)
+                if capacity <= 0:
+                    continue
+                exclude = f"AND id NOT IN ({','.join('?' * len(in_flight))})" if in_flight else ''
+                rows = conn.execute(f'''
+                    SELECT id, channel, subject, body, recipients, attempts, alert_id FROM alert_outbox
+                    WHERE channel = ? AND status = ? AND next_attempt_at <= ? {exclude}
+                    ORDER BY next_attempt_at LIMIT ?
+                ''', (name, STATUS_PENDING, now, *in_flight, capacity)).fetchall()
+                for row in rows:
+                    self._submit(dict(row))
+                    submitted += 1
+        finally:
+            conn.close()
+        return submitted
+
+    def _submit(self, row: Dict) -> None:
+        """提交一条通知到对应通道的线程池"""
+        channel = self.channels.get(row['channel'])
+        if channel is None or not channel.configured():
+            self._record_failure(row, RuntimeError(f"通知通道未启用: {row['channel']}"), permanent=True)
+            return
+        with self._lock:
+            self._in_flight[row['id']] = row['channel']
+            future = self._executor(row['channel']).submit(self._deliver, channel, row)
+            self._futures.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+        # 通道有空闲后提交下一批
+        self._wake.set()
+
+    def _deliver(self, channel: Channel, row: Dict) -> None:
+        """投递一条通知并更新状态（在通道线程池中执行）"""
+        start = time.perf_counter()
+        try:
+            channel.send(row['recipients'], row['subject'], row['body'], row['alert_id'])
+        except Exception as e:
+            DELIVERY_SECONDS.labels(channel.name).observe(time.perf_counter() - start)
+            self._record_failure(row, e, channel.is_permanent(e))
+        else:
+            DELIVERY_SECONDS.labels(channel.name).observe(time.perf_counter() - start)
+            self._update(
+                'UPDATE alert_outbox SET status = ?, attempts = ?, last_error = NULL, sent_at = ? WHERE id = ?',
+                (STATUS_SENT, row['attempts'] + 1, int(self._clock()), row['id'])
+            )
+            DELIVERIES.labels(channel.name, 'sent').inc()
+        finally:
+            with self._lock:
+                self._in_flight.pop(row['id'], None)
+
+    def _record_failure(self, row: Dict, error: Exception, permanent: bool) -> None:
+        """记录投递失败：重试或进入 dead 状态"""
+        attempts = row['attempts'] + 1
+        message = f'{type(error).__name__}: {error}'
+        if permanent or attempts >= Config.ALERT_MAX_ATTEMPTS:
+            self._update('UPDATE alert_outbox SET status = ?, attempts = ?, last_error = ? WHERE id = ?',
+                         (STATUS_DEAD, attempts, message, row['id']))
+            DELIVERIES.labels(row['channel'], 'dead').inc()
+            ColorLogger.error(f"告警通知 {row['id']}（{row['channel']}）发送失败，不再重试: {message}", 'Alert')
+        else:
+            delay = retry_delay(attempts)
+            self._update(
+                'UPDATE alert_outbox SET attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?',
+                (attempts, message, self._clock() + delay, row['id'])
+            )
+            DELIVERIES.labels(row['channel'], 'retry').inc()
+            ColorLogger.warning(
+                f"告警通知 {row['id']}（{row['channel']}）发送失败，{delay:.0f} 秒后重试: {message}", 'Alert'
+            )
+
+    @staticmethod
+    def _update(sql: str, params: Tuple) -> None:
+        conn = get_db_connection()
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待已提交的通知投递完成
+
+        Returns:
+            是否全部完成
+        """
+        with self._lock:
+            futures = list(self._futures)
+        _, not_done = wait(futures, timeout=timeout)
+        return not not_done
+
+    def next_due_in(self) -> Optional[float]:
+        """距下一条未提交的待发送通知到期的秒数，没有时返回 None"""
+        with self._lock:
+            in_flight = list(self._in_flight)
+        exclude = f"AND id NOT IN ({','.join('?' * len(in_flight))})" if in_flight else ''
+        conn = get_db_connection()
+        try:
+            row = conn.execute(
+                f'SELECT MIN(next_attempt_at) AS due FROM alert_outbox WHERE status = ? {exclude}',
+                (STATUS_PENDING, *in_flight)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row['due'] is None:
+            return None
+        return max(0.0, row['due'] - self._clock())
+
+    def prune(self) -> int:
+        """删除超过保留期的已发送记录"""
+        cutoff = int(self._clock()) - Config.ALERT_OUTBOX_RETENTION_DAYS * 86400
+        conn = get_db_connection()
+        try:
+            cursor = conn.execute('DELETE FROM alert_outbox WHERE status = ? AND sent_at < ?',
+                                  (STATUS_SENT, cutoff))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def retry(self, outbox_id: int) -> bool:
+        """将 dead 状态的通知重新加入队列"""
+        conn = get_db_connection()
+        try:
+            cursor = conn.execute('''
+                UPDATE alert_outbox SET status = ?, attempts = 0, next_attempt_at = ?
+                WHERE id = ? AND status = ?
+            ''', (STATUS_PENDING, self._clock(), outbox_id, STATUS_DEAD))
+            conn.commit()
+        finally:
+            conn.close()
+        if cursor.rowcount:
+            self._wake.set()
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def get_entries(status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """查询发送队列记录"""
+        conn = get_db_connection()
+        try:
+            if status:
+                rows = conn.execute(
+                    'SELECT * FROM alert_outbox WHERE status = ? ORDER BY id DESC LIMIT ?', (status, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute('SELECT * FROM alert_outbox ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def get_channels(self) -> List[Dict]:
+        """各通道的启用状态、线程数和正在投递的通知数"""
+        with self._lock:
+            in_flight = list(self._in_flight.values())
+        return [
+            {'name': name, 'enabled': channel.configured(), 'workers': channel.workers,
+             'in_flight': in_flight.count(name)}
+            for name, channel in self.channels.items()
+        ]
+
+    # ==================== 后台线程 ====================
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            wait_seconds = IDLE_WAIT
+            try:
+                self.process_due()
+                if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+                    self.prune()
+                    self._last_prune = time.monotonic()
+                due_in = self.next_due_in()
+                if due_in is not None:
+                    wait_seconds = min(wait_seconds, due_in)
+            except Exception as e:
+                ColorLogger.error(f"告警发送队列出错: {e}", 'Alert')
+            for channel in self.channels.values():
+                channel.close_idle()
+            self._wake.wait(wait_seconds)
+            self._wake.clear()
+
+    def start(self) -> None:
+        """启动后台分发线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='alert-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止分发线程，等待正在投递的通知完成后释放通道资源"""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        self._executors = {}
+        self.close()
+
+    def close(self) -> None:
+        """释放通道资源"""
+        for channel in self.channels.values():
+            channel.close()
+
+
+# (统计时间, 样本)
+_outbox_cache: Optional[Tuple[float, List]] = None
+_outbox_lock = threading.Lock()
+
+
+def _outbox_metrics():
+    """发送队列各通道、各状态的记录数（缓存 OUTBOX_METRICS_TTL 秒）"""
+    global _outbox_cache
+    with _outbox_lock:
+        now = time.monotonic()
+        if _outbox_cache is None or now - _outbox_cache[0] >= OUTBOX_METRICS_TTL:
+            conn = get_db_connection()
+            try:
+                rows = conn.execute(
+                    'SELECT channel, status, COUNT(*) AS count FROM alert_outbox GROUP BY channel, status'
+                ).fetchall()
+            finally:
+                conn.close()
+            _outbox_cache = (now, [({'channel': row['channel'], 'status': row['status']}, row['count'])
+                                   for row in rows])
+        samples = _outbox_cache[1]
+    return [('frp_console_alert_outbox', 'gauge', 'Alert outbox entries by channel and status', samples)]
+
+
+# 全局发送队列实例
+alert_dispatcher = AlertDispatcher()
+registry.register_collector(_outbox_metrics)
+relay.register('alert_dispatcher', alert_dispatcher, 'get_channels')
@@ -0,0 +1,470 @@
+"""
+告警去重与分组模块
+告警按 (客户端, 告警类型) 指纹去重，短时间内的多条通知合并为一条摘要，并限制每个投递目标的发送频率
+
+- 同一指纹存在未解决的告警时，新的触发只累加 occurrences，不产生新记录；
+  距上次通知超过 ALERT_DEDUP_WINDOW 秒时再发送一次提醒
+- 通知先进入每个投递目标（通道 + 目标，如 smtp:ops@example.com、webhook）的待发送列表，
+  最早一条等待 ALERT_GROUP_WAIT 秒后一起发送；只有一条时发送普通告警，多条时发送摘要
+- 每个投递目标在 ALERT_RATE_WINDOW 秒内最多收到 ALERT_RATE_LIMIT 条通知，超出的通知留到下一条摘要
+- 条件解除时自动解决告警：告警通知尚未发出则直接撤回，已发出则发送恢复通知
+
+未解决告警的索引保存在内存中，启动时从 alerts 表加载；重复触发的计数由后台线程批量写回。
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config import Config
+from utils.instrumentation import registry
+from utils.logger import ColorLogger
+from utils.message_queue import relay
+from models.database import get_db_connection
+from services.alert_dispatcher import alert_dispatcher
+from services.alert_channels import describe_target
+
+
+KIND_FIRING = 'firing'
+KIND_REPEAT = 'repeat'
+KIND_RESOLVED = 'resolved'
+
+EVENTS = registry.counter(
+    'frp_console_alert_events',
+    'Alert triggers by outcome (new, repeat, suppressed)',
+    ('outcome',)
+)
+EMAILS = registry.counter(
+    'frp_console_alert_emails',
+    'Alert emails queued by the pipeline by kind (single, digest)',
+    ('kind',)
+)
+
+
+def format_notifications(items: List[Dict]) -> Tuple[str, str]:
+    """
+    构建通知邮件的主题和正文
+
+    Args:
+        items: 通知列表
+
+    Returns:
+        (主题, 正文)
+    """
+    if len(items) == 1:
+        item = items[0]
+        if item['kind'] == KIND_RESOLVED:
+            subject = f"[FRP恢复] {item['client_name']} - {item['alert_type']}"
+            title = 'FRP 客户端告警已恢复'
+        else:
+            subject = f"[FRP告警] {item['client_name']} - {item['alert_type']}"
+            title = 'FRP 客户端告警'
+        body = f"""{title}
+
+客户端: {item['client_name']}
+告警类型: {item['alert_type']}
+消息: {item['message']}
+累计次数: {item['entry']['occurrences']}
+时间: {datetime.fromtimestamp(item['at']).strftime('%Y-%m-%d %H:%M:%S')}
+
+请及时检查 FRP 服务状态。"""
+        return subject, body
+
+    firing = sum(1 for item in items if item['kind'] != KIND_RESOLVED)
+    lines = []
+    for item in items:
+        at = datetime.fromtimestamp(item['at']).strftime('%H:%M:%S')
+        if item['kind'] == KIND_RESOLVED:
+            lines.append(f"[{at}] 已恢复 {item['client_name']} - {item['alert_type']}")
+        else:
+            lines.append(f"[{at}] {item['client_name']} - {item['alert_type']}: {item['message']}"
+                         f"（累计 {item['entry']['occurrences']} 次）")
+    subject = f'[FRP告警] {firing} 条告警，{len(items) - firing} 条恢复'
+    body = 'FRP 客户端告警摘要\n\n' + '\n'.join(lines) + '\n\n请及时检查 FRP 服务状态。'
+    return subject, body
+
+
+class AlertPipeline:
+    """告警去重、分组和限流"""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.RLock()
+        # 串行化新告警的写入（在 _lock 之外执行），与 clear() 之间保持先后顺序
+        self._create_lock = threading.Lock()
+        # (client_id, alert_type) -> 未解决告警
+        self._open: Dict[Tuple[int, str], Dict] = {}
+        self._dirty = set()
+        # (通道, 目标) -> 待发送通知
+        self._pending: Dict[Tuple[str, str], List[Dict]] = {}
+        # (通道, 目标) -> 限流窗口内的发送时间
+        self._sent: Dict[Tuple[str, str], Deque[float]] = {}
+        self._loaded = False
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_loaded(self) -> None:
+        """首次使用时从 alerts 表加载未解决的告警和限流窗口内的发送记录"""
+        if self._loaded:
+            return
+        window_start = self._clock() - Config.ALERT_RATE_WINDOW
+        conn = get_db_connection()
+        try:
+            alerts = conn.execute('''
+                SELECT id, client_id, alert_type, occurrences, last_seen_at,
+                       COALESCE(notified_at, CAST(strftime('%s', sent_at) AS INTEGER)) AS notified_at
+                FROM alerts WHERE resolved = 0 ORDER BY id
+            ''').fetchall()
+            sent = conn.execute(
+                'SELECT channel, recipients, created_at FROM alert_outbox WHERE created_at >= ? ORDER BY created_at',
+                (window_start,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        for row in alerts:
+            self._open[(row['client_id'], row['alert_type'])] = {
+                'alert_id': row['id'],
+                'client_id': row['client_id'],
+                'alert_type': row['alert_type'],
+                'client_name': None,
+                'occurrences': row['occurrences'],
+                'last_seen': row['last_seen_at'] or row['notified_at'],
+                'notified_at': row['notified_at'],
+            }
+        for row in sent:
+            for target in row['recipients'].split(','):
+                self._sent.setdefault((row['channel'], target), deque()).append(row['created_at'])
+        self._loaded = True
+
+    @staticmethod
+    def _destinations() -> List[Tuple[str, str]]:
+        """当前的投递目标（没有启用任何通道时为空）"""
+        return alert_dispatcher.destinations()
+
+    def fire(self, client_id: int, alert_type: str, message: str) -> Optional[str]:
+        """
+        触发告警
+
+        Args:
+            client_id: 客户端 ID
+            alert_type: 告警类型
+            message: 告警消息
+
+        Returns:
+            new（新告警）、repeat（超过去重窗口，再次通知）、suppressed（已去重）；客户端不存在时返回 None
+        """
+        fingerprint = (client_id, alert_type)
+        now = self._clock()
+        result = self._repeat(fingerprint, message, now)
+        if result is not None:
+            return result
+
+        # 新告警：数据库写入不持有 _lock，其他指纹的触发、发送和状态查询不必等待
+        with self._create_lock:
+            # 等待期间其他线程可能已创建同一指纹的告警
+            result = self._repeat(fingerprint, message, now)
+            if result is not None:
+                return result
+
+            destinations = self._destinations()
+            conn = get_db_connection()
+            try:
+                row = conn.execute('SELECT name FROM clients WHERE id = ?', (client_id,)).fetchone()
+                if row is None:
+                    return None
+                cursor = conn.execute('''
+                    INSERT INTO alerts (client_id, alert_type, message, sent_to, occurrences, last_seen_at, notified_at)
+                    VALUES (?, ?, ?, ?, 1, ?, ?)
+                ''', (client_id, alert_type, message,
+                      ','.join(describe_target(*destination) for destination in destinations), int(now), int(now)))
+                conn.commit()
+            finally:
+                conn.close()
+
+            with self._lock:
+                entry = self._open[fingerprint] = {
+                    'alert_id': cursor.lastrowid,
+                    'client_id': client_id,
+                    'alert_type': alert_type,
+                    'client_name': row['name'],
+                    'occurrences': 1,
+                    'last_seen': now,
+                    'notified_at': now,
+                }
+                self._queue(entry, KIND_FIRING, message, now, destinations)
+        EVENTS.labels('new').inc()
+        return 'new'
+
+    def _repeat(self, fingerprint: Tuple[int, str], message: str, now: float) -> Optional[str]:
+        """
+        已有未解决告警时累加计数，超过去重窗口时再次通知
+
+        Returns:
+            repeat、suppressed；没有未解决告警时返回 None
+        """
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._open.get(fingerprint)
+            if entry is None:
+                return None
+            entry['occurrences'] += 1
+            entry['last_seen'] = now
+            self._dirty.add(fingerprint)
+            if now - entry['notified_at'] < Config.ALERT_DEDUP_WINDOW:
+                EVENTS.labels('suppressed').inc()
+                return 'suppressed'
+            entry['notified_at'] = now
+            self._queue(entry, KIND_REPEAT, message, now)
+            EVENTS.labels('repeat').inc()
+            return 'repeat'
+
+    def _queue(self, entry: Dict, kind: str, message: str, now: float,
+               destinations: Optional[List[Tuple[str, str]]] = None) -> None:
+        """将通知加入每个投递目标的待发送列表"""
+        if entry['client_name'] is None:
+            entry['client_name'] = self._client_name(entry['client_id'])
+        item = {
+            'alert_id': entry['alert_id'],
+            'client_name': entry['client_name'],
+            'alert_type': entry['alert_type'],
+            'kind': kind,
+            'message': message,
+            'at': now,
+            'entry': entry,
+        }
+        for destination in self._destinations() if destinations is None else destinations:
+            self._pending.setdefault(destination, []).append(item)
+        self._wake.set()
+
+    @staticmethod
+    def _client_name(client_id: int) -> str:
+        conn = get_db_connection()
+        try:
+            row = conn.execute('SELECT name FROM clients WHERE id = ?', (client_id,)).fetchone()
+        finally:
+            conn.close()
+        return row['name'] if row else str(client_id)
+
+    def clear(self, client_id: int, alert_type: str, message: str = '条件已解除') -> int:
+        """
+        条件解除，自动解决告警
+
+        告警通知尚未发出时直接撤回；已发出时向对应投递目标发送恢复通知。
+
+        Returns:
+            解决的告警数量
+        """
+        fingerprint = (client_id, alert_type)
+        now = self._clock()
+        # 正在写入的新告警完成后再解决，避免写入的告警留在索引中；数据库写入不持有 _lock
+        with self._create_lock:
+            with self._lock:
+                self._ensure_loaded()
+                entry = self._open.pop(fingerprint, None)
+                self._dirty.discard(fingerprint)
+                if entry is not None:
+                    notify = []
+                    for destination in self._destinations():
+                        items = self._pending.get(destination, [])
+                        remaining = [item for item in items if item['entry'] is not entry]
+                        if len(remaining) == len(items):
+                            notify.append(destination)
+                        elif remaining:
+                            self._pending[destination] = remaining
+                        else:
+                            del self._pending[destination]
+                    if notify:
+                        self._queue(entry, KIND_RESOLVED, message, now, notify)
+
+            conn = get_db_connection()
+            try:
+                if entry is not None:
+                    conn.execute('UPDATE alerts SET occurrences = ?, last_seen_at = ? WHERE id = ?',
+                                 (entry['occurrences'], int(entry['last_seen']), entry['alert_id']))
+                cursor = conn.execute('''
+                    UPDATE alerts SET resolved = 1, resolved_at = ?
+                    WHERE client_id = ? AND alert_type = ? AND resolved = 0
+                ''', (int(now), client_id, alert_type))
+                conn.commit()
+            finally:
+                conn.close()
+            return cursor.rowcount
+
+    def discard(self, *alert_ids: int) -> None:
+        """告警被手动解决或删除后移出索引"""
+        alert_ids = set(alert_ids)
+        with self._lock:
+            for fingerprint, entry in list(self._open.items()):
+                if entry['alert_id'] in alert_ids:
+                    del self._open[fingerprint]
+                    self._dirty.discard(fingerprint)
+
+    def forget_client(self, client_id: int) -> None:
+        """移除已删除客户端的告警和待发送通知"""
+        with self._lock:
+            for fingerprint in [fp for fp in self._open if fp[0] == client_id]:
+                entry = self._open.pop(fingerprint)
+                self._dirty.discard(fingerprint)
+                for destination in list(self._pending):
+                    items = [item for item in self._pending[destination] if item['entry'] is not entry]
+                    if items:
+                        self._pending[destination] = items
+                    else:
+                        del self._pending[destination]
+
+    def _allow(self, destination: Tuple[str, str], now: float) -> bool:
+        """投递目标是否还能在限流窗口内接收通知（允许时记录一次发送）"""
+        sent = self._sent.setdefault(destination, deque())
+        while sent and sent[0] <= now - Config.ALERT_RATE_WINDOW:
+            sent.popleft()
+        if len(sent) >= Config.ALERT_RATE_LIMIT:
+            return False
+        sent.append(now)
+        return True
+
+    def flush(self, force: bool = False) -> int:
+        """
+        写回重复触发计数，并发送到期的通知
+
+        Args:
+            force: 忽略分组等待时间（仍遵守限流）
+
+        Returns:
+            加入发送队列的通知数
+        """
+        now = self._clock()
+        with self._lock:
+            dirty = set(self._dirty)
+            updates = [
+                (entry['occurrences'], int(entry['last_seen']), int(entry['notified_at']), entry['alert_id'])
+                for entry in (self._open[fp] for fp in dirty)
+            ]
+            self._dirty.clear()
+
+            emails = []
+            for destination, items in list(self._pending.items()):
+                if not force and now - items[0]['at'] < Config.ALERT_GROUP_WAIT:
+                    continue
+                if not self._allow(destination, now):
+                    continue
+                emails.append((destination, items))
+                del self._pending[destination]
+
+            if not updates and not emails:
+                return 0
+
+        # 数据库写入不持有 _lock，触发、解决和状态查询不必等待
+        conn = get_db_connection()
+        try:
+            if updates:
+                conn.executemany(
+                    # 写入前已被解决的告警以解决时写入的计数为准
+                    'UPDATE alerts SET occurrences = ?, last_seen_at = ?, notified_at = ? WHERE id = ? AND resolved = 0',
+                    updates
+                )
+            for (channel, target), items in emails:
+                subject, body = format_notifications(items)
+                alert_id = items[0]['alert_id'] if len(items) == 1 else None
+                alert_dispatcher.enqueue(conn, subject, body, [target] if target else [],
+                                         alert_id=alert_id, channel=channel)
+                EMAILS.labels('single' if len(items) == 1 else 'digest').inc()
+            conn.commit()
+        except Exception as e:
+            ColorLogger.error(f"保存告警通知失败: {e}", 'Alert')
+            # 计数和通知留到下一次写入，撤销本次记录的发送；期间已解决的告警不再恢复
+            with self._lock:
+                self._dirty.update(fp for fp in dirty if fp in self._open)
+                open_ids = {id(entry) for entry in self._open.values()}
+                for destination, items in emails:
+                    items = [item for item in items if item['kind'] == KIND_RESOLVED or id(item['entry']) in open_ids]
+                    if items:
+                        self._pending[destination] = items + self._pending.get(destination, [])
+                    self._sent[destination].remove(now)
+            return 0
+        finally:
+            conn.close()
+        return len(emails)
+
+    def next_flush_in(self) -> Optional[float]:
+        """距下一次需要发送通知的秒数，没有待发送通知时返回 None"""
+        now = self._clock()
+        with self._lock:
+            waits = []
+            for destination, items in self._pending.items():
+                due = items[0]['at'] + Config.ALERT_GROUP_WAIT
+                sent = self._sent.get(destination)
+                if sent and len(sent) >= Config.ALERT_RATE_LIMIT:
+                    due = max(due, sent[0] + Config.ALERT_RATE_WINDOW)
+                waits.append(max(0.0, due - now))
+            return min(waits) if waits else None
+
+    def get_status(self) -> Dict:
+        """去重索引、待发送通知和限流状态"""
+        now = self._clock()
+        with self._lock:
+            self._ensure_loaded()
+            rate = {}
+            for destination, sent in self._sent.items():
+                recent = sum(1 for at in sent if at > now - Config.ALERT_RATE_WINDOW)
+                rate[describe_target(*destination)] = {'sent': recent, 'remaining': max(0, Config.ALERT_RATE_LIMIT - recent)}
+            return {
+                'open': [
+                    {'client_id': client_id, 'alert_type': alert_type, 'alert_id': entry['alert_id'],
+                     'occurrences': entry['occurrences'], 'last_seen_at': int(entry['last_seen'])}
+                    for (client_id, alert_type), entry in self._open.items()
+                ],
+                'pending': {describe_target(*destination): len(items) for destination, items in self._pending.items()},
+                'rate_limit': rate,
+            }
+
+    # ==================== 后台线程 ====================
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.flush()
+                wait = self.next_flush_in()
+            except Exception as e:
+                ColorLogger.error(f"告警通知发送出错: {e}", 'Alert')
+                wait = None
+            # 没有待发送通知时定期写回重复计数
+            self._wake.wait(Config.ALERT_GROUP_WAIT if wait is None else max(wait, 0.1))
+            self._wake.clear()
+
+    def start(self) -> None:
+        """启动后台线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='alert-pipeline', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台线程并发送剩余通知"""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush(force=True)
+
+
+def _pipeline_metrics():
+    """去重索引和待发送通知数量"""
+    with alert_pipeline._lock:
+        open_alerts = len(alert_pipeline._open)
+        pending = sum(len(items) for items in alert_pipeline._pending.values())
+    return [
+        ('frp_console_alerts_open', 'gauge', 'Unresolved alert fingerprints', [({}, open_alerts)]),
+        ('frp_console_alert_notifications_pending', 'gauge', 'Notifications waiting to be grouped or rate limited',
+         [({}, pending)]),
+    ]
+
+
+# 全局告警处理实例
+alert_pipeline = AlertPipeline()
+registry.register_collector(_pipeline_metrics)
+relay.register('alert_pipeline', alert_pipeline, 'discard', 'forget_client', 'get_status')
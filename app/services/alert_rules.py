@@ -0,0 +1,541 @@
+"""
+告警规则引擎
+按声明式规则对采集、健康检查和配置拉取产生的事件流做增量计算，条件成立时告警，解除时自动解决
+
+规则格式（JSON，ALERT_RULES_FILE 指定，未指定时使用 DEFAULT_RULES）:
+    {"name": "admin_unreachable", "source": "metrics", "field": "reachable", "op": "==", "value": false, "count": 3}
+    {"name": "traffic_stalled", "source": "metrics", "field": "rate_in", "agg": "max", "window": 300,
+     "op": "<=", "value": 0, "for": 300}
+    {"name": "config_pull_missing", "source": "pull", "absent_for": 600}
+
+- source: 事件来源 metrics（采集）、health（健康检查）、pull（配置拉取）
+- field / op / value: 对事件字段的判断；设置 agg / window 时改为判断 window 秒滑动窗口内的聚合值
+  （avg、sum、min、max、count）
+- count: 连续多少个事件满足条件才触发；for: 条件持续多少秒才触发
+- absent_for: 该来源多少秒没有事件即触发（收到事件后解决）；pull 来源只跟踪拉取过配置的启用客户端，
+  启动时按 client_pulls 记录登记，从未拉取的客户端（未使用配置导出）不会触发
+- clients: 只对这些客户端生效（默认全部）
+
+每个事件只计算同一来源的规则，计算量与规则数成正比，与历史数据量无关；
+需要按时间触发的条件（for、absent_for）放入以到期时间为键的最小堆，后台线程每个周期在
+RULES_TICK_BUDGET_MS 的时间预算内处理到期条目，告警和解决也在后台线程中执行。
+"""
+import heapq
+import json
+import operator
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from utils.instrumentation import registry
+from utils.logger import ColorLogger
+from utils.message_queue import relay
+from models.database import get_db_connection
+
+
+SOURCES = ('metrics', 'health', 'pull')
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+AGGREGATES = ('avg', 'sum', 'min', 'max', 'count')
+
+DEFAULT_RULES = [
+    {'name': 'admin_unreachable', 'source': 'metrics', 'field': 'reachable', 'op': '==', 'value': False,
+     'count': 3, 'message': 'frpc admin 接口连续 3 次无法访问'},
+    {'name': 'config_pull_missing', 'source': 'pull', 'absent_for': 600,
+     'message': '超过 10 分钟未拉取配置'},
+]
+
+EVENTS = registry.counter(
+    'frp_console_rule_events',
+    'Events evaluated by the alert rules engine by source',
+    ('source',)
+)
+TRANSITIONS = registry.counter(
+    'frp_console_rule_transitions',
+    'Alert rule state changes by kind (firing, resolved)',
+    ('kind',)
+)
+TICK_SECONDS = registry.histogram(
+    'frp_console_rule_tick_seconds',
+    'Time spent processing rule deadlines and actions per tick',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+
+class SlidingWindow:
+    """
+    时间滑动窗口聚合
+
+    求和与计数随进出窗口增减，最小 / 最大值使用单调队列，每个值进出窗口各一次，均摊 O(1)。
+    """
+    __slots__ = ('span', '_values', '_sum', '_min', '_max')
+
+    def __init__(self, span: float):
+        self.span = span
+        self._values: deque = deque()
+        self._sum = 0.0
+        self._min: deque = deque()
+        self._max: deque = deque()
+
+    def add(self, ts: float, value: float) -> None:
+        self._values.append((ts, value))
+        self._sum += value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((ts, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((ts, value))
+        self.evict(ts)
+
+    def evict(self, now: float) -> None:
+        cutoff = now - self.span
+        values = self._values
+        while values and values[0][0] <= cutoff:
+            _, value = values.popleft()
+            self._sum -= value
+        while self._min and self._min[0][0] <= cutoff:
+            self._min.popleft()
+        while self._max and self._max[0][0] <= cutoff:
+            self._max.popleft()
+
+    def value(self, agg: str) -> Optional[float]:
+        if not self._values:
+            return None
+        if agg == 'count':
+            return len(self._values)
+        if agg == 'sum':
+            return self._sum
+        if agg == 'avg':
+            return self._sum / len(self._values)
+        if agg == 'min':
+            return self._min[0][1]
+        return self._max[0][1]
+
+
+class Rule:
+    """编译后的规则"""
+    __slots__ = ('index', 'name', 'source', 'field', 'op', 'op_name', 'value', 'agg', 'window',
+                 'count', 'for_seconds', 'absent_for', 'clients', 'message', 'definition')
+
+    def __init__(self, index: int, definition: Dict):
+        name = definition.get('name')
+        if not name or not isinstance(name, str):
+            raise ValueError('规则缺少 name')
+        source = definition.get('source')
+        if source not in SOURCES:
+            raise ValueError(f'规则 {name} 的 source 无效: {source}')
+
+        self.index = index
+        self.name = name
+        self.source = source
+        self.definition = definition
+        self.message = definition.get('message')
+        clients = definition.get('clients')
+        self.clients = frozenset(int(client_id) for client_id in clients) if clients else None
+
+        self.absent_for = definition.get('absent_for')
+        self.field = self.op = self.op_name = self.value = self.agg = None
+        self.window = 0.0
+        self.count = 1
+        self.for_seconds = 0.0
+        if self.absent_for is not None:
+            self.absent_for = float(self.absent_for)
+            if self.absent_for <= 0:
+                raise ValueError(f'规则 {name} 的 absent_for 必须大于 0')
+            return
+
+        self.field = definition.get('field')
+        if not self.field:
+            raise ValueError(f'规则 {name} 缺少 field')
+        self.op_name = definition.get('op', '==')
+        if self.op_name not in OPERATORS:
+            raise ValueError(f'规则 {name} 的 op 无效: {self.op_name}')
+        self.op = OPERATORS[self.op_name]
+        if 'value' not in definition:
+            raise ValueError(f'规则 {name} 缺少 value')
+        self.value = definition['value']
+        self.agg = definition.get('agg')
+        if self.agg is not None:
+            if self.agg not in AGGREGATES:
+                raise ValueError(f'规则 {name} 的 agg 无效: {self.agg}')
+            self.window = float(definition.get('window', 0))
+            if self.window <= 0:
+                raise ValueError(f'规则 {name} 使用 agg 时必须设置 window')
+        self.count = max(1, int(definition.get('count', 1)))
+        self.for_seconds = max(0.0, float(definition.get('for', 0)))
+
+    def describe(self) -> str:
+        """告警消息"""
+        if self.message:
+            return self.message
+        if self.absent_for is not None:
+            return f'{self.absent_for:.0f} 秒内没有 {self.source} 事件'
+        subject = f'{self.agg}({self.field}, {self.window:.0f}s)' if self.agg else self.field
+        text = f'{subject} {self.op_name} {self.value}'
+        if self.count > 1:
+            text += f'，连续 {self.count} 次'
+        if self.for_seconds:
+            text += f'，持续 {self.for_seconds:.0f} 秒'
+        return text
+
+
+class _State:
+    """
+    单个客户端在单条规则上的状态
+
+    since: 阈值规则为条件开始成立的时间；缺失规则为已安排的到期时间
+    """
+    __slots__ = ('firing', 'matches', 'since', 'last_seen', 'window')
+
+    def __init__(self):
+        self.firing = False
+        self.matches = 0
+        self.since: Optional[float] = None
+        self.last_seen: Optional[float] = None
+        self.window: Optional[SlidingWindow] = None
+
+
+def load_rules(path: Optional[str] = None) -> List[Rule]:
+    """
+    加载并编译规则
+
+    Args:
+        path: 规则文件路径（JSON 数组），为空时使用 DEFAULT_RULES
+
+    Raises:
+        ValueError: 规则格式错误
+    """
+    definitions = DEFAULT_RULES
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            definitions = json.load(f)
+        if not isinstance(definitions, list):
+            raise ValueError('规则文件必须是 JSON 数组')
+    rules = [Rule(index, definition) for index, definition in enumerate(definitions)]
+    names = [rule.name for rule in rules]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f'规则名称重复: {", ".join(sorted(duplicates))}')
+    return rules
+
+
+class RulesEngine:
+    """告警规则引擎"""
+
+    def __init__(self, rules: Optional[List[Rule]] = None, clock: Callable[[], float] = time.time,
+                 notifier=None):
+        self._clock = clock
+        self._notifier = notifier
+        self._lock = threading.Lock()
+        self._rules: List[Rule] = []
+        self._by_source: Dict[str, List[Rule]] = {}
+        # 规则序号 -> {client_id: 状态}
+        self._states: List[Dict[int, _State]] = []
+        # (到期时间, 序号, 规则序号, client_id, 状态令牌)
+        self._deadlines: List[Tuple[float, int, int, int, float]] = []
+        self._seq = 0
+        self._actions: deque = deque()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.set_rules(rules if rules is not None else [])
+
+    def set_rules(self, rules: List[Rule]) -> None:
+        """替换规则（所有规则状态重置，已触发的告警由新规则重新判断）"""
+        with self._lock:
+            self._rules = rules
+            self._by_source = {source: [rule for rule in rules if rule.source == source] for source in SOURCES}
+            self._states = [{} for _ in rules]
+            self._deadlines = []
+
+    @property
+    def rules(self) -> List[Rule]:
+        return self._rules
+
+    def _push(self, deadline: float, rule: Rule, client_id: int, token: float) -> None:
+        self._seq += 1
+        heapq.heappush(self._deadlines, (deadline, self._seq, rule.index, client_id, token))
+
+    def observe(self, source: str, client_id: int, fields: Dict) -> None:
+        """
+        输入一个事件（由采集、健康检查、配置拉取调用，只做内存计算）
+
+        Args:
+            source: 事件来源
+            client_id: 客户端 ID
+            fields: 事件字段
+        """
+        rules = self._by_source.get(source)
+        if not rules:
+            return
+        EVENTS.labels(source).inc()
+        now = self._clock()
+        with self._lock:
+            for rule in rules:
+                if rule.clients is not None and client_id not in rule.clients:
+                    continue
+                states = self._states[rule.index]
+                state = states.get(client_id)
+                if state is None:
+                    state = states[client_id] = _State()
+
+                if rule.absent_for is not None:
+                    state.last_seen = now
+                    # 每个客户端最多一个到期条目，到期时按最近事件时间顺延
+                    if state.since is None:
+                        state.since = now + rule.absent_for
+                        self._push(state.since, rule, client_id, state.since)
+                    if state.firing:
+                        self._transition(rule, client_id, state, False)
+                    continue
+
+                value = fields.get(rule.field)
+                if value is None:
+                    continue
+                if rule.agg is not None:
+                    if state.window is None:
+                        state.window = SlidingWindow(rule.window)
+                    state.window.add(now, float(value))
+                    value = state.window.value(rule.agg)
+                self._evaluate(rule, client_id, state, rule.op(value, rule.value), now)
+
+    def seed(self, source: str, last_seen: Dict[int, Optional[float]]) -> int:
+        """
+        为缺失规则登记客户端（启动时调用）
+
+        缺失规则的状态在收到第一个事件时才创建，不登记的话重启后一直没有事件的客户端永远不会触发。
+
+        Args:
+            source: 事件来源
+            last_seen: client_id -> 最近一次事件时间，None 表示没有记录（以当前时间为起点）
+
+        Returns:
+            新登记的状态数量（已有状态的客户端不变）
+        """
+        now = self._clock()
+        added = 0
+        with self._lock:
+            for rule in self._by_source.get(source, []):
+                if rule.absent_for is None:
+                    continue
+                states = self._states[rule.index]
+                for client_id, seen in last_seen.items():
+                    if client_id in states or (rule.clients is not None and client_id not in rule.clients):
+                        continue
+                    state = states[client_id] = _State()
+                    state.last_seen = now if seen is None else min(seen, now)
+                    state.since = state.last_seen + rule.absent_for
+                    self._push(state.since, rule, client_id, state.since)
+                    added += 1
+        return added
+
+    def sync_client(self, client_id: int, enabled: bool) -> None:
+        """
+        客户端启用 / 停用后更新规则状态
+
+        停用时移除该客户端的状态；启用时拉取过配置的客户端重新登记，以启用时间为起点。
+        """
+        if not enabled:
+            self.forget_client(client_id)
+            return
+        if load_pull_times([client_id]):
+            self.seed('pull', {client_id: None})
+
+    def _evaluate(self, rule: Rule, client_id: int, state: _State, matched: bool, now: float) -> None:
+        """更新阈值规则的状态（调用方持有锁）"""
+        if not matched:
+            state.matches = 0
+            state.since = None
+            if state.firing:
+                self._transition(rule, client_id, state, False)
+            return
+
+        state.matches += 1
+        if state.since is None:
+            state.since = now
+            if rule.for_seconds:
+                # 后续没有事件时由到期处理触发
+                self._push(now + rule.for_seconds, rule, client_id, now)
+        if not state.firing and state.matches >= rule.count and now - state.since >= rule.for_seconds:
+            self._transition(rule, client_id, state, True)
+
+    def _transition(self, rule: Rule, client_id: int, state: _State, firing: bool) -> None:
+        """记录状态变化，告警在后台线程中执行（调用方持有锁）"""
+        state.firing = firing
+        self._actions.append((firing, rule, client_id))
+        TRANSITIONS.labels('firing' if firing else 'resolved').inc()
+
+    def _expire(self, now: float, deadline_budget: float) -> int:
+        """处理到期条目，超出时间预算时留到下一周期（调用方持有锁）"""
+        processed = 0
+        heap = self._deadlines
+        while heap and heap[0][0] <= now:
+            if processed and time.perf_counter() >= deadline_budget:
+                break
+            _, _, rule_index, client_id, token = heapq.heappop(heap)
+            processed += 1
+            if rule_index >= len(self._rules):
+                continue
+            rule = self._rules[rule_index]
+            state = self._states[rule_index].get(client_id)
+            if state is None or state.since != token:
+                continue
+            if rule.absent_for is not None:
+                due = state.last_seen + rule.absent_for
+                if due > now:
+                    state.since = due
+                    self._push(due, rule, client_id, due)
+                    continue
+                state.since = None
+                if not state.firing:
+                    self._transition(rule, client_id, state, True)
+            elif not state.firing and state.matches >= rule.count:
+                self._transition(rule, client_id, state, True)
+        return processed
+
+    def tick(self) -> Dict[str, int]:
+        """
+        处理到期条目并执行告警 / 解决
+
+        Returns:
+            本周期统计（expired, actions, scheduled）
+        """
+        start = time.perf_counter()
+        budget_end = start + Config.RULES_TICK_BUDGET_MS / 1000
+        with self._lock:
+            expired = self._expire(self._clock(), budget_end)
+            actions = list(self._actions)
+            self._actions.clear()
+            scheduled = len(self._deadlines)
+
+        for firing, rule, client_id in actions:
+            self._notify(firing, rule, client_id)
+        TICK_SECONDS.observe(time.perf_counter() - start)
+        return {'expired': expired, 'actions': len(actions), 'scheduled': scheduled}
+
+    def _notify(self, firing: bool, rule: Rule, client_id: int) -> None:
+        if self._notifier is not None:
+            self._notifier(firing, rule, client_id)
+            return
+        from services.alert_service import AlertService
+        try:
+            if firing:
+                AlertService.raise_alert(client_id, rule.name, rule.describe())
+            else:
+                AlertService.resolve_client_alerts(client_id, rule.name, f'{rule.describe()}（已解除）')
+        except Exception as e:
+            ColorLogger.error(f"规则 {rule.name} 告警失败: {e}", 'Rules')
+
+    def forget_client(self, client_id: int) -> None:
+        """移除已删除客户端的规则状态（堆中的条目到期时丢弃）"""
+        with self._lock:
+            for states in self._states:
+                states.pop(client_id, None)
+
+    def get_status(self) -> List[Dict]:
+        """每条规则的定义和正在触发的客户端"""
+        with self._lock:
+            return [
+                {
+                    **rule.definition,
+                    'description': rule.describe(),
+                    'tracked_clients': len(self._states[rule.index]),
+                    'firing': sorted(client_id for client_id, state in self._states[rule.index].items()
+                                     if state.firing),
+                }
+                for rule in self._rules
+            ]
+
+    # ==================== 后台线程 ====================
+
+    def _loop(self) -> None:
+        while not self._stop_event.wait(Config.RULES_TICK_INTERVAL):
+            try:
+                self.tick()
+            except Exception as e:
+                ColorLogger.error(f"规则引擎出错: {e}", 'Rules')
+
+    def start(self) -> None:
+        """启动后台线程（先按配置拉取记录登记 pull 来源的缺失规则）"""
+        if self._thread and self._thread.is_alive():
+            return
+        try:
+            self.seed('pull', load_pull_times())
+        except Exception as e:
+            ColorLogger.error(f"加载配置拉取记录失败: {e}", 'Rules')
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='alert-rules', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台线程"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+def load_pull_times(client_ids: Optional[List[int]] = None) -> Dict[int, float]:
+    """
+    拉取过配置的启用客户端及其最近一次拉取配置的时间
+
+    Args:
+        client_ids: 只查询这些客户端，默认全部
+
+    Returns:
+        client_id -> 最近拉取时间
+    """
+    query = '''
+        SELECT c.id, p.last_pull_at
+        FROM clients c
+        JOIN client_pulls p ON p.client_id = c.id
+        WHERE c.enabled = 1
+    '''
+    params: List[int] = []
+    if client_ids is not None:
+        query += f" AND c.id IN ({','.join('?' * len(client_ids))})"
+        params = list(client_ids)
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    return {row['id']: row['last_pull_at'] for row in rows}
+
+
+def _create_engine() -> RulesEngine:
+    try:
+        rules = load_rules(Config.ALERT_RULES_FILE)
+    except (OSError, ValueError) as e:
+        ColorLogger.error(f"加载告警规则失败，使用默认规则: {e}", 'Rules')
+        rules = load_rules()
+    return RulesEngine(rules)
+
+
+def _rules_metrics():
+    """正在触发的规则实例数"""
+    with rules_engine._lock:
+        samples = [({'rule': rule.name}, sum(1 for state in rules_engine._states[rule.index].values()
+                                             if state.firing))
+                   for rule in rules_engine._rules]
+        pending = len(rules_engine._deadlines)
+    return [
+        ('frp_console_rule_firing', 'gauge', 'Clients currently matching each alert rule', samples),
+        ('frp_console_rule_deadlines', 'gauge', 'Scheduled rule deadlines', [({}, pending)]),
+    ]
+
+
+# 全局规则引擎实例
+rules_engine = _create_engine()
+registry.register_collector(_rules_metrics)
+relay.register('alert_rules', rules_engine, 'forget_client', 'sync_client', 'get_status')
@@ -2,15 +2,23 @@
 告警服务模块
 处理告警发送和管理
 """
-import smtplib
-from datetime import datetime
-from email.mime.text import MIMEText
-from typing import Dict, List, Tuple
+import base64
+import json
+import time
+from typing import Dict, List, Optional, Tuple
 
 from config import Config
 from utils.logger import ColorLogger
+from utils.message_queue import relay
 from models.database import get_db
 from services.audit_log_service import AuditLogService
+from services.alert_pipeline import alert_pipeline
+from services.alert_dispatcher import alert_dispatcher
+from services.alert_cleanup import delete_resolved_batch
+
+
+# 批量解决时每条语句的最大 ID 数（低于 SQLite 的参数数量上限）
+RESOLVE_CHUNK = 500
 
 
 class AlertService:
@@ -19,7 +27,10 @@ class AlertService:
     @staticmethod
     def send_alert(client_name: str, alert_type: str, message: str) -> bool:
         """
-        发送邮件告警
+        发送告警通知
+
+        告警经去重和分组后由后台发送队列投递到已启用的通知通道，调用方不等待投递；
+        同一客户端同类型的未解决告警在去重窗口内不会重复发送。
 
         Args:
             client_name: 客户端名称
@@ -27,44 +38,24 @@ class AlertService:
             message: 告警消息
 
         Returns:
-            是否发送成功
+            是否已受理
         """
-        # 检查 SMTP 配置
-        if not Config.SMTP_CONFIG.get('password') or not Config.SMTP_CONFIG.get('host') or not Config.SMTP_CONFIG.get('user'):
-            ColorLogger.warning('SMTP 未完全配置（需要 host, user, password），跳过发送告警邮件', 'Alert')
+        # 检查通知通道配置
+        if not alert_dispatcher.destinations():
+            ColorLogger.warning('未启用任何告警通知通道（SMTP、Webhook 或命令），跳过发送告警', 'Alert')
             return False
 
         try:
-            # 构建邮件内容
-            msg = MIMEText(f"""FRP 客户端告警
-
-客户端: {client_name}
-告警类型: {alert_type}
-消息: {message}
-时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+            row = get_db().execute('SELECT id FROM clients WHERE name = ?', (client_name,)).fetchone()
+            if row is None:
+                ColorLogger.warning(f"告警的客户端不存在: {client_name}", 'Alert')
+                return False
 
-请及时检查 FRP 服务状态。""", 'plain', 'utf-8')
+            outcome = alert_pipeline.fire(row['id'], alert_type, message)
+            if outcome == 'suppressed':
+                return True
 
-            msg['Subject'] = f'[FRP告警] {client_name} - {alert_type}'
-            msg['From'] = Config.SMTP_CONFIG['user']
-            msg['To'] = ', '.join(Config.SMTP_CONFIG['to'])
-
-            # 发送邮件
-            server = smtplib.SMTP(Config.SMTP_CONFIG['host'], Config.SMTP_CONFIG['port'])
-            server.starttls()
-            server.login(Config.SMTP_CONFIG['user'], Config.SMTP_CONFIG['password'])
-            server.sendmail(Config.SMTP_CONFIG['user'], Config.SMTP_CONFIG['to'], msg.as_string())
-            server.quit()
-
-            # 记录告警
-            db = get_db()
-            db.execute('''
-                INSERT INTO alerts (client_id, alert_type, message, sent_to)
-                SELECT id, ?, ?, ? FROM clients WHERE name = ?
-            ''', (alert_type, message, ','.join(Config.SMTP_CONFIG['to']), client_name))
-            db.commit()
-
-            ColorLogger.success(f"告警邮件已发送: {client_name} - {alert_type}", 'Alert')
+            ColorLogger.success(f"告警已加入发送队列: {client_name} - {alert_type}", 'Alert')
 
             # 记录审计日志
             AuditLogService.log(
@@ -88,21 +79,120 @@ class AlertService:
             return False
 
     @staticmethod
-    def get_all_alerts() -> List[Dict]:
+    def raise_alert(client_id: int, alert_type: str, message: str) -> bool:
+        """
+        记录告警并通知（供后台任务使用，不依赖请求上下文）
+
+        与 send_alert 不同，未启用任何通知通道时告警仍会记录，sent_to 为空。
+
+        Args:
+            client_id: 客户端 ID
+            alert_type: 告警类型
+            message: 告警消息
+
+        Returns:
+            是否记录成功（客户端不存在时返回 False）
+        """
+        outcome = alert_pipeline.fire(client_id, alert_type, message)
+        if outcome is None:
+            return False
+        if outcome == 'suppressed':
+            return True
+
+        ColorLogger.warning(f"告警: 客户端 {client_id} - {alert_type}: {message}", 'Alert')
+        AuditLogService.log(
+            AuditLogService.ACTION_ALERT_SENT,
+            details={'client_id': client_id, 'alert_type': alert_type, 'message': message},
+            level=AuditLogService.LEVEL_WARNING
+        )
+        return True
+
+    @staticmethod
+    def resolve_client_alerts(client_id: int, alert_type: str, message: str = '条件已解除') -> int:
+        """
+        条件解除时自动解决客户端指定类型的告警（供后台任务使用）
+
+        已发出告警通知的收件人会收到恢复通知。
+
+        Returns:
+            标记的告警数量
+        """
+        return alert_pipeline.clear(client_id, alert_type, message)
+
+    @staticmethod
+    def encode_cursor(row: Dict) -> str:
+        """由最后一条告警生成翻页游标"""
+        return base64.urlsafe_b64encode(json.dumps([row['sent_at'], row['id']]).encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[str, int]:
+        """
+        解析翻页游标
+
+        Raises:
+            ValueError: 游标无效
+        """
+        try:
+            sent_at, alert_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (ValueError, TypeError) as e:
+            raise ValueError('cursor 参数无效') from e
+        if not isinstance(sent_at, str) or not isinstance(alert_id, int):
+            raise ValueError('cursor 参数无效')
+        return sent_at, alert_id
+
+    @staticmethod
+    def list_alerts(
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        client_id: Optional[int] = None,
+        alert_type: Optional[str] = None,
+        resolved: Optional[bool] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
         """
-        获取所有告警
+        分页获取告警（按 sent_at、id 倒序）
+
+        使用 (sent_at, id) 游标翻页，每页的查询代价与历史告警总数无关。
+
+        Args:
+            limit: 每页数量
+            cursor: 上一页返回的游标
+            client_id: 按客户端过滤
+            alert_type: 按告警类型过滤
+            resolved: 按是否已解决过滤
 
         Returns:
-            告警列表
+            (告警列表, 下一页游标；没有更多时为 None)
+
+        Raises:
+            ValueError: 游标无效
         """
+        conditions, params = [], []
+        if client_id is not None:
+            conditions.append('a.client_id = ?')
+            params.append(client_id)
+        if alert_type:
+            conditions.append('a.alert_type = ?')
+            params.append(alert_type)
+        if resolved is not None:
+            conditions.append('a.resolved = ?')
+            params.append(1 if resolved else 0)
+        if cursor:
+            conditions.append('(a.sent_at, a.id) < (?, ?)')
+            params.extend(AlertService.decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
         db = get_db()
-        alerts = db.execute('''
+        rows = db.execute(f'''
             SELECT a.*, c.name as client_name
             FROM alerts a
             LEFT JOIN clients c ON a.client_id = c.id
-            ORDER BY a.sent_at DESC
-        ''').fetchall()
-        return [dict(row) for row in alerts]
+            {where}
+            ORDER BY a.sent_at DESC, a.id DESC
+            LIMIT ?
+        ''', (*params, limit + 1)).fetchall()
+        alerts = [dict(row) for row in rows[:limit]]
+        next_cursor = AlertService.encode_cursor(alerts[-1]) if len(rows) > limit else None
+        return alerts, next_cursor
 
     @staticmethod
     def resolve_alert(alert_id: int) -> Tuple[bool, Dict]:
@@ -116,26 +206,95 @@ class AlertService:
             (是否成功, 响应数据)
         """
         db = get_db()
-        db.execute('UPDATE alerts SET resolved = 1 WHERE id = ?', (alert_id,))
+        # 已解决的告警保留原来的解决时间
+        db.execute(
+            'UPDATE alerts SET resolved = 1, resolved_at = ? WHERE id = ? AND resolved = 0',
+            (int(time.time()), alert_id)
+        )
         db.commit()
+        relay.call(alert_pipeline.discard, alert_id)
 
         ColorLogger.info(f"告警 {alert_id} 已标记为解决", 'Alert')
         return True, {'message': '告警已解决'}
 
+    @staticmethod
+    def resolve_alerts(
+        alert_ids: Optional[List[int]] = None,
+        client_id: Optional[int] = None,
+        alert_type: Optional[str] = None
+    ) -> Tuple[bool, Dict]:
+        """
+        批量标记告警为已解决
+
+        按 ID 列表和 / 或过滤条件（客户端、告警类型）选择未解决的告警，条件之间为“且”的关系。
+
+        Args:
+            alert_ids: 告警 ID 列表
+            client_id: 客户端 ID
+            alert_type: 告警类型
+
+        Returns:
+            (是否成功, 响应数据)
+        """
+        if alert_ids is None and client_id is None and not alert_type:
+            return False, {'error': '请指定告警 ID 或过滤条件'}
+
+        conditions, params = ['resolved = 0'], []
+        if client_id is not None:
+            conditions.append('client_id = ?')
+            params.append(client_id)
+        if alert_type:
+            conditions.append('alert_type = ?')
+            params.append(alert_type)
+
+        db = get_db()
+        where = ' AND '.join(conditions)
+        if alert_ids is None:
+            ids = [row['id'] for row in db.execute(f'SELECT id FROM alerts WHERE {where}', params)]
+        else:
+            ids = []
+            requested = sorted(set(alert_ids))
+            for start in range(0, len(requested), RESOLVE_CHUNK):
+                chunk = requested[start:start + RESOLVE_CHUNK]
+                ids.extend(row['id'] for row in db.execute(
+                    f"SELECT id FROM alerts WHERE {where} AND id IN ({','.join('?' * len(chunk))})",
+                    (*params, *chunk)
+                ))
+
+        resolved_at = int(time.time())
+        for start in range(0, len(ids), RESOLVE_CHUNK):
+            chunk = ids[start:start + RESOLVE_CHUNK]
+            db.execute(
+                f"UPDATE alerts SET resolved = 1, resolved_at = ? WHERE id IN ({','.join('?' * len(chunk))})",
+                (resolved_at, *chunk)
+            )
+        db.commit()
+        relay.call(alert_pipeline.discard, *ids)
+
+        ColorLogger.info(f"已批量解决 {len(ids)} 条告警", 'Alert')
+        return True, {'message': f'已解决 {len(ids)} 条告警', 'resolved': len(ids)}
+
     @staticmethod
     def clear_resolved_alerts() -> Tuple[bool, Dict]:
         """
         清除已解决的告警
 
+        分批删除，每批单独提交，避免长时间占用写锁；数据量大时应使用 alert_cleanup 在后台执行。
+
         Returns:
             (是否成功, 响应数据)
         """
         db = get_db()
-        db.execute('DELETE FROM alerts WHERE resolved = 1')
-        db.commit()
+        batch_size = Config.ALERT_CLEAR_BATCH_SIZE
+        deleted = 0
+        while True:
+            count = delete_resolved_batch(db, batch_size)
+            deleted += count
+            if count < batch_size:
+                break
 
-        ColorLogger.info('已清除所有已解决的告警', 'Alert')
-        return True, {'message': '已清除已解决的告警'}
+        ColorLogger.info(f'已清除 {deleted} 条已解决的告警', 'Alert')
+        return True, {'message': '已清除已解决的告警', 'deleted': deleted}
 
     @staticmethod
     def get_alert_stats() -> Dict:
@@ -147,20 +306,18 @@ class AlertService:
         """
         db = get_db()
 
-        total = db.execute('SELECT COUNT(*) as count FROM alerts').fetchone()['count']
-        unresolved = db.execute('SELECT COUNT(*) as count FROM alerts WHERE resolved = 0').fetchone()['count']
-
-        # 按类型统计
-        type_stats = db.execute('''
-            SELECT alert_type, COUNT(*) as count
+        # 一次扫描 (alert_type, resolved) 覆盖索引完成所有统计
+        rows = db.execute('''
+            SELECT alert_type, COUNT(*) as count, SUM(resolved = 0) as unresolved
             FROM alerts
-            WHERE resolved = 0
             GROUP BY alert_type
         ''').fetchall()
 
+        total = sum(row['count'] for row in rows)
+        unresolved = sum(row['unresolved'] for row in rows)
         return {
             'total': total,
             'unresolved': unresolved,
             'resolved': total - unresolved,
-            'by_type': {row['alert_type']: row['count'] for row in type_stats}
-        }
\ No newline at end of file
+            'by_type': {row['alert_type']: row['unresolved'] for row in rows if row['unresolved']}
+        }
@@ -3,14 +3,24 @@
 记录系统的关键操作和安全事件
 """
 import sqlite3
+import time
 from datetime import datetime
 from typing import Optional, Dict, Any
-from flask import request, session
+from flask import has_request_context, request, session
 
 from models.database import get_db_connection
+from utils.instrumentation import registry
 from utils.logger import ColorLogger
 
 
+# 审计日志同步写入，没有队列；记录写入耗时和结果
+WRITE_SECONDS = registry.histogram(
+    'frp_console_audit_write_seconds',
+    'Synchronous audit log write time',
+    ('result',)
+)
+
+
 class AuditLogService:
     """审计日志服务类"""
 
@@ -32,7 +42,12 @@ class AuditLogService:
     ACTION_CLIENT_STOP = "client_stop"
     ACTION_CLIENT_RESTART = "client_restart"
     ACTION_CONFIG_UPDATE = "config_update"
+    ACTION_CONFIG_ROLLBACK = "config_rollback"
     ACTION_ALERT_SENT = "alert_sent"
+    ACTION_TEMPLATE_CREATE = "template_create"
+    ACTION_TEMPLATE_UPDATE = "template_update"
+    ACTION_TEMPLATE_DELETE = "template_delete"
+    ACTION_PROFILE_RUN = "profile_run"
 
     @staticmethod
     def log(
@@ -57,19 +72,19 @@ class AuditLogService:
         Returns:
             是否记录成功
         """
+        start = time.perf_counter()
         try:
             conn = get_db_connection()
             cursor = conn.cursor()
 
-            # 获取用户信息
-            if user is None:
+            # 获取用户和请求信息（后台任务中没有请求上下文，记为 system）
+            in_request = has_request_context()
+            if user is None and in_request:
                 user = session.get('user_id')
-
-            # 获取请求信息
             if ip_address is None:
-                ip_address = request.remote_addr if request else 'unknown'
+                ip_address = request.remote_addr if in_request else 'system'
             if user_agent is None:
-                user_agent = request.headers.get('User-Agent', 'unknown') if request else 'unknown'
+                user_agent = request.headers.get('User-Agent', 'unknown') if in_request else 'system'
 
             # 记录审计日志
             cursor.execute('''
@@ -88,9 +103,10 @@ class AuditLogService:
 
             conn.commit()
             conn.close()
+            WRITE_SECONDS.labels('ok').observe(time.perf_counter() - start)
 
             # 根据级别记录到应用日志
-            username = session.get('username', 'unknown')
+            username = session.get('username', 'unknown') if in_request else 'system'
             if level == AuditLogService.LEVEL_CRITICAL:
                 ColorLogger.critical(f"[AUDIT] {action} by {username} from {ip_address}", 'Audit')
             elif level == AuditLogService.LEVEL_ERROR:
@@ -103,6 +119,7 @@ class AuditLogService:
             return True
 
         except Exception as e:
+            WRITE_SECONDS.labels('error').observe(time.perf_counter() - start)
             ColorLogger.error(f"记录审计日志失败: {e}", 'Audit')
             return False
 
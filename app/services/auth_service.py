@@ -97,7 +97,7 @@ class AuthService:
             return True, '登录成功'
 
         # 登录失败
-        record_login_attempt(client_ip, False)
+        record_login_attempt(client_ip, False, Config.MAX_LOGIN_ATTEMPTS, Config.LOGIN_LOCKOUT_TIME)
         ColorLogger.warning(f"登录失败: 用户名或密码错误 (IP: {client_ip})", 'Auth')
 
         # 记录审计日志
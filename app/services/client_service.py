@@ -2,15 +2,22 @@
 客户端服务模块
 处理客户端的 CRUD 操作 - 纯配置管理，不管理进程
 """
+import json
 import os
-import re
 from typing import Dict, List, Optional, Tuple
 
 from config import Config
 from utils.logger import ColorLogger
-from utils.validators import validate_client_name, validate_toml_config
+from utils.message_queue import relay, RelayError
+from utils.helpers import parse_config_fields
+from utils.validators import validate_client_payload, validate_client_update_payload, validate_toml_config
 from models.database import get_db
 from services.audit_log_service import AuditLogService
+from services.template_service import TemplateService, dump_template_vars, render_template
+from services.revision_service import ConfigRevisionService
+from services.pull_tracker import pull_tracker, effective_version
+from services.alert_pipeline import alert_pipeline
+from services.alert_rules import rules_engine
 
 
 class ClientService:
@@ -22,12 +29,23 @@ class ClientService:
         获取所有客户端
 
         Returns:
-            客户端列表
+            客户端列表（含最近一次配置拉取的时间、IP、版本、频率和失联标记）
         """
         db = get_db()
-        clients = db.execute('SELECT * FROM clients ORDER BY id').fetchall()
+        clients = db.execute('''
+            SELECT c.*, t.version AS template_version
+            FROM clients c
+            LEFT JOIN config_templates t ON t.id = c.template_id
+            ORDER BY c.id
+        ''').fetchall()
         clients_list = [dict(row) for row in clients]
-        return clients_list
+        # 补充配置拉取摘要（含未写入数据库的最新记录，由后台任务进程提供）
+        try:
+            summaries = relay.request(pull_tracker.get_all)
+        except RelayError as e:
+            ColorLogger.warning(f"获取配置拉取记录失败: {e}", 'Client')
+            summaries = {}
+        return pull_tracker.annotate(clients_list, summaries)
 
     @staticmethod
     def get_client(client_id: int) -> Optional[Dict]:
@@ -47,6 +65,26 @@ class ClientService:
         ).fetchone()
         return dict(client) if client else None
 
+    @staticmethod
+    def _get_client_meta(client_id: int) -> Optional[Dict]:
+        """
+        获取客户端元数据（不含配置内容），用于存在性检查和修改前读取
+
+        Args:
+            client_id: 客户端 ID
+
+        Returns:
+            客户端元数据，不存在则返回 None
+        """
+        db = get_db()
+        client = db.execute(
+            'SELECT id, name, enabled, version, template_id, template_vars, server_addr, local_port, remote_port, '
+            'EXISTS (SELECT 1 FROM client_config_revisions r WHERE r.client_id = c.id) AS has_revisions '
+            'FROM clients c WHERE id = ?',
+            (client_id,)
+        ).fetchone()
+        return dict(client) if client else None
+
     @staticmethod
     def create_client(data: Dict) -> Tuple[bool, Dict]:
         """
@@ -58,85 +96,70 @@ class ClientService:
         Returns:
             (是否成功, 响应数据)
         """
-        name = data.get('name')
-
-        # 验证名称
-        valid, message = validate_client_name(name)
+        # 按模式校验请求数据（名称、端口、配置格式）
+        valid, message = validate_client_payload(data)
         if not valid:
             return False, {'error': message}
 
+        name = data.get('name')
+
+        template_id = None
+        template_vars = None
+
         # 检查是否是粘贴配置模式
         if data.get('config_content'):
             config_content = data.get('config_content')
 
-            # 验证 TOML 格式
-            valid, message = validate_toml_config(config_content)
-            if not valid:
-                return False, {'error': message}
-
             # 从配置内容解析关键信息
-            try:
-                import tomllib
-                parsed_config = tomllib.loads(config_content)
-
-                # 获取 common 部分的配置
-                common_config = parsed_config.get('common', {})
-                server_addr = common_config.get('server_addr') or common_config.get('serverAddr', '127.0.0.1')
-                server_port = common_config.get('server_port') or common_config.get('serverPort', 7000)
-
-                # 获取第一个 proxy 部分的配置
-                proxy_config = {}
-                for key, value in parsed_config.items():
-                    if key != 'common':
-                        proxy_config = value
-                        break
-
-                local_port = proxy_config.get('local_port') or proxy_config.get('localPort', 0)
-                remote_port = proxy_config.get('remote_port') or proxy_config.get('remotePort', 0)
-            except Exception as e:
-                ColorLogger.warning(f'解析 TOML 配置失败，使用正则回退: {e}', 'Client')
-                # 回退到正则表达式解析
-                server_addr_match = re.search(r'server_addr|serverAddr\s*=\s*["\']?([^"\'\n]+)["\']?', config_content)
-                server_port_match = re.search(r'server_port|serverPort\s*=\s*(\d+)', config_content)
-                local_port_match = re.search(r'local_port|localPort\s*=\s*(\d+)', config_content)
-                remote_port_match = re.search(r'remote_port|remotePort\s*=\s*(\d+)', config_content)
-
-                server_addr = server_addr_match.group(1).strip() if server_addr_match else '127.0.0.1'
-                server_port = int(server_port_match.group(1)) if server_port_match else 7000
-                local_port = int(local_port_match.group(1)) if local_port_match else 0
-                remote_port = int(remote_port_match.group(1)) if remote_port_match else 0
+            server_addr, server_port, local_port, remote_port = parse_config_fields(config_content)
         else:
-            # 表单模式
+            # 表单模式 - 只保存模板变量，配置在导出时由模板渲染
             server_addr = data.get('server_addr')
-            server_port = data.get('server_port', 7000)
-            token = data.get('token', 'ChmlFrpToken')
-            user = data.get('user', 'LrqS7A0jwRdbRAyQB6k4ikzU')
             local_port = data.get('local_port')
             remote_port = data.get('remote_port')
 
-            # 生成配置文件
-            config_content = f"""[common]
-server_addr = {server_addr}
-server_port = {server_port}
-tls_enable = false
-user = {user}
-token = {token}
-
-[proxy]
-type = tcp
-local_ip = 127.0.0.1
-local_port = {local_port}
-remote_port = {remote_port}
-"""
+            if data.get('template_id'):
+                template = TemplateService.get_template(data['template_id'])
+            else:
+                template = TemplateService.get_template_by_name(Config.DEFAULT_CONFIG_TEMPLATE)
+            if template is None:
+                return False, {'error': '配置模板不存在'}
+            template_id = template['id']
+
+            variables = {
+                'server_addr': server_addr,
+                'server_port': data.get('server_port', 7000),
+                'user': data.get('user', 'LrqS7A0jwRdbRAyQB6k4ikzU'),
+                'token': data.get('token', 'ChmlFrpToken'),
+                'local_port': local_port,
+                'remote_port': remote_port,
+            }
+            variables.update(data.get('template_vars') or {})
+            template_vars = dump_template_vars(variables)
+
+            # 预先渲染一次，确保变量齐全且结果是有效配置
+            success, rendered = render_template(template['content'], variables)
+            if not success:
+                return False, {'error': rendered}
+            valid, message = validate_toml_config(rendered)
+            if not valid:
+                return False, {'error': message}
+            # template_vars 可能覆盖表单字段，以渲染结果为准
+            server_addr, _, local_port, remote_port = parse_config_fields(rendered)
+
+            config_content = ''
 
         # 插入数据库 - 配置内容直接存储在数据库中
         db = get_db()
         cursor = db.execute('''
-            INSERT INTO clients (name, config_content, local_port, remote_port, server_addr, enabled)
-            VALUES (?, ?, ?, ?, ?, 1)
-        ''', (name, config_content, local_port, remote_port, server_addr))
-        db.commit()
+            INSERT INTO clients (name, config_content, local_port, remote_port, server_addr, enabled,
+                                 template_id, template_vars)
+            VALUES (?, ?, ?, ?, ?, 1, ?, ?)
+        ''', (name, config_content, local_port, remote_port, server_addr, template_id, template_vars))
         client_id = cursor.lastrowid
+        if config_content:
+            ConfigRevisionService.record_revision(client_id, config_content)
+        db.commit()
 
         ColorLogger.success(f"客户端 {name} 创建成功", 'Client')
 
@@ -150,41 +173,73 @@ remote_port = {remote_port}
         return True, {'id': client_id, 'message': '创建成功'}
 
     @staticmethod
-    def update_client(client_id: int, data: Dict) -> Tuple[bool, Dict]:
+    def update_client(client_id: int, data: Dict, expected_version: Optional[int] = None) -> Tuple[bool, Dict]:
         """
         更新客户端信息
 
         Args:
             client_id: 客户端 ID
             data: 更新数据
+            expected_version: 客户端读取到的版本号（None 表示以本次读取的版本为准）
 
         Returns:
             (是否成功, 响应数据)
         """
-        db = get_db()
+        valid, message = validate_client_update_payload(data)
+        if not valid:
+            return False, {'error': message}
 
-        # 读取现有配置
-        client = db.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
+        client = ClientService._get_client_meta(client_id)
         if client is None:
             return False, {'error': '客户端不存在'}
 
         # 更新数据库
         name = data.get('name', client['name'])
         enabled = data.get('enabled', client['enabled'])
-
-        # 如果更新了名称，验证新名称
-        if name != client['name']:
-            valid, message = validate_client_name(name)
+        server_addr, local_port, remote_port = client['server_addr'], client['local_port'], client['remote_port']
+
+        # 模板客户端可以只更新变量，配置在导出时重新渲染
+        template_vars = client['template_vars']
+        if data.get('template_vars'):
+            if client['template_id'] is None:
+                return False, {'error': '该客户端未使用配置模板'}
+            template = TemplateService.get_template(client['template_id'])
+            if template is None:
+                return False, {'error': '配置模板不存在'}
+            variables = json.loads(template_vars or '{}')
+            variables.update(data['template_vars'])
+
+            # 保存前按新变量渲染一次，变量不全或结果无效时拒绝，不留到导出时才失败
+            success, rendered = render_template(template['content'], variables)
+            if not success:
+                return False, {'error': rendered}
+            valid, message = validate_toml_config(rendered)
             if not valid:
                 return False, {'error': message}
+            # 健康检查读取这些列，随渲染结果更新
+            server_addr, _, local_port, remote_port = parse_config_fields(rendered)
+            template_vars = dump_template_vars(variables)
 
-        db.execute('''
-            UPDATE clients SET name = ?, enabled = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (name, enabled, client_id))
+        version = client['version'] if expected_version is None else expected_version
+        db = get_db()
+        if data.get('template_vars'):
+            ClientService._record_baseline_revision(client)
+        cursor = db.execute('''
+            UPDATE clients SET name = ?, enabled = ?, template_vars = ?, server_addr = ?, local_port = ?,
+                               remote_port = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND version = ?
+        ''', (name, enabled, template_vars, server_addr, local_port, remote_port, client_id, version))
+        if cursor.rowcount == 0:
+            db.rollback()
+            return False, ClientService._conflict_result(client_id)
+        if data.get('template_vars'):
+            # 修订历史保存渲染结果，回滚时按普通配置写回
+            ConfigRevisionService.record_revision(client_id, rendered)
         db.commit()
 
         ColorLogger.info(f"客户端 {name} 更新成功", 'Client')
+        if bool(enabled) != bool(client['enabled']):
+            relay.call(rules_engine.sync_client, client_id, bool(enabled))
 
         # 记录审计日志
         AuditLogService.log(
@@ -193,7 +248,7 @@ remote_port = {remote_port}
             level=AuditLogService.LEVEL_INFO
         )
 
-        return True, {'message': '更新成功'}
+        return True, {'message': '更新成功', 'version': version + 1}
 
     @staticmethod
     def delete_client(client_id: int) -> Tuple[bool, Dict]:
@@ -206,18 +261,17 @@ remote_port = {remote_port}
         Returns:
             (是否成功, 响应数据)
         """
-        db = get_db()
-
-        # 获取客户端信息
-        client = db.execute('SELECT * FROM clients WHERE id = ?', (client_id,)).fetchone()
+        client = ClientService._get_client_meta(client_id)
         if client is None:
             return False, {'error': '客户端不存在'}
 
-        # 删除数据库记录
+        # 删除数据库记录（日志、告警和修订历史由外键级联删除）
+        db = get_db()
         db.execute('DELETE FROM clients WHERE id = ?', (client_id,))
-        db.execute('DELETE FROM logs WHERE client_id = ?', (client_id,))
-        db.execute('DELETE FROM alerts WHERE client_id = ?', (client_id,))
         db.commit()
+        relay.call(pull_tracker.forget, client_id)
+        relay.call(alert_pipeline.forget_client, client_id)
+        relay.call(rules_engine.forget_client, client_id)
 
         ColorLogger.success(f"客户端 {client['name']} 删除成功", 'Client')
 
@@ -233,49 +287,144 @@ remote_port = {remote_port}
     @staticmethod
     def get_client_config(client_id: int) -> Tuple[bool, Dict]:
         """
-        获取客户端配置文件内容
+        获取客户端配置文件内容（模板客户端按变量渲染）
 
         Args:
             client_id: 客户端 ID
 
         Returns:
-            (是否成功, 响应数据)
+            (是否成功, 响应数据)；config_version 为导出配置的有效版本（模板客户端包含模板版本）
         """
-        client = ClientService.get_client(client_id)
+        db = get_db()
+        client = db.execute('''
+            SELECT c.config_content, c.version, c.template_id, c.template_vars, t.version AS template_version
+            FROM clients c
+            LEFT JOIN config_templates t ON t.id = c.template_id
+            WHERE c.id = ?
+        ''', (client_id,)).fetchone()
         if client is None:
             return False, {'error': '客户端不存在'}
 
-        config_content = client.get('config_content', '')
-        return True, {'config': config_content}
+        if client['template_id'] is None:
+            return True, {
+                'config': client['config_content'] or '',
+                'version': client['version'],
+                'config_version': client['version'],
+            }
+
+        if client['template_version'] is None:
+            return False, {'error': '配置模板不存在'}
+
+        success, config_content = TemplateService.render_client_config(
+            client['template_id'], client['template_version'], client['template_vars']
+        )
+        if not success:
+            return False, {'error': config_content}
+        return True, {
+            'config': config_content,
+            'version': client['version'],
+            'config_version': effective_version(client['version'], client['template_version']),
+        }
 
     @staticmethod
-    def update_client_config(client_id: int, config_content: str) -> Tuple[bool, Dict]:
+    def update_client_config(client_id: int, config_content: str,
+                             expected_version: Optional[int] = None) -> Tuple[bool, Dict]:
         """
         更新客户端配置文件
 
+        使用条件更新 (WHERE id = ? AND version = ?) 实现乐观并发控制，
+        版本不一致时不写入并返回冲突，无需加锁。
+
         Args:
             client_id: 客户端 ID
             config_content: 新配置内容
+            expected_version: 客户端读取到的版本号（None 表示以本次读取的版本为准）
 
         Returns:
             (是否成功, 响应数据)
         """
-        client = ClientService.get_client(client_id)
-        if client is None:
-            return False, {'error': '客户端不存在'}
-
         # 验证 TOML 格式
         valid, message = validate_toml_config(config_content)
         if not valid:
             return False, {'error': message}
 
-        # 更新数据库中的配置
+        client = ClientService._get_client_meta(client_id)
+        if client is None:
+            return False, {'error': '客户端不存在'}
+
+        # 更新数据库中的配置（直接编辑配置后客户端脱离模板），健康检查读取的地址和端口列随配置更新
+        server_addr, _, local_port, remote_port = parse_config_fields(config_content)
+        version = client['version'] if expected_version is None else expected_version
         db = get_db()
-        db.execute(
-            'UPDATE clients SET config_content = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
-            (config_content, client_id)
-        )
+        ClientService._record_baseline_revision(client)
+        cursor = db.execute('''
+            UPDATE clients SET config_content = ?, template_id = NULL, template_vars = NULL, server_addr = ?,
+                               local_port = ?, remote_port = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND version = ?
+        ''', (config_content, server_addr, local_port, remote_port, client_id, version))
+        if cursor.rowcount == 0:
+            db.rollback()
+            return False, ClientService._conflict_result(client_id)
+        revision = ConfigRevisionService.record_revision(client_id, config_content)
         db.commit()
 
         ColorLogger.success(f"客户端 {client['name']} 配置更新成功", 'Client')
-        return True, {'message': '配置更新成功'}
+        return True, {'message': '配置更新成功', 'revision': revision, 'version': version + 1}
+
+    @staticmethod
+    def _record_baseline_revision(client: Dict) -> None:
+        """
+        升级前创建的客户端没有修订历史，首次修改前把当前配置记为第 1 版（不提交事务，
+        与随后的更新一起提交或回滚），使第一次修改也能回滚
+
+        Args:
+            client: _get_client_meta 返回的客户端元数据
+        """
+        if client['has_revisions']:
+            return
+        success, result = ClientService.get_client_config(client['id'])
+        if success:
+            ConfigRevisionService.record_revision(client['id'], result['config'])
+
+    @staticmethod
+    def _conflict_result(client_id: int) -> Dict:
+        """
+        条件更新未命中时生成错误响应：客户端已删除或版本已变化
+
+        Args:
+            client_id: 客户端 ID
+
+        Returns:
+            响应数据，版本冲突时包含 conflict 和当前版本号
+        """
+        client = ClientService._get_client_meta(client_id)
+        if client is None:
+            return {'error': '客户端不存在'}
+        return {'error': '客户端已被其他人修改，请刷新后重试', 'conflict': True, 'version': client['version']}
+
+    @staticmethod
+    def rollback_client_config(client_id: int, revision: int) -> Tuple[bool, Dict]:
+        """
+        将客户端配置回滚到指定版本（回滚本身会生成一个新版本）
+
+        Args:
+            client_id: 客户端 ID
+            revision: 目标修订号
+
+        Returns:
+            (是否成功, 响应数据)
+        """
+        config_content = ConfigRevisionService.get_revision_content(client_id, revision)
+        if config_content is None:
+            return False, {'error': '修订版本不存在'}
+
+        success, result = ClientService.update_client_config(client_id, config_content)
+        if not success:
+            return False, result
+
+        AuditLogService.log(
+            AuditLogService.ACTION_CONFIG_ROLLBACK,
+            details={'client_id': client_id, 'from_revision': revision, 'revision': result['revision']},
+            level=AuditLogService.LEVEL_INFO
+        )
+        return True, {'message': f'已回滚到版本 {revision}', 'revision': result['revision']}
@@ -0,0 +1,241 @@
+"""
+采集调度模块
+按客户端自适应调整采集间隔，使用以下一次到期时间为键的最小堆调度
+
+- 被实时订阅的客户端：MONITOR_WATCHED_INTERVAL
+- 流量或连接数有变化的客户端：MONITOR_ACTIVE_INTERVAL
+- 连续无变化的客户端：从 MONITOR_ACTIVE_INTERVAL 开始指数退避，最长 MONITOR_IDLE_MAX_INTERVAL
+- 无法访问的客户端：指数退避，最长 MONITOR_BACKOFF_MAX_INTERVAL
+- 订阅了全局汇总（fleet）时，所有客户端的间隔不超过 MONITOR_ACTIVE_INTERVAL
+"""
+import heapq
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from utils.message_queue import relay
+
+
+REASON_NEW = 'new'
+REASON_WATCHED = 'watched'
+REASON_CHANGING = 'changing'
+REASON_IDLE = 'idle'
+REASON_UNREACHABLE = 'unreachable'
+
+
+class CollectionScheduler:
+    """
+    自适应采集调度器
+
+    每个客户端在堆中最多有一个有效条目；客户端被取出后直到 record() 重新调度前
+    不在堆中，因此同一客户端不会被并发采集。被替换的旧条目通过序号惰性丢弃。
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[float, int, int]] = []
+        self._states: Dict[int, Dict] = {}
+        self._seq = 0
+
+    def _push(self, client_id: int, due: float) -> None:
+        """加入堆（调用方持有锁）"""
+        self._seq += 1
+        state = self._states[client_id]
+        state['seq'] = self._seq
+        state['next_due'] = due
+        heapq.heappush(self._heap, (due, self._seq, client_id))
+
+    def sync(self, client_ids: Iterable[int]) -> None:
+        """
+        同步需要采集的客户端：新客户端立即到期，已移除的客户端停止调度
+
+        Args:
+            client_ids: 当前启用的客户端 ID
+        """
+        now = self._clock()
+        client_ids = set(client_ids)
+        with self._lock:
+            for client_id in list(self._states):
+                if client_id not in client_ids:
+                    del self._states[client_id]
+            for client_id in client_ids:
+                if client_id not in self._states:
+                    self._states[client_id] = {
+                        'interval': 0.0,
+                        'reason': REASON_NEW,
+                        'idle_streak': 0,
+                        'failures': 0,
+                        'in_flight': False,
+                        'last_polled': None,
+                    }
+                    self._push(client_id, now)
+            # 堆中失效条目过多时重建
+            if len(self._heap) > 2 * len(self._states) + 64:
+                self._heap = [entry for entry in self._heap
+                              if entry[2] in self._states and self._states[entry[2]].get('seq') == entry[1]]
+                heapq.heapify(self._heap)
+
+    def pop_due(self, now: Optional[float] = None) -> List[int]:
+        """
+        取出所有已到期的客户端
+
+        Args:
+            now: 当前时间（单调时钟）
+
+        Returns:
+            到期的客户端 ID，按到期时间排序
+        """
+        if now is None:
+            now = self._clock()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, client_id = heapq.heappop(self._heap)
+                state = self._states.get(client_id)
+                if state is None or state.get('seq') != seq:
+                    continue
+                state['seq'] = None
+                state['in_flight'] = True
+                due.append(client_id)
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """最近的到期时间，没有待调度的客户端时返回 None"""
+        with self._lock:
+            while self._heap:
+                _, seq, client_id = self._heap[0]
+                state = self._states.get(client_id)
+                if state is not None and state.get('seq') == seq:
+                    return self._heap[0][0]
+                heapq.heappop(self._heap)
+        return None
+
+    def record(self, client_id: int, reachable: bool, changed: bool,
+               watched: bool = False, fleet_watched: bool = False) -> Optional[float]:
+        """
+        记录一次采集结果并安排下一次采集
+
+        Args:
+            client_id: 客户端 ID
+            reachable: admin API 是否可访问
+            changed: 流量或连接数是否有变化
+            watched: 是否被实时订阅
+            fleet_watched: 是否有全局汇总订阅
+
+        Returns:
+            下一次采集的间隔（秒），客户端已移除时返回 None
+        """
+        now = self._clock()
+        with self._lock:
+            state = self._states.get(client_id)
+            if state is None:
+                return None
+
+            if not reachable:
+                state['failures'] += 1
+                state['idle_streak'] = 0
+                interval = min(
+                    Config.MONITOR_ACTIVE_INTERVAL * 2 ** (state['failures'] - 1),
+                    Config.MONITOR_BACKOFF_MAX_INTERVAL
+                )
+                reason = REASON_UNREACHABLE
+            elif changed:
+                state['failures'] = 0
+                state['idle_streak'] = 0
+                interval = Config.MONITOR_ACTIVE_INTERVAL
+                reason = REASON_CHANGING
+            else:
+                state['failures'] = 0
+                state['idle_streak'] += 1
+                interval = min(
+                    Config.MONITOR_ACTIVE_INTERVAL * 2 ** state['idle_streak'],
+                    Config.MONITOR_IDLE_MAX_INTERVAL
+                )
+                reason = REASON_IDLE
+
+            if watched:
+                interval = Config.MONITOR_WATCHED_INTERVAL
+                reason = REASON_WATCHED
+            elif fleet_watched:
+                interval = min(interval, Config.MONITOR_ACTIVE_INTERVAL)
+
+            state['interval'] = interval
+            state['reason'] = reason
+            state['in_flight'] = False
+            state['last_polled'] = now
+            jitter = Config.MONITOR_JITTER
+            self._push(client_id, now + interval * random.uniform(1 - jitter, 1 + jitter))
+            return interval
+
+    def reschedule(self, client_id: int, delay: float) -> None:
+        """不更新统计，仅将已取出的客户端延后 delay 秒重新调度"""
+        with self._lock:
+            state = self._states.get(client_id)
+            if state is not None:
+                state['in_flight'] = False
+                self._push(client_id, self._clock() + delay)
+
+    def expedite(self, client_ids: Iterable[int], interval: Optional[float] = None) -> int:
+        """
+        提前采集新被订阅的客户端：下一次到期晚于 interval 秒后的改为立即到期
+
+        Args:
+            client_ids: 被订阅的客户端 ID
+            interval: 允许的最长等待时间，默认为 MONITOR_WATCHED_INTERVAL
+
+        Returns:
+            被提前的客户端数量
+        """
+        if interval is None:
+            interval = Config.MONITOR_WATCHED_INTERVAL
+        now = self._clock()
+        expedited = 0
+        with self._lock:
+            for client_id in client_ids:
+                state = self._states.get(client_id)
+                if state is None or state['in_flight'] or state.get('seq') is None:
+                    continue
+                if state['next_due'] > now + interval:
+                    self._push(client_id, now)
+                    expedited += 1
+        return expedited
+
+    def snapshot(self) -> Dict:
+        """
+        调度器状态（用于内省接口）
+
+        Returns:
+            {'clients', 'in_flight', 'heap_size', 'entries': [...]}，entries 按下一次到期时间排序
+        """
+        now = self._clock()
+        with self._lock:
+            entries = []
+            for client_id, state in self._states.items():
+                entries.append({
+                    'client_id': client_id,
+                    'reason': state['reason'],
+                    'interval': state['interval'],
+                    'next_due_in': None if state['in_flight'] else round(max(0.0, state['next_due'] - now), 3),
+                    'in_flight': state['in_flight'],
+                    'idle_streak': state['idle_streak'],
+                    'failures': state['failures'],
+                    'last_polled_ago': None if state['last_polled'] is None
+                    else round(now - state['last_polled'], 3),
+                })
+            heap_size = len(self._heap)
+
+        entries.sort(key=lambda e: (e['next_due_in'] is not None, e['next_due_in'] or 0))
+        return {
+            'clients': len(entries),
+            'in_flight': sum(1 for e in entries if e['in_flight']),
+            'heap_size': heap_size,
+            'entries': entries,
+        }
+
+
+# 采集器使用的全局调度器实例
+scheduler = CollectionScheduler()
+relay.register('collection_scheduler', scheduler, 'snapshot')
@@ -0,0 +1,387 @@
+"""
+隧道健康检查模块
+并发 TCP 探测每个启用客户端的 server_addr:remote_port，判断隧道是否可用
+
+- 每轮探测在独立线程的 asyncio 事件循环中并发执行，并发数由 HEALTH_CHECK_CONCURRENCY 限制
+- 每个目标有一个熔断器：连续失败 HEALTH_FAILURE_THRESHOLD 次后打开，熔断期间跳过探测；
+  冷却结束后半开探测一次，失败则冷却时间加倍（最长 HEALTH_BREAKER_MAX_COOLDOWN）
+- 只在状态变化（up <-> down）时通过 AlertService 告警，不对每次失败告警
+- 结果每轮批量写入 client_health 表，重启后从表中恢复状态，避免重复告警
+"""
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from utils.instrumentation import registry
+from utils.logger import ColorLogger
+from utils.message_queue import relay
+from models.database import get_db_connection
+from services.alert_rules import rules_engine
+
+
+STATE_UNKNOWN = 'unknown'
+STATE_UP = 'up'
+STATE_DOWN = 'down'
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+ALERT_TUNNEL_DOWN = 'tunnel_down'
+
+# 探测函数: (host, port, timeout) -> (是否连通, 耗时毫秒, 错误信息)
+ProbeFunc = Callable[[str, int, float], Awaitable[Tuple[bool, Optional[float], Optional[str]]]]
+
+
+async def tcp_probe(host: str, port: int, timeout: float) -> Tuple[bool, Optional[float], Optional[str]]:
+    """
+    TCP 连接探测（只建立连接，不发送数据）
+
+    Returns:
+        (是否连通, 连接耗时毫秒, 错误信息)
+    """
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except asyncio.TimeoutError:
+        return False, None, 'timeout'
+    except OSError as e:
+        return False, None, e.strerror or str(e)
+    latency = (time.perf_counter() - start) * 1000
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True, round(latency, 2), None
+
+
+class CircuitBreaker:
+    """单个目标的熔断器"""
+
+    __slots__ = ('state', 'failures', 'cooldown', 'open_until')
+
+    def __init__(self, state: str = BREAKER_CLOSED, failures: int = 0):
+        self.state = state
+        self.failures = failures
+        self.cooldown = Config.HEALTH_BREAKER_COOLDOWN
+        # 恢复的打开状态从启动时开始冷却
+        self.open_until = time.monotonic() + self.cooldown if state == BREAKER_OPEN else 0.0
+
+    def allow(self, now: float) -> bool:
+        """是否允许本轮探测（打开状态冷却结束后转为半开）"""
+        if self.state == BREAKER_OPEN:
+            if now < self.open_until:
+                return False
+            self.state = BREAKER_HALF_OPEN
+        return True
+
+    def record_success(self) -> None:
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.cooldown = Config.HEALTH_BREAKER_COOLDOWN
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        if self.state == BREAKER_HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, Config.HEALTH_BREAKER_MAX_COOLDOWN)
+            self._open(now)
+        elif self.failures >= Config.HEALTH_FAILURE_THRESHOLD:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = BREAKER_OPEN
+        self.open_until = now + self.cooldown
+
+
+class HealthChecker:
+    """隧道健康检查器"""
+
+    def __init__(self, probe: ProbeFunc = tcp_probe):
+        self._probe = probe
+        self._lock = threading.Lock()
+        self._targets: Dict[int, Dict] = {}
+        self._loaded = False
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ==================== 状态 ====================
+
+    def _load(self) -> None:
+        """从 client_health 表恢复状态"""
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('SELECT * FROM client_health').fetchall()
+        finally:
+            conn.close()
+        with self._lock:
+            for row in rows:
+                self._targets[row['client_id']] = {
+                    'state': row['state'],
+                    'breaker': CircuitBreaker(row['breaker'], row['failures']),
+                    'latency_ms': row['latency_ms'],
+                    'error': row['error'],
+                    'checked_at': row['checked_at'],
+                    'changed_at': row['changed_at'],
+                }
+        self._loaded = True
+
+    @staticmethod
+    def _get_targets() -> List[Dict]:
+        """需要探测的客户端（启用且配置了 server_addr 和 remote_port）"""
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('''
+                SELECT id, name, server_addr, remote_port FROM clients
+                WHERE enabled = 1 AND server_addr IS NOT NULL AND server_addr != ''
+                  AND remote_port IS NOT NULL AND remote_port > 0
+            ''').fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def _new_target(self) -> Dict:
+        return {
+            'state': STATE_UNKNOWN,
+            'breaker': CircuitBreaker(),
+            'latency_ms': None,
+            'error': None,
+            'checked_at': None,
+            'changed_at': None,
+        }
+
+    # ==================== 探测 ====================
+
+    async def _probe_all(self, targets: List[Dict]) -> List[Tuple[Dict, Tuple]]:
+        """并发探测所有目标"""
+        semaphore = asyncio.Semaphore(Config.HEALTH_CHECK_CONCURRENCY)
+
+        async def probe_one(target):
+            async with semaphore:
+                try:
+                    result = await self._probe(target['server_addr'], target['remote_port'],
+                                               Config.HEALTH_CHECK_TIMEOUT)
+                except Exception as e:
+                    result = (False, None, str(e))
+                return target, result
+
+        return await asyncio.gather(*(probe_one(target) for target in targets))
+
+    def run_round(self, targets: Optional[List[Dict]] = None) -> Dict[str, int]:
+        """
+        执行一轮探测
+
+        Args:
+            targets: 探测目标（id, name, server_addr, remote_port），默认从 clients 表读取
+
+        Returns:
+            本轮统计（targets, probed, skipped, up, down, transitions）
+        """
+        if not self._loaded:
+            self._load()
+        if targets is None:
+            targets = self._get_targets()
+
+        now = time.monotonic()
+        to_probe = []
+        with self._lock:
+            active_ids = {target['id'] for target in targets}
+            for client_id in [cid for cid in self._targets if cid not in active_ids]:
+                del self._targets[client_id]
+            for target in targets:
+                state = self._targets.setdefault(target['id'], self._new_target())
+                if state['breaker'].allow(now):
+                    to_probe.append(target)
+
+        results = asyncio.run(self._probe_all(to_probe)) if to_probe else []
+
+        transitions = []
+        checked_at = int(time.time())
+        with self._lock:
+            for target, (ok, latency_ms, error) in results:
+                state = self._targets.get(target['id'])
+                if state is None:
+                    continue
+                transition = self._apply(state, ok, latency_ms, error, checked_at)
+                if transition:
+                    transitions.append((target, transition))
+            rows = [self._row(client_id, state) for client_id, state in self._targets.items()
+                    if state['checked_at'] is not None]
+            up = sum(1 for state in self._targets.values() if state['state'] == STATE_UP)
+            down = sum(1 for state in self._targets.values() if state['state'] == STATE_DOWN)
+
+        self._save(rows)
+        for target, (ok, latency_ms, _) in results:
+            rules_engine.observe('health', target['id'], {'ok': ok, 'latency_ms': latency_ms})
+        for target, transition in transitions:
+            self._notify(target, transition)
+
+        return {
+            'targets': len(targets),
+            'probed': len(to_probe),
+            'skipped': len(targets) - len(to_probe),
+            'up': up,
+            'down': down,
+            'transitions': len(transitions),
+        }
+
+    @staticmethod
+    def _apply(state: Dict, ok: bool, latency_ms: Optional[float], error: Optional[str],
+               checked_at: int) -> Optional[Tuple[str, str]]:
+        """
+        应用一次探测结果（调用方持有锁）
+
+        Returns:
+            状态变化 (旧状态, 新状态)，无变化返回 None
+        """
+        breaker = state['breaker']
+        previous = state['state']
+        if ok:
+            breaker.record_success()
+            new_state = STATE_UP
+        else:
+            breaker.record_failure(time.monotonic())
+            # 达到连续失败阈值才判定为不可用，单次抖动不改变状态
+            new_state = STATE_DOWN if breaker.failures >= Config.HEALTH_FAILURE_THRESHOLD else previous
+
+        state['latency_ms'] = latency_ms
+        state['error'] = error
+        state['checked_at'] = checked_at
+        if new_state != previous:
+            state['state'] = new_state
+            state['changed_at'] = checked_at
+            # 首次探测成功不算恢复
+            if not (previous == STATE_UNKNOWN and new_state == STATE_UP):
+                return previous, new_state
+        return None
+
+    @staticmethod
+    def _row(client_id: int, state: Dict) -> Tuple:
+        breaker = state['breaker']
+        return (client_id, state['state'], breaker.state, breaker.failures, state['latency_ms'],
+                state['error'], state['checked_at'], state['changed_at'])
+
+    @staticmethod
+    def _save(rows: List[Tuple]) -> None:
+        """批量写入本轮结果"""
+        if not rows:
+            return
+        conn = get_db_connection()
+        try:
+            conn.executemany('''
+                INSERT INTO client_health (client_id, state, breaker, failures, latency_ms, error, checked_at, changed_at)
+                SELECT ?, ?, ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM clients WHERE id = ?1)
+                ON CONFLICT(client_id) DO UPDATE SET
+                    state = excluded.state, breaker = excluded.breaker, failures = excluded.failures,
+                    latency_ms = excluded.latency_ms, error = excluded.error,
+                    checked_at = excluded.checked_at, changed_at = excluded.changed_at
+            ''', rows)
+            conn.commit()
+        except Exception as e:
+            ColorLogger.error(f"保存健康检查结果失败: {e}", 'Health')
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _notify(target: Dict, transition: Tuple[str, str]) -> None:
+        """状态变化时告警"""
+        from services.alert_service import AlertService
+
+        address = f"{target['server_addr']}:{target['remote_port']}"
+        _, new_state = transition
+        try:
+            if new_state == STATE_DOWN:
+                AlertService.raise_alert(
+                    target['id'], ALERT_TUNNEL_DOWN,
+                    f"隧道 {address} 连续 {Config.HEALTH_FAILURE_THRESHOLD} 次探测失败"
+                )
+            else:
+                AlertService.resolve_client_alerts(target['id'], ALERT_TUNNEL_DOWN, f"隧道 {address} 已恢复")
+        except Exception as e:
+            ColorLogger.error(f"健康检查告警失败: {e}", 'Health')
+
+    # ==================== 查询 ====================
+
+    def get_status(self, client_id: Optional[int] = None):
+        """
+        获取健康状态
+
+        Args:
+            client_id: 客户端 ID，为空时返回所有客户端
+
+        Returns:
+            单个客户端的状态（不存在返回 None），或 client_id -> 状态 的字典
+        """
+        def public(state):
+            return {
+                'state': state['state'],
+                'breaker': state['breaker'].state,
+                'failures': state['breaker'].failures,
+                'latency_ms': state['latency_ms'],
+                'error': state['error'],
+                'checked_at': state['checked_at'],
+                'changed_at': state['changed_at'],
+            }
+
+        if not self._loaded:
+            self._load()
+        with self._lock:
+            if client_id is not None:
+                state = self._targets.get(client_id)
+                return public(state) if state else None
+            return {cid: public(state) for cid, state in self._targets.items()}
+
+    # ==================== 后台线程 ====================
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            try:
+                stats = self.run_round()
+                if stats['transitions']:
+                    ColorLogger.info(
+                        f"健康检查: {stats['up']} 个可用, {stats['down']} 个不可用, "
+                        f"{stats['transitions']} 个状态变化", 'Health'
+                    )
+            except Exception as e:
+                ColorLogger.error(f"健康检查出错: {e}", 'Health')
+            self._stop_event.wait(max(0.0, Config.HEALTH_CHECK_INTERVAL - (time.monotonic() - start)))
+
+    def start(self) -> None:
+        """启动后台检查线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='health-checker', daemon=True)
+        self._thread.start()
+        ColorLogger.success(f"隧道健康检查已启动 (间隔 {Config.HEALTH_CHECK_INTERVAL:g} 秒)", 'Health')
+
+    def stop(self) -> None:
+        """停止后台检查线程"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=Config.HEALTH_CHECK_TIMEOUT + 5)
+            self._thread = None
+
+
+def _health_metrics():
+    """隧道健康状态的运行指标"""
+    with health_checker._lock:
+        states = [(client_id, state['state'], state['breaker'].state)
+                  for client_id, state in health_checker._targets.items()]
+    return [
+        ('frp_console_tunnel_up', 'gauge', 'Whether the tunnel remote port accepted a TCP connection',
+         [({'client_id': str(client_id)}, 1 if state == STATE_UP else 0)
+          for client_id, state, _ in states if state != STATE_UNKNOWN]),
+        ('frp_console_tunnel_breaker_open', 'gauge', 'Whether probing is suspended by the circuit breaker',
+         [({'client_id': str(client_id)}, 1 if breaker == BREAKER_OPEN else 0)
+          for client_id, _, breaker in states]),
+    ]
+
+
+# 全局健康检查器实例
+health_checker = HealthChecker()
+registry.register_collector(_health_metrics)
+relay.register('health_checker', health_checker, 'get_status')
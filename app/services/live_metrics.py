@@ -0,0 +1,231 @@
+"""
+实时指标推送模块
+通过 Socket.IO 房间向订阅者推送采集器的最新指标
+
+房间分为 client:<id>（单个客户端）和 fleet（全局汇总）。采集器每轮结束时调用
+flush_tick()，本轮内的更新合并后每个房间最多发送一帧，且只包含相对上一帧变化的字段。
+房间的订阅计数同时决定采集节奏：没有订阅者时采集器降速。
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from utils.logger import ColorLogger
+from utils.message_queue import relay
+
+
+FLEET_ROOM = 'fleet'
+CLIENT_ROOM_PREFIX = 'client:'
+
+# 客户端帧中推送的字段
+FRAME_FIELDS: Tuple[str, ...] = (
+    'traffic_in',
+    'traffic_out',
+    'connections_active',
+    'connections_total',
+    'rate_in',
+    'rate_out',
+    'status',
+)
+
+
+def client_room(client_id: int) -> str:
+    """客户端房间名"""
+    return f'{CLIENT_ROOM_PREFIX}{client_id}'
+
+
+def parse_room(room: str) -> Optional[int]:
+    """解析客户端房间名，返回客户端 ID；fleet 或无效房间返回 None"""
+    if room.startswith(CLIENT_ROOM_PREFIX):
+        suffix = room[len(CLIENT_ROOM_PREFIX):]
+        if suffix.isdigit():
+            return int(suffix)
+    return None
+
+
+def diff_frame(previous: Dict, current: Dict, fields) -> Dict:
+    """计算两帧之间变化的字段"""
+    return {field: current[field] for field in fields if previous.get(field) != current.get(field)}
+
+
+class LiveMetricsPublisher:
+    """实时指标发布器"""
+
+    def __init__(self, emit: Optional[Callable] = None):
+        self._emit = emit
+        self._lock = threading.Lock()
+        self._room_counts: Dict[str, int] = {}
+        self._sid_rooms: Dict[str, Set[str]] = {}
+        # 本轮待发送的最新样本，以及已发送的最新状态（作为下一帧差分的基准）
+        self._pending: Dict[int, Dict] = {}
+        self._latest: Dict[int, Dict] = {}
+        self._fleet_latest: Dict = {}
+        self.last_activity = 0.0
+        # 订阅变化时唤醒采集器，使新的采集节奏立即生效
+        self.demand_changed = threading.Event()
+
+    def set_emitter(self, emit: Callable) -> None:
+        """设置发送函数（socketio.emit）"""
+        self._emit = emit
+
+    def _send(self, event: str, data: Dict, to: str) -> None:
+        """发送一帧，推送失败不影响采集"""
+        if self._emit is None:
+            return
+        try:
+            self._emit(event, data, to=to)
+        except Exception as e:
+            ColorLogger.error(f"推送 {event} 到 {to} 失败: {e}", 'LiveMetrics')
+
+    # ==================== 订阅管理 ====================
+
+    def subscribe(self, sid: str, room: str) -> None:
+        """
+        登记订阅，并向新订阅者发送当前完整状态
+
+        Args:
+            sid: Socket.IO 会话 ID
+            room: 房间名（已由调用方 join_room）
+        """
+        with self._lock:
+            rooms = self._sid_rooms.setdefault(sid, set())
+            if room in rooms:
+                return
+            rooms.add(room)
+            self._room_counts[room] = self._room_counts.get(room, 0) + 1
+            self.last_activity = time.time()
+            snapshot = self._snapshot(room)
+        self.demand_changed.set()
+
+        if snapshot is not None:
+            self._send(*snapshot, to=sid)
+
+    def unsubscribe(self, sid: str, room: str) -> None:
+        """取消订阅"""
+        with self._lock:
+            rooms = self._sid_rooms.get(sid)
+            if not rooms or room not in rooms:
+                return
+            rooms.discard(room)
+            if not rooms:
+                del self._sid_rooms[sid]
+            self._release(room)
+
+    def disconnect(self, sid: str) -> None:
+        """连接断开时释放该会话的所有订阅"""
+        with self._lock:
+            for room in self._sid_rooms.pop(sid, ()):
+                self._release(room)
+
+    def _release(self, room: str) -> None:
+        """订阅计数减一（调用方持有锁）"""
+        count = self._room_counts.get(room, 0) - 1
+        if count > 0:
+            self._room_counts[room] = count
+        else:
+            self._room_counts.pop(room, None)
+        self.last_activity = time.time()
+
+    def subscriber_count(self, room: Optional[str] = None) -> int:
+        """房间的订阅数，room 为空时返回所有房间的订阅总数"""
+        with self._lock:
+            if room is not None:
+                return self._room_counts.get(room, 0)
+            return sum(self._room_counts.values())
+
+    def has_subscribers(self) -> bool:
+        """是否有任何订阅"""
+        return bool(self._room_counts)
+
+    def watched_clients(self) -> Set[int]:
+        """被单独订阅的客户端 ID"""
+        with self._lock:
+            return {client_id for client_id in map(parse_room, self._room_counts) if client_id is not None}
+
+    # ==================== 发布 ====================
+
+    def publish(self, client_id: int, sample: Dict) -> None:
+        """
+        提交客户端的最新样本（同一轮内多次提交只保留最后一次）
+
+        Args:
+            client_id: 客户端 ID
+            sample: 采集器样本，需包含 ts 和 FRAME_FIELDS
+        """
+        frame = {field: sample.get(field) for field in FRAME_FIELDS}
+        frame['ts'] = sample['ts']
+        with self._lock:
+            self._pending[client_id] = frame
+
+    def remove_client(self, client_id: int) -> None:
+        """移除已删除或已禁用的客户端"""
+        with self._lock:
+            self._pending.pop(client_id, None)
+            self._latest.pop(client_id, None)
+
+    def flush_tick(self) -> int:
+        """
+        发送本轮合并后的差分帧
+
+        Returns:
+            发送的帧数
+        """
+        frames: List[Tuple[str, Dict, str]] = []
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            for client_id, frame in pending.items():
+                previous = self._latest.get(client_id, {})
+                self._latest[client_id] = frame
+                room = client_room(client_id)
+                if not self._room_counts.get(room):
+                    continue
+                delta = diff_frame(previous, frame, FRAME_FIELDS)
+                if delta:
+                    frames.append(('metrics', {'id': client_id, 'ts': frame['ts'], **delta}, room))
+
+            if self._room_counts.get(FLEET_ROOM) and pending:
+                summary = self._fleet_summary()
+                delta = diff_frame(self._fleet_latest, summary, summary.keys())
+                self._fleet_latest = summary
+                if delta:
+                    frames.append(('fleet', {'ts': int(time.time()), **delta}, FLEET_ROOM))
+
+        for event, data, room in frames:
+            self._send(event, data, to=room)
+        return len(frames)
+
+    def _fleet_summary(self) -> Dict:
+        """计算全局汇总（调用方持有锁）"""
+        summary = {
+            'clients': len(self._latest),
+            'running': 0,
+            'connections_active': 0,
+            'rate_in': 0,
+            'rate_out': 0,
+        }
+        for frame in self._latest.values():
+            if frame['status'] == 'running':
+                summary['running'] += 1
+            summary['connections_active'] += frame['connections_active'] or 0
+            summary['rate_in'] += frame['rate_in'] or 0
+            summary['rate_out'] += frame['rate_out'] or 0
+        return summary
+
+    def _snapshot(self, room: str) -> Optional[Tuple[str, Dict]]:
+        """房间的完整状态帧（调用方持有锁）"""
+        if room == FLEET_ROOM:
+            self._fleet_latest = self._fleet_summary()
+            return 'fleet', {'ts': int(time.time()), 'full': True, **self._fleet_latest}
+
+        client_id = parse_room(room)
+        frame = self._latest.get(client_id)
+        if frame is None:
+            return None
+        return 'metrics', {'id': client_id, 'full': True, **frame}
+
+
+# 全局发布器实例，由 app.py 设置发送函数
+publisher = LiveMetricsPublisher()
+# 多进程部署时订阅在接受连接的进程中发生，转发到运行采集器的进程登记
+relay.register('live_metrics', publisher, 'subscribe', 'unsubscribe', 'disconnect')
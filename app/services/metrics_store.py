@@ -0,0 +1,516 @@
+"""
+监控指标存储模块
+按客户端每 METRICS_BLOCK_SECONDS 秒一个块存储采集样本
+
+块内样本按列组织：每列做差分编码后打包为 64 位整数数组，再整体 zlib 压缩。
+时间戳使用整数秒（epoch），过期数据按块整行删除。
+
+写入原始块的同时维护 1 分钟和 1 小时两级汇总（速率和连接数的 min/max/avg/last），
+查询时按 max_points 选择合适的精度，必要时再按需重新分桶（安装 NumPy 时使用向量化计算）。
+"""
+import sys
+import threading
+import time
+import zlib
+from array import array
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import Config
+from models.database import get_db_connection
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖，缺失时使用纯 Python 分桶
+    np = None
+
+
+# 块内保存的列，ts 相对块起始时间做差分
+FIELDS: Tuple[str, ...] = (
+    'ts',
+    'traffic_in',
+    'traffic_out',
+    'connections_active',
+    'connections_total',
+    'rate_in',
+    'rate_out',
+)
+
+# 汇总的指标及汇总桶的列（samples 为桶内样本数，avg 按样本数加权）
+SUMMARY_METRICS: Tuple[str, ...] = ('rate_in', 'rate_out', 'connections_active')
+ROLLUP_FIELDS: Tuple[str, ...] = ('ts', 'samples') + tuple(
+    f'{metric}_{stat}' for metric in SUMMARY_METRICS for stat in ('min', 'max', 'avg', 'last')
+) + ('traffic_in_last', 'traffic_out_last')
+
+# 汇总精度（秒） -> 每行保存的时间跨度（秒）
+ROLLUP_PERIODS: Dict[int, int] = {60: 3600, 3600: 86400}
+
+
+def encode_block(block_ts: int, samples: List[Dict], fields: Tuple[str, ...] = FIELDS) -> bytes:
+    """
+    编码一个块的样本
+
+    Args:
+        block_ts: 块起始时间戳
+        samples: 按时间升序排列的样本
+        fields: 块内保存的列
+
+    Returns:
+        压缩后的块数据
+    """
+    values = array('q')
+    for field in fields:
+        previous = block_ts if field == 'ts' else 0
+        for sample in samples:
+            value = int(sample[field])
+            values.append(value - previous)
+            previous = value
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return zlib.compress(values.tobytes())
+
+
+def decode_block(block_ts: int, count: int, data: bytes, fields: Tuple[str, ...] = FIELDS) -> List[Dict]:
+    """
+    解码一个块的样本
+
+    Args:
+        block_ts: 块起始时间戳
+        count: 样本数量
+        data: encode_block 生成的块数据
+        fields: 块内保存的列
+
+    Returns:
+        样本列表
+    """
+    values = array('q')
+    values.frombytes(zlib.decompress(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+
+    columns = []
+    for index, field in enumerate(fields):
+        deltas = values[index * count:(index + 1) * count]
+        columns.append(list(accumulate(deltas, initial=block_ts if field == 'ts' else 0))[1:])
+    return [dict(zip(fields, row)) for row in zip(*columns)]
+
+
+def sample_bucket(sample: Dict) -> Dict:
+    """将单个原始样本转换为汇总桶格式"""
+    bucket = {'ts': sample['ts'], 'samples': 1}
+    for metric in SUMMARY_METRICS:
+        value = sample[metric]
+        bucket[f'{metric}_min'] = value
+        bucket[f'{metric}_max'] = value
+        bucket[f'{metric}_avg'] = value
+        bucket[f'{metric}_last'] = value
+    bucket['traffic_in_last'] = sample['traffic_in']
+    bucket['traffic_out_last'] = sample['traffic_out']
+    return bucket
+
+
+def combine_buckets(earlier: Dict, later: Dict) -> Dict:
+    """合并两个汇总桶（later 的数据时间更晚），结果沿用 earlier 的时间戳"""
+    total = earlier['samples'] + later['samples']
+    bucket = {'ts': earlier['ts'], 'samples': total}
+    for metric in SUMMARY_METRICS:
+        bucket[f'{metric}_min'] = min(earlier[f'{metric}_min'], later[f'{metric}_min'])
+        bucket[f'{metric}_max'] = max(earlier[f'{metric}_max'], later[f'{metric}_max'])
+        bucket[f'{metric}_avg'] = round(
+            (earlier[f'{metric}_avg'] * earlier['samples'] + later[f'{metric}_avg'] * later['samples']) / total
+        )
+        bucket[f'{metric}_last'] = later[f'{metric}_last']
+    bucket['traffic_in_last'] = later['traffic_in_last']
+    bucket['traffic_out_last'] = later['traffic_out_last']
+    return bucket
+
+
+def _rebucket_python(buckets: List[Dict], start: int, width: int) -> List[Dict]:
+    """纯 Python 分桶（每组只在最后做一次取整，与 NumPy 结果一致）"""
+    groups: List[Tuple[int, List[Dict]]] = []
+    for bucket in buckets:
+        index = (bucket['ts'] - start) // width
+        if not groups or groups[-1][0] != index:
+            groups.append((index, []))
+        groups[-1][1].append(bucket)
+
+    result = []
+    for index, group in groups:
+        total = sum(b['samples'] for b in group)
+        merged = {'ts': start + index * width, 'samples': total}
+        for metric in SUMMARY_METRICS:
+            merged[f'{metric}_min'] = min(b[f'{metric}_min'] for b in group)
+            merged[f'{metric}_max'] = max(b[f'{metric}_max'] for b in group)
+            merged[f'{metric}_avg'] = round(sum(b[f'{metric}_avg'] * b['samples'] for b in group) / total)
+            merged[f'{metric}_last'] = group[-1][f'{metric}_last']
+        merged['traffic_in_last'] = group[-1]['traffic_in_last']
+        merged['traffic_out_last'] = group[-1]['traffic_out_last']
+        result.append(merged)
+    return result
+
+
+def _rebucket_numpy(buckets: List[Dict], start: int, width: int) -> List[Dict]:
+    """NumPy 向量化分桶：按桶边界用 reduceat 一次计算每列的聚合值"""
+    columns = {field: np.fromiter((b[field] for b in buckets), dtype=np.int64, count=len(buckets))
+               for field in ROLLUP_FIELDS}
+    index = (columns['ts'] - start) // width
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    weights = columns['samples']
+    totals = np.add.reduceat(weights, starts)
+    result = {'ts': start + index[starts] * width, 'samples': totals}
+    for metric in SUMMARY_METRICS:
+        result[f'{metric}_min'] = np.minimum.reduceat(columns[f'{metric}_min'], starts)
+        result[f'{metric}_max'] = np.maximum.reduceat(columns[f'{metric}_max'], starts)
+        weighted = np.add.reduceat(columns[f'{metric}_avg'] * weights, starts)
+        result[f'{metric}_avg'] = np.rint(weighted / totals).astype(np.int64)
+        result[f'{metric}_last'] = columns[f'{metric}_last'][ends]
+    result['traffic_in_last'] = columns['traffic_in_last'][ends]
+    result['traffic_out_last'] = columns['traffic_out_last'][ends]
+
+    lists = [result[field].tolist() for field in ROLLUP_FIELDS]
+    return [dict(zip(ROLLUP_FIELDS, row)) for row in zip(*lists)]
+
+
+def rebucket(buckets: List[Dict], start: int, width: int) -> List[Dict]:
+    """
+    将按时间升序排列的汇总桶重新合并为 width 秒宽的桶
+
+    Args:
+        buckets: 汇总桶列表
+        start: 分桶起点（桶边界为 start + n * width）
+        width: 桶宽度（秒）
+
+    Returns:
+        合并后的汇总桶
+    """
+    if not buckets:
+        return []
+    if np is not None:
+        return _rebucket_numpy(buckets, start, width)
+    return _rebucket_python(buckets, start, width)
+
+
+def summarize(samples: Iterable[Dict], resolution: int) -> List[Dict]:
+    """
+    按精度汇总原始样本
+
+    Args:
+        samples: 按时间升序排列的原始样本
+        resolution: 汇总精度（秒）
+
+    Returns:
+        汇总桶列表，桶时间戳对齐到 resolution
+    """
+    return _rebucket_python([sample_bucket(sample) for sample in samples], 0, resolution)
+
+
+def merge_bucket_lists(existing: List[Dict], new: List[Dict]) -> List[Dict]:
+    """按时间戳合并两组汇总桶，同一时间的桶合并统计值（new 的数据更晚）"""
+    merged = {bucket['ts']: bucket for bucket in existing}
+    for bucket in new:
+        previous = merged.get(bucket['ts'])
+        merged[bucket['ts']] = combine_buckets(previous, bucket) if previous else bucket
+    return [merged[ts] for ts in sorted(merged)]
+
+
+class MetricsStore:
+    """
+    监控指标存储
+
+    每个客户端保留一个内存中的当前块；时间进入下一个块后，旧块转入待写入队列，
+    由 flush() 批量写入数据库。查询时合并数据库中的块和内存中尚未写入的块。
+    """
+
+    def __init__(self, block_seconds: Optional[int] = None):
+        self.block_seconds = block_seconds or Config.METRICS_BLOCK_SECONDS
+        self._open: Dict[int, Tuple[int, List[Dict]]] = {}
+        self._pending: Dict[Tuple[int, int], List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def block_start(self, ts: int) -> int:
+        """计算时间戳所在块的起始时间"""
+        return ts - ts % self.block_seconds
+
+    def append(self, client_id: int, sample: Dict) -> None:
+        """
+        追加一个样本
+
+        Args:
+            client_id: 客户端 ID
+            sample: 包含 FIELDS 中所有字段的样本，ts 为整数秒
+        """
+        block_ts = self.block_start(sample['ts'])
+        row = {field: int(sample[field]) for field in FIELDS}
+        with self._lock:
+            current = self._open.get(client_id)
+            if current is not None and current[0] == block_ts:
+                current[1].append(row)
+                return
+            if current is not None:
+                self._pending[(client_id, current[0])] = current[1]
+            self._open[client_id] = (block_ts, [row])
+
+    def flush(self, include_open: bool = False) -> int:
+        """
+        将已结束的块批量写入数据库
+
+        同一块在数据库中已存在（例如采集器重启后继续写入同一分钟）时合并样本。
+        新样本同时合并进 1 分钟和 1 小时汇总，与原始块在同一事务中提交。
+
+        Args:
+            include_open: 是否同时写入当前未结束的块（停止采集时使用）
+
+        Returns:
+            写入的块数量
+        """
+        with self._lock:
+            blocks = self._pending
+            self._pending = {}
+            if include_open:
+                for client_id, (block_ts, samples) in self._open.items():
+                    blocks[(client_id, block_ts)] = samples
+                self._open = {}
+        if not blocks:
+            return 0
+
+        conn = get_db_connection()
+        try:
+            rows = []
+            new_samples: Dict[int, List[Dict]] = {}
+            for (client_id, block_ts), samples in blocks.items():
+                new_samples.setdefault(client_id, []).extend(samples)
+                existing = conn.execute(
+                    'SELECT count, data FROM metric_blocks WHERE client_id = ? AND block_ts = ?',
+                    (client_id, block_ts)
+                ).fetchone()
+                if existing is not None:
+                    merged = {s['ts']: s for s in decode_block(block_ts, existing['count'], existing['data'])}
+                    merged.update((s['ts'], s) for s in samples)
+                    samples = [merged[ts] for ts in sorted(merged)]
+                rows.append((client_id, block_ts, len(samples), encode_block(block_ts, samples)))
+
+            conn.executemany(
+                'INSERT OR REPLACE INTO metric_blocks (client_id, block_ts, count, data) VALUES (?, ?, ?, ?)',
+                rows
+            )
+
+            for client_id, samples in new_samples.items():
+                samples.sort(key=lambda sample: sample['ts'])
+                buckets = summarize(samples, 60)
+                for resolution in ROLLUP_PERIODS:
+                    if resolution != 60:
+                        buckets = rebucket(buckets, 0, resolution)
+                    self._merge_rollups(conn, client_id, resolution, buckets)
+
+            conn.commit()
+        except Exception:
+            # 写入失败时放回待写入队列，下次 flush 重试
+            with self._lock:
+                for key, samples in blocks.items():
+                    self._pending.setdefault(key, samples)
+            raise
+        finally:
+            conn.close()
+        return len(rows)
+
+    @staticmethod
+    def _merge_rollups(conn, client_id: int, resolution: int, buckets: List[Dict]) -> None:
+        """将汇总桶合并进对应时间段的汇总行"""
+        period = ROLLUP_PERIODS[resolution]
+        by_period: Dict[int, List[Dict]] = {}
+        for bucket in buckets:
+            by_period.setdefault(bucket['ts'] - bucket['ts'] % period, []).append(bucket)
+
+        for period_ts, period_buckets in by_period.items():
+            existing = conn.execute('''
+                SELECT count, data FROM metric_rollups
+                WHERE client_id = ? AND resolution = ? AND period_ts = ?
+            ''', (client_id, resolution, period_ts)).fetchone()
+            if existing is not None:
+                period_buckets = merge_bucket_lists(
+                    decode_block(period_ts, existing['count'], existing['data'], ROLLUP_FIELDS),
+                    period_buckets
+                )
+            conn.execute('''
+                INSERT OR REPLACE INTO metric_rollups (client_id, resolution, period_ts, count, data)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (client_id, resolution, period_ts, len(period_buckets),
+                  encode_block(period_ts, period_buckets, ROLLUP_FIELDS)))
+
+    def _unflushed(self, client_id: int) -> Dict[int, List[Dict]]:
+        """获取客户端尚未写入数据库的样本（块起始时间 -> 样本）"""
+        blocks: Dict[int, List[Dict]] = {}
+        with self._lock:
+            for (pending_client, block_ts), samples in self._pending.items():
+                if pending_client == client_id:
+                    blocks[block_ts] = list(samples)
+            current = self._open.get(client_id)
+            if current is not None:
+                blocks[current[0]] = blocks.get(current[0], []) + list(current[1])
+        return blocks
+
+    def query(self, client_id: int, since: int, until: Optional[int] = None) -> List[Dict]:
+        """
+        查询时间范围内的样本
+
+        Args:
+            client_id: 客户端 ID
+            since: 起始时间戳（不含）
+            until: 结束时间戳（含），默认为当前时间
+
+        Returns:
+            按时间升序排列的样本
+        """
+        if until is None:
+            until = int(time.time())
+
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('''
+                SELECT block_ts, count, data FROM metric_blocks
+                WHERE client_id = ? AND block_ts >= ? AND block_ts <= ?
+                ORDER BY block_ts
+            ''', (client_id, self.block_start(since), until)).fetchall()
+        finally:
+            conn.close()
+
+        blocks = {row['block_ts']: decode_block(row['block_ts'], row['count'], row['data']) for row in rows}
+        for block_ts, samples in self._unflushed(client_id).items():
+            blocks[block_ts] = blocks.get(block_ts, []) + samples
+
+        merged: Dict[int, Dict] = {}
+        for block_ts in sorted(blocks):
+            for sample in blocks[block_ts]:
+                if since < sample['ts'] <= until:
+                    merged[sample['ts']] = sample
+        return [merged[ts] for ts in sorted(merged)]
+
+    def query_rollups(self, client_id: int, resolution: int, since: int, until: Optional[int] = None) -> List[Dict]:
+        """
+        查询汇总桶（包含尚未写入数据库的样本）
+
+        Args:
+            client_id: 客户端 ID
+            resolution: 汇总精度（秒），必须是 ROLLUP_PERIODS 中的值
+            since: 起始时间戳（不含，与之相交的桶也会返回）
+            until: 结束时间戳（含），默认为当前时间
+
+        Returns:
+            按时间升序排列的汇总桶
+        """
+        if until is None:
+            until = int(time.time())
+        period = ROLLUP_PERIODS[resolution]
+
+        conn = get_db_connection()
+        try:
+            rows = conn.execute('''
+                SELECT period_ts, count, data FROM metric_rollups
+                WHERE client_id = ? AND resolution = ? AND period_ts >= ? AND period_ts <= ?
+                ORDER BY period_ts
+            ''', (client_id, resolution, since - since % period, until)).fetchall()
+        finally:
+            conn.close()
+
+        buckets: List[Dict] = []
+        for row in rows:
+            buckets.extend(decode_block(row['period_ts'], row['count'], row['data'], ROLLUP_FIELDS))
+
+        unflushed = [sample for _, samples in sorted(self._unflushed(client_id).items()) for sample in samples]
+        if unflushed:
+            buckets = merge_bucket_lists(buckets, summarize(unflushed, resolution))
+
+        return [bucket for bucket in buckets if since - resolution < bucket['ts'] <= until]
+
+    def query_series(self, client_id: int, since: int, until: Optional[int] = None,
+                     max_points: int = 500) -> Dict:
+        """
+        查询适合绘图的时间序列，点数不超过 max_points
+
+        目标桶宽度为 跨度 / max_points，在原始样本、1 分钟汇总和 1 小时汇总中选用
+        不超过目标宽度且数据仍在保留期内的最粗精度，读出后按目标宽度重新分桶。
+
+        Args:
+            client_id: 客户端 ID
+            since: 起始时间戳（不含）
+            until: 结束时间戳（含），默认为当前时间
+            max_points: 最大点数
+
+        Returns:
+            {'resolution': 桶宽度（秒，原始样本为 0）, 'points': 汇总桶列表}
+        """
+        now = int(time.time())
+        if until is None:
+            until = now
+        max_points = max(1, max_points)
+        span = max(1, until - since)
+
+        # 目标桶宽度；选用不超过该宽度的最粗精度（采样间隔不小于 1 秒，原始样本视为 1 秒精度）
+        width = -(-span // max_points)
+        tiers = [0] + sorted(ROLLUP_PERIODS)
+        available = [r for r in tiers if since >= now - self._retention_days(r) * 86400] or tiers[-1:]
+        fitting = [r for r in available if r <= width]
+        resolution = fitting[-1] if fitting else available[0]
+
+        if resolution:
+            points = self.query_rollups(client_id, resolution, since, until)
+        else:
+            points = [sample_bucket(sample) for sample in self.query(client_id, since, until)]
+
+        if len(points) > max_points:
+            if resolution:
+                width = -(-width // resolution) * resolution
+            points = rebucket(points, since - since % width, width)
+            resolution = width
+
+        return {'resolution': resolution, 'points': points}
+
+    @staticmethod
+    def _retention_days(resolution: int) -> int:
+        """各精度数据的保留天数（0 表示原始样本）"""
+        if resolution >= 3600:
+            return Config.METRICS_HOUR_RETENTION_DAYS
+        if resolution >= 60:
+            return Config.METRICS_MINUTE_RETENTION_DAYS
+        return Config.METRICS_RETENTION_DAYS
+
+    def drop_expired(self, now: Optional[int] = None) -> int:
+        """
+        删除超出保留期的原始块和汇总行（按时间索引整行删除）
+
+        Args:
+            now: 当前时间戳
+
+        Returns:
+            删除的行数
+        """
+        if now is None:
+            now = int(time.time())
+        cutoff = self.block_start(now - Config.METRICS_RETENTION_DAYS * 86400)
+
+        conn = get_db_connection()
+        try:
+            deleted = conn.execute('DELETE FROM metric_blocks WHERE block_ts < ?', (cutoff,)).rowcount
+            for resolution, period in ROLLUP_PERIODS.items():
+                rollup_cutoff = now - self._retention_days(resolution) * 86400
+                deleted += conn.execute(
+                    'DELETE FROM metric_rollups WHERE resolution = ? AND period_ts < ?',
+                    (resolution, rollup_cutoff - rollup_cutoff % period)
+                ).rowcount
+            conn.commit()
+            return deleted
+        finally:
+            conn.close()
+
+    def close_client(self, client_id: int) -> None:
+        """结束客户端的当前块（客户端被删除或禁用后不再有新样本）"""
+        with self._lock:
+            current = self._open.pop(client_id, None)
+            if current is not None:
+                self._pending[(client_id, current[0])] = current[1]
+
+
+# 采集器使用的全局存储实例
+metrics_store = MetricsStore()
@@ -0,0 +1,251 @@
+"""
+配置拉取记录模块
+记录每个客户端最近一次拉取配置的时间、来源 IP、返回的版本和拉取频率
+
+拉取接口只更新内存中的记录，后台线程每 PULL_FLUSH_INTERVAL 秒把有变化的记录
+在一个事务中批量写入 client_pulls 表，拉取请求本身不执行写事务。
+"""
+import atexit
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import Config
+from utils.instrumentation import registry
+from utils.logger import ColorLogger
+from utils.message_queue import relay
+from models.database import get_db_connection
+from services.alert_rules import rules_engine
+
+
+# 拉取间隔平滑系数（指数移动平均）
+INTERVAL_SMOOTHING = 0.2
+
+
+def effective_version(version: Optional[int], template_version: Optional[int] = None) -> Optional[int]:
+    """
+    导出配置的有效版本
+
+    模板客户端的配置还随模板内容变化，有效版本为客户端版本与模板版本之和（两者都只增不减）。
+    """
+    if version is None:
+        return None
+    return version + (template_version or 0)
+
+
+class PullTracker:
+    """配置拉取记录"""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._records: Dict[int, Dict] = {}
+        self._dirty = set()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def _ensure_loaded(self) -> None:
+        """首次使用时从 client_pulls 表加载记录"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            conn = get_db_connection()
+            try:
+                rows = conn.execute('SELECT * FROM client_pulls').fetchall()
+            finally:
+                conn.close()
+            with self._lock:
+                for row in rows:
+                    # 加载前已记录的拉取更新，保留内存中的值
+                    self._records.setdefault(row['client_id'], {
+                        'last_pull_at': row['last_pull_at'],
+                        'last_ip': row['last_ip'],
+                        'last_version': row['last_version'],
+                        'pull_count': row['pull_count'],
+                        'avg_interval': row['avg_interval'],
+                    })
+            self._loaded = True
+
+    def record(self, client_id: int, ip: Optional[str], version: Optional[int]) -> None:
+        """
+        记录一次拉取（只更新内存）
+
+        Args:
+            client_id: 客户端 ID
+            ip: 来源 IP
+            version: 返回的配置版本
+        """
+        self._ensure_loaded()
+        self._ensure_flusher()
+        now = self._clock()
+        with self._lock:
+            record = self._records.get(client_id)
+            if record is None:
+                record = self._records[client_id] = {
+                    'last_pull_at': None, 'last_ip': None, 'last_version': None,
+                    'pull_count': 0, 'avg_interval': None,
+                }
+            if record['last_pull_at'] is not None:
+                interval = max(0.0, now - record['last_pull_at'])
+                previous = record['avg_interval']
+                record['avg_interval'] = interval if previous is None else \
+                    previous + INTERVAL_SMOOTHING * (interval - previous)
+            record['last_pull_at'] = now
+            record['last_ip'] = ip
+            record['last_version'] = version
+            record['pull_count'] += 1
+            self._dirty.add(client_id)
+        rules_engine.observe('pull', client_id, {'version': version})
+
+    def flush(self) -> int:
+        """
+        写入有变化的记录
+
+        Returns:
+            写入的记录数
+        """
+        with self._lock:
+            if not self._dirty:
+                return 0
+            rows = [
+                (client_id, int(record['last_pull_at']), record['last_ip'], record['last_version'],
+                 record['pull_count'], record['avg_interval'])
+                for client_id, record in ((cid, self._records[cid]) for cid in self._dirty)
+            ]
+            dirty = self._dirty
+            self._dirty = set()
+
+        conn = get_db_connection()
+        try:
+            conn.executemany('''
+                INSERT INTO client_pulls (client_id, last_pull_at, last_ip, last_version, pull_count, avg_interval)
+                SELECT ?, ?, ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM clients WHERE id = ?1)
+                ON CONFLICT(client_id) DO UPDATE SET
+                    last_pull_at = excluded.last_pull_at, last_ip = excluded.last_ip,
+                    last_version = excluded.last_version, pull_count = excluded.pull_count,
+                    avg_interval = excluded.avg_interval
+            ''', rows)
+            conn.commit()
+        except Exception as e:
+            # 写入失败时保留待写入标记，下次重试
+            with self._lock:
+                self._dirty |= dirty
+            ColorLogger.error(f"保存配置拉取记录失败: {e}", 'PullTracker')
+            return 0
+        finally:
+            conn.close()
+        return len(rows)
+
+    def forget(self, client_id: int) -> None:
+        """移除已删除客户端的记录"""
+        with self._lock:
+            self._records.pop(client_id, None)
+            self._dirty.discard(client_id)
+
+    def get(self, client_id: int) -> Optional[Dict]:
+        """单个客户端的拉取摘要，没有拉取记录时返回 None"""
+        self._ensure_loaded()
+        with self._lock:
+            record = self._records.get(client_id)
+            return self._summary(record, self._clock()) if record else None
+
+    def get_all(self) -> Dict[int, Dict]:
+        """所有客户端的拉取摘要"""
+        self._ensure_loaded()
+        now = self._clock()
+        with self._lock:
+            return {client_id: self._summary(record, now) for client_id, record in self._records.items()}
+
+    @staticmethod
+    def _summary(record: Dict, now: float) -> Dict:
+        """拉取摘要：拉取频率按平均间隔换算为每小时次数"""
+        avg_interval = record['avg_interval']
+        return {
+            'last_pull_at': int(record['last_pull_at']),
+            'last_pull_ip': record['last_ip'],
+            'last_pull_version': record['last_version'],
+            'pull_count': record['pull_count'],
+            'pulls_per_hour': round(3600 / avg_interval, 2) if avg_interval else None,
+            'pull_stale': now - record['last_pull_at'] > Config.PULL_STALE_SECONDS,
+        }
+
+    def annotate(self, clients: List[Dict], summaries: Optional[Dict] = None) -> List[Dict]:
+        """
+        为客户端列表补充拉取摘要
+
+        从未拉取过的客户端字段为空，pull_stale 为 False；config_outdated 表示节点拉取到的版本落后于
+        当前配置的有效版本（effective_version，与导出接口记录的版本相同）。
+
+        Args:
+            clients: 客户端列表（模板客户端需包含 template_version）
+            summaries: get_all() 的结果（可由其他进程返回，键为字符串），为空时读取本进程的记录
+        """
+        if summaries is None:
+            summaries = self.get_all()
+        summaries = {int(client_id): summary for client_id, summary in summaries.items()}
+        for client in clients:
+            summary = summaries.get(client['id'])
+            if summary is None:
+                client.update({
+                    'last_pull_at': None, 'last_pull_ip': None, 'last_pull_version': None,
+                    'pull_count': 0, 'pulls_per_hour': None, 'pull_stale': False, 'config_outdated': False,
+                })
+            else:
+                client.update(summary)
+                version = effective_version(client.get('version'), client.get('template_version'))
+                client['config_outdated'] = (
+                    version is not None and summary['last_pull_version'] is not None
+                    and summary['last_pull_version'] < version
+                )
+        return clients
+
+    # ==================== 后台写入 ====================
+
+    def _ensure_flusher(self) -> None:
+        """首次记录时启动后台写入线程"""
+        if self._thread is not None:
+            return
+        with self._load_lock:
+            if self._thread is not None:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._flush_loop, name='pull-tracker', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _flush_loop(self) -> None:
+        while not self._stop_event.wait(Config.PULL_FLUSH_INTERVAL):
+            self.flush()
+
+    def stop(self) -> None:
+        """停止后台线程并写入剩余记录"""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self._thread = None
+        self.flush()
+
+
+def _pull_metrics():
+    """配置拉取的运行指标"""
+    now = time.time()
+    with pull_tracker._lock:
+        records = [(client_id, record['last_pull_at'], record['pull_count'])
+                   for client_id, record in pull_tracker._records.items()]
+    return [
+        ('frp_console_config_pulls', 'counter', 'Config pulls per client',
+         [({'client_id': str(client_id)}, count) for client_id, _, count in records]),
+        ('frp_console_config_pull_age_seconds', 'gauge', 'Seconds since the last config pull',
+         [({'client_id': str(client_id)}, round(now - last_pull_at, 1)) for client_id, last_pull_at, _ in records]),
+    ]
+
+
+# 全局拉取记录实例
+pull_tracker = PullTracker()
+registry.register_collector(_pull_metrics)
+relay.register('pull_tracker', pull_tracker, 'record', 'forget', 'get_all')
@@ -0,0 +1,224 @@
+"""
+配置修订历史服务模块
+以差异形式保存客户端配置的每个版本，支持查看、对比和回滚
+"""
+import difflib
+import json
+from typing import Dict, List, Optional, Tuple
+
+from flask import has_request_context, session
+
+from config import Config
+from models.database import get_db
+
+
+def make_delta(old: str, new: str) -> List:
+    """
+    计算从 old 到 new 的行级差异
+
+    差异格式为操作列表：
+        正整数 n   - 从旧内容复制 n 行
+        负整数 -n  - 跳过旧内容 n 行
+        字符串列表 - 插入这些行
+
+    Args:
+        old: 前一版本内容
+        new: 新版本内容
+
+    Returns:
+        差异操作列表
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops: List = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(new_lines[j1:j2])
+    return ops
+
+
+def apply_delta(old: str, ops: List) -> str:
+    """
+    将差异应用到前一版本内容
+
+    Args:
+        old: 前一版本内容
+        ops: make_delta 生成的差异操作列表
+
+    Returns:
+        新版本内容
+    """
+    old_lines = old.splitlines(keepends=True)
+    result: List[str] = []
+    pos = 0
+    for op in ops:
+        if isinstance(op, list):
+            result.extend(op)
+        elif op > 0:
+            result.extend(old_lines[pos:pos + op])
+            pos += op
+        else:
+            pos -= op
+    return ''.join(result)
+
+
+class ConfigRevisionService:
+    """配置修订历史服务类"""
+
+    @staticmethod
+    def _latest_revision(client_id: int) -> int:
+        """获取客户端最新修订号，没有历史时返回 0"""
+        db = get_db()
+        row = db.execute(
+            'SELECT MAX(revision) AS revision FROM client_config_revisions WHERE client_id = ?',
+            (client_id,)
+        ).fetchone()
+        return row['revision'] or 0
+
+    @staticmethod
+    def record_revision(client_id: int, content: str) -> int:
+        """
+        记录新的配置版本（不提交事务，由调用方与配置更新一起提交）
+
+        每隔 CONFIG_REVISION_SNAPSHOT_INTERVAL 个版本保存一次完整快照，
+        其余版本保存相对前一版本的差异；差异不比全文小时也直接存快照。
+
+        Args:
+            client_id: 客户端 ID
+            content: 新配置内容
+
+        Returns:
+            新修订号
+        """
+        db = get_db()
+        previous = ConfigRevisionService._latest_revision(client_id)
+        revision = previous + 1
+
+        is_snapshot = True
+        payload = content
+        if previous and (revision - 1) % Config.CONFIG_REVISION_SNAPSHOT_INTERVAL != 0:
+            previous_content = ConfigRevisionService.get_revision_content(client_id, previous)
+            if previous_content is not None:
+                delta = json.dumps(make_delta(previous_content, content), ensure_ascii=False, separators=(',', ':'))
+                if len(delta) < len(content):
+                    is_snapshot = False
+                    payload = delta
+
+        created_by = session.get('username') if has_request_context() else None
+        db.execute('''
+            INSERT INTO client_config_revisions (client_id, revision, is_snapshot, payload, content_size, created_by)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (client_id, revision, is_snapshot, payload, len(content), created_by))
+
+        ConfigRevisionService._prune(client_id, revision)
+        return revision
+
+    @staticmethod
+    def _prune(client_id: int, latest: int) -> None:
+        """超出保留数量时删除最旧的版本，并保证最旧的保留版本是完整快照"""
+        oldest_kept = latest - Config.CONFIG_REVISION_RETENTION + 1
+        if oldest_kept <= 1:
+            return
+
+        db = get_db()
+        row = db.execute(
+            'SELECT is_snapshot FROM client_config_revisions WHERE client_id = ? AND revision = ?',
+            (client_id, oldest_kept)
+        ).fetchone()
+        if row is None:
+            return
+
+        if not row['is_snapshot']:
+            content = ConfigRevisionService.get_revision_content(client_id, oldest_kept)
+            db.execute('''
+                UPDATE client_config_revisions SET is_snapshot = 1, payload = ?
+                WHERE client_id = ? AND revision = ?
+            ''', (content, client_id, oldest_kept))
+
+        db.execute(
+            'DELETE FROM client_config_revisions WHERE client_id = ? AND revision < ?',
+            (client_id, oldest_kept)
+        )
+
+    @staticmethod
+    def list_revisions(client_id: int) -> List[Dict]:
+        """
+        获取客户端的修订列表（不含内容）
+
+        Args:
+            client_id: 客户端 ID
+
+        Returns:
+            修订列表，最新在前
+        """
+        db = get_db()
+        rows = db.execute('''
+            SELECT revision, is_snapshot, content_size, LENGTH(payload) AS stored_size, created_by, created_at
+            FROM client_config_revisions
+            WHERE client_id = ?
+            ORDER BY revision DESC
+        ''', (client_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def get_revision_content(client_id: int, revision: int) -> Optional[str]:
+        """
+        重建指定版本的配置内容：从最近的快照开始依次应用差异
+
+        Args:
+            client_id: 客户端 ID
+            revision: 修订号
+
+        Returns:
+            配置内容，版本不存在则返回 None
+        """
+        db = get_db()
+        rows = db.execute('''
+            SELECT revision, is_snapshot, payload
+            FROM client_config_revisions
+            WHERE client_id = ? AND revision <= ? AND revision >= (
+                SELECT MAX(revision) FROM client_config_revisions
+                WHERE client_id = ? AND revision <= ? AND is_snapshot = 1
+            )
+            ORDER BY revision
+        ''', (client_id, revision, client_id, revision)).fetchall()
+
+        if not rows or rows[-1]['revision'] != revision:
+            return None
+
+        content = rows[0]['payload']
+        for row in rows[1:]:
+            content = apply_delta(content, json.loads(row['payload']))
+        return content
+
+    @staticmethod
+    def diff_revisions(client_id: int, from_revision: int, to_revision: int) -> Tuple[bool, Dict]:
+        """
+        对比两个版本，返回 unified diff
+
+        Args:
+            client_id: 客户端 ID
+            from_revision: 起始修订号
+            to_revision: 目标修订号
+
+        Returns:
+            (是否成功, 响应数据)
+        """
+        old = ConfigRevisionService.get_revision_content(client_id, from_revision)
+        new = ConfigRevisionService.get_revision_content(client_id, to_revision)
+        if old is None or new is None:
+            return False, {'error': '修订版本不存在'}
+
+        diff = difflib.unified_diff(
+            old.splitlines(keepends=True),
+            new.splitlines(keepends=True),
+            fromfile=f'r{from_revision}',
+            tofile=f'r{to_revision}'
+        )
+        return True, {'from': from_revision, 'to': to_revision, 'diff': ''.join(diff)}
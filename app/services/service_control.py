@@ -0,0 +1,214 @@
+"""
+frpc 服务控制模块
+systemctl start / stop / restart 作为后台任务执行，接口立即返回任务 ID，进度通过 Socket.IO 的 service_job 事件推送
+
+- 同一服务单元同一时间只运行一个任务，任务运行期间的其他操作请求被拒绝
+- systemctl 超过 SERVICE_ACTION_TIMEOUT 秒未结束时终止，任务标记为 timeout
+- start / restart 受重启频率限制（helpers.check_restart_limit），结果记入 record_restart
+"""
+import itertools
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+from utils.helpers import check_restart_limit, record_restart
+from utils.instrumentation import registry
+from utils.logger import ColorLogger
+from utils.message_queue import relay
+from services.service_status import service_status
+
+
+ACTIONS = ('start', 'stop', 'restart')
+# 受重启频率限制的操作
+LIMITED_ACTIONS = ('start', 'restart')
+ACTION_NAMES = {'start': '启动', 'stop': '停止', 'restart': '重启'}
+
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+STATUS_TIMEOUT = 'timeout'
+
+# submit() 被拒绝的原因
+REJECT_BUSY = 'busy'
+REJECT_LIMITED = 'limited'
+
+# 保留最近多少个任务供查询
+MAX_JOBS = 50
+
+ACTIONS_TOTAL = registry.counter(
+    'frp_console_service_actions',
+    'systemctl service actions by action and result',
+    ('action', 'result')
+)
+ACTION_SECONDS = registry.histogram(
+    'frp_console_service_action_seconds',
+    'systemctl service action duration by action',
+    ('action',),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+
+
+class ServiceControl:
+    """systemd 服务操作的后台任务"""
+
+    def __init__(self, emit: Optional[Callable] = None):
+        self._emit = emit
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._jobs: 'OrderedDict[int, Dict]' = OrderedDict()
+        # 服务单元 -> 正在运行的任务
+        self._running: Dict[str, Dict] = {}
+        self._threads: Dict[int, threading.Thread] = {}
+
+    def set_emitter(self, emit: Callable) -> None:
+        """设置发送函数（socketio.emit）"""
+        self._emit = emit
+
+    def _send(self, job: Dict) -> None:
+        """推送任务状态，推送失败不影响任务"""
+        if self._emit is None:
+            return
+        try:
+            self._emit('service_job', job)
+        except Exception as e:
+            ColorLogger.error(f"推送服务任务 {job['id']} 状态失败: {e}", 'Service')
+
+    def submit(self, action: str, force: bool = False) -> Tuple[bool, Dict]:
+        """
+        提交服务操作
+
+        Args:
+            action: start / stop / restart
+            force: 是否忽略重启频率限制
+
+        Returns:
+            (是否已提交, 任务状态)；被拒绝时返回 False 和 {'reason', 'error', 'job'}，
+            reason 为 busy（该服务单元已有任务在运行，job 为该任务）或 limited（重启过于频繁）
+        """
+        if action not in ACTIONS:
+            raise ValueError(f'不支持的操作: {action}')
+        unit = Config.FRPC_SERVICE_UNIT
+
+        with self._lock:
+            running = self._running.get(unit)
+            if running:
+                return False, {
+                    'reason': REJECT_BUSY,
+                    'error': f"{unit} 正在{ACTION_NAMES[running['action']]}，请等待当前任务结束",
+                    'job': dict(running),
+                }
+
+            if action in LIMITED_ACTIONS:
+                allowed, message = check_restart_limit(
+                    unit,
+                    max_restarts=Config.SERVICE_RESTART_LIMIT,
+                    window=Config.SERVICE_RESTART_WINDOW,
+                    cooldown=Config.SERVICE_RESTART_COOLDOWN,
+                    force=force
+                )
+                if not allowed:
+                    return False, {'reason': REJECT_LIMITED, 'error': message, 'job': None}
+
+            job = {
+                'id': next(self._ids),
+                'action': action,
+                'unit': unit,
+                'status': STATUS_RUNNING,
+                'started_at': int(time.time()),
+                'finished_at': None,
+                'duration': None,
+                'returncode': None,
+                'output': '',
+                'error': None,
+            }
+            self._running[unit] = job
+            self._jobs[job['id']] = job
+            while len(self._jobs) > MAX_JOBS:
+                self._jobs.popitem(last=False)
+            snapshot = dict(job)
+            thread = threading.Thread(target=self._run, args=(job,), name=f'service-{action}', daemon=True)
+            self._threads = {job_id: t for job_id, t in self._threads.items() if t.is_alive()}
+            self._threads[job['id']] = thread
+            thread.start()
+
+        ColorLogger.info(f"开始{ACTION_NAMES[action]} {unit} 服务（任务 {job['id']}）", 'Service')
+        self._send(snapshot)
+        return True, snapshot
+
+    def _run(self, job: Dict) -> None:
+        action, unit = job['action'], job['unit']
+        timeout = Config.SERVICE_ACTION_TIMEOUT
+        returncode, output, error = None, '', None
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(
+                [Config.SYSTEMCTL_PATH, action, unit],
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+            returncode = result.returncode
+            output = (result.stdout + result.stderr).strip()
+            if returncode == 0:
+                status = STATUS_SUCCEEDED
+            else:
+                status = STATUS_FAILED
+                error = result.stderr.strip() or f'systemctl 退出码 {returncode}'
+        except subprocess.TimeoutExpired:
+            status, error = STATUS_TIMEOUT, f'{timeout:g} 秒内未完成'
+        except Exception as e:
+            # systemctl 不存在或无法执行
+            status, error = STATUS_FAILED, str(e)
+        duration = time.perf_counter() - start
+
+        if action in LIMITED_ACTIONS:
+            record_restart(unit, success=status == STATUS_SUCCEEDED)
+        ACTIONS_TOTAL.labels(action, status).inc()
+        ACTION_SECONDS.labels(action).observe(duration)
+
+        with self._lock:
+            job.update({
+                'status': status,
+                'finished_at': int(time.time()),
+                'duration': round(duration, 3),
+                'returncode': returncode,
+                'output': output,
+                'error': error,
+            })
+            self._running.pop(unit, None)
+            snapshot = dict(job)
+
+        if status == STATUS_SUCCEEDED:
+            ColorLogger.success(f'{unit} 服务已{ACTION_NAMES[action]}', 'Service')
+        else:
+            ColorLogger.error(f'{ACTION_NAMES[action]} {unit} 服务失败: {error}', 'Service')
+        self._send(snapshot)
+        # 服务状态可能已变化，不等下一个检查周期
+        service_status.wake()
+
+    def get_job(self, job_id: int) -> Optional[Dict]:
+        """任务状态，不存在（或已被淘汰）时返回 None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        """最近的任务，最新的在前"""
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
+
+    def wait(self, job_id: int, timeout: Optional[float] = None) -> bool:
+        """等待任务结束，返回是否已结束"""
+        thread = self._threads.get(job_id)
+        if thread:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+
+# 全局服务控制实例
+service_control = ServiceControl()
+relay.register('service_control', service_control, 'submit', 'get_job', 'list_jobs')
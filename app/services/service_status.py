@@ -0,0 +1,201 @@
+"""
+frpc 服务状态模块
+后台线程每 SERVICE_STATUS_INTERVAL 秒用一次 `systemctl show` 读取所有受管服务单元的状态并缓存，
+状态接口直接返回缓存（附带检查时间），状态变化时通过 Socket.IO 的 service_status 事件推送
+
+服务操作任务结束后调用 wake() 立即刷新一次，不必等到下一个周期。
+"""
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+from utils.logger import ColorLogger
+from utils.message_queue import relay
+
+
+# 读取的属性（systemctl show --property）
+PROPERTIES = ('Id', 'LoadState', 'ActiveState', 'SubState', 'MainPID', 'ActiveEnterTimestamp')
+
+STATUS_RUNNING = 'running'
+STATUS_STOPPED = 'stopped'
+STATUS_UNKNOWN = 'unknown'
+
+
+def managed_units() -> List[str]:
+    """受管的服务单元"""
+    return [Config.FRPC_SERVICE_UNIT]
+
+
+def parse_show(output: str, units: List[str]) -> Dict[str, Dict]:
+    """
+    解析 systemctl show 的输出
+
+    多个服务单元的属性块以空行分隔，顺序与参数一致
+
+    Returns:
+        服务单元 -> 属性字典
+    """
+    blocks = [block for block in output.strip().split('\n\n') if block.strip()]
+    if len(blocks) != len(units):
+        raise ValueError(f'systemctl show 返回 {len(blocks)} 个单元，预期 {len(units)} 个')
+    result = {}
+    for unit, block in zip(units, blocks):
+        properties = {}
+        for line in block.splitlines():
+            key, sep, value = line.partition('=')
+            if sep:
+                properties[key] = value
+        result[unit] = properties
+    return result
+
+
+def unit_status(properties: Dict[str, str]) -> Dict:
+    """把 systemctl show 的属性转换为接口返回的状态"""
+    active_state = properties.get('ActiveState', '')
+    try:
+        main_pid = int(properties.get('MainPID') or 0)
+    except ValueError:
+        main_pid = 0
+    return {
+        'status': STATUS_RUNNING if active_state == 'active' else STATUS_STOPPED,
+        'active': active_state == 'active',
+        'load_state': properties.get('LoadState', ''),
+        'active_state': active_state,
+        'sub_state': properties.get('SubState', ''),
+        'main_pid': main_pid or None,
+        'since': properties.get('ActiveEnterTimestamp') or None,
+    }
+
+
+class ServiceStatusWatcher:
+    """服务单元状态缓存"""
+
+    def __init__(self, emit: Optional[Callable] = None):
+        self._emit = emit
+        self._lock = threading.Lock()
+        self._units: Dict[str, Dict] = {}
+        self._checked_at: Optional[float] = None
+        self._error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        # 第一次检查完成后设置
+        self._refreshed = threading.Event()
+
+    def set_emitter(self, emit: Callable) -> None:
+        """设置发送函数（socketio.emit）"""
+        self._emit = emit
+
+    def _send(self, status: Dict) -> None:
+        if self._emit is None:
+            return
+        try:
+            self._emit('service_status', status)
+        except Exception as e:
+            ColorLogger.error(f"推送 {status['unit']} 服务状态失败: {e}", 'Service')
+
+    def refresh(self) -> None:
+        """读取所有受管服务单元的状态（一次 systemctl 调用），推送发生变化的单元"""
+        units = managed_units()
+        try:
+            result = subprocess.run(
+                [Config.SYSTEMCTL_PATH, 'show', '--property=' + ','.join(PROPERTIES), *units],
+                capture_output=True,
+                text=True,
+                timeout=Config.SERVICE_STATUS_TIMEOUT
+            )
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or f'systemctl 退出码 {result.returncode}')
+            states = {unit: unit_status(properties) for unit, properties in parse_show(result.stdout, units).items()}
+            error = None
+        except Exception as e:
+            states = {unit: dict(unit_status({}), status=STATUS_UNKNOWN) for unit in units}
+            error = str(e) or e.__class__.__name__
+
+        now = time.time()
+        changed = []
+        with self._lock:
+            if error and error != self._error:
+                ColorLogger.error(f"读取服务状态失败: {error}", 'Service')
+            self._error = error
+            self._checked_at = now
+            for unit, state in states.items():
+                previous = self._units.get(unit)
+                state = {'unit': unit, **state, 'error': error}
+                self._units[unit] = state
+                if previous is None or any(previous.get(key) != state.get(key)
+                                           for key in ('status', 'active_state', 'sub_state', 'main_pid')):
+                    changed.append(dict(state, checked_at=now))
+        self._refreshed.set()
+        for state in changed:
+            self._send(state)
+
+    def get_status(self, unit: Optional[str] = None) -> Dict:
+        """
+        缓存的服务状态
+
+        后台线程运行时只读缓存，第一次检查尚未完成时等待其结果；后台线程未运行时（如开发模式下调用），
+        缓存缺失或超过一个周期才同步检查一次。
+
+        Returns:
+            状态字典，包含 checked_at（检查时间）和 age（距检查时间的秒数）
+        """
+        unit = unit or Config.FRPC_SERVICE_UNIT
+        running = self.running
+        if running:
+            self._refreshed.wait(Config.SERVICE_STATUS_TIMEOUT + 1)
+        with self._lock:
+            if running:
+                # 等待超时（后台线程卡住）时才同步检查
+                stale = self._checked_at is None
+            else:
+                stale = unit not in self._units or time.time() - self._checked_at >= Config.SERVICE_STATUS_INTERVAL
+        if stale:
+            self.refresh()
+        with self._lock:
+            state = self._units.get(unit)
+            if state is None:
+                raise ValueError(f'{unit} 不是受管的服务单元')
+            return dict(state, checked_at=self._checked_at, age=round(time.time() - self._checked_at, 3))
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def wake(self) -> None:
+        """立即刷新一次（服务操作结束后调用）；后台线程未运行时使缓存失效，下次查询时刷新"""
+        if self.running:
+            self._wake_event.set()
+        else:
+            with self._lock:
+                self._units.clear()
+
+    def _loop(self) -> None:
+        while not self._stop_event.is_set():
+            self._wake_event.clear()
+            self.refresh()
+            self._wake_event.wait(Config.SERVICE_STATUS_INTERVAL)
+
+    def start(self) -> None:
+        """启动后台刷新线程"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='service-status', daemon=True)
+        self._thread.start()
+        ColorLogger.info(f"服务状态检查已启动 (间隔 {Config.SERVICE_STATUS_INTERVAL:g} 秒)", 'Service')
+
+    def stop(self) -> None:
+        """停止后台刷新线程"""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread:
+            self._thread.join(timeout=Config.SERVICE_STATUS_TIMEOUT + 5)
+            self._thread = None
+
+
+# 全局服务状态实例
+service_status = ServiceStatusWatcher()
+relay.register('service_status', service_status, 'get_status')
@@ -0,0 +1,336 @@
+"""
+配置模板服务模块
+管理可复用的 frpc 配置模板，并在导出时按变量渲染配置
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from string import Template
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from utils.helpers import parse_config_fields
+from utils.instrumentation import registry
+from utils.logger import ColorLogger
+from utils.validators import validate_toml_config
+from models.database import get_db
+from services.audit_log_service import AuditLogService
+
+
+# 渲染缓存：(template_id, template_version, variables_hash) -> 渲染结果
+# 模板更新时版本号递增，旧缓存自然失效，无需改写客户端记录
+_render_cache: "OrderedDict[Tuple[int, int, str], str]" = OrderedDict()
+_render_cache_lock = threading.Lock()
+render_cache_stats: Dict[str, int] = {'hits': 0, 'misses': 0}
+
+
+def dump_template_vars(variables: Dict) -> str:
+    """
+    将模板变量序列化为规范 JSON（键排序），保证相同变量得到相同哈希
+
+    Args:
+        variables: 模板变量
+
+    Returns:
+        JSON 字符串
+    """
+    return json.dumps(variables, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+def render_template(content: str, variables: Dict) -> Tuple[bool, str]:
+    """
+    使用变量渲染模板内容
+
+    Args:
+        content: 模板内容（${name} 占位符）
+        variables: 模板变量
+
+    Returns:
+        (是否成功, 渲染结果或错误消息)
+    """
+    try:
+        return True, Template(content).substitute(variables)
+    except KeyError as e:
+        return False, f'缺少模板变量: {e.args[0]}'
+    except ValueError as e:
+        return False, f'模板格式错误: {e}'
+
+
+def clear_render_cache() -> None:
+    """清空渲染缓存"""
+    with _render_cache_lock:
+        _render_cache.clear()
+        render_cache_stats['hits'] = 0
+        render_cache_stats['misses'] = 0
+
+
+def _render_cache_metrics():
+    """配置导出渲染缓存的运行指标"""
+    with _render_cache_lock:
+        hits, misses, size = render_cache_stats['hits'], render_cache_stats['misses'], len(_render_cache)
+    return [
+        ('frp_console_config_render_cache', 'counter', 'Config export render cache lookups',
+         [({'result': 'hit'}, hits), ({'result': 'miss'}, misses)]),
+        ('frp_console_config_render_cache_entries', 'gauge', 'Config export render cache size',
+         [({}, size)]),
+    ]
+
+
+registry.register_collector(_render_cache_metrics)
+
+
+class TemplateService:
+    """配置模板服务类"""
+
+    @staticmethod
+    def get_all_templates() -> List[Dict]:
+        """
+        获取所有模板
+
+        Returns:
+            模板列表
+        """
+        db = get_db()
+        rows = db.execute('''
+            SELECT t.*, (SELECT COUNT(*) FROM clients c WHERE c.template_id = t.id) AS client_count
+            FROM config_templates t
+            ORDER BY t.id
+        ''').fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def get_template(template_id: int) -> Optional[Dict]:
+        """
+        获取单个模板
+
+        Args:
+            template_id: 模板 ID
+
+        Returns:
+            模板信息，不存在则返回 None
+        """
+        db = get_db()
+        row = db.execute('SELECT * FROM config_templates WHERE id = ?', (template_id,)).fetchone()
+        return dict(row) if row else None
+
+    @staticmethod
+    def get_template_by_name(name: str) -> Optional[Dict]:
+        """
+        根据名称获取模板
+
+        Args:
+            name: 模板名称
+
+        Returns:
+            模板信息，不存在则返回 None
+        """
+        db = get_db()
+        row = db.execute('SELECT * FROM config_templates WHERE name = ?', (name,)).fetchone()
+        return dict(row) if row else None
+
+    @staticmethod
+    def _validate_content(content: str) -> Tuple[bool, str]:
+        """验证模板内容：占位符合法，且以空值渲染后仍是有效配置"""
+        if not content or not content.strip():
+            return False, '模板内容不能为空'
+        try:
+            placeholders = {
+                match.group('named') or match.group('braced')
+                for match in Template.pattern.finditer(content)
+                if match.group('named') or match.group('braced')
+            }
+        except Exception as e:
+            return False, f'模板格式错误: {e}'
+        success, rendered = render_template(content, {name: '0' for name in placeholders})
+        if not success:
+            return False, rendered
+        return validate_toml_config(rendered)
+
+    @staticmethod
+    def create_template(data: Dict) -> Tuple[bool, Dict]:
+        """
+        创建模板
+
+        Args:
+            data: 模板数据（name, content, description）
+
+        Returns:
+            (是否成功, 响应数据)
+        """
+        name = (data.get('name') or '').strip()
+        content = data.get('content', '')
+        if not name:
+            return False, {'error': '模板名称不能为空'}
+
+        valid, message = TemplateService._validate_content(content)
+        if not valid:
+            return False, {'error': message}
+
+        db = get_db()
+        if db.execute('SELECT 1 FROM config_templates WHERE name = ?', (name,)).fetchone():
+            return False, {'error': '模板名称已存在'}
+
+        cursor = db.execute(
+            'INSERT INTO config_templates (name, description, content) VALUES (?, ?, ?)',
+            (name, data.get('description'), content)
+        )
+        db.commit()
+        template_id = cursor.lastrowid
+
+        ColorLogger.success(f"模板 {name} 创建成功", 'Template')
+        AuditLogService.log(
+            AuditLogService.ACTION_TEMPLATE_CREATE,
+            details={'template_id': template_id, 'template_name': name},
+            level=AuditLogService.LEVEL_INFO
+        )
+        return True, {'id': template_id, 'message': '创建成功'}
+
+    @staticmethod
+    def update_template(template_id: int, data: Dict) -> Tuple[bool, Dict]:
+        """
+        更新模板，内容变化时版本号加一，所有引用该模板的客户端在下次导出时生效
+
+        新内容无法按某些引用客户端的变量渲染（如新增了这些客户端没有的变量）时拒绝更新
+
+        Args:
+            template_id: 模板 ID
+            data: 更新数据（content, description）
+
+        Returns:
+            (是否成功, 响应数据)；因客户端渲染失败被拒绝时响应数据包含 clients（id, name, error）
+        """
+        db = get_db()
+        template = db.execute(
+            'SELECT name, content, description FROM config_templates WHERE id = ?',
+            (template_id,)
+        ).fetchone()
+        if template is None:
+            return False, {'error': '模板不存在'}
+
+        content = data.get('content', template['content'])
+        description = data.get('description', template['description'])
+
+        valid, message = TemplateService._validate_content(content)
+        if not valid:
+            return False, {'error': message}
+
+        version_bump = 1 if content != template['content'] else 0
+        fields = []
+        if version_bump:
+            # 新内容按每个引用客户端的变量渲染一次，任何客户端失败都拒绝更新，避免这些客户端的导出全部失败
+            failures = []
+            clients = db.execute(
+                'SELECT id, name, template_vars FROM clients WHERE template_id = ? ORDER BY id', (template_id,)
+            ).fetchall()
+            for client in clients:
+                success, rendered = render_template(content, json.loads(client['template_vars'] or '{}'))
+                if success:
+                    success, message = validate_toml_config(rendered)
+                else:
+                    message = rendered
+                if not success:
+                    failures.append({'id': client['id'], 'name': client['name'], 'error': message})
+                    continue
+                server_addr, _, local_port, remote_port = parse_config_fields(rendered)
+                fields.append((server_addr, local_port, remote_port, client['id']))
+            if failures:
+                return False, {
+                    'error': f'{len(failures)} 个使用该模板的客户端无法按新内容渲染配置',
+                    'clients': failures,
+                }
+
+        db.execute('''
+            UPDATE config_templates
+            SET content = ?, description = ?, version = version + ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (content, description, version_bump, template_id))
+        # 健康检查读取的地址和端口随渲染结果更新
+        db.executemany(
+            'UPDATE clients SET server_addr = ?, local_port = ?, remote_port = ? WHERE id = ?', fields
+        )
+        db.commit()
+
+        if version_bump:
+            # 释放旧版本的缓存条目
+            with _render_cache_lock:
+                for key in [key for key in _render_cache if key[0] == template_id]:
+                    del _render_cache[key]
+
+        ColorLogger.info(f"模板 {template['name']} 更新成功", 'Template')
+        AuditLogService.log(
+            AuditLogService.ACTION_TEMPLATE_UPDATE,
+            details={'template_id': template_id, 'template_name': template['name']},
+            level=AuditLogService.LEVEL_INFO
+        )
+        return True, {'message': '更新成功'}
+
+    @staticmethod
+    def delete_template(template_id: int) -> Tuple[bool, Dict]:
+        """
+        删除模板（仍被客户端引用时拒绝删除）
+
+        Args:
+            template_id: 模板 ID
+
+        Returns:
+            (是否成功, 响应数据)
+        """
+        db = get_db()
+        template = db.execute('SELECT name FROM config_templates WHERE id = ?', (template_id,)).fetchone()
+        if template is None:
+            return False, {'error': '模板不存在'}
+
+        if db.execute('SELECT 1 FROM clients WHERE template_id = ? LIMIT 1', (template_id,)).fetchone():
+            return False, {'error': '模板仍被客户端使用，无法删除'}
+
+        db.execute('DELETE FROM config_templates WHERE id = ?', (template_id,))
+        db.commit()
+
+        ColorLogger.success(f"模板 {template['name']} 删除成功", 'Template')
+        AuditLogService.log(
+            AuditLogService.ACTION_TEMPLATE_DELETE,
+            details={'template_id': template_id, 'template_name': template['name']},
+            level=AuditLogService.LEVEL_INFO
+        )
+        return True, {'message': '删除成功'}
+
+    @staticmethod
+    def render_client_config(template_id: int, template_version: int, template_vars: str) -> Tuple[bool, str]:
+        """
+        渲染客户端配置，按 (模板版本, 变量哈希) 缓存渲染结果
+
+        Args:
+            template_id: 模板 ID
+            template_version: 模板当前版本
+            template_vars: 客户端保存的变量 JSON
+
+        Returns:
+            (是否成功, 配置内容或错误消息)
+        """
+        template_vars = template_vars or '{}'
+        key = (template_id, template_version, hashlib.sha1(template_vars.encode('utf-8')).hexdigest())
+
+        with _render_cache_lock:
+            cached = _render_cache.get(key)
+            if cached is not None:
+                _render_cache.move_to_end(key)
+                render_cache_stats['hits'] += 1
+                return True, cached
+            render_cache_stats['misses'] += 1
+
+        db = get_db()
+        row = db.execute('SELECT content FROM config_templates WHERE id = ?', (template_id,)).fetchone()
+        if row is None:
+            return False, '模板不存在'
+
+        success, rendered = render_template(row['content'], json.loads(template_vars))
+        if not success:
+            return False, rendered
+
+        with _render_cache_lock:
+            _render_cache[key] = rendered
+            while len(_render_cache) > Config.TEMPLATE_RENDER_CACHE_SIZE:
+                _render_cache.popitem(last=False)
+
+        return True, rendered
@@ -2,22 +2,18 @@
 辅助工具模块
 包含各种辅助函数
 
-注意：本模块使用内存中的全局字典存储状态（login_attempts, restart_records）。
-这种设计在以下场景存在限制：
-1. 多进程部署时状态不共享
-2. 应用重启后数据丢失
-3. 无法水平扩展
-
-如需支持上述场景，建议将状态存储迁移到 Redis 或数据库。
+登录限流（login_attempts）和重启限流（restart_records）记录保存在共享状态中
+（见 utils.shared_state），多进程部署时所有工作进程看到同一份记录。
 """
+import re
 import time
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple, Union
 from utils.logger import ColorLogger
+from utils.shared_state import SharedDict
 
 
-# 登录速率限制记录（内存存储，重启后丢失）
-# TODO: 如需多实例部署，请迁移到 Redis
-login_attempts: Dict[str, Dict[str, int]] = {}  # IP -> {'count': int, 'locked_until': timestamp}
+# 登录速率限制记录：IP -> {'count': int, 'locked_until': timestamp}
+login_attempts = SharedDict('login_attempts')
 
 
 def check_login_rate_limit(ip: str, max_attempts: int = 5, lockout_time: int = 900) -> Tuple[bool, str]:
@@ -33,15 +29,16 @@ def check_login_rate_limit(ip: str, max_attempts: int = 5, lockout_time: int = 9
         (是否允许, 错误消息)
     """
     now = time.time()
-    if ip not in login_attempts:
-        login_attempts[ip] = {'count': 0, 'locked_until': 0}
 
-    record = login_attempts[ip]
+    def refresh(record: Optional[Dict]) -> Dict:
+        record = record or {'count': 0, 'locked_until': 0}
+        # 如果锁定时间已过，重置计数（未锁定时保留失败次数，否则每次检查都会清零）
+        if record['locked_until'] and now > record['locked_until']:
+            record['count'] = 0
+            record['locked_until'] = 0
+        return record
 
-    # 如果锁定时间已过，重置计数
-    if now > record['locked_until']:
-        record['count'] = 0
-        record['locked_until'] = 0
+    record = login_attempts.update_record(ip, refresh)
 
     # 检查是否被锁定
     if now < record['locked_until']:
@@ -62,34 +59,44 @@ def record_login_attempt(ip: str, success: bool, max_attempts: int = 5, lockout_
         lockout_time: 锁定时间（秒）
     """
     now = time.time()
-    if ip not in login_attempts:
-        login_attempts[ip] = {'count': 0, 'locked_until': 0}
 
-    record = login_attempts[ip]
+    def apply(record: Optional[Dict]) -> Dict:
+        record = record or {'count': 0, 'locked_until': 0}
+        if success:
+            # 登录成功，重置计数
+            record['count'] = 0
+            record['locked_until'] = 0
+        else:
+            # 登录失败，增加计数（各进程的失败次数累加到同一条记录）
+            record['count'] += 1
+            if record['count'] >= max_attempts:
+                record['locked_until'] = now + lockout_time
+        return record
+
+    record = login_attempts.update_record(ip, apply)
+    if not success and record['count'] >= max_attempts:
+        ColorLogger.warning(f'登录失败过多，IP {ip} 已被锁定 {lockout_time} 秒', 'Security')
+
 
-    if success:
-        # 登录成功，重置计数
-        record['count'] = 0
-        record['locked_until'] = 0
-    else:
-        # 登录失败，增加计数
-        record['count'] += 1
-        if record['count'] >= max_attempts:
-            record['locked_until'] = now + lockout_time
-            ColorLogger.warning(f'登录失败过多，IP {ip} 已被锁定 {lockout_time} 秒', 'Security')
+# 重启记录：client_id（或 frpc 服务单元名）-> {'count': int, 'last_restart': timestamp, 'first_failure': timestamp, 'consecutive_failures': int}
+restart_records = SharedDict('restart_records')
 
 
-# 重启记录（内存存储，重启后丢失）
-# TODO: 如需多实例部署，请迁移到 Redis
-restart_records: Dict[int, Dict[str, int]] = {}  # client_id -> {'count': int, 'last_restart': int, ...}
+def _new_restart_record(record: Optional[Dict]) -> Dict:
+    return record or {
+        'count': 0,
+        'last_restart': 0,
+        'first_failure': 0,
+        'consecutive_failures': 0
+    }
 
 
-def check_restart_limit(client_id: int, max_restarts: int = 3, window: int = 300, cooldown: int = 10, force: bool = False) -> Tuple[bool, str]:
+def check_restart_limit(client_id: Union[int, str], max_restarts: int = 3, window: int = 300, cooldown: int = 10, force: bool = False) -> Tuple[bool, str]:
     """
     检查重启频率限制
 
     Args:
-        client_id: 客户端 ID
+        client_id: 客户端 ID（frpc 服务操作使用服务单元名）
         max_restarts: 最大重启次数
         window: 时间窗口（秒）
         cooldown: 重启间隔（秒）
@@ -102,15 +109,16 @@ def check_restart_limit(client_id: int, max_restarts: int = 3, window: int = 300
         return True, ''
 
     now = time.time()
-    if client_id not in restart_records:
-        restart_records[client_id] = {
-            'count': 0,
-            'last_restart': 0,
-            'first_failure': 0,
-            'consecutive_failures': 0
-        }
 
-    record = restart_records[client_id]
+    def refresh(record: Optional[Dict]) -> Dict:
+        record = _new_restart_record(record)
+        # 冷却中不修改记录；否则超出时间窗口时重置计数
+        if now - record['last_restart'] >= cooldown and now - record['first_failure'] > window:
+            record['count'] = 0
+            record['first_failure'] = 0
+        return record
+
+    record = restart_records.update_record(client_id, refresh)
 
     # 检查冷却时间
     if now - record['last_restart'] < cooldown:
@@ -118,52 +126,88 @@ def check_restart_limit(client_id: int, max_restarts: int = 3, window: int = 300
         return False, f'重启过于频繁，请等待 {remaining} 秒后重试'
 
     # 检查时间窗口内的重启次数
-    if now - record['first_failure'] > window:
-        # 超出时间窗口，重置计数
-        record['count'] = 0
-        record['first_failure'] = 0
-
     if record['count'] >= max_restarts:
         return False, f'{window} 秒内重启次数已达上限 ({max_restarts} 次)'
 
     return True, ''
 
 
-def record_restart(client_id: int, success: bool = True) -> None:
+def record_restart(client_id: Union[int, str], success: bool = True) -> None:
     """
     记录重启
 
     Args:
-        client_id: 客户端 ID
+        client_id: 客户端 ID（frpc 服务操作使用服务单元名）
         success: 是否重启成功
     """
     now = time.time()
-    if client_id not in restart_records:
-        restart_records[client_id] = {
-            'count': 0,
-            'last_restart': 0,
-            'first_failure': 0,
-            'consecutive_failures': 0
-        }
-
-    record = restart_records[client_id]
-    record['last_restart'] = now
-
-    if success:
-        record['consecutive_failures'] = 0
-    else:
-        record['count'] += 1
-        record['consecutive_failures'] += 1
-        if record['first_failure'] == 0:
-            record['first_failure'] = now
-
-
-def reset_restart_record(client_id: int) -> None:
+
+    def apply(record: Optional[Dict]) -> Dict:
+        record = _new_restart_record(record)
+        record['last_restart'] = now
+
+        if success:
+            record['consecutive_failures'] = 0
+        else:
+            record['count'] += 1
+            record['consecutive_failures'] += 1
+            if record['first_failure'] == 0:
+                record['first_failure'] = now
+        return record
+
+    restart_records.update_record(client_id, apply)
+
+
+def reset_restart_record(client_id: Union[int, str]) -> None:
     """
     重置重启记录
 
     Args:
-        client_id: 客户端 ID
+        client_id: 客户端 ID（frpc 服务操作使用服务单元名）
+    """
+    restart_records.pop(client_id, None)
+
+
+def parse_config_fields(config_content: str) -> Tuple[str, int, int, int]:
+    """
+    从 frpc 配置中解析服务器地址和第一个代理的端口（健康检查和列表展示使用）
+
+    先按 TOML 解析，失败时（如 INI 格式的旧配置）用正则匹配
+
+    Args:
+        config_content: 配置内容
+
+    Returns:
+        (server_addr, server_port, local_port, remote_port)
     """
-    if client_id in restart_records:
-        del restart_records[client_id]
\ No newline at end of file
+    try:
+        import tomllib
+        parsed_config = tomllib.loads(config_content)
+
+        # 获取 common 部分的配置
+        common_config = parsed_config.get('common', {})
+        server_addr = common_config.get('server_addr') or common_config.get('serverAddr', '127.0.0.1')
+        server_port = common_config.get('server_port') or common_config.get('serverPort', 7000)
+
+        # 获取第一个 proxy 部分的配置
+        proxy_config = {}
+        for key, value in parsed_config.items():
+            if key != 'common':
+                proxy_config = value
+                break
+
+        local_port = proxy_config.get('local_port') or proxy_config.get('localPort', 0)
+        remote_port = proxy_config.get('remote_port') or proxy_config.get('remotePort', 0)
+    except Exception:
+        # 回退到正则表达式解析
+        server_addr_match = re.search(r'(?:server_addr|serverAddr)\s*=\s*["\']?([^"\'\n]+)["\']?', config_content)
+        server_port_match = re.search(r'(?:server_port|serverPort)\s*=\s*(\d+)', config_content)
+        local_port_match = re.search(r'(?:local_port|localPort)\s*=\s*(\d+)', config_content)
+        remote_port_match = re.search(r'(?:remote_port|remotePort)\s*=\s*(\d+)', config_content)
+
+        server_addr = server_addr_match.group(1).strip() if server_addr_match else '127.0.0.1'
+        server_port = int(server_port_match.group(1)) if server_port_match else 7000
+        local_port = int(local_port_match.group(1)) if local_port_match else 0
+        remote_port = int(remote_port_match.group(1)) if remote_port_match else 0
+
+    return server_addr, server_port, local_port, remote_port
@@ -0,0 +1,268 @@
+"""
+进程间消息队列模块
+多个工作进程通过 SQLite 文件（Config.SHARED_STATE_PATH 的 messages 表）发布和订阅消息，无需外部服务
+
+- SQLiteMessageQueue：按频道追加消息，监听方轮询新消息；超过保留时间的消息由发布方顺带清理
+- SQLiteManager：Socket.IO 的 pub/sub 客户端管理器，一个进程中的 emit 送达所有进程中的连接
+- BackgroundRelay：把 Web 请求中对后台组件（实时指标发布器、告警管道、健康检查等）的调用转发到
+  运行后台任务的进程，需要结果的调用通过一次性的回复频道返回
+
+单进程部署（SERVER_WORKERS = 1）时不使用消息队列，relay 直接调用本进程的组件。
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import socketio
+
+from config import Config
+from utils.logger import ColorLogger
+from utils.shared_state import connect
+
+
+class SQLiteMessageQueue:
+    """基于 SQLite 的发布/订阅消息队列"""
+
+    # 发布方每隔多久清理一次过期消息（秒）
+    PRUNE_INTERVAL = 10
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._last_prune = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # AUTOINCREMENT：清理后 ID 不会复用，监听方按 ID 递增读取不会漏掉消息
+        self._conn().execute('''
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        self._conn().execute('CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages(channel, id)')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    def publish(self, channel: str, message: Dict) -> None:
+        """发布一条消息（消息需可 JSON 序列化）"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            'INSERT INTO messages (channel, payload, created_at) VALUES (?, ?, ?)',
+            (channel, json.dumps(message), now)
+        )
+        if now - self._last_prune >= self.PRUNE_INTERVAL:
+            self._last_prune = now
+            conn.execute('DELETE FROM messages WHERE created_at < ?', (now - Config.MESSAGE_QUEUE_RETENTION,))
+
+    def last_id(self) -> int:
+        row = self._conn().execute('SELECT MAX(id) FROM messages').fetchone()
+        return row[0] or 0
+
+    def fetch(self, channel: str, after: int) -> Iterator[Tuple[int, Dict]]:
+        """读取 ID 大于 after 的消息"""
+        rows = self._conn().execute(
+            'SELECT id, payload FROM messages WHERE id > ? AND channel = ? ORDER BY id', (after, channel)
+        ).fetchall()
+        for message_id, payload in rows:
+            yield message_id, json.loads(payload)
+
+    def listen(self, channel: str, stop: Optional[threading.Event] = None,
+               after: Optional[int] = None) -> Iterator[Dict]:
+        """
+        持续读取频道中的新消息
+
+        Args:
+            channel: 频道名
+            stop: 设置后结束监听
+            after: 从该 ID 之后开始读取，默认为开始迭代时的最新消息
+        """
+        last = self.last_id() if after is None else after
+        interval = Config.MESSAGE_QUEUE_POLL_MS / 1000
+        while stop is None or not stop.is_set():
+            received = False
+            try:
+                for last, message in self.fetch(channel, last):
+                    received = True
+                    yield message
+            except sqlite3.Error as e:
+                ColorLogger.error(f"读取消息队列失败: {e}", 'MessageQueue')
+            if not received:
+                if stop is not None:
+                    stop.wait(interval)
+                else:
+                    time.sleep(interval)
+
+
+def create_message_queue() -> SQLiteMessageQueue:
+    return SQLiteMessageQueue(Config.SHARED_STATE_PATH)
+
+
+class SQLiteManager(socketio.PubSubManager):
+    """通过 SQLite 消息队列在多个进程之间转发 Socket.IO 消息"""
+
+    name = 'sqlite'
+
+    def __init__(self, queue: Optional[SQLiteMessageQueue] = None, channel: str = 'flask-socketio',
+                 write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.queue = queue or create_message_queue()
+
+    def _publish(self, data: Dict) -> None:
+        self.queue.publish(self.channel, data)
+
+    def _listen(self) -> Iterator[Dict]:
+        return self.queue.listen(self.channel)
+
+
+def socketio_options() -> Dict[str, Any]:
+    """
+    按 Config.SOCKETIO_MESSAGE_QUEUE 生成 SocketIO() 的消息队列参数
+
+    Returns:
+        空字典（单进程）、{'client_manager': SQLiteManager} 或 {'message_queue': url}
+    """
+    url = Config.SOCKETIO_MESSAGE_QUEUE
+    if not url:
+        return {}
+    if url == 'sqlite':
+        return {'client_manager': SQLiteManager()}
+    return {'message_queue': url}
+
+
+class RelayError(Exception):
+    """转发的调用失败或运行后台任务的进程未响应"""
+
+
+class BackgroundRelay:
+    """
+    后台组件调用转发
+
+    后台组件登记可转发的方法；多进程部署时调用发布到消息队列，由运行后台任务的进程
+    （start() 之后）执行，单进程时直接调用。参数和返回值需可 JSON 序列化（字典的整数键会变为字符串）。
+    """
+
+    CHANNEL = 'relay'
+
+    def __init__(self):
+        self._targets: Dict[str, Tuple[Any, frozenset]] = {}
+        self._queue: Optional[SQLiteMessageQueue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def register(self, name: str, target: Any, *methods: str) -> None:
+        """登记后台组件（对象或模块）和允许转发的方法"""
+        self._targets[name] = (target, frozenset(methods))
+
+    @staticmethod
+    def enabled() -> bool:
+        return Config.SERVER_WORKERS > 1
+
+    def _get_queue(self) -> SQLiteMessageQueue:
+        if self._queue is None:
+            self._queue = create_message_queue()
+        return self._queue
+
+    def _message(self, method: Callable, args: tuple) -> Dict:
+        # 绑定方法属于登记的对象，模块级函数属于登记的模块
+        owner = getattr(method, '__self__', None) or sys.modules.get(method.__module__)
+        name = next((name for name, (target, _) in self._targets.items() if target is owner), None)
+        if name is None or method.__name__ not in self._targets[name][1]:
+            raise ValueError(f'{method.__qualname__} 不允许转发')
+        return {'target': name, 'method': method.__name__, 'args': list(args)}
+
+    def call(self, method: Callable, *args) -> None:
+        """
+        调用后台组件的方法，不等待结果（多进程时转发）
+
+        Args:
+            method: 已登记组件的绑定方法（如 publisher.subscribe）或已登记模块的函数
+        """
+        if not self.enabled():
+            method(*args)
+            return
+        message = self._message(method, args)
+        try:
+            self._get_queue().publish(self.CHANNEL, message)
+        except sqlite3.Error as e:
+            ColorLogger.error(f"转发 {message['target']}.{message['method']} 失败: {e}", 'MessageQueue')
+
+    def request(self, method: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """
+        调用后台组件的方法并返回结果（多进程时转发并等待回复）
+
+        Raises:
+            RelayError: 调用出错，或 timeout（默认 Config.RELAY_TIMEOUT）秒内未收到回复
+        """
+        if not self.enabled():
+            return method(*args)
+        message = self._message(method, args)
+        message['reply'] = f'reply:{uuid.uuid4().hex}'
+        label = f"{message['target']}.{message['method']}"
+        queue = self._get_queue()
+        timeout = Config.RELAY_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        try:
+            after = queue.last_id()
+            queue.publish(self.CHANNEL, message)
+            while True:
+                for _, reply in queue.fetch(message['reply'], after):
+                    if 'error' in reply:
+                        raise RelayError(f"{label} 失败: {reply['error']}")
+                    return reply['result']
+                if time.monotonic() >= deadline:
+                    raise RelayError(f'{label} 未在 {timeout:g} 秒内响应，后台任务进程可能未运行')
+                time.sleep(Config.MESSAGE_QUEUE_POLL_MS / 1000)
+        except sqlite3.Error as e:
+            raise RelayError(f'转发 {label} 失败: {e}') from e
+
+    def dispatch(self, message: Dict) -> None:
+        """执行一条转发的调用，需要回复时发布结果"""
+        entry = self._targets.get(message.get('target'))
+        if entry is None or message.get('method') not in entry[1]:
+            ColorLogger.warning(f"忽略无效的转发调用: {message}", 'MessageQueue')
+            return
+        try:
+            reply = {'result': getattr(entry[0], message['method'])(*message.get('args', ()))}
+        except Exception as e:
+            ColorLogger.error(f"执行转发调用 {message['target']}.{message['method']} 失败: {e}", 'MessageQueue')
+            reply = {'error': str(e)}
+        if message.get('reply'):
+            self._get_queue().publish(message['reply'], reply)
+
+    def _loop(self, after: int) -> None:
+        for message in self._get_queue().listen(self.CHANNEL, self._stop_event, after):
+            self.dispatch(message)
+
+    def start(self) -> None:
+        """在运行后台任务的进程中开始执行转发的调用（单进程时无需启动）"""
+        if not self.enabled() or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        # 从启动时的位置开始读取，之后发布的调用不会遗漏
+        after = self._get_queue().last_id()
+        self._thread = threading.Thread(target=self._loop, args=(after,), name='background-relay', daemon=True)
+        self._thread.start()
+        ColorLogger.info("后台调用转发已启动", 'MessageQueue')
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# 全局转发实例，后台组件在各自模块中登记
+relay = BackgroundRelay()
@@ -7,12 +7,21 @@ import secrets
 import hashlib
 from typing import Tuple
 
+from utils.instrumentation import registry
+
 
 # 密码哈希配置
 HASH_ALGORITHM = "sha256"
 ITERATIONS = 100000  # PBKDF2 迭代次数
 SALT_LENGTH = 32  # 盐长度（字节）
 
+HASH_SECONDS = registry.histogram(
+    'frp_console_password_hash_seconds',
+    'PBKDF2 password hashing time',
+    ('operation',),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0)
+)
+
 
 def hash_password(password: str) -> Tuple[str, str]:
     """
@@ -28,12 +37,13 @@ def hash_password(password: str) -> Tuple[str, str]:
     salt = secrets.token_hex(SALT_LENGTH)
 
     # 使用 PBKDF2-HMAC-SHA256 哈希密码
-    dk = hashlib.pbkdf2_hmac(
-        HASH_ALGORITHM,
-        password.encode('utf-8'),
-        salt.encode('utf-8'),
-        ITERATIONS
-    )
+    with HASH_SECONDS.labels('hash').time():
+        dk = hashlib.pbkdf2_hmac(
+            HASH_ALGORITHM,
+            password.encode('utf-8'),
+            salt.encode('utf-8'),
+            ITERATIONS
+        )
 
     hashed_password = dk.hex()
 
@@ -53,12 +63,13 @@ def verify_password(password: str, salt: str, hashed_password: str) -> bool:
         密码是否匹配
     """
     # 使用相同的参数重新哈希
-    dk = hashlib.pbkdf2_hmac(
-        HASH_ALGORITHM,
-        password.encode('utf-8'),
-        salt.encode('utf-8'),
-        ITERATIONS
-    )
+    with HASH_SECONDS.labels('verify').time():
+        dk = hashlib.pbkdf2_hmac(
+            HASH_ALGORITHM,
+            password.encode('utf-8'),
+            salt.encode('utf-8'),
+            ITERATIONS
+        )
 
     computed_hash = dk.hex()
 
@@ -0,0 +1,135 @@
+"""
+采样分析模块
+定期读取 sys._current_frames() 记录所有线程的调用栈，输出折叠栈格式（flamegraph.pl / speedscope 可直接读取）
+
+采样在调用线程中进行，不修改被采样线程，也不安装 trace/profile 钩子，开销只与采样频率和线程数有关。
+同一时间只允许一次采样，并且两次采样之间有冷却时间。
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from config import Config
+
+
+# 栈顶为这些函数的线程视为空闲（等待锁、I/O 或休眠）
+IDLE_FUNCTIONS = frozenset((
+    'wait', 'select', 'poll', 'accept', 'sleep', 'recv', 'recv_into', 'readinto',
+    '_wait_for_tstate_lock',
+))
+
+_run_lock = threading.Lock()
+_last_finished = 0.0
+
+
+class ProfilerBusy(Exception):
+    """已有采样在进行或仍在冷却中"""
+
+    def __init__(self, message: str, retry_after: int = 0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SamplingProfiler:
+    """调用栈采样器"""
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 128, include_idle: bool = False):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[object, str] = {}
+
+    def _label(self, code) -> str:
+        """函数标签（按代码对象缓存）"""
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            parts = filename.replace('\\', '/').split('/')
+            short = '/'.join(parts[-2:]) if len(parts) > 1 else filename
+            label = f'{code.co_name} ({short}:{code.co_firstlineno})'
+            self._labels[code] = label
+        return label
+
+    def sample(self, skip_thread: Optional[int] = None) -> None:
+        """采样一次所有线程的调用栈"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            if not self.include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                continue
+            codes = []
+            while frame is not None and len(codes) < self.max_depth:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            labels = [names.get(thread_id, f'thread-{thread_id}')]
+            labels.extend(self._label(code) for code in reversed(codes))
+            self.stacks[';'.join(labels)] += 1
+        self.samples += 1
+
+    def run(self, duration: float) -> None:
+        """在当前线程中按间隔采样 duration 秒（不采样当前线程自身）"""
+        own = threading.get_ident()
+        deadline = time.perf_counter() + duration
+        next_sample = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now >= next_sample:
+                self.sample(skip_thread=own)
+                next_sample += self.interval
+                # 采样落后时跳过错过的时刻，避免连续补采
+                if next_sample < now:
+                    next_sample = now + self.interval
+            time.sleep(max(0.0, min(next_sample, deadline) - time.perf_counter()))
+
+    def collapsed(self) -> str:
+        """折叠栈文本：每行为 "帧1;帧2;... 次数"，按次数降序"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def profile(duration: float, interval: float, include_idle: bool = False) -> Tuple[SamplingProfiler, float]:
+    """
+    执行一次采样（限制时长、并发和频率）
+
+    Args:
+        duration: 采样时长（秒），不超过 PROFILER_MAX_SECONDS
+        interval: 采样间隔（秒），不小于 1ms
+        include_idle: 是否包含空闲线程
+
+    Returns:
+        (采样器, 实际耗时)
+
+    Raises:
+        ProfilerBusy: 已有采样在进行或仍在冷却中
+    """
+    global _last_finished
+    duration = max(0.1, min(duration, Config.PROFILER_MAX_SECONDS))
+    interval = max(0.001, interval)
+
+    if not _run_lock.acquire(blocking=False):
+        raise ProfilerBusy('已有采样正在进行')
+    try:
+        remaining = _last_finished + Config.PROFILER_COOLDOWN - time.monotonic()
+        if _last_finished and remaining > 0:
+            raise ProfilerBusy(f'请在 {int(remaining) + 1} 秒后重试', int(remaining) + 1)
+
+        profiler = SamplingProfiler(interval=interval, include_idle=include_idle)
+        start = time.perf_counter()
+        profiler.run(duration)
+        elapsed = time.perf_counter() - start
+        _last_finished = time.monotonic()
+        return profiler, elapsed
+    finally:
+        _run_lock.release()
+
+
+def reset_cooldown() -> None:
+    """清除冷却状态（测试使用）"""
+    global _last_finished
+    _last_finished = 0.0
@@ -0,0 +1,224 @@
+"""
+共享状态模块
+为登录限流、重启限流等需要跨进程一致的小型状态提供统一的键值接口
+
+后端由 Config.SHARED_STATE_BACKEND 决定：
+- memory：进程内字典（单进程部署，默认）
+- sqlite：SHARED_STATE_PATH 中的 shared_state 表，同一主机上的多个工作进程共享
+
+记录是可 JSON 序列化的字典，按命名空间隔离。读-改-写通过 update() 原子完成
+（sqlite 后端在 BEGIN IMMEDIATE 事务中执行），调用方不应修改 get() 返回的记录后期望写回。
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, Optional
+
+from config import Config
+
+
+Record = Dict[str, Any]
+Updater = Callable[[Optional[Record]], Optional[Record]]
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    打开共享状态文件（WAL 模式，isolation_level=None 由调用方显式控制事务）
+
+    多个工作进程同时首次打开时只有一个能切换到 WAL（切换需要独占锁且不等待），其余稍后重试。
+    """
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    for attempt in range(100):
+        try:
+            if conn.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+                conn.execute('PRAGMA journal_mode=WAL')
+            break
+        except sqlite3.OperationalError:
+            if attempt == 99:
+                conn.close()
+                raise
+            time.sleep(0.01)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class MemoryState:
+    """进程内共享状态"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data: Dict[str, Dict[Any, Record]] = {}
+
+    def get(self, namespace: str, key: Any) -> Optional[Record]:
+        with self._lock:
+            record = self._data.get(namespace, {}).get(key)
+            return copy.deepcopy(record) if record is not None else None
+
+    def update(self, namespace: str, key: Any, updater: Updater) -> Optional[Record]:
+        """
+        原子地读-改-写一条记录
+
+        Args:
+            updater: 接收当前记录（不存在时为 None），返回新记录；返回 None 表示删除
+
+        Returns:
+            新记录
+        """
+        with self._lock:
+            records = self._data.setdefault(namespace, {})
+            current = records.get(key)
+            record = updater(copy.deepcopy(current) if current is not None else None)
+            if record is None:
+                records.pop(key, None)
+                return None
+            records[key] = copy.deepcopy(record)
+            return record
+
+    def delete(self, namespace: str, key: Any) -> bool:
+        with self._lock:
+            return self._data.get(namespace, {}).pop(key, None) is not None
+
+    def keys(self, namespace: str) -> List[Any]:
+        with self._lock:
+            return list(self._data.get(namespace, {}))
+
+    def clear(self, namespace: str) -> None:
+        with self._lock:
+            self._data.pop(namespace, None)
+
+
+class SQLiteState:
+    """基于 SQLite 文件的跨进程共享状态（每个线程一个连接）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS shared_state (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+        ''')
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    @staticmethod
+    def _encode(key: Any) -> str:
+        # 键按 JSON 编码，keys() 能还原整数键（如客户端 ID）
+        return json.dumps(key)
+
+    def get(self, namespace: str, key: Any) -> Optional[Record]:
+        row = self._conn().execute(
+            'SELECT value FROM shared_state WHERE namespace = ? AND key = ?',
+            (namespace, self._encode(key))
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, namespace: str, key: Any, updater: Updater) -> Optional[Record]:
+        """原子地读-改-写一条记录（语义同 MemoryState.update）"""
+        conn = self._conn()
+        encoded = self._encode(key)
+        # 事务开始即取得写锁，其他进程的 update() 在此等待，不会丢失更新
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM shared_state WHERE namespace = ? AND key = ?', (namespace, encoded)
+            ).fetchone()
+            record = updater(json.loads(row[0]) if row else None)
+            if record is None:
+                conn.execute('DELETE FROM shared_state WHERE namespace = ? AND key = ?', (namespace, encoded))
+            else:
+                conn.execute(
+                    'INSERT OR REPLACE INTO shared_state (namespace, key, value) VALUES (?, ?, ?)',
+                    (namespace, encoded, json.dumps(record))
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return record
+
+    def delete(self, namespace: str, key: Any) -> bool:
+        cursor = self._conn().execute(
+            'DELETE FROM shared_state WHERE namespace = ? AND key = ?', (namespace, self._encode(key))
+        )
+        return cursor.rowcount > 0
+
+    def keys(self, namespace: str) -> List[Any]:
+        rows = self._conn().execute('SELECT key FROM shared_state WHERE namespace = ?', (namespace,))
+        return [json.loads(row[0]) for row in rows]
+
+    def clear(self, namespace: str) -> None:
+        self._conn().execute('DELETE FROM shared_state WHERE namespace = ?', (namespace,))
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_shared_state():
+    """按配置创建（首次调用时）并返回共享状态后端"""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                if Config.SHARED_STATE_BACKEND == 'sqlite':
+                    _state = SQLiteState(Config.SHARED_STATE_PATH)
+                elif Config.SHARED_STATE_BACKEND == 'memory':
+                    _state = MemoryState()
+                else:
+                    raise ValueError(f'SHARED_STATE_BACKEND 无效: {Config.SHARED_STATE_BACKEND}（可选 memory、sqlite）')
+    return _state
+
+
+class SharedDict(MutableMapping):
+    """
+    共享状态中一个命名空间的字典视图
+
+    读取返回记录的副本；修改记录需通过 update_record() 原子完成。
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def __getitem__(self, key: Any) -> Record:
+        record = get_shared_state().get(self.namespace, key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __setitem__(self, key: Any, record: Record) -> None:
+        get_shared_state().update(self.namespace, key, lambda current: record)
+
+    def __delitem__(self, key: Any) -> None:
+        if not get_shared_state().delete(self.namespace, key):
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(get_shared_state().keys(self.namespace))
+
+    def __len__(self) -> int:
+        return len(get_shared_state().keys(self.namespace))
+
+    def __contains__(self, key: Any) -> bool:
+        return get_shared_state().get(self.namespace, key) is not None
+
+    def clear(self) -> None:
+        get_shared_state().clear(self.namespace)
+
+    def update_record(self, key: Any, updater: Updater) -> Optional[Record]:
+        """原子地读-改-写一条记录，返回新记录"""
+        return get_shared_state().update(self.namespace, key, updater)
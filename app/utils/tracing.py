@@ -0,0 +1,224 @@
+"""
+请求追踪模块（TRACING_ENABLED 开启）
+记录每个请求各阶段的耗时，通过 Server-Timing 响应头返回，并保留最近的请求和 SQL 记录
+
+阶段划分：
+- session: 会话 Cookie 的解析和签名
+- db: 本请求执行的 SQL 语句（不含读取结果行）
+- json: JSON 序列化
+- app: 其余时间（视图逻辑、模板渲染等）
+
+追踪状态保存在线程本地变量中（SocketIO 使用 threading 模式，每个请求独占一个线程）。
+后台线程的 SQL 同样进入最近查询记录，但不属于任何请求。
+"""
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict, List, Optional
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from flask.sessions import SecureCookieSessionInterface
+
+from config import Config
+
+
+# 由 init_app 开启；SQL 计时钩子据此决定是否记录，关闭时只有一次属性读取的开销
+enabled = False
+
+_local = threading.local()
+_lock = threading.Lock()
+_recent_requests: Deque[Dict] = deque(maxlen=Config.TRACING_BUFFER_SIZE)
+_recent_queries: Deque[Dict] = deque(maxlen=Config.TRACING_BUFFER_SIZE)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """
+    规范化 SQL 文本：合并空白，字面量替换为 ?，IN 列表合并为 (?...)
+
+    同一语句不同参数的执行得到相同文本，便于聚合。
+    """
+    text = _WHITESPACE.sub(' ', sql).strip()
+    text = _STRING_LITERAL.sub('?', text)
+    text = _NUMBER_LITERAL.sub('?', text)
+    return _PLACEHOLDER_LIST.sub('(?...)', text)
+
+
+class Trace:
+    """单个请求的追踪数据"""
+    __slots__ = ('start', 'spans', 'queries')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.queries = 0
+
+    def add(self, name: str, elapsed: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + elapsed
+
+
+def current_trace() -> Optional[Trace]:
+    """当前线程正在追踪的请求"""
+    return getattr(_local, 'trace', None)
+
+
+class span:
+    """
+    将代码块的耗时计入当前请求的指定阶段（未开启追踪或不在请求中时不记录）
+
+    Example:
+        with tracing.span('render'):
+            ...
+    """
+    __slots__ = ('name', '_trace', '_start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._trace = current_trace()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._trace is not None:
+            self._trace.add(self.name, time.perf_counter() - self._start)
+        return False
+
+
+def record_query(sql: str, elapsed: float) -> None:
+    """记录一条 SQL 的执行耗时（由数据库连接调用）"""
+    trace = current_trace()
+    if trace is not None:
+        trace.add('db', elapsed)
+        trace.queries += 1
+        endpoint = trace_endpoint()
+    else:
+        endpoint = None
+    entry = {
+        'sql': normalize_sql(sql),
+        'duration_ms': round(elapsed * 1000, 3),
+        'endpoint': endpoint,
+        'at': time.time(),
+    }
+    with _lock:
+        _recent_queries.append(entry)
+
+
+def trace_endpoint() -> Optional[str]:
+    """当前请求的端点名"""
+    try:
+        return request.endpoint
+    except RuntimeError:
+        return None
+
+
+def _begin() -> None:
+    _local.trace = Trace()
+
+
+def _finish(response) -> None:
+    """结束追踪：设置 Server-Timing 响应头并记录请求"""
+    trace = getattr(_local, 'trace', None)
+    _local.trace = None
+    if trace is None:
+        return
+
+    total = time.perf_counter() - trace.start
+    spans = trace.spans
+    other = max(0.0, total - sum(spans.values()))
+
+    parts = [f'total;dur={total * 1000:.2f}']
+    for name, elapsed in spans.items():
+        if name == 'db':
+            parts.append(f'db;dur={elapsed * 1000:.2f};desc="{trace.queries} queries"')
+        else:
+            parts.append(f'{name};dur={elapsed * 1000:.2f}')
+    parts.append(f'app;dur={other * 1000:.2f}')
+    response.headers['Server-Timing'] = ', '.join(parts)
+
+    entry = {
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'duration_ms': round(total * 1000, 3),
+        'spans': {name: round(elapsed * 1000, 3) for name, elapsed in spans.items()},
+        'queries': trace.queries,
+        'at': time.time(),
+    }
+    with _lock:
+        _recent_requests.append(entry)
+
+
+class TracingSessionInterface(SecureCookieSessionInterface):
+    """
+    追踪请求的会话接口
+
+    open_session 是请求上下文中最先执行的步骤，save_session 在所有 after_request 之后执行，
+    因此在这里开始和结束追踪可以覆盖整个请求（包括会话签名本身）。
+    """
+
+    def open_session(self, app, request):
+        _begin()
+        with span('session'):
+            return super().open_session(app, request)
+
+    def save_session(self, app, session, response):
+        with span('session'):
+            super().save_session(app, session, response)
+        _finish(response)
+
+
+class TracingJSONProvider(DefaultJSONProvider):
+    """记录 JSON 序列化耗时"""
+
+    def dumps(self, obj, **kwargs):
+        with span('json'):
+            return super().dumps(obj, **kwargs)
+
+
+def init_app(app) -> None:
+    """为应用开启请求追踪"""
+    global enabled
+    app.session_interface = TracingSessionInterface()
+    app.json = TracingJSONProvider(app)
+    enabled = True
+
+
+def slowest(limit: int = 20) -> Dict[str, List[Dict]]:
+    """
+    最近记录中最慢的请求和 SQL
+
+    Args:
+        limit: 每类返回的条数
+
+    Returns:
+        {'requests': [...], 'queries': [...]}，按耗时降序
+    """
+    with _lock:
+        recent_requests = list(_recent_requests)
+        recent_queries = list(_recent_queries)
+
+    def by_duration(item):
+        return item['duration_ms']
+
+    return {
+        'requests': sorted(recent_requests, key=by_duration, reverse=True)[:limit],
+        'queries': sorted(recent_queries, key=by_duration, reverse=True)[:limit],
+    }
+
+
+def reset() -> None:
+    """清空记录"""
+    with _lock:
+        _recent_requests.clear()
+        _recent_queries.clear()
@@ -1,10 +1,26 @@
 """
 验证器模块
 包含各种数据验证函数
+
+正则表达式在模块加载时编译一次；配置校验逐行扫描原字符串，不复制整份配置。
+validate_schema 可以把单字段验证器组合成请求数据的校验规则。
 """
 
 import re
-from typing import Tuple, Optional
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+# 验证器签名：接收字段值，返回 (是否有效, 错误消息)
+Validator = Callable[[Any], Tuple[bool, str]]
+
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+CLIENT_NAME_PATTERN = re.compile(r'[a-zA-Z0-9_\-\u4e00-\u9fa5]+')
+# 每个标签 1-63 个字符，首尾不能是连字符
+DOMAIN_PATTERN = re.compile(
+    r'[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?(?:\.[a-zA-Z0-9](?:[a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)*'
+)
+IP_PATTERN = re.compile(r'(\d{1,3}\.){3}\d{1,3}')
+UNSAFE_FILENAME_PATTERN = re.compile(r'[<>:"|?*]')
 
 
 def validate_password(password: str) -> Tuple[bool, str]:
@@ -49,8 +65,7 @@ def validate_email(email: str) -> Tuple[bool, str]:
     if not email:
         return True, ''  # 允许为空
 
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(email_pattern, email):
+    if not EMAIL_PATTERN.fullmatch(email):
         return False, '邮箱格式不正确'
 
     return True, ''
@@ -66,7 +81,7 @@ def validate_port(port: int) -> Tuple[bool, str]:
     Returns:
         (是否有效, 错误消息)
     """
-    if not isinstance(port, int):
+    if not isinstance(port, int) or isinstance(port, bool):
         return False, '端口号必须是整数'
 
     if port < 1 or port > 65535:
@@ -85,7 +100,7 @@ def validate_client_name(name: str) -> Tuple[bool, str]:
     Returns:
         (是否有效, 错误消息)
     """
-    if not name or not name.strip():
+    if not name or not isinstance(name, str) or not name.strip():
         return False, '客户端名称不能为空'
 
     name = name.strip()
@@ -95,7 +110,7 @@ def validate_client_name(name: str) -> Tuple[bool, str]:
         return False, '客户端名称不能超过 100 个字符'
 
     # 检查特殊字符
-    if not re.match(r'^[a-zA-Z0-9_\-\u4e00-\u9fa5]+$', name):
+    if not CLIENT_NAME_PATTERN.fullmatch(name):
         return False, '客户端名称只能包含字母、数字、下划线、连字符和中文'
 
     return True, ''
@@ -111,21 +126,43 @@ def validate_server_addr(addr: str) -> Tuple[bool, str]:
     Returns:
         (是否有效, 错误消息)
     """
-    if not addr or not addr.strip():
+    if not addr or (isinstance(addr, str) and not addr.strip()):
         return True, ''  # 允许为空
 
+    if not isinstance(addr, str):
+        return False, '服务器地址格式不正确'
+
     addr = addr.strip()
 
     # 可以是域名或 IP 地址
-    domain_pattern = r'^[a-zA-Z0-9][a-zA-Z0-9-]{0,61}[a-zA-Z0-9](?:\.[a-zA-Z0-9][a-zA-Z0-9-]{0,61}[a-zA-Z0-9])*$'
-    ip_pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-
-    if not re.match(domain_pattern, addr) and not re.match(ip_pattern, addr):
+    if not DOMAIN_PATTERN.fullmatch(addr) and not IP_PATTERN.fullmatch(addr):
         return False, '服务器地址格式不正确'
 
     return True, ''
 
 
+def iter_lines(text: str) -> Iterator[Tuple[int, str]]:
+    """
+    逐行迭代文本，不预先拆分成行列表
+
+    Args:
+        text: 文本内容
+
+    Yields:
+        (行号, 行内容)，行号从 1 开始
+    """
+    start = 0
+    line_num = 1
+    length = len(text)
+    while start < length:
+        end = text.find('\n', start)
+        if end == -1:
+            end = length
+        yield line_num, text[start:end]
+        start = end + 1
+        line_num += 1
+
+
 def validate_toml_config(config: str) -> Tuple[bool, str]:
     """
     验证 TOML/INI 配置格式
@@ -136,22 +173,21 @@ def validate_toml_config(config: str) -> Tuple[bool, str]:
     Returns:
         (是否有效, 错误消息)
     """
-    if not config or not config.strip():
+    if not config or config.isspace():
         return False, '配置不能为空'
 
     # 基本格式检查
-    lines = config.strip().split('\n')
     has_section = False
 
-    for line_num, line in enumerate(lines, 1):
+    for line_num, line in iter_lines(config):
         line = line.strip()
 
         # 跳过空行和注释
-        if not line or line.startswith('#'):
+        if not line or line[0] == '#':
             continue
 
         # 检查节标题格式 [section] 或 [[section]]
-        if line.startswith('[') and line.endswith(']'):
+        if line[0] == '[' and line[-1] == ']':
             has_section = True
             continue
 
@@ -162,12 +198,12 @@ def validate_toml_config(config: str) -> Tuple[bool, str]:
         #   key = true
         #   key = ["array"]
         #   key = {table}
-        if '=' not in line:
+        eq = line.find('=')
+        if eq == -1:
             # 可能是内联表的一部分，跳过
             continue
 
-        key_part = line.split('=')[0].strip()
-        if not key_part:
+        if eq == 0 or line[:eq].isspace():
             return False, f'第 {line_num} 行格式错误: 键名不能为空'
 
     if not has_section:
@@ -176,6 +212,134 @@ def validate_toml_config(config: str) -> Tuple[bool, str]:
     return True, ''
 
 
+def required(validator: Validator, message: str) -> Validator:
+    """
+    组合验证器：字段必须存在且非空，再交给 validator 校验
+
+    Args:
+        validator: 字段验证器
+        message: 字段缺失时的错误消息
+
+    Returns:
+        新的验证器
+    """
+    def validate(value: Any) -> Tuple[bool, str]:
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return False, message
+        return validator(value)
+    return validate
+
+
+def optional(validator: Validator) -> Validator:
+    """
+    组合验证器：字段缺失时视为有效，存在时交给 validator 校验
+
+    Args:
+        validator: 字段验证器
+
+    Returns:
+        新的验证器
+    """
+    def validate(value: Any) -> Tuple[bool, str]:
+        if value is None:
+            return True, ''
+        return validator(value)
+    return validate
+
+
+def validate_schema(data: Any, schema: Dict[str, Validator]) -> Tuple[bool, str]:
+    """
+    按 schema 校验请求数据，返回第一个错误
+
+    Args:
+        data: 请求数据
+        schema: 字段名 -> 验证器
+
+    Returns:
+        (是否有效, 错误消息)
+    """
+    if not isinstance(data, dict):
+        return False, '请求数据格式错误'
+
+    for field, validator in schema.items():
+        valid, message = validator(data.get(field))
+        if not valid:
+            return False, message
+
+    return True, ''
+
+
+def validate_template_vars(variables: Any) -> Tuple[bool, str]:
+    """
+    验证模板变量：必须是以字符串为键、标量为值的对象
+
+    Args:
+        variables: 模板变量
+
+    Returns:
+        (是否有效, 错误消息)
+    """
+    if not isinstance(variables, dict):
+        return False, '模板变量必须是对象'
+    for key, value in variables.items():
+        if not isinstance(key, str) or not key:
+            return False, '模板变量名必须是非空字符串'
+        if not isinstance(value, (str, int, float, bool)):
+            return False, f'模板变量 {key} 的值必须是字符串或数字'
+    return True, ''
+
+
+# 创建客户端（表单模式）的请求数据校验规则
+CLIENT_FORM_SCHEMA: Dict[str, Validator] = {
+    'name': validate_client_name,
+    'server_addr': required(validate_server_addr, '服务器地址不能为空'),
+    'server_port': optional(validate_port),
+    'local_port': required(validate_port, '本地端口不能为空'),
+    'remote_port': required(validate_port, '远程端口不能为空'),
+    'template_vars': optional(validate_template_vars),
+}
+
+# 创建客户端（粘贴配置模式）的请求数据校验规则
+CLIENT_CONFIG_SCHEMA: Dict[str, Validator] = {
+    'name': validate_client_name,
+    'config_content': validate_toml_config,
+}
+
+# 更新客户端的请求数据校验规则（字段均可省略）
+CLIENT_UPDATE_SCHEMA: Dict[str, Validator] = {
+    'name': optional(validate_client_name),
+    'template_vars': optional(validate_template_vars),
+}
+
+
+def validate_client_payload(data: Any) -> Tuple[bool, str]:
+    """
+    校验创建客户端的请求数据，按是否包含 config_content 选择规则
+
+    Args:
+        data: 请求数据
+
+    Returns:
+        (是否有效, 错误消息)
+    """
+    if isinstance(data, dict) and data.get('config_content'):
+        return validate_schema(data, CLIENT_CONFIG_SCHEMA)
+    return validate_schema(data, CLIENT_FORM_SCHEMA)
+
+
+def validate_client_update_payload(data: Any) -> Tuple[bool, str]:
+    """
+    校验更新客户端的请求数据
+
+    Args:
+        data: 请求数据
+
+    Returns:
+        (是否有效, 错误消息)
+    """
+    return validate_schema(data, CLIENT_UPDATE_SCHEMA)
+
+
 def sanitize_filename(filename: str) -> str:
     """
     清理文件名，移除不安全字符
@@ -190,7 +354,7 @@ def sanitize_filename(filename: str) -> str:
     filename = filename.replace('..', '').replace('/', '').replace('\\', '')
 
     # 移除特殊字符
-    filename = re.sub(r'[<>:"|?*]', '', filename)
+    filename = UNSAFE_FILENAME_PATTERN.sub('', filename)
 
     # 限制长度
     if len(filename) > 255:
@@ -214,6 +214,7 @@ export default {
     message: 'Message',
     time: 'Time',
     resolve: 'Mark Resolved',
+    loadMore: 'Load more',
     resolving: 'Processing...',
     resolvedStatus: 'Resolved',
     unresolvedStatus: 'Unresolved',
@@ -223,7 +224,10 @@ export default {
       offline: 'Offline',
     },
     resolveSuccess: 'Alert marked as resolved',
-    clearSuccess: 'All resolved alerts cleared',
+    clearSuccess: 'Cleared {{count}} resolved alerts',
+    clearRunning: 'A clear job is already running, waiting for it to finish',
+    clearCancelled: 'Clearing was cancelled after {{count}} alerts',
+    clearError: 'Failed to clear resolved alerts',
     actionError: 'Operation failed',
   },
   settings: {
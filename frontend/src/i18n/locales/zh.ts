@@ -214,6 +214,7 @@ export default {
     message: '消息',
     time: '时间',
     resolve: '标记已解决',
+    loadMore: '加载更多',
     resolving: '处理中...',
     resolvedStatus: '已解决',
     unresolvedStatus: '未解决',
@@ -223,7 +224,10 @@ export default {
       offline: '离线',
     },
     resolveSuccess: '告警已标记为已解决',
-    clearSuccess: '已清除所有已解决的告警',
+    clearSuccess: '已清除 {{count}} 条已解决的告警',
+    clearRunning: '已有清除任务正在运行，等待其结束',
+    clearCancelled: '清除已取消，已清除 {{count}} 条',
+    clearError: '清除已解决的告警失败',
     actionError: '操作失败',
   },
   settings: {
@@ -28,7 +28,7 @@ export class ApiError extends Error {
 }
 
 
-export async function apiFetch(url: string, options: RequestInit = {}): Promise<any> {
+async function send(url: string, options: RequestInit = {}): Promise<Response> {
   const method = options.method?.toUpperCase() || 'GET';
 
   if (!['GET', 'HEAD', 'OPTIONS'].includes(method)) {
@@ -57,6 +57,12 @@ export async function apiFetch(url: string, options: RequestInit = {}): Promise<
     throw new ApiError(response.status, errorBody, errorBody.error || 'API request failed');
   }
 
+  return response;
+}
+
+export async function apiFetch(url: string, options: RequestInit = {}): Promise<any> {
+  const response = await send(url, options);
+
   const contentType = response.headers.get('Content-Type') || response.headers.get('content-type');
   if (contentType?.includes('application/json')) {
     return response.json();
@@ -64,3 +70,17 @@ export async function apiFetch(url: string, options: RequestInit = {}): Promise<
 
   return response.text();
 }
+
+export interface Page<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
+// 分页列表：下一页的游标在 X-Next-Cursor 响应头中，没有更多时为 null
+export async function apiFetchPage<T>(url: string): Promise<Page<T>> {
+  const response = await send(url);
+  return {
+    items: await response.json(),
+    nextCursor: response.headers.get('X-Next-Cursor'),
+  };
+}
@@ -2,10 +2,10 @@
  * 告警页面
  * 显示和管理所有告警信息
  */
-import { useState, useEffect } from "react";
+import { useState, useEffect, useCallback } from "react";
 import { useTranslation } from "react-i18next";
 import { useApi } from "@/hooks/useApi.ts";
-import { apiFetch } from "@/lib/api.ts";
+import { apiFetch, apiFetchPage, ApiError } from "@/lib/api.ts";
 import { useToast } from "@/contexts/toast-context.tsx";
 import {
     Table,
@@ -20,17 +20,66 @@ import { Badge } from "@/components/ui/badge.tsx";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card.tsx";
 import { AlertTriangle, CheckCircle, Trash2, RefreshCw, Bell } from "lucide-react";
 import i18n from "@/i18n";
-import type { Alert, AlertStats } from "@/types";
+import type { Alert, AlertCleanupJob, AlertStats } from "@/types";
+
+type AlertFilter = 'all' | 'unresolved';
+
+// 告警列表按页获取（每页 100 条），未解决过滤由后端完成
+function alertsUrl(filter: AlertFilter, cursor?: string | null) {
+    const params = new URLSearchParams();
+    if (filter === 'unresolved') params.set('resolved', 'false');
+    if (cursor) params.set('cursor', cursor);
+    const query = params.toString();
+    return query ? `/alerts?${query}` : '/alerts';
+}
 
 export default function AlertsPage() {
     const { t } = useTranslation();
-    const { success, error: toastError } = useToast();
-    const { data: alerts, isLoading, error, fetchData: fetchAlerts } = useApi<Alert[]>("/alerts");
+    const { success, error: toastError, info } = useToast();
     const { data: stats, fetchData: fetchStats } = useApi<AlertStats>("/alerts/stats");
-    const [filter, setFilter] = useState<'all' | 'unresolved'>('all');
+    const [filter, setFilter] = useState<AlertFilter>('all');
+    const [alerts, setAlerts] = useState<Alert[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [isLoading, setIsLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [error, setError] = useState<Error | null>(null);
     const [resolving, setResolving] = useState<number | null>(null);
     const [clearing, setClearing] = useState(false);
 
+    // 重新加载第一页
+    const fetchAlerts = useCallback(async () => {
+        setIsLoading(true);
+        setError(null);
+        try {
+            const page = await apiFetchPage<Alert>(alertsUrl(filter));
+            setAlerts(page.items);
+            setNextCursor(page.nextCursor);
+        } catch (err) {
+            setError(err as Error);
+        } finally {
+            setIsLoading(false);
+        }
+    }, [filter]);
+
+    useEffect(() => {
+        fetchAlerts();
+    }, [fetchAlerts]);
+
+    const handleLoadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const page = await apiFetchPage<Alert>(alertsUrl(filter, nextCursor));
+            setAlerts(prev => [...prev, ...page.items]);
+            setNextCursor(page.nextCursor);
+        } catch (err) {
+            toastError(t('alerts.actionError'));
+            console.error('Failed to load alerts:', err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     // 根据未解决数量动态设置默认过滤器
     useEffect(() => {
         if (stats) {
@@ -42,11 +91,6 @@ export default function AlertsPage() {
         }
     }, [stats]);
 
-    const filteredAlerts = Array.isArray(alerts) ? alerts.filter(alert => {
-        if (filter === 'unresolved') return !alert.resolved;
-        return true;
-    }) : [];
-
     const handleResolve = async (alertId: number) => {
         setResolving(alertId);
         try {
@@ -64,15 +108,33 @@ export default function AlertsPage() {
         }
     };
 
+    // 清除在后台分批执行（202），轮询任务直到结束；已有任务在运行时（409）等待该任务
     const handleClearResolved = async () => {
         setClearing(true);
         try {
-            await apiFetch('/alerts/clear', {
-                method: 'POST',
-            });
+            let job: AlertCleanupJob;
+            try {
+                ({ job } = await apiFetch('/alerts/clear', {
+                    method: 'POST',
+                }));
+            } catch (err) {
+                if (!(err instanceof ApiError && err.status === 409)) throw err;
+                job = err.body.job;
+                info(t('alerts.clearRunning'));
+            }
+            while (job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                ({ job } = await apiFetch('/alerts/clear'));
+            }
             fetchAlerts();
             fetchStats();
-            success(t('alerts.clearSuccess'));
+            if (job.status === 'completed') {
+                success(t('alerts.clearSuccess', { count: job.deleted }));
+            } else if (job.status === 'cancelled') {
+                toastError(t('alerts.clearCancelled', { count: job.deleted }));
+            } else {
+                toastError(`${t('alerts.clearError')}: ${job.error}`);
+            }
         } catch (error) {
             toastError(t('alerts.actionError'));
             console.error('Failed to clear alerts:', error);
@@ -111,7 +173,7 @@ export default function AlertsPage() {
         return colors[type] || 'bg-gray-500';
     };
 
-    if (isLoading && !alerts) {
+    if (isLoading && alerts.length === 0) {
         return <div className="flex items-center justify-center h-64">{t('common.loading')}</div>;
     }
 
@@ -119,8 +181,9 @@ export default function AlertsPage() {
         return <div className="text-destructive">{t('common.error')}: {error.message}</div>;
     }
 
-    const resolvedCount = Array.isArray(alerts) ? alerts.filter(a => a.resolved).length : 0;
-    const unresolvedCount = Array.isArray(alerts) ? alerts.filter(a => !a.resolved).length : 0;
+    // 数量来自统计接口，列表只加载了部分页
+    const resolvedCount = stats?.resolved ?? 0;
+    const unresolvedCount = stats?.unresolved ?? 0;
 
     return (
         <div className="space-y-6">
@@ -212,7 +275,7 @@ export default function AlertsPage() {
             </div>
 
             {/* 告警列表 */}
-            {filteredAlerts.length === 0 ? (
+            {alerts.length === 0 ? (
                 <Card>
                     <CardContent className="flex items-center justify-center h-48 text-muted-foreground">
                         {filter === 'all' ? t('alerts.noAlerts') : t('alerts.noUnresolved')}
@@ -233,7 +296,7 @@ export default function AlertsPage() {
                                 </TableRow>
                             </TableHeader>
                             <TableBody>
-                                {filteredAlerts.map((alert) => (
+                                {alerts.map((alert) => (
                                     <TableRow key={alert.id}>
                                         <TableCell>
                                             {alert.resolved ? (
@@ -276,6 +339,13 @@ export default function AlertsPage() {
                                 ))}
                             </TableBody>
                         </Table>
+                        {nextCursor && (
+                            <div className="flex justify-center p-4">
+                                <Button variant="outline" size="sm" onClick={handleLoadMore} disabled={loadingMore}>
+                                    {loadingMore ? t('common.loading') : t('alerts.loadMore')}
+                                </Button>
+                            </div>
+                        )}
                     </CardContent>
                 </Card>
             )}
@@ -24,14 +24,27 @@ interface EditClientDialogProps {
     children: React.ReactNode;
 }
 
+// 模板客户端可编辑的变量
+const TEMPLATE_VAR_FIELDS = ['server_addr', 'server_port', 'local_port', 'remote_port', 'user', 'token'] as const;
+
+// 表单初始值：模板客户端的服务器端口、用户和令牌保存在模板变量中
+function toFormData(client: Client): Client {
+    if (!client.template_vars) return client;
+    try {
+        return { ...client, ...JSON.parse(client.template_vars) };
+    } catch {
+        return client;
+    }
+}
+
 export function EditClientDialog({ client, onClientUpdated, children }: EditClientDialogProps) {
     const { t } = useTranslation();
     const { success, error: toastError } = useToast();
     const [open, setOpen] = useState(false);
-    const [formData, setFormData] = useState(client);
+    const [formData, setFormData] = useState(() => toFormData(client));
 
     useEffect(() => {
-        setFormData(client);
+        setFormData(toFormData(client));
     }, [client]);
 
     const handleChange = (e: React.ChangeEvent<HTMLInputElement>) => {
@@ -48,9 +61,24 @@ export function EditClientDialog({ client, onClientUpdated, children }: EditClie
 
     const handleSubmit = async () => {
         try {
+            const payload: Record<string, unknown> = {
+                name: formData.name,
+                enabled: formData.enabled,
+                always_on: formData.always_on,
+            };
+            if (client.template_id) {
+                payload.template_vars = Object.fromEntries(
+                    TEMPLATE_VAR_FIELDS
+                        .filter(field => {
+                            const value = formData[field];
+                            return value !== undefined && value !== '' && !Number.isNaN(value);
+                        })
+                        .map(field => [field, formData[field]])
+                );
+            }
             await apiFetch(`/clients/${client.id}`, {
                 method: 'PUT',
-                body: JSON.stringify(formData),
+                body: JSON.stringify(payload),
             });
             onClientUpdated();
             setOpen(false);
@@ -1,6 +1,6 @@
 import { useState, useEffect, ReactNode } from "react";
 import { useApi } from "@/hooks/useApi.ts";
-import { apiFetch } from "@/lib/api.ts";
+import { apiFetch, ApiError } from "@/lib/api.ts";
 import { useToast } from "@/contexts/toast-context.tsx";
 import { Button } from "@/components/ui/button.tsx";
 import {
@@ -23,6 +23,7 @@ interface EditConfigDialogProps {
 
 interface ConfigResponse {
     config: string;
+    version?: number;
 }
 
 export function EditConfigDialog({ clientId, clientName, children }: EditConfigDialogProps) {
@@ -54,13 +55,18 @@ export function EditConfigDialog({ clientId, clientName, children }: EditConfigD
         try {
             await apiFetch(`/clients/${clientId}/config`, {
                 method: 'PUT',
-                body: JSON.stringify({ config: configContent }),
+                // 携带读取时的版本号，配置已被他人修改时服务端返回 409
+                body: JSON.stringify({ config: configContent, version: configData?.version }),
             });
             success('配置文件已保存');
             setOpen(false);
         } catch (error) {
             console.error("Failed to save config:", error);
-            toastError('保存失败，请重试');
+            if (error instanceof ApiError && error.status === 409) {
+                toastError('配置已被其他人修改，请重新打开后再编辑');
+            } else {
+                toastError('保存失败，请重试');
+            }
         } finally {
             setIsSaving(false);
         }
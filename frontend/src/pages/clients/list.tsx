@@ -45,12 +45,20 @@ export default function ClientListPage() {
         );
     }, [clients, searchTerm]);
 
-    // 控制 frpc 服务（通过后端调用 systemctl）
+    // 控制 frpc 服务（后端在后台调用 systemctl，轮询任务直到结束）
     const handleServiceAction = async (action: string) => {
         try {
-            await apiFetch(`/service/${action}`, { method: 'POST' });
+            let { job } = await apiFetch(`/service/${action}`, { method: 'POST' });
+            while (job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                ({ job } = await apiFetch(`/service/jobs/${job.id}`));
+            }
             const actionText = action === 'start' ? '启动' : action === 'stop' ? '停止' : '重启';
-            success(`frpc 服务${actionText}成功`);
+            if (job.status === 'succeeded') {
+                success(`frpc 服务${actionText}成功`);
+            } else {
+                toastError(`frpc 服务${actionText}失败: ${job.error}`);
+            }
         } catch (error) {
             console.error(`Failed to ${action} service:`, error);
             toastError(`操作失败: ${error}`);
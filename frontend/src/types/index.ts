@@ -20,6 +20,9 @@ export interface Client {
   status: ClientStatus;
   enabled: boolean;
   always_on: boolean;
+  template_id?: number | null; // 使用的配置模板
+  template_vars?: string | null; // 模板变量（JSON 字符串）
+  version?: number;
   traffic_in_cache: number;
   traffic_out_cache: number;
   connections_active_cache: number;
@@ -62,6 +65,18 @@ export interface Alert {
   client_name?: string; // 连接查询时包含
 }
 
+// 清除已解决告警的后台任务
+export interface AlertCleanupJob {
+  id: number;
+  status: 'running' | 'completed' | 'cancelled' | 'failed';
+  total: number;
+  deleted: number;
+  batches: number;
+  started_at: number;
+  finished_at: number | null;
+  error: string | null;
+}
+
 // 告警统计
 export interface AlertStats {
   total: number;
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+FRP Console 压测脚本（仅使用标准库）
+
+对 GET /api/clients（登录会话）和 GET /api/configs/<id>/export（API Token）并发发起请求，
+输出吞吐量、延迟分位数和错误数，用于比较开发服务器与 gunicorn 各工作模型的差异。
+
+用法:
+    python scripts/loadtest.py --url http://127.0.0.1:7600 --username admin --password ... \\
+        --api-token ... --client-id 1 --concurrency 32 --duration 20
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit
+
+
+def login(base: urlsplit, username: str, password: str) -> str:
+    """登录并返回 Cookie 头"""
+    conn = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=10)
+    body = json.dumps({'username': username, 'password': password})
+    conn.request('POST', '/login', body, {'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    response.read()
+    if response.status != 200:
+        raise SystemExit(f'登录失败: HTTP {response.status}')
+    cookie = SimpleCookie(response.getheader('Set-Cookie'))
+    conn.close()
+    return '; '.join(f'{key}={morsel.value}' for key, morsel in cookie.items())
+
+
+def worker(base, path, headers, deadline, latencies, errors, lock):
+    """在同一个长连接上循环请求，直到截止时间"""
+    conn = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=30)
+    local_latencies, local_errors = [], 0
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                local_errors += 1
+            if response.getheader('Connection', '').lower() == 'close':
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection(base.hostname, base.port or 80, timeout=30)
+            continue
+        local_latencies.append(time.perf_counter() - start)
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(base, name, path, headers, concurrency, duration):
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=worker, args=(base, path, headers, deadline, latencies, errors, lock))
+        for _ in range(concurrency)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    latencies.sort()
+    print(f'{name:<8} {len(latencies) / elapsed:>10.1f} req/s   '
+          f'p50 {percentile(latencies, 0.5) * 1000:>7.1f} ms   '
+          f'p95 {percentile(latencies, 0.95) * 1000:>7.1f} ms   '
+          f'p99 {percentile(latencies, 0.99) * 1000:>7.1f} ms   '
+          f'errors {sum(errors)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FRP Console 压测')
+    parser.add_argument('--url', default='http://127.0.0.1:7600')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password')
+    parser.add_argument('--api-token', help='测试导出接口时需要')
+    parser.add_argument('--client-id', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20, help='每个接口的压测时长（秒）')
+    args = parser.parse_args()
+
+    base = urlsplit(args.url)
+    print(f'{args.url}  并发 {args.concurrency}  每个接口 {args.duration:.0f} 秒')
+    if args.password:
+        cookie = login(base, args.username, args.password)
+        run(base, 'clients', '/api/clients', {'Cookie': cookie, 'Accept': 'application/json'},
+            args.concurrency, args.duration)
+    if args.api_token:
+        run(base, 'export', f'/api/configs/{args.client_id}/export',
+            {'Authorization': f'Bearer {args.api_token}'}, args.concurrency, args.duration)
+    if not args.password and not args.api_token:
+        parser.error('至少指定 --password 或 --api-token')
+
+
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,15 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../app')))
 
 
+@pytest.fixture(autouse=True)
+def shared_state(monkeypatch):
+    """每个测试使用新的进程内共享状态，登录和重启限流记录不在测试之间累积"""
+    from utils import shared_state
+    state = shared_state.MemoryState()
+    monkeypatch.setattr(shared_state, '_state', state)
+    return state
+
+
 @pytest.fixture
 def test_config():
     """测试配置 fixture"""
@@ -48,6 +57,55 @@ def test_database(tmp_path):
     conn.close()
 
 
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """使用 init_db 初始化的临时数据库 fixture"""
+    from config import Config
+    from models.database import init_db
+
+    db_path = str(tmp_path / "frpc.db")
+    monkeypatch.setattr(Config, 'DATABASE_URL', db_path)
+    init_db()
+    return db_path
+
+
+@pytest.fixture
+def statement_counter():
+    """
+    SQL 语句计数 fixture（需在应用上下文中使用）
+
+    记录 get_db() 连接上执行的语句，忽略事务控制和 PRAGMA 语句。
+    外键级联动作会以父语句的文本再次触发回调，因此连续重复的语句只计一次。
+    """
+    from models.database import get_db
+
+    class StatementCounter:
+        IGNORED = ('BEGIN', 'COMMIT', 'ROLLBACK', 'PRAGMA')
+
+        def __init__(self):
+            self.statements = []
+
+        def _trace(self, sql):
+            if self.statements and self.statements[-1] == sql:
+                return
+            if sql.lstrip().split(None, 1)[0].upper() not in self.IGNORED:
+                self.statements.append(sql)
+
+        def __enter__(self):
+            self.statements = []
+            get_db().set_trace_callback(self._trace)
+            return self
+
+        def __exit__(self, *exc_info):
+            get_db().set_trace_callback(None)
+
+        @property
+        def count(self):
+            return len(self.statements)
+
+    return StatementCounter()
+
+
 @pytest.fixture
 def test_app():
     """测试 Flask 应用 fixture"""
@@ -99,3 +157,135 @@ def test_auth_headers(test_client):
         'password': 'test_password'
     })
     return {}
+
+
+class SMTPStandIn:
+    """
+    本地 SMTP 测试服务器（支持 EHLO、AUTH PLAIN/LOGIN、MAIL、RCPT、DATA、NOOP、RSET、QUIT）
+
+    - messages: 收到的邮件 (发件人, 收件人列表, 内容)
+    - connections / logins: 建立的连接数和登录次数
+    - fail_codes: 依次用于 DATA 结束时的响应码（为空时返回 250）
+    - refused: 拒绝的收件人地址
+    - drop_after_message: 每封邮件后由服务器主动断开连接
+    """
+
+    def __init__(self):
+        import socketserver
+        import threading
+
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        self.fail_codes = []
+        self.refused = set()
+        self.drop_after_message = False
+        stand_in = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b'\r\n')
+
+            def readline(self):
+                return self.rfile.readline().decode().rstrip('\r\n')
+
+            def handle(self):
+                stand_in.connections += 1
+                sender, recipients = None, []
+                self.reply('220 localhost ESMTP stand-in')
+                while True:
+                    line = self.readline()
+                    if not line and self.rfile.closed:
+                        return
+                    command = line.split(' ', 1)[0].upper()
+                    if command == 'EHLO':
+                        self.reply('250-localhost')
+                        self.reply('250 AUTH PLAIN LOGIN')
+                    elif command == 'HELO':
+                        self.reply('250 localhost')
+                    elif command == 'AUTH':
+                        parts = line.split()
+                        if parts[1].upper() == 'LOGIN':
+                            self.reply('334 VXNlcm5hbWU6')
+                            self.readline()
+                            self.reply('334 UGFzc3dvcmQ6')
+                            self.readline()
+                        elif len(parts) == 2:
+                            self.reply('334 ')
+                            self.readline()
+                        stand_in.logins += 1
+                        self.reply('235 Authentication successful')
+                    elif command == 'MAIL':
+                        sender, recipients = line.split(':', 1)[1].strip(' <>'), []
+                        self.reply('250 OK')
+                    elif command == 'RCPT':
+                        address = line.split(':', 1)[1].strip(' <>')
+                        if address in stand_in.refused:
+                            self.reply('550 No such user')
+                        else:
+                            recipients.append(address)
+                            self.reply('250 OK')
+                    elif command == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        lines = []
+                        while True:
+                            data = self.readline()
+                            if data == '.':
+                                break
+                            lines.append(data)
+                        code = stand_in.fail_codes.pop(0) if stand_in.fail_codes else 250
+                        if code == 250:
+                            stand_in.messages.append((sender, recipients, '\n'.join(lines)))
+                            self.reply('250 OK queued')
+                        else:
+                            self.reply(f'{code} Rejected')
+                        if stand_in.drop_after_message:
+                            return
+                    elif command in ('NOOP', 'RSET'):
+                        self.reply('250 OK')
+                    elif command == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    elif not line:
+                        return
+                    else:
+                        self.reply('502 Command not implemented')
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server(('127.0.0.1', 0), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    """本地 SMTP 测试服务器，并将 SMTP_CONFIG 指向它"""
+    from config import Config
+
+    server = SMTPStandIn()
+    monkeypatch.setattr(Config, 'SMTP_CONFIG', {
+        'host': '127.0.0.1', 'port': server.port, 'user': 'alert@example.com',
+        'password': 'secret', 'to': ['ops@example.com'], 'starttls': False,
+    })
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def alert_pipeline(temp_db, monkeypatch):
+    """使用临时数据库的独立告警处理实例（替换全局实例）"""
+    from services import alert_service, client_service
+    from services.alert_pipeline import AlertPipeline
+
+    pipeline = AlertPipeline()
+    monkeypatch.setattr(alert_service, 'alert_pipeline', pipeline)
+    monkeypatch.setattr(client_service, 'alert_pipeline', pipeline)
+    return pipeline
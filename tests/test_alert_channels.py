@@ -0,0 +1,258 @@
+"""
+告警通知通道测试
+"""
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from config import Config
+from models.database import get_db_connection
+from services.alert_channels import CommandChannel, SMTPChannel, SMTPSession, WebhookChannel
+from services.alert_dispatcher import AlertDispatcher, DELIVERIES, DELIVERY_SECONDS
+
+
+class WebhookStandIn:
+    """本地 Webhook 测试服务器"""
+
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.release = threading.Event()
+        self.release.set()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length))
+                stand_in.release.wait(10)
+                stand_in.requests.append((dict(self.headers), payload))
+                status = stand_in.statuses.pop(0) if stand_in.statuses else 200
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/hook'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    stand_in = WebhookStandIn()
+    monkeypatch.setattr(Config, 'ALERT_WEBHOOK_URL', stand_in.url)
+    monkeypatch.setattr(Config, 'ALERT_WEBHOOK_TOKEN', 'hook-token')
+    monkeypatch.setattr(Config, 'ALERT_WEBHOOK_TIMEOUT', 15)
+    yield stand_in
+    stand_in.close()
+
+
+@pytest.fixture
+def dispatcher(temp_db, smtp_server, clock, monkeypatch):
+    monkeypatch.setattr(Config, 'ALERT_RETRY_BASE_SECONDS', 30)
+    monkeypatch.setattr(Config, 'ALERT_MAX_ATTEMPTS', 3)
+    monkeypatch.setattr(Config, 'ALERT_COMMAND', None)
+    channels = {
+        'smtp': SMTPChannel(workers=1, session_factory=lambda: SMTPSession(clock=clock)),
+        'webhook': WebhookChannel(workers=2),
+        'command': CommandChannel(workers=1),
+    }
+    dispatcher = AlertDispatcher(channels=channels, clock=clock)
+    yield dispatcher
+    dispatcher.stop()
+
+
+def enqueue(dispatcher, channel, recipients=(), subject='subject', alert_id=None):
+    conn = get_db_connection()
+    outbox_id = dispatcher.enqueue(conn, subject, 'body 正文', list(recipients), alert_id=alert_id, channel=channel)
+    conn.commit()
+    conn.close()
+    return outbox_id
+
+
+def outbox(outbox_id):
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM alert_outbox WHERE id = ?', (outbox_id,)).fetchone()
+    conn.close()
+    return dict(row)
+
+
+def run(dispatcher):
+    submitted = dispatcher.process_due()
+    assert dispatcher.drain(timeout=10)
+    return submitted
+
+
+class TestFanOut:
+    """多通道并发投递测试"""
+
+    def test_destinations(self, dispatcher, webhook):
+        """测试只返回已启用通道的投递目标"""
+        assert dispatcher.destinations() == [('smtp', 'ops@example.com'), ('webhook', '')]
+
+    def test_slow_webhook_does_not_delay_email(self, dispatcher, webhook, smtp_server):
+        """测试 Webhook 阻塞时邮件仍然按时发送"""
+        webhook.release.clear()
+        hook_id = enqueue(dispatcher, 'webhook')
+        mail_id = enqueue(dispatcher, 'smtp', ['ops@example.com'])
+        assert dispatcher.process_due() == 2
+
+        # 邮件通道线程不受阻塞的 Webhook 影响
+        for _ in range(100):
+            if outbox(mail_id)['status'] == 'sent':
+                break
+            threading.Event().wait(0.05)
+        assert outbox(mail_id)['status'] == 'sent'
+        assert outbox(hook_id)['status'] == 'pending'
+        assert {'name': 'webhook', 'enabled': True, 'workers': 2, 'in_flight': 1} in dispatcher.get_channels()
+
+        # 正在投递的通知不会被重复提交
+        assert dispatcher.process_due() == 0
+
+        webhook.release.set()
+        assert dispatcher.drain(timeout=10)
+        assert outbox(hook_id)['status'] == 'sent'
+
+    def test_unconfigured_channel_marked_dead(self, dispatcher):
+        """测试通道未启用时通知直接进入 dead 状态"""
+        outbox_id = enqueue(dispatcher, 'command')
+        run(dispatcher)
+        row = outbox(outbox_id)
+        assert row['status'] == 'dead'
+        assert '通知通道未启用' in row['last_error']
+
+
+class TestWebhookChannel:
+    """Webhook 通道测试"""
+
+    def test_payload(self, dispatcher, webhook):
+        """测试请求体和认证头"""
+        enqueue(dispatcher, 'webhook', subject='[FRP告警] node - offline')
+        run(dispatcher)
+
+        headers, payload = webhook.requests[0]
+        assert headers['Authorization'] == 'Bearer hook-token'
+        assert payload['subject'] == '[FRP告警] node - offline'
+        assert payload['body'] == 'body 正文'
+        assert payload['alert_id'] is None
+
+    @pytest.mark.parametrize('status, expected', [(400, 'dead'), (503, 'pending'), (429, 'pending')])
+    def test_status_codes(self, dispatcher, webhook, status, expected):
+        """测试 4xx（408 / 429 除外）不重试，5xx 按退避重试"""
+        webhook.statuses = [status]
+        outbox_id = enqueue(dispatcher, 'webhook')
+        run(dispatcher)
+        row = outbox(outbox_id)
+        assert row['status'] == expected
+        assert row['attempts'] == 1
+        assert f'HTTP {status}' in row['last_error']
+
+    def test_metrics_by_channel(self, dispatcher, webhook):
+        """测试投递结果和耗时按通道统计"""
+        dead = DELIVERIES.labels('webhook', 'dead')
+        sent = DELIVERIES.labels('webhook', 'sent')
+        before_dead, before_sent = dead.get(), sent.get()
+        before_count = DELIVERY_SECONDS.labels('webhook').snapshot()[0][-1]
+
+        webhook.statuses = [404]
+        enqueue(dispatcher, 'webhook')
+        enqueue(dispatcher, 'webhook')
+        run(dispatcher)
+
+        assert dead.get() - before_dead == 1
+        assert sent.get() - before_sent == 1
+        assert DELIVERY_SECONDS.labels('webhook').snapshot()[0][-1] - before_count == 2
+
+
+class TestCommandChannel:
+    """命令通道测试"""
+
+    def test_command_receives_body_and_subject(self, dispatcher, tmp_path, monkeypatch):
+        """测试正文通过标准输入、主题和告警 ID 通过环境变量传入"""
+        output = tmp_path / 'alert.txt'
+        script = ('import os, sys; open(sys.argv[1], "w", encoding="utf-8").write('
+                  'os.environ["FRP_ALERT_SUBJECT"] + "|" + os.environ["FRP_ALERT_ID"] + "|" + '
+                  'sys.stdin.buffer.read().decode("utf-8"))')
+        monkeypatch.setattr(Config, 'ALERT_COMMAND', f'{sys.executable} -c \'{script}\' {output}')
+
+        outbox_id = enqueue(dispatcher, 'command', subject='[FRP告警] node - offline')
+        run(dispatcher)
+        assert outbox(outbox_id)['status'] == 'sent'
+        assert output.read_text(encoding='utf-8') == '[FRP告警] node - offline||body 正文'
+
+    def test_non_zero_exit_retried(self, dispatcher, monkeypatch):
+        """测试命令失败时按退避重试，错误信息包含标准错误输出"""
+        script = 'import sys; sys.stderr.write("gateway down"); sys.exit(3)'
+        monkeypatch.setattr(Config, 'ALERT_COMMAND', f'{sys.executable} -c \'{script}\'')
+
+        outbox_id = enqueue(dispatcher, 'command')
+        run(dispatcher)
+        row = outbox(outbox_id)
+        assert row['status'] == 'pending'
+        assert '退出码 3: gateway down' in row['last_error']
+
+    def test_missing_command_is_permanent(self, dispatcher, monkeypatch):
+        """测试命令不存在时不再重试"""
+        monkeypatch.setattr(Config, 'ALERT_COMMAND', '/nonexistent/frp-alert-hook')
+
+        outbox_id = enqueue(dispatcher, 'command')
+        run(dispatcher)
+        assert outbox(outbox_id)['status'] == 'dead'
+
+
+class TestPipelineChannels:
+    """告警处理与多通道集成测试"""
+
+    def test_each_channel_gets_notification(self, temp_db, smtp_server, webhook, alert_pipeline):
+        """测试同一告警分别加入每个通道的发送队列"""
+        conn = get_db_connection()
+        conn.execute("INSERT INTO clients (name, config_content) VALUES ('node', '[common]')")
+        conn.commit()
+        conn.close()
+
+        alert_pipeline.fire(1, 'offline', 'down')
+        assert alert_pipeline.flush(force=True) == 2
+
+        conn = get_db_connection()
+        alert = conn.execute('SELECT sent_to FROM alerts').fetchone()
+        rows = conn.execute('SELECT channel, recipients FROM alert_outbox ORDER BY channel').fetchall()
+        conn.close()
+        assert alert['sent_to'] == 'smtp:ops@example.com,webhook'
+        assert [tuple(row) for row in rows] == [('smtp', 'ops@example.com'), ('webhook', '')]
+
+    def test_channels_route(self, test_client, dispatcher, webhook, monkeypatch):
+        """测试通知通道状态接口"""
+        from api.routes import admin
+
+        monkeypatch.setattr(admin, 'alert_dispatcher', dispatcher)
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+        data = test_client.get('/api/alerts/channels').get_json()
+        assert [(channel['name'], channel['enabled']) for channel in data] == [
+            ('smtp', True), ('webhook', True), ('command', False)
+        ]
@@ -0,0 +1,173 @@
+"""
+告警批量解决和分批清除测试
+"""
+import time
+
+import pytest
+
+from config import Config
+from models.database import get_db_connection
+from services.alert_cleanup import AlertCleanup, delete_resolved_batch
+
+
+def add_alerts(resolved=0, unresolved=0, client_id=1, alert_type='offline'):
+    conn = get_db_connection()
+    if not conn.execute('SELECT 1 FROM clients WHERE id = ?', (client_id,)).fetchone():
+        conn.execute('INSERT INTO clients (id, name, config_content) VALUES (?, ?, ?)',
+                     (client_id, f'node-{client_id}', '[common]'))
+    conn.executemany(
+        'INSERT INTO alerts (client_id, alert_type, message, resolved) VALUES (?, ?, ?, ?)',
+        [(client_id, alert_type, 'msg', 1)] * resolved + [(client_id, alert_type, 'msg', 0)] * unresolved
+    )
+    conn.commit()
+    conn.close()
+
+
+def count(where='1 = 1'):
+    conn = get_db_connection()
+    value = conn.execute(f'SELECT COUNT(*) AS count FROM alerts WHERE {where}').fetchone()['count']
+    conn.close()
+    return value
+
+
+@pytest.fixture
+def client(test_client):
+    with test_client.session_transaction() as sess:
+        sess['logged_in'] = True
+        sess['csrf_token'] = 'token'
+    return test_client
+
+
+def post(client, url, json=None):
+    return client.post(url, json=json, headers={'X-CSRF-Token': 'token'})
+
+
+class TestBulkResolve:
+    """批量解决测试"""
+
+    def test_resolve_by_ids(self, client, temp_db, alert_pipeline):
+        """测试按 ID 列表解决，忽略不存在和已解决的告警，并移出去重索引"""
+        add_alerts(resolved=1)
+        alert_pipeline.fire(1, 'offline', 'down')
+        alert_pipeline.fire(1, 'tunnel_down', 'down')
+        assert len(alert_pipeline.get_status()['open']) == 2
+
+        response = post(client, '/api/alerts/resolve', {'ids': [1, 2, 3, 99]})
+        assert response.status_code == 200
+        assert response.get_json()['resolved'] == 2
+        assert count('resolved = 0') == 0
+        assert count('resolved = 1 AND resolved_at IS NOT NULL') == 2
+        assert alert_pipeline.get_status()['open'] == []
+
+    def test_resolve_single(self, client, temp_db):
+        """测试单条解决记录解决时间"""
+        add_alerts(unresolved=1)
+        assert post(client, '/api/alerts/1/resolve').status_code == 200
+        assert count('resolved = 1 AND resolved_at IS NOT NULL') == 1
+
+    def test_resolve_by_filter(self, client, temp_db):
+        """测试按客户端和类型过滤解决"""
+        add_alerts(unresolved=3, client_id=1, alert_type='offline')
+        add_alerts(unresolved=2, client_id=1, alert_type='tunnel_down')
+        add_alerts(unresolved=4, client_id=2, alert_type='offline')
+
+        response = post(client, '/api/alerts/resolve', {'client_id': 1, 'type': 'offline'})
+        assert response.get_json()['resolved'] == 3
+        response = post(client, '/api/alerts/resolve', {'type': 'offline'})
+        assert response.get_json()['resolved'] == 4
+        assert count('resolved = 0') == 2
+
+    def test_many_ids(self, client, temp_db):
+        """测试 ID 数量超过单条语句的参数上限"""
+        add_alerts(unresolved=1500)
+        response = post(client, '/api/alerts/resolve', {'ids': list(range(1, 1501))})
+        assert response.get_json()['resolved'] == 1500
+
+    @pytest.mark.parametrize('body', [None, {}, {'ids': '1,2'}, {'ids': [1, 'x']}, {'client_id': '1'}])
+    def test_invalid_request(self, client, temp_db, body):
+        """测试未指定条件或参数类型错误时返回 400"""
+        assert post(client, '/api/alerts/resolve', body).status_code == 400
+
+
+class TestClear:
+    """分批清除测试"""
+
+    @pytest.fixture
+    def cleanup(self, monkeypatch):
+        from api.routes import admin
+
+        cleanup = AlertCleanup()
+        monkeypatch.setattr(admin, 'alert_cleanup', cleanup)
+        monkeypatch.setattr(Config, 'ALERT_CLEAR_BATCH_SIZE', 100)
+        monkeypatch.setattr(Config, 'ALERT_CLEAR_PAUSE_MS', 0)
+        yield cleanup
+        cleanup.cancel()
+        cleanup.wait(5)
+
+    def test_background_clear(self, client, temp_db, cleanup):
+        """测试后台分批删除并报告进度，未解决的告警保留"""
+        add_alerts(resolved=250, unresolved=5)
+        conn = get_db_connection()
+        conn.execute("INSERT INTO alert_outbox (alert_id, subject, body, recipients, next_attempt_at, created_at) "
+                     "VALUES (1, 's', 'b', '', 0, 0)")
+        conn.commit()
+        conn.close()
+
+        response = post(client, '/api/alerts/clear')
+        assert response.status_code == 202
+        assert response.get_json()['job']['total'] == 250
+        assert cleanup.wait(5)
+
+        job = client.get('/api/alerts/clear').get_json()['job']
+        assert job['status'] == 'completed'
+        assert job['deleted'] == 250
+        assert job['batches'] == 3
+        assert count() == 5
+
+        conn = get_db_connection()
+        assert conn.execute('SELECT alert_id FROM alert_outbox').fetchone()['alert_id'] is None
+        conn.close()
+
+    def test_single_job(self, client, temp_db, cleanup, monkeypatch):
+        """测试任务运行中不能再次启动，取消后在当前批次结束时停止"""
+        monkeypatch.setattr(Config, 'ALERT_CLEAR_PAUSE_MS', 10_000)
+        add_alerts(resolved=250)
+
+        assert post(client, '/api/alerts/clear').status_code == 202
+        response = post(client, '/api/alerts/clear')
+        assert response.status_code == 409
+        assert response.get_json()['job']['status'] == 'running'
+
+        # 第一批完成后任务在暂停中
+        for _ in range(100):
+            if cleanup.get_status()['batches']:
+                break
+            time.sleep(0.05)
+        assert cleanup.cancel() is True
+        assert cleanup.wait(5)
+        job = cleanup.get_status()
+        assert job['status'] == 'cancelled'
+        assert job['deleted'] == 100
+        assert count() == 150
+
+    def test_synchronous_clear_in_batches(self, test_app, temp_db, monkeypatch):
+        """测试同步清除同样分批提交"""
+        from services import alert_service
+        from services.alert_service import AlertService
+
+        batches = []
+
+        def delete_batch(conn, batch_size):
+            deleted = delete_resolved_batch(conn, batch_size)
+            batches.append((deleted, conn.in_transaction))
+            return deleted
+
+        monkeypatch.setattr(Config, 'ALERT_CLEAR_BATCH_SIZE', 100)
+        monkeypatch.setattr(alert_service, 'delete_resolved_batch', delete_batch)
+        add_alerts(resolved=250, unresolved=1)
+        with test_app.app_context():
+            success, result = AlertService.clear_resolved_alerts()
+        assert success is True
+        assert result['deleted'] == 250
+        assert batches == [(100, False), (100, False), (50, False)]
+        assert count() == 1
@@ -0,0 +1,249 @@
+"""
+告警发送队列测试
+"""
+import pytest
+
+from config import Config
+from models.database import get_db_connection
+from services.alert_channels import SMTPChannel, SMTPSession
+from services.alert_dispatcher import AlertDispatcher, retry_delay
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def dispatcher(temp_db, smtp_server, clock, monkeypatch):
+    monkeypatch.setattr(Config, 'ALERT_SMTP_TIMEOUT', 5)
+    monkeypatch.setattr(Config, 'ALERT_RETRY_BASE_SECONDS', 30)
+    monkeypatch.setattr(Config, 'ALERT_RETRY_MAX_SECONDS', 3600)
+    monkeypatch.setattr(Config, 'ALERT_MAX_ATTEMPTS', 3)
+    dispatcher = make_dispatcher(clock)
+    yield dispatcher
+    dispatcher.stop()
+
+
+def make_dispatcher(clock):
+    channel = SMTPChannel(workers=1, session_factory=lambda: SMTPSession(clock=clock))
+    return AlertDispatcher(channels={'smtp': channel}, clock=clock)
+
+
+def run(dispatcher):
+    """提交到期通知并等待投递完成"""
+    submitted = dispatcher.process_due()
+    assert dispatcher.drain(timeout=10)
+    return submitted
+
+
+def enqueue(dispatcher, count=1, recipients=('ops@example.com',)):
+    conn = get_db_connection()
+    ids = [dispatcher.enqueue(conn, f'subject {index}', f'body {index}', list(recipients)) for index in range(count)]
+    conn.commit()
+    conn.close()
+    return ids
+
+
+def outbox(outbox_id):
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM alert_outbox WHERE id = ?', (outbox_id,)).fetchone()
+    conn.close()
+    return dict(row)
+
+
+class TestDelivery:
+    """发送测试"""
+
+    def test_session_reused(self, dispatcher, smtp_server):
+        """测试多封邮件复用同一个已登录的连接"""
+        ids = enqueue(dispatcher, 5)
+        assert run(dispatcher) == 5
+
+        assert len(smtp_server.messages) == 5
+        assert smtp_server.connections == 1
+        assert smtp_server.logins == 1
+        assert all(outbox(outbox_id)['status'] == 'sent' for outbox_id in ids)
+        assert 'Subject: subject 0' in smtp_server.messages[0][2]
+
+    def test_reconnect_after_server_drop(self, dispatcher, smtp_server):
+        """测试服务器断开空闲连接后自动重连"""
+        smtp_server.drop_after_message = True
+        ids = enqueue(dispatcher, 2)
+        run(dispatcher)
+
+        assert len(smtp_server.messages) == 2
+        assert smtp_server.connections == 2
+        assert [outbox(outbox_id)['status'] for outbox_id in ids] == ['sent', 'sent']
+
+    def test_idle_session_closed(self, dispatcher, smtp_server, clock, monkeypatch):
+        """测试空闲连接超时后断开"""
+        monkeypatch.setattr(Config, 'ALERT_SMTP_IDLE_SECONDS', 60)
+        enqueue(dispatcher)
+        run(dispatcher)
+        channel = dispatcher.channels['smtp']
+        session, = channel._idle
+
+        clock.now += 30
+        channel.close_idle()
+        assert session.connected
+
+        clock.now += 31
+        channel.close_idle()
+        assert not session.connected
+
+
+class TestRetry:
+    """重试测试"""
+
+    def test_backoff(self, monkeypatch):
+        """测试指数退避且不超过上限"""
+        monkeypatch.setattr(Config, 'ALERT_RETRY_BASE_SECONDS', 30)
+        monkeypatch.setattr(Config, 'ALERT_RETRY_MAX_SECONDS', 100)
+        assert [retry_delay(attempts) for attempts in (1, 2, 3, 4)] == [30, 60, 100, 100]
+
+    def test_transient_failure_retried(self, dispatcher, smtp_server, clock):
+        """测试临时错误按退避时间重试"""
+        smtp_server.fail_codes = [451]
+        outbox_id, = enqueue(dispatcher)
+
+        run(dispatcher)
+        row = outbox(outbox_id)
+        assert row['status'] == 'pending'
+        assert row['attempts'] == 1
+        assert row['next_attempt_at'] == clock.now + 30
+        assert '451' in row['last_error']
+
+        # 未到重试时间
+        assert run(dispatcher) == 0
+        assert dispatcher.next_due_in() == 30
+
+        clock.now += 30
+        run(dispatcher)
+        assert outbox(outbox_id)['status'] == 'sent'
+        assert len(smtp_server.messages) == 1
+
+    def test_dead_after_max_attempts(self, dispatcher, smtp_server, clock):
+        """测试达到最大尝试次数后进入 dead 状态"""
+        smtp_server.fail_codes = [451, 451, 451]
+        outbox_id, = enqueue(dispatcher)
+        for _ in range(3):
+            run(dispatcher)
+            clock.now += 3600
+
+        row = outbox(outbox_id)
+        assert row['status'] == 'dead'
+        assert row['attempts'] == 3
+        assert dispatcher.next_due_in() is None
+
+    def test_permanent_failure_and_manual_retry(self, dispatcher, smtp_server):
+        """测试收件人被拒绝时直接进入 dead 状态，手动重试后重新发送"""
+        smtp_server.refused = {'ops@example.com'}
+        outbox_id, = enqueue(dispatcher)
+        run(dispatcher)
+        assert outbox(outbox_id)['status'] == 'dead'
+        assert outbox(outbox_id)['attempts'] == 1
+
+        smtp_server.refused = set()
+        assert dispatcher.retry(outbox_id) is True
+        assert dispatcher.retry(outbox_id) is False
+        run(dispatcher)
+        assert outbox(outbox_id)['status'] == 'sent'
+
+    def test_pending_survives_restart(self, dispatcher, smtp_server, clock):
+        """测试进程重启后由新实例继续发送"""
+        outbox_id, = enqueue(dispatcher)
+
+        restarted = make_dispatcher(clock)
+        try:
+            assert run(restarted) == 1
+        finally:
+            restarted.stop()
+        assert outbox(outbox_id)['status'] == 'sent'
+
+    def test_prune_sent(self, dispatcher, clock, monkeypatch):
+        """测试清理超过保留期的已发送记录"""
+        monkeypatch.setattr(Config, 'ALERT_OUTBOX_RETENTION_DAYS', 1)
+        enqueue(dispatcher)
+        run(dispatcher)
+        assert dispatcher.prune() == 0
+
+        clock.now += 86400 + 1
+        assert dispatcher.prune() == 1
+
+    def test_outbox_metrics_cached(self, dispatcher, monkeypatch):
+        """测试发送队列统计在缓存时间内不重复查询"""
+        from services import alert_dispatcher as module
+
+        monkeypatch.setattr(module, '_outbox_cache', None)
+
+        def counts():
+            return {labels['status']: value for labels, value in module._outbox_metrics()[0][3]}
+
+        enqueue(dispatcher)
+        assert counts() == {'pending': 1}
+        enqueue(dispatcher)
+        assert counts() == {'pending': 1}
+
+        monkeypatch.setattr(module, 'OUTBOX_METRICS_TTL', 0)
+        assert counts() == {'pending': 2}
+
+
+class TestAlertServiceQueue:
+    """告警服务入队测试"""
+
+    def test_send_alert_does_not_block(self, test_app, temp_db, smtp_server, alert_pipeline):
+        """测试 send_alert 只写入队列，不连接 SMTP"""
+        from services.alert_service import AlertService
+
+        conn = get_db_connection()
+        conn.execute("INSERT INTO clients (name, config_content) VALUES ('node', '[common]')")
+        conn.commit()
+        conn.close()
+
+        with test_app.test_request_context():
+            assert AlertService.send_alert('node', 'offline', 'Client is offline') is True
+        alert_pipeline.flush(force=True)
+
+        assert smtp_server.connections == 0
+        conn = get_db_connection()
+        alert = conn.execute('SELECT * FROM alerts').fetchone()
+        entry = conn.execute('SELECT * FROM alert_outbox').fetchone()
+        conn.close()
+        assert entry['alert_id'] == alert['id']
+        assert entry['status'] == 'pending'
+        assert entry['recipients'] == 'ops@example.com'
+        assert entry['subject'] == '[FRP告警] node - offline'
+
+    def test_outbox_routes(self, test_client, temp_db, smtp_server):
+        """测试发送队列查询和重试接口"""
+        from services.alert_dispatcher import alert_dispatcher
+
+        smtp_server.refused = {'ops@example.com'}
+        outbox_id, = enqueue(alert_dispatcher)
+        alert_dispatcher.process_due()
+        alert_dispatcher.drain(timeout=10)
+        alert_dispatcher.close()
+
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+            sess['csrf_token'] = 'token'
+
+        response = test_client.get('/api/alerts/outbox?status=dead')
+        assert response.status_code == 200
+        assert [entry['id'] for entry in response.get_json()] == [outbox_id]
+        assert test_client.get('/api/alerts/outbox?status=bogus').status_code == 400
+
+        response = test_client.post(f'/api/alerts/outbox/{outbox_id}/retry', headers={'X-CSRF-Token': 'token'})
+        assert response.status_code == 200
+        assert outbox(outbox_id)['status'] == 'pending'
+        response = test_client.post(f'/api/alerts/outbox/{outbox_id}/retry', headers={'X-CSRF-Token': 'token'})
+        assert response.status_code == 404
@@ -0,0 +1,127 @@
+"""
+告警列表分页和统计测试
+"""
+import pytest
+
+from models.database import get_db_connection
+
+
+@pytest.fixture
+def alerts(temp_db):
+    """三个客户端、250 条告警，多条告警的 sent_at 相同"""
+    conn = get_db_connection()
+    for name in ('a', 'b', 'c'):
+        conn.execute('INSERT INTO clients (name, config_content) VALUES (?, ?)', (name, '[common]'))
+    rows = []
+    for index in range(250):
+        rows.append((
+            index % 3 + 1,
+            'offline' if index % 2 else 'tunnel_down',
+            f'alert {index}',
+            f'2024-01-01 00:{index // 10:02d}:00',
+            1 if index % 5 == 0 else 0,
+        ))
+    conn.executemany(
+        'INSERT INTO alerts (client_id, alert_type, message, sent_at, resolved) VALUES (?, ?, ?, ?, ?)', rows
+    )
+    conn.commit()
+    conn.close()
+    return rows
+
+
+@pytest.fixture
+def client(test_client):
+    with test_client.session_transaction() as sess:
+        sess['logged_in'] = True
+    return test_client
+
+
+def fetch_all(client, query=''):
+    """沿 X-Next-Cursor 取完所有页"""
+    pages, cursor = [], None
+    while True:
+        url = f'/api/alerts?limit=40{query}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append(response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return pages
+
+
+class TestPagination:
+    """游标分页测试"""
+
+    def test_pages_cover_all_rows_once(self, client, alerts):
+        """测试逐页获取不重复、不遗漏，且按 sent_at、id 倒序"""
+        pages = fetch_all(client)
+        assert [len(page) for page in pages] == [40] * 6 + [10]
+
+        items = [alert for page in pages for alert in page]
+        assert [alert['id'] for alert in items] == list(range(250, 0, -1))
+        assert items[0]['client_name'] == 'a'
+
+    def test_last_page_without_cursor(self, client, alerts):
+        """测试结果恰好一页时不返回游标"""
+        response = client.get('/api/alerts?limit=250')
+        assert len(response.get_json()) == 250
+        assert 'X-Next-Cursor' not in response.headers
+
+    @pytest.mark.parametrize('query, predicate', [
+        ('&client_id=2', lambda row: row[0] == 2),
+        ('&type=offline', lambda row: row[1] == 'offline'),
+        ('&resolved=false', lambda row: row[4] == 0),
+        ('&resolved=true&type=tunnel_down', lambda row: row[4] == 1 and row[1] == 'tunnel_down'),
+    ])
+    def test_filters(self, client, alerts, query, predicate):
+        """测试过滤条件与翻页组合"""
+        items = [alert for page in fetch_all(client, query) for alert in page]
+        expected = [index + 1 for index, row in enumerate(alerts) if predicate(row)]
+        assert [alert['id'] for alert in items] == expected[::-1]
+
+    @pytest.mark.parametrize('query', ['cursor=bm90LWpzb24', 'cursor=WzEsMl0', 'resolved=maybe'])
+    def test_invalid_parameters(self, client, alerts, query):
+        """测试无效游标和过滤参数返回 400"""
+        assert client.get(f'/api/alerts?{query}').status_code == 400
+
+    def test_queries_use_indexes(self, temp_db):
+        """测试列表查询按索引顺序读取，统计只扫描覆盖索引"""
+        conn = get_db_connection()
+        queries = [
+            "SELECT * FROM alerts a WHERE (a.sent_at, a.id) < ('2024', 5) ORDER BY a.sent_at DESC, a.id DESC",
+            'SELECT * FROM alerts a WHERE a.resolved = 0 ORDER BY a.sent_at DESC, a.id DESC',
+            'SELECT * FROM alerts a WHERE a.client_id = 1 ORDER BY a.sent_at DESC, a.id DESC',
+            "SELECT * FROM alerts a WHERE a.alert_type = 'offline' ORDER BY a.sent_at DESC, a.id DESC",
+        ]
+        for query in queries:
+            plan = ' '.join(row['detail'] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}'))
+            assert 'USING INDEX' in plan and 'TEMP B-TREE' not in plan, plan
+
+        stats = 'SELECT alert_type, COUNT(*), SUM(resolved = 0) FROM alerts GROUP BY alert_type'
+        plan = ' '.join(row['detail'] for row in conn.execute(f'EXPLAIN QUERY PLAN {stats}'))
+        assert 'COVERING INDEX' in plan and 'TEMP B-TREE' not in plan, plan
+        conn.close()
+
+
+class TestStats:
+    """告警统计测试"""
+
+    def test_single_query(self, test_app, alerts, statement_counter):
+        """测试统计结果正确且只执行一条查询"""
+        from services.alert_service import AlertService
+
+        with test_app.app_context():
+            with statement_counter as counter:
+                stats = AlertService.get_alert_stats()
+            assert counter.count == 1
+
+        unresolved = [row for row in alerts if not row[4]]
+        assert stats == {
+            'total': 250,
+            'unresolved': len(unresolved),
+            'resolved': 250 - len(unresolved),
+            'by_type': {
+                'offline': sum(1 for row in unresolved if row[1] == 'offline'),
+                'tunnel_down': sum(1 for row in unresolved if row[1] == 'tunnel_down'),
+            },
+        }
@@ -0,0 +1,251 @@
+"""
+告警去重与分组测试
+"""
+import threading
+
+import pytest
+
+from config import Config
+from models.database import get_db_connection
+from services.alert_pipeline import AlertPipeline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def pipeline(temp_db, clock, monkeypatch):
+    monkeypatch.setattr(Config, 'SMTP_CONFIG', {
+        'host': 'smtp.example.com', 'port': 587, 'user': 'alert@example.com',
+        'password': 'secret', 'to': ['ops@example.com'], 'starttls': True,
+    })
+    monkeypatch.setattr(Config, 'ALERT_DEDUP_WINDOW', 3600)
+    monkeypatch.setattr(Config, 'ALERT_GROUP_WAIT', 30)
+    monkeypatch.setattr(Config, 'ALERT_RATE_LIMIT', 2)
+    monkeypatch.setattr(Config, 'ALERT_RATE_WINDOW', 3600)
+    return AlertPipeline(clock=clock)
+
+
+def add_clients(*names):
+    conn = get_db_connection()
+    for name in names:
+        conn.execute('INSERT INTO clients (name, config_content) VALUES (?, ?)', (name, '[common]'))
+    conn.commit()
+    conn.close()
+
+
+def alert_rows():
+    conn = get_db_connection()
+    rows = conn.execute('SELECT client_id, alert_type, occurrences, resolved FROM alerts ORDER BY id').fetchall()
+    conn.close()
+    return [tuple(row) for row in rows]
+
+
+def outbox_rows():
+    conn = get_db_connection()
+    rows = conn.execute('SELECT recipients, subject, body FROM alert_outbox ORDER BY id').fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+class TestDeduplication:
+    """去重测试"""
+
+    def test_duplicates_suppressed(self, pipeline, clock):
+        """测试去重窗口内的重复触发只累加次数"""
+        add_clients('node')
+        assert pipeline.fire(1, 'offline', 'down') == 'new'
+        for _ in range(99):
+            clock.now += 1
+            assert pipeline.fire(1, 'offline', 'down') == 'suppressed'
+
+        # 重复计数在 flush 时批量写回
+        assert alert_rows() == [(1, 'offline', 1, 0)]
+        clock.now += 30
+        assert pipeline.flush() == 1
+        assert alert_rows() == [(1, 'offline', 100, 0)]
+        assert len(outbox_rows()) == 1
+        assert '累计次数: 100' in outbox_rows()[0]['body']
+
+    def test_repeat_after_window(self, pipeline, clock):
+        """测试超过去重窗口后再次通知，仍使用同一条告警"""
+        add_clients('node')
+        pipeline.fire(1, 'offline', 'down')
+        clock.now += 3600
+        assert pipeline.fire(1, 'offline', 'still down') == 'repeat'
+        assert alert_rows() == [(1, 'offline', 1, 0)]
+
+    def test_flush_failure_keeps_counters(self, pipeline, clock, monkeypatch):
+        """测试写入失败时重复计数和通知留到下一次写入，不占用限流额度"""
+        from services.alert_pipeline import alert_dispatcher
+
+        add_clients('node')
+        pipeline.fire(1, 'offline', 'down')
+        for _ in range(4):
+            pipeline.fire(1, 'offline', 'down')
+        clock.now += 30
+
+        enqueue = alert_dispatcher.enqueue
+        failing = [True]
+
+        def flaky_enqueue(*args, **kwargs):
+            if failing[0]:
+                raise RuntimeError('database is locked')
+            return enqueue(*args, **kwargs)
+
+        monkeypatch.setattr(alert_dispatcher, 'enqueue', flaky_enqueue)
+        assert pipeline.flush() == 0
+        assert alert_rows() == [(1, 'offline', 1, 0)]
+        assert pipeline.get_status()['rate_limit']['smtp:ops@example.com']['sent'] == 0
+
+        failing[0] = False
+        assert pipeline.flush() == 1
+        assert alert_rows() == [(1, 'offline', 5, 0)]
+        assert len(outbox_rows()) == 1
+
+    def test_database_writes_outside_lock(self, pipeline, monkeypatch):
+        """测试写入新告警、发送通知和解决告警时不持有管道锁，状态查询不被阻塞"""
+        import services.alert_pipeline as alert_pipeline_module
+
+        add_clients('node')
+        pipeline.get_status()
+        connect = alert_pipeline_module.get_db_connection
+        blocked = []
+
+        def connect_and_query():
+            thread = threading.Thread(target=pipeline.get_status)
+            thread.start()
+            thread.join(2)
+            blocked.append(thread.is_alive())
+            return connect()
+
+        monkeypatch.setattr(alert_pipeline_module, 'get_db_connection', connect_and_query)
+        assert pipeline.fire(1, 'offline', 'down') == 'new'
+        assert pipeline.flush(force=True) == 1
+        assert pipeline.clear(1, 'offline') == 1
+        assert blocked == [False, False, False]
+
+    def test_missing_client(self, pipeline):
+        """测试客户端不存在时不记录"""
+        assert pipeline.fire(42, 'offline', 'down') is None
+        assert alert_rows() == []
+
+    def test_index_loaded_from_table(self, pipeline, clock):
+        """测试重启后从 alerts 表恢复未解决告警，不重复通知"""
+        add_clients('node')
+        pipeline.fire(1, 'offline', 'down')
+        pipeline.flush(force=True)
+
+        restarted = AlertPipeline(clock=clock)
+        clock.now += 60
+        assert restarted.fire(1, 'offline', 'down') == 'suppressed'
+        restarted.flush()
+        assert alert_rows() == [(1, 'offline', 2, 0)]
+
+
+class TestGrouping:
+    """分组和限流测试"""
+
+    def test_burst_grouped_into_digest(self, pipeline, clock):
+        """测试分组等待时间内的多条告警合并为一封摘要"""
+        add_clients('a', 'b', 'c')
+        for client_id in (1, 2, 3):
+            pipeline.fire(client_id, 'offline', 'down')
+            clock.now += 5
+
+        assert pipeline.flush() == 0
+        assert pipeline.next_flush_in() == 15
+        clock.now += 15
+        assert pipeline.flush() == 1
+
+        emails = outbox_rows()
+        assert len(emails) == 1
+        assert emails[0]['subject'] == '[FRP告警] 3 条告警，0 条恢复'
+        assert all(name in emails[0]['body'] for name in ('a - offline', 'b - offline', 'c - offline'))
+
+    def test_rate_limit_per_destination(self, pipeline, clock):
+        """测试超过投递目标限流后通知留到下一封摘要"""
+        add_clients('a', 'b', 'c', 'd')
+        for client_id in (1, 2, 3):
+            pipeline.fire(client_id, 'offline', 'down')
+            clock.now += 31
+            pipeline.flush()
+        assert len(outbox_rows()) == 2
+
+        pipeline.fire(4, 'offline', 'down')
+        clock.now += 31
+        assert pipeline.flush() == 0
+        assert pipeline.get_status()['pending'] == {'smtp:ops@example.com': 2}
+        assert pipeline.get_status()['rate_limit']['smtp:ops@example.com']['remaining'] == 0
+
+        # 窗口滑过后两条通知合并发送
+        clock.now += 3600
+        assert pipeline.flush() == 1
+        assert outbox_rows()[-1]['subject'] == '[FRP告警] 2 条告警，0 条恢复'
+
+    def test_no_destinations_without_channels(self, pipeline, monkeypatch):
+        """测试未启用任何通知通道时只记录告警"""
+        monkeypatch.setattr(Config, 'SMTP_CONFIG', {'host': None, 'port': None, 'user': None, 'password': None, 'to': []})
+        add_clients('node')
+        assert pipeline.fire(1, 'offline', 'down') == 'new'
+        assert pipeline.flush(force=True) == 0
+        assert alert_rows() == [(1, 'offline', 1, 0)]
+
+
+class TestAutoResolve:
+    """自动解决测试"""
+
+    def test_unsent_notification_withdrawn(self, pipeline, clock):
+        """测试通知发出前条件解除，不发送任何邮件"""
+        add_clients('node')
+        pipeline.fire(1, 'offline', 'down')
+        clock.now += 10
+        assert pipeline.clear(1, 'offline') == 1
+
+        clock.now += 60
+        assert pipeline.flush() == 0
+        assert outbox_rows() == []
+        assert alert_rows() == [(1, 'offline', 1, 1)]
+
+    def test_resolved_notification(self, pipeline, clock):
+        """测试已通知的告警解除后发送恢复通知，再次触发产生新告警"""
+        add_clients('node')
+        pipeline.fire(1, 'offline', 'down')
+        clock.now += 30
+        pipeline.flush()
+
+        pipeline.fire(1, 'offline', 'down')
+        pipeline.clear(1, 'offline', '已恢复在线')
+        clock.now += 30
+        pipeline.flush()
+        emails = outbox_rows()
+        assert emails[-1]['subject'] == '[FRP恢复] node - offline'
+        assert '已恢复在线' in emails[-1]['body']
+        assert alert_rows() == [(1, 'offline', 2, 1)]
+
+        assert pipeline.fire(1, 'offline', 'down again') == 'new'
+        assert len(alert_rows()) == 2
+
+    def test_pipeline_route(self, test_client, pipeline, monkeypatch):
+        """测试告警处理状态接口"""
+        from api.routes import admin
+
+        monkeypatch.setattr(admin, 'alert_pipeline', pipeline)
+        add_clients('node')
+        pipeline.fire(1, 'offline', 'down')
+
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+        data = test_client.get('/api/alerts/pipeline').get_json()
+        assert data['open'][0]['alert_type'] == 'offline'
+        assert data['pending'] == {'smtp:ops@example.com': 1}
@@ -0,0 +1,316 @@
+"""
+告警规则引擎测试
+"""
+import json
+import random
+
+import pytest
+
+from config import Config
+from models.database import get_db_connection
+from services.alert_rules import RulesEngine, Rule, SlidingWindow, load_rules
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Recorder:
+    """记录规则引擎的告警和解决"""
+
+    def __init__(self):
+        self.actions = []
+
+    def __call__(self, firing, rule, client_id):
+        self.actions.append(('firing' if firing else 'resolved', rule.name, client_id))
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+def make_engine(definitions, clock, recorder):
+    rules = [Rule(index, definition) for index, definition in enumerate(definitions)]
+    return RulesEngine(rules, clock=clock, notifier=recorder)
+
+
+class TestSlidingWindow:
+    """滑动窗口测试"""
+
+    def test_matches_brute_force(self):
+        """测试增量聚合与直接计算一致"""
+        rng = random.Random(7)
+        window = SlidingWindow(10)
+        history = []
+        ts = 0.0
+        for _ in range(500):
+            ts += rng.uniform(0.1, 3)
+            value = rng.uniform(-100, 100)
+            window.add(ts, value)
+            history.append((ts, value))
+            current = [v for t, v in history if t > ts - 10]
+            assert window.value('count') == len(current)
+            assert window.value('min') == min(current)
+            assert window.value('max') == max(current)
+            assert window.value('sum') == pytest.approx(sum(current))
+            assert window.value('avg') == pytest.approx(sum(current) / len(current))
+
+
+class TestThresholdRules:
+    """阈值规则测试"""
+
+    def test_consecutive_count(self, clock, recorder):
+        """测试连续 3 次满足条件才触发，条件解除时解决"""
+        engine = make_engine([{'name': 'down', 'source': 'health', 'field': 'ok', 'op': '==',
+                               'value': False, 'count': 3}], clock, recorder)
+        for ok in (False, False, True, False, False):
+            engine.observe('health', 1, {'ok': ok})
+        engine.tick()
+        assert recorder.actions == []
+
+        engine.observe('health', 1, {'ok': False})
+        engine.observe('health', 1, {'ok': False})
+        engine.tick()
+        assert recorder.actions == [('firing', 'down', 1)]
+
+        engine.observe('health', 1, {'ok': True})
+        engine.tick()
+        assert recorder.actions[-1] == ('resolved', 'down', 1)
+
+    def test_for_fires_without_new_events(self, clock, recorder):
+        """测试条件持续时间到期后由到期处理触发"""
+        engine = make_engine([{'name': 'stalled', 'source': 'metrics', 'field': 'rate_in', 'op': '<=',
+                               'value': 0, 'for': 300}], clock, recorder)
+        engine.observe('metrics', 1, {'rate_in': 0})
+        clock.now += 299
+        engine.tick()
+        assert recorder.actions == []
+
+        clock.now += 1
+        engine.tick()
+        assert recorder.actions == [('firing', 'stalled', 1)]
+
+    def test_for_interrupted(self, clock, recorder):
+        """测试条件中途不成立时重新计时"""
+        engine = make_engine([{'name': 'stalled', 'source': 'metrics', 'field': 'rate_in', 'op': '<=',
+                               'value': 0, 'for': 300}], clock, recorder)
+        engine.observe('metrics', 1, {'rate_in': 0})
+        clock.now += 200
+        engine.observe('metrics', 1, {'rate_in': 50})
+        clock.now += 10
+        engine.observe('metrics', 1, {'rate_in': 0})
+        clock.now += 100
+        engine.tick()
+        assert recorder.actions == []
+
+        clock.now += 200
+        engine.tick()
+        assert recorder.actions == [('firing', 'stalled', 1)]
+
+    def test_window_aggregate(self, clock, recorder):
+        """测试滑动窗口平均值规则"""
+        engine = make_engine([{'name': 'slow', 'source': 'health', 'field': 'latency_ms', 'agg': 'avg',
+                               'window': 60, 'op': '>', 'value': 100}], clock, recorder)
+        for latency in (50, 120, 200):
+            engine.observe('health', 1, {'latency_ms': latency})
+            clock.now += 10
+        engine.tick()
+        assert recorder.actions == [('firing', 'slow', 1)]
+
+        # 旧样本滑出窗口后平均值下降
+        clock.now += 60
+        engine.observe('health', 1, {'latency_ms': 20})
+        engine.tick()
+        assert recorder.actions[-1] == ('resolved', 'slow', 1)
+
+    def test_missing_field_and_client_filter(self, clock, recorder):
+        """测试事件缺少字段时跳过，clients 限定生效范围"""
+        engine = make_engine([{'name': 'idle', 'source': 'metrics', 'field': 'rate_in', 'op': '==',
+                               'value': 0, 'clients': [2]}], clock, recorder)
+        engine.observe('metrics', 1, {'rate_in': 0})
+        engine.observe('metrics', 2, {'reachable': False})
+        engine.tick()
+        assert recorder.actions == []
+
+        engine.observe('metrics', 2, {'rate_in': 0})
+        engine.tick()
+        assert recorder.actions == [('firing', 'idle', 2)]
+
+
+class TestAbsenceRules:
+    """缺失规则测试"""
+
+    def test_absence(self, clock, recorder):
+        """测试超时未收到事件时触发，收到事件后解决"""
+        engine = make_engine([{'name': 'no_pull', 'source': 'pull', 'absent_for': 600}], clock, recorder)
+        engine.observe('pull', 1, {'version': 1})
+        for _ in range(5):
+            clock.now += 300
+            engine.observe('pull', 1, {'version': 1})
+            engine.tick()
+        assert recorder.actions == []
+        # 每个客户端最多一个到期条目
+        assert len(engine._deadlines) == 1
+
+        clock.now += 600
+        engine.tick()
+        assert recorder.actions == [('firing', 'no_pull', 1)]
+
+        clock.now += 10
+        engine.observe('pull', 1, {'version': 2})
+        engine.tick()
+        assert recorder.actions[-1] == ('resolved', 'no_pull', 1)
+
+    def test_seeded_on_start(self, temp_db, clock, recorder):
+        """测试启动时只登记拉取过配置的启用客户端，从未拉取的客户端不触发"""
+        conn = get_db_connection()
+        conn.executemany('INSERT INTO clients (id, name, config_content, enabled) VALUES (?, ?, ?, ?)',
+                         [(1, 'pulled', '[common]', 1), (2, 'never', '[common]', 1), (3, 'off', '[common]', 0)])
+        conn.executemany('INSERT INTO client_pulls (client_id, last_pull_at) VALUES (?, ?)',
+                         [(1, int(clock.now) - 700), (3, int(clock.now) - 700)])
+        conn.commit()
+        conn.close()
+
+        engine = make_engine([{'name': 'no_pull', 'source': 'pull', 'absent_for': 600}], clock, recorder)
+        engine.start()
+        engine.stop()
+        engine.tick()
+        assert recorder.actions == [('firing', 'no_pull', 1)]
+
+        clock.now += 3600
+        engine.tick()
+        assert recorder.actions == [('firing', 'no_pull', 1)]
+
+    def test_sync_client(self, temp_db, clock, recorder):
+        """测试停用时移除状态，重新启用时拉取过配置的客户端以启用时间为起点登记"""
+        conn = get_db_connection()
+        conn.executemany('INSERT INTO clients (id, name, config_content) VALUES (?, ?, ?)',
+                         [(1, 'pulled', '[common]'), (2, 'never', '[common]')])
+        conn.execute('INSERT INTO client_pulls (client_id, last_pull_at) VALUES (1, ?)', (int(clock.now) - 7200,))
+        conn.commit()
+        conn.close()
+
+        engine = make_engine([{'name': 'no_pull', 'source': 'pull', 'absent_for': 600}], clock, recorder)
+        engine.observe('pull', 1, {})
+        engine.sync_client(1, False)
+        assert engine.get_status()[0]['tracked_clients'] == 0
+
+        engine.sync_client(1, True)
+        engine.sync_client(2, True)
+        assert engine.get_status()[0]['tracked_clients'] == 1
+        clock.now += 599
+        engine.tick()
+        assert recorder.actions == []
+        clock.now += 1
+        engine.tick()
+        assert recorder.actions == [('firing', 'no_pull', 1)]
+
+    def test_seed_keeps_observed_state(self, clock, recorder):
+        engine = make_engine([{'name': 'no_pull', 'source': 'pull', 'absent_for': 600}], clock, recorder)
+        engine.observe('pull', 1, {})
+        assert engine.seed('pull', {1: clock.now - 1000, 2: None}) == 1
+        clock.now += 599
+        engine.tick()
+        assert recorder.actions == []
+
+    def test_tick_budget(self, clock, recorder, monkeypatch):
+        """测试超出时间预算的到期条目留到下一周期"""
+        monkeypatch.setattr(Config, 'RULES_TICK_BUDGET_MS', 0)
+        engine = make_engine([{'name': 'no_pull', 'source': 'pull', 'absent_for': 60}], clock, recorder)
+        for client_id in range(1, 4):
+            engine.observe('pull', client_id, {})
+        clock.now += 60
+
+        for _ in range(3):
+            assert engine.tick()['expired'] == 1
+        assert len(recorder.actions) == 3
+
+    def test_forget_client(self, clock, recorder):
+        """测试删除的客户端不再触发"""
+        engine = make_engine([{'name': 'no_pull', 'source': 'pull', 'absent_for': 60}], clock, recorder)
+        engine.observe('pull', 1, {})
+        engine.forget_client(1)
+        clock.now += 60
+        engine.tick()
+        assert recorder.actions == []
+
+
+class TestRuleLoading:
+    """规则加载测试"""
+
+    def test_default_rules(self):
+        rules = load_rules()
+        assert [rule.name for rule in rules] == ['admin_unreachable', 'config_pull_missing']
+
+    def test_rules_file(self, tmp_path):
+        path = tmp_path / 'rules.json'
+        path.write_text(json.dumps([{'name': 'x', 'source': 'health', 'field': 'ok', 'value': False}]))
+        rules = load_rules(str(path))
+        assert rules[0].describe() == 'ok == False'
+
+    @pytest.mark.parametrize('definition', [
+        {'source': 'health', 'field': 'ok', 'value': False},
+        {'name': 'x', 'source': 'disk', 'field': 'ok', 'value': False},
+        {'name': 'x', 'source': 'health', 'field': 'ok', 'op': '~', 'value': False},
+        {'name': 'x', 'source': 'health', 'field': 'ok'},
+        {'name': 'x', 'source': 'health', 'field': 'ok', 'value': 1, 'agg': 'avg'},
+        {'name': 'x', 'source': 'pull', 'absent_for': 0},
+    ])
+    def test_invalid_rules(self, definition):
+        with pytest.raises(ValueError):
+            Rule(0, definition)
+
+    def test_duplicate_names(self, tmp_path):
+        path = tmp_path / 'rules.json'
+        path.write_text(json.dumps([{'name': 'x', 'source': 'pull', 'absent_for': 1}] * 2))
+        with pytest.raises(ValueError):
+            load_rules(str(path))
+
+
+class TestIntegration:
+    """与告警服务的集成测试"""
+
+    def test_raises_and_resolves_alert(self, clock, alert_pipeline, monkeypatch):
+        """测试规则触发写入告警，解除时自动解决"""
+        monkeypatch.setattr(Config, 'SMTP_CONFIG', {'host': None, 'port': None, 'user': None, 'password': None, 'to': []})
+        conn = get_db_connection()
+        conn.execute("INSERT INTO clients (name, config_content) VALUES ('node', '[common]')")
+        conn.commit()
+        conn.close()
+
+        engine = RulesEngine(load_rules(), clock=clock)
+        for _ in range(3):
+            engine.observe('metrics', 1, {'reachable': False})
+        engine.tick()
+        engine.observe('metrics', 1, {'reachable': True})
+        engine.tick()
+
+        conn = get_db_connection()
+        rows = conn.execute('SELECT client_id, alert_type, message, resolved FROM alerts').fetchall()
+        conn.close()
+        assert [tuple(row) for row in rows] == [(1, 'admin_unreachable', 'frpc admin 接口连续 3 次无法访问', 1)]
+
+    def test_rules_route(self, test_client, clock, recorder, monkeypatch):
+        """测试规则状态接口"""
+        from api.routes import admin
+
+        engine = make_engine([{'name': 'down', 'source': 'health', 'field': 'ok', 'value': False}], clock, recorder)
+        engine.observe('health', 5, {'ok': False})
+        monkeypatch.setattr(admin, 'rules_engine', engine)
+
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+        data = test_client.get('/api/alerts/rules').get_json()
+        assert data[0]['name'] == 'down'
+        assert data[0]['firing'] == [5]
+        assert data[0]['description'] == 'ok == False'
@@ -83,8 +83,8 @@ class TestAlertService:
             # 恢复配置
             Config.SMTP_CONFIG = original_config
 
-    def test_get_all_alerts(self, test_app, test_database):
-        """测试获取所有告警"""
+    def test_list_alerts(self, test_app, test_database):
+        """测试分页获取告警"""
         with test_app.test_request_context():
             from app.services.alert_service import AlertService
             
@@ -115,7 +115,7 @@ class TestAlertService:
             test_database.commit()
             
             with patch('app.services.alert_service.get_db', return_value=test_database):
-                alerts = AlertService.get_all_alerts()
+                alerts = AlertService.list_alerts()[0]
                 assert len(alerts) >= 1
                 assert alerts[0]['alert_type'] == 'offline'
 
@@ -134,7 +134,8 @@ class TestAlertService:
                     message TEXT,
                     sent_to TEXT,
                     sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    resolved BOOLEAN DEFAULT 0
+                    resolved BOOLEAN DEFAULT 0,
+                    resolved_at INTEGER
                 )
             ''')
             cursor.execute('''
@@ -150,9 +151,10 @@ class TestAlertService:
                 assert '已解决' in result['message']
                 
                 # 验证数据库更新
-                cursor.execute('SELECT resolved FROM alerts WHERE id = ?', (alert_id,))
+                cursor.execute('SELECT resolved, resolved_at FROM alerts WHERE id = ?', (alert_id,))
                 row = cursor.fetchone()
                 assert row[0] == 1
+                assert row[1] is not None
 
     def test_clear_resolved_alerts(self, test_app, test_database):
         """测试清除已解决的告警"""
@@ -288,7 +290,7 @@ class TestAlertIntegration:
                     assert result is True
                     
                     # 2. 获取告警列表
-                    alerts = AlertService.get_all_alerts()
+                    alerts = AlertService.list_alerts()[0]
                     assert len(alerts) == 1
                     alert_id = alerts[0]['id']
                     
@@ -305,7 +307,7 @@ class TestAlertIntegration:
                     assert success is True
                     
                     # 6. 验证告警列表为空
-                    alerts = AlertService.get_all_alerts()
+                    alerts = AlertService.list_alerts()[0]
                     assert len(alerts) == 0
             
             # 恢复配置
@@ -0,0 +1,122 @@
+"""
+客户端乐观并发控制测试
+"""
+import json
+
+
+CONFIG = """[common]
+server_addr = "frp.example.com"
+server_port = 7000
+
+[proxy]
+type = "tcp"
+local_port = 8080
+remote_port = 9000
+"""
+
+
+def login(test_client):
+    """直接写入会话完成登录，并返回 CSRF token"""
+    with test_client.session_transaction() as sess:
+        sess['logged_in'] = True
+        sess['username'] = 'test_admin'
+        sess['user_role'] = 'admin'
+        sess['csrf_token'] = 'test-csrf-token'
+    return {'X-CSRF-Token': 'test-csrf-token'}
+
+
+class TestOptimisticConcurrencyService:
+    """服务层版本检查测试"""
+
+    def test_stale_version_is_rejected(self, test_app, temp_db):
+        """测试使用过期版本号更新时返回冲突且不写入"""
+        from services.client_service import ClientService
+
+        with test_app.test_request_context():
+            success, result = ClientService.create_client({'name': 'race', 'config_content': CONFIG})
+            client_id = result['id']
+            success, config = ClientService.get_client_config(client_id)
+            assert config['version'] == 1
+
+            success, result = ClientService.update_client_config(client_id, CONFIG.replace('9000', '9001'), 1)
+            assert success
+            assert result['version'] == 2
+
+            success, result = ClientService.update_client_config(client_id, CONFIG.replace('9000', '9002'), 1)
+            assert not success
+            assert result['conflict'] is True
+            assert result['version'] == 2
+
+            success, config = ClientService.get_client_config(client_id)
+            assert 'remote_port = 9001' in config['config']
+
+    def test_client_update_bumps_version(self, test_app, temp_db):
+        """测试修改客户端信息也会递增版本，使并发的配置编辑失效"""
+        from services.client_service import ClientService
+
+        with test_app.test_request_context():
+            success, result = ClientService.create_client({'name': 'race2', 'config_content': CONFIG})
+            client_id = result['id']
+
+            success, result = ClientService.update_client(client_id, {'enabled': False}, 1)
+            assert success
+            assert result['version'] == 2
+
+            success, result = ClientService.update_client_config(client_id, CONFIG, 1)
+            assert not success
+            assert result.get('conflict')
+
+    def test_missing_client_is_not_conflict(self, test_app, temp_db):
+        """测试不存在的客户端不报告为冲突"""
+        from services.client_service import ClientService
+
+        with test_app.test_request_context():
+            success, result = ClientService.update_client_config(12345, CONFIG, 1)
+            assert not success
+            assert 'conflict' not in result
+
+
+class TestOptimisticConcurrencyRoutes:
+    """路由层 If-Match / 409 测试"""
+
+    def test_if_match_conflict_returns_409(self, test_app, test_client, temp_db):
+        """测试 If-Match 版本不一致时返回 409"""
+        headers = login(test_client)
+        response = test_client.post('/api/clients', json={'name': 'etag', 'config_content': CONFIG}, headers=headers)
+        client_id = response.get_json()['id']
+
+        response = test_client.get(f'/api/clients/{client_id}/config')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert etag == '"1"'
+
+        response = test_client.put(
+            f'/api/clients/{client_id}/config',
+            json={'config': CONFIG.replace('9000', '9001')},
+            headers={**headers, 'If-Match': etag}
+        )
+        assert response.status_code == 200
+        assert response.headers['ETag'] == '"2"'
+
+        response = test_client.put(
+            f'/api/clients/{client_id}/config',
+            json={'config': CONFIG.replace('9000', '9002')},
+            headers={**headers, 'If-Match': etag}
+        )
+        assert response.status_code == 409
+        assert response.get_json()['version'] == 2
+
+    def test_body_version_and_invalid_header(self, test_app, test_client, temp_db):
+        """测试请求体中的 version 字段和无效的 If-Match"""
+        headers = login(test_client)
+        response = test_client.post('/api/clients', json={'name': 'body-version', 'config_content': CONFIG},
+                                    headers=headers)
+        client_id = response.get_json()['id']
+
+        response = test_client.put(f'/api/clients/{client_id}/config',
+                                   json={'config': CONFIG, 'version': 7}, headers=headers)
+        assert response.status_code == 409
+
+        response = test_client.put(f'/api/clients/{client_id}/config', json={'config': CONFIG},
+                                   headers={**headers, 'If-Match': '"abc"'})
+        assert response.status_code == 400
@@ -173,3 +173,139 @@ remote_port = 9090
         with test_app.app_context():
             client = ClientService.get_client(99999)
             assert client is None
+
+
+class TestClientServiceStatementCount:
+    """客户端服务 SQL 语句数量测试，防止回退到 N+1 查询"""
+
+    CONFIG = """[common]
+server_addr = "test.example.com"
+server_port = 7000
+
+[proxy]
+type = "tcp"
+local_port = 8080
+remote_port = 9090
+"""
+
+    def _create(self):
+        success, result = ClientService.create_client({'name': 'count-client', 'config_content': self.CONFIG})
+        assert success, result
+        return result['id']
+
+    def test_read_paths(self, test_app, temp_db, statement_counter):
+        """测试读取路径各只需一条语句"""
+        with test_app.test_request_context():
+            client_id = self._create()
+
+            with statement_counter as counter:
+                ClientService.get_all_clients()
+            assert counter.count == 1
+
+            with statement_counter as counter:
+                ClientService.get_client(client_id)
+            assert counter.count == 1
+
+            with statement_counter as counter:
+                ClientService.get_client_config(client_id)
+            assert counter.count == 1
+
+    def test_create_client(self, test_app, temp_db, statement_counter):
+        """测试创建客户端：插入客户端 + 首个修订"""
+        with test_app.test_request_context():
+            with statement_counter as counter:
+                self._create()
+            assert counter.count == 3
+
+    def test_form_mode_create_client(self, test_app, temp_db, statement_counter):
+        """测试表单模式创建客户端：读取模板 + 插入客户端"""
+        with test_app.test_request_context():
+            with statement_counter as counter:
+                success, _ = ClientService.create_client({
+                    'name': 'form-count', 'server_addr': 'a.example.com', 'local_port': 22, 'remote_port': 6022
+                })
+            assert success
+            assert counter.count == 2
+
+    def test_update_client(self, test_app, temp_db, statement_counter):
+        """测试更新客户端：元数据查询 + 更新"""
+        with test_app.test_request_context():
+            client_id = self._create()
+            with statement_counter as counter:
+                success, _ = ClientService.update_client(client_id, {'enabled': False})
+            assert success
+            assert counter.count == 2
+            assert not any('config_content' in sql for sql in counter.statements)
+
+    def test_update_client_config(self, test_app, temp_db, statement_counter):
+        """测试更新配置不读取旧客户端整行"""
+        with test_app.test_request_context():
+            client_id = self._create()
+            with statement_counter as counter:
+                success, _ = ClientService.update_client_config(client_id, self.CONFIG.replace('9090', '9091'))
+            assert success
+            # 元数据 + 更新 + 最新修订号 + 重建前一版本 + 插入修订
+            assert counter.count == 5
+            assert not any('SELECT *' in sql for sql in counter.statements)
+            assert ClientService.get_client(client_id)['remote_port'] == 9091
+
+    def test_delete_client_cascades(self, test_app, temp_db, statement_counter):
+        """测试删除客户端只需两条语句，关联数据由外键级联删除"""
+        from models.database import get_db
+
+        with test_app.test_request_context():
+            client_id = self._create()
+            db = get_db()
+            db.execute("INSERT INTO logs (client_id, level, message) VALUES (?, 'INFO', 'x')", (client_id,))
+            db.execute("INSERT INTO alerts (client_id, alert_type, message) VALUES (?, 'offline', 'x')", (client_id,))
+            db.commit()
+
+            with statement_counter as counter:
+                success, _ = ClientService.delete_client(client_id)
+            assert success
+            assert counter.count == 2
+
+            for table in ('logs', 'alerts', 'client_config_revisions'):
+                count = db.execute(f'SELECT COUNT(*) FROM {table} WHERE client_id = ?', (client_id,)).fetchone()[0]
+                assert count == 0, table
+
+    def test_missing_client(self, test_app, temp_db, statement_counter):
+        """测试不存在的客户端只做一次元数据查询"""
+        with test_app.test_request_context():
+            with statement_counter as counter:
+                success, _ = ClientService.delete_client(99999)
+            assert not success
+            assert counter.count == 1
+
+
+class TestForeignKeyMigration:
+    """旧表外键迁移测试"""
+
+    def test_legacy_tables_rebuilt_with_cascade(self, tmp_path, monkeypatch):
+        """测试旧数据库的 logs/alerts 表被重建为级联删除且保留数据"""
+        import sqlite3
+        from config import Config
+        from models.database import init_db
+
+        db_path = str(tmp_path / 'legacy.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute('''CREATE TABLE clients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+                        config_content TEXT NOT NULL, local_port INTEGER, remote_port INTEGER,
+                        server_addr TEXT, enabled BOOLEAN DEFAULT 1,
+                        created_at TIMESTAMP, updated_at TIMESTAMP)''')
+        conn.execute('''CREATE TABLE alerts (id INTEGER PRIMARY KEY AUTOINCREMENT, client_id INTEGER,
+                        alert_type TEXT, message TEXT, sent_to TEXT, sent_at TIMESTAMP, resolved BOOLEAN DEFAULT 0,
+                        FOREIGN KEY (client_id) REFERENCES clients (id))''')
+        conn.execute("INSERT INTO clients (id, name, config_content) VALUES (1, 'a', '[common]')")
+        conn.execute("INSERT INTO alerts (client_id, alert_type, message) VALUES (1, 'offline', 'old')")
+        conn.commit()
+        conn.close()
+
+        monkeypatch.setattr(Config, 'DATABASE_URL', db_path)
+        init_db()
+
+        conn = sqlite3.connect(db_path)
+        on_delete = [row[6] for row in conn.execute('PRAGMA foreign_key_list(alerts)')]
+        assert on_delete == ['CASCADE']
+        assert conn.execute('SELECT message FROM alerts').fetchone()[0] == 'old'
+        conn.close()
@@ -0,0 +1,153 @@
+"""
+采集调度器测试
+"""
+import pytest
+
+from config import Config
+from services.collection_scheduler import CollectionScheduler
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(Config, 'MONITOR_JITTER', 0.0)
+    monkeypatch.setattr(Config, 'MONITOR_WATCHED_INTERVAL', 1.0)
+    monkeypatch.setattr(Config, 'MONITOR_ACTIVE_INTERVAL', 5.0)
+    monkeypatch.setattr(Config, 'MONITOR_IDLE_MAX_INTERVAL', 60.0)
+    monkeypatch.setattr(Config, 'MONITOR_BACKOFF_MAX_INTERVAL', 300.0)
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return CollectionScheduler(clock=clock)
+
+
+class TestScheduling:
+    """调度顺序测试"""
+
+    def test_new_clients_due_immediately(self, scheduler):
+        """测试新客户端立即到期，取出后不会重复调度"""
+        scheduler.sync([1, 2, 3])
+        assert sorted(scheduler.pop_due()) == [1, 2, 3]
+        assert scheduler.pop_due() == []
+        assert scheduler.next_due() is None
+
+    def test_pop_in_due_order(self, scheduler, clock):
+        """测试按到期时间取出"""
+        scheduler.sync([1, 2])
+        scheduler.pop_due()
+        scheduler.record(1, True, False)   # 10 秒后
+        scheduler.record(2, True, True)    # 5 秒后
+        assert scheduler.next_due() == clock.now + 5
+
+        clock.now += 5
+        assert scheduler.pop_due() == [2]
+        clock.now += 5
+        assert scheduler.pop_due() == [1]
+
+    def test_sync_removes_clients(self, scheduler, clock):
+        """测试移除的客户端不再调度，采集结果被忽略"""
+        scheduler.sync([1, 2])
+        scheduler.pop_due()
+        scheduler.sync([2])
+        assert scheduler.record(1, True, True) is None
+        assert scheduler.record(2, True, True) == 5
+        clock.now += 5
+        assert scheduler.pop_due() == [2]
+        assert scheduler.snapshot()['clients'] == 1
+
+
+class TestIntervals:
+    """采集间隔测试"""
+
+    def _interval(self, scheduler, clock, *args, **kwargs):
+        scheduler.pop_due(clock.now + 10 ** 6)
+        return scheduler.record(1, *args, **kwargs)
+
+    def test_idle_doubles_until_max(self, scheduler, clock):
+        """测试无变化时间隔逐步加倍，有变化时恢复"""
+        scheduler.sync([1])
+        intervals = [self._interval(scheduler, clock, True, False) for _ in range(5)]
+        assert intervals == [10, 20, 40, 60, 60]
+        assert self._interval(scheduler, clock, True, True) == 5
+        assert self._interval(scheduler, clock, True, False) == 10
+
+    def test_unreachable_backoff(self, scheduler, clock):
+        """测试无法访问时指数退避，恢复后重置"""
+        scheduler.sync([1])
+        intervals = [self._interval(scheduler, clock, False, False) for _ in range(8)]
+        assert intervals == [5, 10, 20, 40, 80, 160, 300, 300]
+        assert scheduler.snapshot()['entries'][0]['reason'] == 'unreachable'
+        assert self._interval(scheduler, clock, True, True) == 5
+        assert scheduler.snapshot()['entries'][0]['failures'] == 0
+
+    def test_watched_and_fleet(self, scheduler, clock):
+        """测试被订阅的客户端使用最短间隔，全局订阅时间隔不超过活跃间隔"""
+        scheduler.sync([1])
+        for _ in range(4):
+            self._interval(scheduler, clock, True, False)
+        assert self._interval(scheduler, clock, True, False, watched=True) == 1
+        assert scheduler.snapshot()['entries'][0]['reason'] == 'watched'
+        assert self._interval(scheduler, clock, True, False, fleet_watched=True) == 5
+        assert self._interval(scheduler, clock, False, False, fleet_watched=True) == 5
+
+    def test_jitter_bounds(self, scheduler, clock, monkeypatch):
+        """测试抖动范围"""
+        monkeypatch.setattr(Config, 'MONITOR_JITTER', 0.2)
+        scheduler.sync([1])
+        scheduler.pop_due()
+        scheduler.record(1, True, True)
+        assert clock.now + 4 <= scheduler.next_due() <= clock.now + 6
+
+
+class TestExpedite:
+    """订阅触发的提前采集测试"""
+
+    def test_expedite_idle_client(self, scheduler, clock):
+        """测试新订阅的空闲客户端立即到期"""
+        scheduler.sync([1, 2])
+        scheduler.pop_due()
+        scheduler.record(1, True, False)
+        scheduler.record(2, True, False)
+
+        assert scheduler.expedite([1, 3]) == 1
+        assert scheduler.pop_due() == [1]
+        # 已在采集中的客户端不重复提前
+        assert scheduler.expedite([1]) == 0
+
+    def test_reschedule_keeps_stats(self, scheduler, clock):
+        """测试延后调度不改变统计"""
+        scheduler.sync([1])
+        scheduler.pop_due()
+        scheduler.reschedule(1, 1.0)
+        entry = scheduler.snapshot()['entries'][0]
+        assert entry['reason'] == 'new'
+        assert entry['next_due_in'] == 1.0
+
+
+class TestSnapshot:
+    """内省接口数据测试"""
+
+    def test_sorted_by_next_due(self, scheduler, clock):
+        """测试按下一次到期时间排序，采集中的客户端排在最前"""
+        scheduler.sync([1, 2, 3])
+        scheduler.pop_due()
+        scheduler.record(1, True, False)
+        scheduler.record(2, True, True)
+
+        snapshot = scheduler.snapshot()
+        assert snapshot['clients'] == 3
+        assert snapshot['in_flight'] == 1
+        assert [e['client_id'] for e in snapshot['entries']] == [3, 2, 1]
+        assert snapshot['entries'][1]['next_due_in'] == 5
+        assert snapshot['entries'][0]['next_due_in'] is None
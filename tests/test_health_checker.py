@@ -0,0 +1,243 @@
+"""
+隧道健康检查测试
+"""
+import asyncio
+import socket
+import time
+
+import pytest
+
+from config import Config
+from models.database import get_db_connection
+from services import health_checker as health
+from services.health_checker import HealthChecker, CircuitBreaker
+
+
+@pytest.fixture(autouse=True)
+def health_config(monkeypatch, temp_db, alert_pipeline):
+    monkeypatch.setattr(Config, 'HEALTH_FAILURE_THRESHOLD', 3)
+    monkeypatch.setattr(Config, 'HEALTH_BREAKER_COOLDOWN', 60)
+    monkeypatch.setattr(Config, 'HEALTH_BREAKER_MAX_COOLDOWN', 240)
+    monkeypatch.setattr(Config, 'HEALTH_CHECK_TIMEOUT', 1)
+    monkeypatch.setattr(Config, 'SMTP_CONFIG', {'host': None, 'port': None, 'user': None, 'password': None, 'to': []})
+
+
+def add_clients(count, port=7000):
+    conn = get_db_connection()
+    for index in range(count):
+        conn.execute(
+            'INSERT INTO clients (name, config_content, server_addr, remote_port) VALUES (?, ?, ?, ?)',
+            (f'client-{index}', '[common]', '127.0.0.1', port + index)
+        )
+    conn.commit()
+    conn.close()
+
+
+def alerts():
+    conn = get_db_connection()
+    rows = conn.execute('SELECT client_id, alert_type, resolved FROM alerts ORDER BY id').fetchall()
+    conn.close()
+    return [tuple(row) for row in rows]
+
+
+class FakeProbe:
+    """按端口返回预设结果的探测函数"""
+
+    def __init__(self):
+        self.up = set()
+        self.calls = []
+
+    async def __call__(self, host, port, timeout):
+        self.calls.append(port)
+        if port in self.up:
+            return True, 1.0, None
+        return False, None, 'Connection refused'
+
+
+class TestCircuitBreaker:
+    """熔断器测试"""
+
+    def test_opens_after_threshold(self):
+        """测试连续失败达到阈值后打开"""
+        breaker = CircuitBreaker()
+        for _ in range(2):
+            breaker.record_failure(0)
+        assert breaker.allow(1)
+        breaker.record_failure(0)
+        assert breaker.state == 'open'
+        assert not breaker.allow(59)
+        assert breaker.allow(60)
+        assert breaker.state == 'half_open'
+
+    def test_half_open_failure_doubles_cooldown(self):
+        """测试半开探测失败时冷却时间加倍，不超过上限"""
+        breaker = CircuitBreaker()
+        for _ in range(3):
+            breaker.record_failure(0)
+        now = 0
+        cooldowns = []
+        for _ in range(4):
+            now = breaker.open_until
+            assert breaker.allow(now)
+            breaker.record_failure(now)
+            cooldowns.append(breaker.open_until - now)
+        assert cooldowns == [120, 240, 240, 240]
+
+        breaker.allow(breaker.open_until)
+        breaker.record_success()
+        assert breaker.state == 'closed'
+        assert breaker.cooldown == 60
+
+
+class TestHealthChecker:
+    """健康检查器测试"""
+
+    def test_alert_only_on_transitions(self):
+        """测试只在状态变化时告警，恢复时解决之前的告警"""
+        add_clients(1)
+        probe = FakeProbe()
+        checker = HealthChecker(probe=probe)
+
+        probe.up.add(7000)
+        checker.run_round()
+        assert checker.get_status(1)['state'] == 'up'
+        assert alerts() == []
+
+        probe.up.clear()
+        for _ in range(2):
+            checker.run_round()
+        assert checker.get_status(1)['state'] == 'up'
+        stats = checker.run_round()
+        assert stats['transitions'] == 1
+        assert checker.get_status(1)['state'] == 'down'
+        assert alerts() == [(1, 'tunnel_down', 0)]
+
+        # 熔断期间不再探测，也不重复告警
+        calls = len(probe.calls)
+        stats = checker.run_round()
+        assert stats['skipped'] == 1
+        assert len(probe.calls) == calls
+        assert len(alerts()) == 1
+
+        # 冷却结束后半开探测成功即恢复
+        probe.up.add(7000)
+        with checker._lock:
+            checker._targets[1]['breaker'].open_until = 0
+        checker.run_round()
+        assert checker.get_status(1)['state'] == 'up'
+        assert alerts() == [(1, 'tunnel_down', 1)]
+
+    def test_state_persisted(self):
+        """测试结果写入 client_health，重启后恢复状态且不重复告警"""
+        add_clients(2)
+        probe = FakeProbe()
+        probe.up.add(7001)
+        checker = HealthChecker(probe=probe)
+        for _ in range(3):
+            checker.run_round()
+
+        conn = get_db_connection()
+        rows = {row['client_id']: dict(row) for row in conn.execute('SELECT * FROM client_health')}
+        conn.close()
+        assert rows[1]['state'] == 'down'
+        assert rows[1]['breaker'] == 'open'
+        assert rows[2]['state'] == 'up'
+        assert rows[2]['latency_ms'] == 1.0
+
+        restarted = HealthChecker(probe=probe)
+        assert restarted.get_status(1)['state'] == 'down'
+        stats = restarted.run_round()
+        assert stats['skipped'] == 1
+        assert len(alerts()) == 1
+
+    def test_removed_clients_dropped(self):
+        """测试禁用的客户端不再探测"""
+        add_clients(2)
+        probe = FakeProbe()
+        checker = HealthChecker(probe=probe)
+        checker.run_round()
+        conn = get_db_connection()
+        conn.execute('UPDATE clients SET enabled = 0 WHERE id = 2')
+        conn.commit()
+        conn.close()
+
+        probe.calls.clear()
+        stats = checker.run_round()
+        assert stats['targets'] == 1
+        assert probe.calls == [7000]
+        assert set(checker.get_status()) == {1}
+
+    def test_probes_run_concurrently(self, monkeypatch):
+        """测试一轮探测并发执行"""
+        monkeypatch.setattr(Config, 'HEALTH_CHECK_CONCURRENCY', 64)
+
+        async def slow_probe(host, port, timeout):
+            await asyncio.sleep(0.2)
+            return True, 200.0, None
+
+        targets = [{'id': index, 'name': f'c{index}', 'server_addr': '127.0.0.1', 'remote_port': 7000 + index}
+                   for index in range(50)]
+        checker = HealthChecker(probe=slow_probe)
+        start = time.time()
+        stats = checker.run_round(targets)
+        assert stats['up'] == 50
+        assert time.time() - start < 1.5
+
+    def test_metrics(self):
+        """测试运行指标"""
+        add_clients(1)
+        probe = FakeProbe()
+        probe.up.add(7000)
+        checker = HealthChecker(probe=probe)
+        checker.run_round()
+        original = health.health_checker
+        health.health_checker = checker
+        try:
+            families = {name: samples for name, _, _, samples in health._health_metrics()}
+        finally:
+            health.health_checker = original
+        assert families['frp_console_tunnel_up'] == [({'client_id': '1'}, 1)]
+
+
+class TestTcpProbe:
+    """TCP 探测测试"""
+
+    def test_open_and_closed_port(self):
+        """测试监听端口可连通，关闭的端口失败"""
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen()
+        open_port = server.getsockname()[1]
+
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+
+        try:
+            ok, latency, error = asyncio.run(health.tcp_probe('127.0.0.1', open_port, 1))
+            assert ok and latency is not None and error is None
+            ok, latency, error = asyncio.run(health.tcp_probe('127.0.0.1', closed_port, 1))
+            assert not ok and error
+        finally:
+            server.close()
+
+
+class TestHealthRoutes:
+    """健康状态路由测试"""
+
+    def test_health_routes(self, test_client, monkeypatch):
+        """测试查询健康状态"""
+        add_clients(1)
+        probe = FakeProbe()
+        probe.up.add(7000)
+        checker = HealthChecker(probe=probe)
+        checker.run_round()
+        monkeypatch.setattr(health, 'health_checker', checker)
+
+        assert test_client.get('/api/monitor/health').status_code == 401
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+        assert test_client.get('/api/monitor/health').get_json()['1']['state'] == 'up'
+        assert test_client.get('/api/monitor/health/1').get_json()['breaker'] == 'closed'
+        assert test_client.get('/api/monitor/health/9').status_code == 404
@@ -57,6 +57,21 @@ class TestLoginRateLimit:
         assert '登录失败次数过多' in message
         assert '秒后重试' in message
 
+    def test_check_login_rate_limit_counts_across_checks(self):
+        """测试每次登录前的检查不会清零失败次数"""
+        from utils.helpers import check_login_rate_limit, record_login_attempt, login_attempts
+
+        login_attempts.clear()
+
+        ip = '192.168.1.30'
+        for i in range(3):
+            allowed, _ = check_login_rate_limit(ip, max_attempts=3, lockout_time=900)
+            assert allowed is True
+            record_login_attempt(ip, success=False, max_attempts=3, lockout_time=900)
+
+        allowed, _ = check_login_rate_limit(ip, max_attempts=3, lockout_time=900)
+        assert allowed is False
+
     def test_check_login_rate_limit_lockout_expires(self):
         """测试锁定时间过期后重置"""
         from utils.helpers import check_login_rate_limit, record_login_attempt, login_attempts
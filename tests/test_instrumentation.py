@@ -0,0 +1,163 @@
+"""
+运行指标测试
+"""
+import time
+
+import pytest
+
+from config import Config
+from utils.instrumentation import Registry, registry
+
+
+class TestRegistry:
+    """指标注册和输出测试"""
+
+    def test_counter_and_gauge(self):
+        """测试计数器和仪表的文本输出"""
+        reg = Registry()
+        requests = reg.counter('app_requests', 'Requests', ('path',))
+        requests.labels('/a').inc()
+        requests.labels('/a').inc(2)
+        requests.labels('x"y').inc()
+        gauge = reg.gauge('app_queue', 'Queue depth')
+        gauge.set(7)
+
+        text = reg.render()
+        assert '# TYPE app_requests counter' in text
+        assert 'app_requests_total{path="/a"} 3' in text
+        assert 'app_requests_total{path="x\\"y"} 1' in text
+        assert 'app_queue 7' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """测试直方图桶累计计数"""
+        reg = Registry()
+        hist = reg.histogram('app_seconds', 'Latency', buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            hist.observe(value)
+
+        text = reg.render()
+        assert 'app_seconds_bucket{le="0.1"} 2' in text
+        assert 'app_seconds_bucket{le="1"} 3' in text
+        assert 'app_seconds_bucket{le="+Inf"} 4' in text
+        assert 'app_seconds_count 4' in text
+        assert 'app_seconds_sum 3.65' in text
+
+    def test_reregister_returns_existing(self):
+        """测试重复注册复用已有指标，定义冲突时报错"""
+        reg = Registry()
+        first = reg.counter('app_events', 'Events', ('kind',))
+        assert reg.counter('app_events', 'Events', ('kind',)) is first
+        with pytest.raises(ValueError):
+            reg.gauge('app_events', 'Events')
+
+    def test_label_count_checked(self):
+        """测试标签数量校验"""
+        reg = Registry()
+        with pytest.raises(ValueError):
+            reg.counter('app_events', 'Events', ('kind',)).labels('a', 'b')
+
+    def test_collector(self):
+        """测试采集函数在输出时调用，失败不影响其他指标"""
+        reg = Registry()
+        reg.gauge('app_up', 'Up').set(1)
+        reg.register_collector(lambda: [('app_cache', 'counter', 'Cache', [({'result': 'hit'}, 5)])])
+
+        def broken():
+            raise RuntimeError('boom')
+        reg.register_collector(broken)
+
+        text = reg.render()
+        assert 'app_cache_total{result="hit"} 5' in text
+        assert 'app_up 1' in text
+        assert 'boom' in text
+
+    def test_observe_overhead(self):
+        """测试记录开销为微秒级"""
+        hist = Registry().histogram('app_seconds', 'Latency', ('endpoint',))
+        start = time.perf_counter()
+        for _ in range(20000):
+            hist.labels('clients.get_clients').observe(0.003)
+        assert (time.perf_counter() - start) / 20000 < 50e-6
+
+
+class TestInstrumentation:
+    """控制台埋点测试"""
+
+    def test_db_queries_are_timed(self, temp_db):
+        """测试 SQLite 语句按类型计时"""
+        from models.database import QUERY_SECONDS, get_db_connection
+        QUERY_SECONDS.clear()
+
+        conn = get_db_connection()
+        conn.execute('SELECT COUNT(*) FROM clients').fetchone()
+        conn.cursor().execute('SELECT 1').fetchone()
+        conn.close()
+
+        assert QUERY_SECONDS.labels('SELECT').snapshot()[0][-1] == 2
+        assert QUERY_SECONDS.labels('PRAGMA').snapshot()[0][-1] == 3
+
+    def test_password_hash_timed(self):
+        """测试密码哈希计时"""
+        from utils.password import HASH_SECONDS, hash_password, verify_password
+        HASH_SECONDS.clear()
+        salt, hashed = hash_password('secret')
+        assert verify_password('secret', salt, hashed)
+        assert HASH_SECONDS.labels('hash').snapshot()[0][-1] == 1
+        assert HASH_SECONDS.labels('verify').snapshot()[0][-1] == 1
+
+
+class TestMetricsRoute:
+    """/metrics 路由测试"""
+
+    def test_requires_auth(self, test_client, monkeypatch):
+        """测试未登录且令牌错误时拒绝访问"""
+        monkeypatch.setattr(Config, 'METRICS_TOKEN', 'scrape-token')
+        assert test_client.get('/metrics').status_code == 401
+        response = test_client.get('/metrics', headers={'Authorization': 'Bearer wrong'})
+        assert response.status_code == 401
+
+    def test_token_disabled_by_default(self, test_client, monkeypatch):
+        """测试未配置令牌时不接受任何令牌"""
+        monkeypatch.setattr(Config, 'METRICS_TOKEN', None)
+        response = test_client.get('/metrics', headers={'Authorization': 'Bearer '})
+        assert response.status_code == 401
+
+    def test_scrape(self, test_client, monkeypatch, temp_db):
+        """测试输出请求耗时、渲染缓存和客户端指标"""
+        import monitor
+        monkeypatch.setattr(Config, 'METRICS_TOKEN', 'scrape-token')
+        monkeypatch.setitem(monitor.metrics_cache, 3, {
+            'traffic_in': 10, 'traffic_out': 20, 'connections_active': 2,
+            'rate_in': 1, 'rate_out': 2, 'status': 'running', 'ts': 0, 'collected_at': 0,
+        })
+        headers = {'Authorization': 'Bearer scrape-token'}
+        test_client.get('/metrics', headers=headers)
+
+        response = test_client.get('/metrics', headers=headers)
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain; version=0.0.4')
+        text = response.get_data(as_text=True)
+        assert 'frp_console_http_request_seconds_count{endpoint="metrics.get_metrics",method="GET"}' in text
+        assert 'frp_console_http_requests_total{endpoint="metrics.get_metrics",method="GET",status="200"}' in text
+        assert 'frp_console_config_render_cache_total{result="hit"}' in text
+        assert 'frp_console_client_connections{client_id="3"} 2' in text
+        assert 'frp_console_client_up{client_id="3"} 1' in text
+        assert 'frp_console_db_query_seconds' in text
+        assert registry.get('frp_console_password_hash_seconds') is not None
+
+    def test_request_metrics_single_worker_only(self, monkeypatch):
+        """测试多进程部署时不记录请求指标（/metrics 只能输出后台进程处理的请求）"""
+        import importlib.util
+        from flask import Flask
+        import api.routes.metrics as metrics_module
+
+        monkeypatch.setattr(Config, 'SERVER_WORKERS', 2)
+        spec = importlib.util.spec_from_file_location('metrics_multi_worker', metrics_module.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        app = Flask(__name__)
+        app.register_blueprint(module.metrics_bp)
+        assert not hasattr(module, 'REQUEST_SECONDS')
+        assert not app.before_request_funcs
+        assert not app.after_request_funcs
@@ -0,0 +1,195 @@
+"""
+实时指标推送测试
+"""
+import pytest
+
+from services.live_metrics import LiveMetricsPublisher, FLEET_ROOM, client_room
+
+
+def make_sample(ts, rate_in=0, status='running'):
+    """构造采集样本"""
+    return {
+        'ts': ts,
+        'traffic_in': rate_in * ts,
+        'traffic_out': 0,
+        'connections_active': 1,
+        'connections_total': 1,
+        'rate_in': rate_in,
+        'rate_out': 0,
+        'status': status,
+    }
+
+
+class FakeEmitter:
+    """记录发送的帧"""
+
+    def __init__(self):
+        self.frames = []
+
+    def __call__(self, event, data, to=None):
+        self.frames.append((event, data, to))
+
+    def take(self):
+        frames, self.frames = self.frames, []
+        return frames
+
+
+@pytest.fixture
+def emitter():
+    return FakeEmitter()
+
+
+@pytest.fixture
+def publisher(emitter):
+    return LiveMetricsPublisher(emit=emitter)
+
+
+class TestSubscriptions:
+    """订阅计数测试"""
+
+    def test_refcounts(self, publisher):
+        """测试多个会话订阅同一房间"""
+        publisher.subscribe('a', client_room(1))
+        publisher.subscribe('b', client_room(1))
+        publisher.subscribe('b', client_room(1))
+        assert publisher.subscriber_count(client_room(1)) == 2
+        assert publisher.watched_clients() == {1}
+
+        publisher.unsubscribe('a', client_room(1))
+        assert publisher.has_subscribers()
+        publisher.disconnect('b')
+        assert not publisher.has_subscribers()
+        assert publisher.watched_clients() == set()
+
+    def test_subscribe_wakes_collector(self, publisher):
+        """测试订阅变化会唤醒采集器"""
+        publisher.demand_changed.clear()
+        publisher.subscribe('a', FLEET_ROOM)
+        assert publisher.demand_changed.is_set()
+
+
+class TestFrames:
+    """差分帧测试"""
+
+    def test_unwatched_clients_are_not_sent(self, publisher, emitter):
+        """测试没有订阅的客户端不发送"""
+        publisher.publish(1, make_sample(100))
+        assert publisher.flush_tick() == 0
+        assert emitter.frames == []
+
+    def test_snapshot_then_deltas(self, publisher, emitter):
+        """测试新订阅者收到完整状态，之后只收到变化的字段"""
+        publisher.publish(1, make_sample(100, rate_in=5))
+        publisher.flush_tick()
+
+        publisher.subscribe('a', client_room(1))
+        [(event, frame, to)] = emitter.take()
+        assert (event, to) == ('metrics', 'a')
+        assert frame['full'] is True
+        assert frame['rate_in'] == 5
+
+        publisher.publish(1, make_sample(101, rate_in=7))
+        publisher.flush_tick()
+        [(event, frame, to)] = emitter.take()
+        assert to == client_room(1)
+        assert frame == {'id': 1, 'ts': 101, 'traffic_in': 707, 'rate_in': 7}
+
+    def test_unchanged_sample_sends_nothing(self, publisher, emitter):
+        """测试数据没有变化时不发送"""
+        publisher.subscribe('a', client_room(1))
+        sample = make_sample(100)
+        sample['traffic_in'] = 0
+        publisher.publish(1, sample)
+        publisher.flush_tick()
+        emitter.take()
+
+        publisher.publish(1, {**sample, 'ts': 101})
+        assert publisher.flush_tick() == 0
+
+    def test_coalesces_per_tick(self, publisher, emitter):
+        """测试同一轮内多次更新只发送一帧"""
+        publisher.subscribe('a', client_room(1))
+        for ts in range(100, 110):
+            publisher.publish(1, make_sample(ts, rate_in=ts))
+        assert publisher.flush_tick() == 1
+        assert emitter.frames[0][1]['rate_in'] == 109
+
+    def test_fleet_summary(self, publisher, emitter):
+        """测试全局汇总帧"""
+        publisher.subscribe('a', FLEET_ROOM)
+        assert emitter.take()[0][1]['clients'] == 0
+
+        publisher.publish(1, make_sample(100, rate_in=10))
+        publisher.publish(2, make_sample(100, rate_in=20, status='idle'))
+        publisher.flush_tick()
+        [(event, frame, to)] = emitter.take()
+        assert (event, to) == ('fleet', FLEET_ROOM)
+        assert frame['clients'] == 2
+        assert frame['running'] == 1
+        assert frame['rate_in'] == 30
+
+        publisher.publish(2, make_sample(101, rate_in=25, status='idle'))
+        publisher.flush_tick()
+        frame = emitter.take()[0][1]
+        assert set(frame) == {'ts', 'rate_in'}
+
+    def test_emit_failure_is_isolated(self, publisher):
+        """测试推送失败不影响采集"""
+        def broken(*args, **kwargs):
+            raise RuntimeError('boom')
+
+        publisher.set_emitter(broken)
+        publisher.subscribe('a', client_room(1))
+        publisher.publish(1, make_sample(100))
+        assert publisher.flush_tick() == 1
+
+
+class TestSocketEvents:
+    """Socket.IO 事件测试"""
+
+    @pytest.fixture
+    def app_module(self):
+        from app import app as app_module
+        return app_module
+
+    def test_requires_login(self, app_module):
+        """测试未登录时拒绝连接"""
+        client = app_module.socketio.test_client(app_module.app)
+        assert not client.is_connected()
+
+    def test_subscribe_events(self, app_module, monkeypatch):
+        """测试 subscribe/unsubscribe 事件维护订阅计数并发送快照"""
+        from services import live_metrics
+
+        # socketio 测试客户端收不到经 manager 广播的事件，这里用假发送函数记录帧
+        emitter = FakeEmitter()
+        publisher = LiveMetricsPublisher(emit=emitter)
+        monkeypatch.setattr(app_module, 'publisher', publisher)
+        publisher.publish(3, make_sample(100, rate_in=1))
+        publisher.flush_tick()
+
+        flask_client = app_module.app.test_client()
+        with flask_client.session_transaction() as sess:
+            sess['logged_in'] = True
+        # 固定版本的 Flask-SocketIO 无法从 Werkzeug 2.3 测试客户端注入 cookie，改为手动传入
+        cookie = flask_client.get_cookie('session')
+        client = app_module.socketio.test_client(
+            app_module.app, headers={'Cookie': f'session={cookie.value}'}
+        )
+        assert client.is_connected()
+
+        client.emit('subscribe', {'client_id': 3})
+        client.emit('subscribe', {'room': 'fleet'})
+        assert publisher.subscriber_count(live_metrics.client_room(3)) == 1
+        assert publisher.subscriber_count(live_metrics.FLEET_ROOM) == 1
+        event, frame, _ = emitter.take()[0]
+        assert event == 'metrics'
+        assert frame['full'] is True
+
+        client.emit('subscribe', {'client_id': 'x'})
+        assert publisher.subscriber_count() == 2
+
+        client.emit('unsubscribe', {'room': 'fleet'})
+        assert publisher.subscriber_count() == 1
+        client.disconnect()
+        assert publisher.subscriber_count() == 0
@@ -0,0 +1,226 @@
+"""
+进程间消息队列和后台调用转发测试
+"""
+import sys
+import threading
+import time
+
+import pytest
+
+from config import Config
+from utils import message_queue
+from utils.message_queue import BackgroundRelay, RelayError, SQLiteManager, SQLiteMessageQueue
+
+
+@pytest.fixture
+def queue_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'shared_state.db')
+    monkeypatch.setattr(Config, 'SHARED_STATE_PATH', path)
+    monkeypatch.setattr(Config, 'MESSAGE_QUEUE_POLL_MS', 5)
+    return path
+
+
+@pytest.fixture
+def multi_worker(queue_path, monkeypatch):
+    """多进程部署模式"""
+    monkeypatch.setattr(Config, 'SERVER_WORKERS', 2)
+    return queue_path
+
+
+def collect(queue, channel, count, after=0, timeout=5):
+    """在后台线程中监听，返回收到的前 count 条消息"""
+    messages, stop = [], threading.Event()
+
+    def run():
+        for message in queue.listen(channel, stop, after):
+            messages.append(message)
+            if len(messages) >= count:
+                stop.set()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    stop.set()
+    return messages
+
+
+class TestSQLiteMessageQueue:
+    """消息队列测试"""
+
+    def test_publish_and_listen(self, queue_path):
+        """测试另一个连接（进程）按发布顺序收到同一频道的消息"""
+        publisher, listener = SQLiteMessageQueue(queue_path), SQLiteMessageQueue(queue_path)
+        after = listener.last_id()
+        publisher.publish('a', {'n': 1})
+        publisher.publish('b', {'n': 2})
+        publisher.publish('a', {'n': 3})
+        assert collect(listener, 'a', 2, after) == [{'n': 1}, {'n': 3}]
+
+    def test_listen_starts_at_latest(self, queue_path):
+        """测试默认只收到开始监听之后发布的消息"""
+        queue = SQLiteMessageQueue(queue_path)
+        queue.publish('a', {'n': 1})
+        stop = threading.Event()
+        listener = queue.listen('a', stop)
+
+        def publish_later():
+            time.sleep(0.05)
+            queue.publish('a', {'n': 2})
+
+        threading.Thread(target=publish_later, daemon=True).start()
+        assert next(listener) == {'n': 2}
+        stop.set()
+
+    def test_prune(self, queue_path, monkeypatch):
+        """测试发布时清理超过保留时间的消息，ID 不复用"""
+        monkeypatch.setattr(Config, 'MESSAGE_QUEUE_RETENTION', 0)
+        queue = SQLiteMessageQueue(queue_path)
+        queue.publish('a', {'n': 1})
+        queue.publish('a', {'n': 2})
+        last = queue.last_id()
+
+        queue._last_prune = 0
+        time.sleep(0.01)
+        queue.publish('a', {'n': 3})
+        assert [message for _, message in queue.fetch('a', 0)] == [{'n': 3}]
+        assert queue.last_id() == last + 1
+
+
+class TestSocketIOManager:
+    """Socket.IO 客户端管理器测试"""
+
+    def test_emit_reaches_other_process(self, queue_path):
+        """测试一个进程中的 emit 发布到消息队列，其他进程的管理器收到同样的消息"""
+        sender, receiver = SQLiteManager(), SQLiteManager()
+        listener = receiver._listen()
+
+        def emit_later():
+            time.sleep(0.05)
+            sender.emit('metrics', {'id': 1}, namespace='/', room='client:1')
+
+        threading.Thread(target=emit_later, daemon=True).start()
+        message = next(listener)
+        assert message['method'] == 'emit'
+        assert message['event'] == 'metrics'
+        assert message['data'] == {'id': 1}
+        assert message['room'] == 'client:1'
+        assert message['host_id'] == sender.host_id
+
+    @pytest.mark.parametrize('setting, expected', [
+        ('', None), ('sqlite', 'client_manager'), ('redis://localhost:6379/0', 'message_queue')
+    ])
+    def test_socketio_options(self, queue_path, monkeypatch, setting, expected):
+        monkeypatch.setattr(Config, 'SOCKETIO_MESSAGE_QUEUE', setting)
+        options = message_queue.socketio_options()
+        if expected is None:
+            assert options == {}
+        else:
+            assert list(options) == [expected]
+        if expected == 'client_manager':
+            assert isinstance(options['client_manager'], SQLiteManager)
+        if expected == 'message_queue':
+            assert options['message_queue'] == setting
+
+
+class Component:
+    """后台组件"""
+
+    def __init__(self):
+        self.calls = []
+
+    def record(self, *args):
+        self.calls.append(args)
+
+    def status(self, key):
+        return {key: len(self.calls)}
+
+    def fail(self):
+        raise RuntimeError('boom')
+
+    def private(self):
+        pass
+
+
+def module_status(key):
+    """模块级函数（如 monitor.get_latest_metrics）"""
+    return {key: 'module'}
+
+
+class TestBackgroundRelay:
+    """后台调用转发测试"""
+
+    def test_single_process_calls_directly(self, queue_path):
+        relay, component = BackgroundRelay(), Component()
+        relay.call(component.record, 1)
+        assert relay.request(component.status, 'calls') == {'calls': 1}
+        assert component.calls == [(1,)]
+
+    @pytest.fixture
+    def workers(self, multi_worker):
+        """模拟 Web 工作进程和后台任务进程：各自有一份组件实例，通过同一个数据库文件通信"""
+        web, background = BackgroundRelay(), BackgroundRelay()
+        web_component, background_component = Component(), Component()
+        for relay, component in ((web, web_component), (background, background_component)):
+            relay.register('component', component, 'record', 'status', 'fail')
+        background.start()
+        yield web, web_component, background_component
+        background.stop()
+
+    def test_call_runs_in_background_process(self, workers):
+        """测试转发的调用在后台任务进程的组件上执行"""
+        web, web_component, background_component = workers
+        web.call(web_component.record, 1, 'a')
+        web.call(web_component.record, 2, 'b')
+        assert web.request(web_component.status, 'calls') == {'calls': 2}
+        assert background_component.calls == [(1, 'a'), (2, 'b')]
+        assert web_component.calls == []
+
+    def test_module_function(self, multi_worker):
+        """测试登记模块后可以转发模块级函数"""
+        web, background = BackgroundRelay(), BackgroundRelay()
+        module = sys.modules[__name__]
+        for relay in (web, background):
+            relay.register('module', module, 'module_status')
+        background.start()
+        try:
+            assert web.request(module_status, 'source') == {'source': 'module'}
+        finally:
+            background.stop()
+        with pytest.raises(ValueError):
+            web.call(time.time)
+
+    def test_request_error(self, workers):
+        """测试后台执行出错时请求方收到 RelayError"""
+        web, web_component, _ = workers
+        with pytest.raises(RelayError, match='boom'):
+            web.request(web_component.fail)
+
+    def test_request_timeout(self, multi_worker):
+        """测试没有后台任务进程时请求超时"""
+        relay, component = BackgroundRelay(), Component()
+        relay.register('component', component, 'status')
+        start = time.monotonic()
+        with pytest.raises(RelayError, match='未在'):
+            relay.request(component.status, 'calls', timeout=0.1)
+        assert time.monotonic() - start < 2
+
+    def test_only_registered_methods(self, multi_worker):
+        relay, component = BackgroundRelay(), Component()
+        relay.register('component', component, 'record')
+        with pytest.raises(ValueError):
+            relay.call(component.private)
+        with pytest.raises(ValueError):
+            relay.call(Component().record, 1)
+
+    def test_route_unavailable_without_background_process(self, test_client, multi_worker, monkeypatch):
+        """测试多进程部署中后台任务进程未响应时，状态接口返回 503"""
+        monkeypatch.setattr(Config, 'RELAY_TIMEOUT', 0.1)
+        monkeypatch.setattr(message_queue.relay, '_queue', None)
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+
+        response = test_client.get('/api/alerts/rules')
+        assert response.status_code == 503
+        assert '后台任务进程' in response.get_json()['error']
+        for url in ('/api/monitor/metrics', '/api/monitor/metrics/1/history', '/metrics'):
+            assert test_client.get(url).status_code == 503
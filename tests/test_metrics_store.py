@@ -0,0 +1,196 @@
+"""
+监控指标存储测试
+"""
+import sqlite3
+
+import pytest
+
+from config import Config
+from services import metrics_store
+from services.metrics_store import MetricsStore, decode_block, encode_block, summarize, FIELDS
+
+
+def make_sample(ts, traffic_in=0, rate_in=0, connections=1):
+    """构造样本"""
+    return {
+        'ts': ts,
+        'traffic_in': traffic_in,
+        'traffic_out': traffic_in // 2,
+        'connections_active': connections,
+        'connections_total': connections,
+        'rate_in': rate_in,
+        'rate_out': rate_in // 2,
+    }
+
+
+class TestBlockEncoding:
+    """块编码测试"""
+
+    def test_roundtrip(self):
+        """测试编码后可还原"""
+        samples = [make_sample(6000 + i, traffic_in=i * 1000, rate_in=1000) for i in range(60)]
+        data = encode_block(6000, samples)
+        assert decode_block(6000, 60, data) == samples
+
+    def test_negative_deltas(self):
+        """测试计数器回绕（frpc 重启后流量清零）"""
+        samples = [make_sample(6000, traffic_in=10 ** 12), make_sample(6001, traffic_in=5)]
+        assert decode_block(6000, 2, encode_block(6000, samples)) == samples
+
+    def test_compact(self):
+        """测试匀速变化的数据压缩后每个样本只占很少字节"""
+        samples = [make_sample(6000 + i, traffic_in=i * 4096, rate_in=4096) for i in range(60)]
+        assert len(encode_block(6000, samples)) < 60 * len(FIELDS)
+
+
+class TestMetricsStore:
+    """指标存储测试"""
+
+    @pytest.fixture
+    def store(self, temp_db):
+        return MetricsStore(block_seconds=60)
+
+    def test_open_block_is_queryable(self, store):
+        """测试未写入数据库的样本也能查询到"""
+        store.append(1, make_sample(6001))
+        assert [s['ts'] for s in store.query(1, 6000, 7000)] == [6001]
+
+    def test_one_row_per_block(self, store, temp_db):
+        """测试每个客户端每个块只写一行"""
+        for ts in range(6000, 6180):
+            store.append(1, make_sample(ts, traffic_in=ts))
+            store.append(2, make_sample(ts))
+
+        assert store.flush() == 4
+        assert store.flush(include_open=True) == 2
+
+        conn = sqlite3.connect(temp_db)
+        assert conn.execute('SELECT COUNT(*) FROM metric_blocks').fetchone()[0] == 6
+        conn.close()
+
+        samples = store.query(1, 6029, 6100)
+        assert [s['ts'] for s in samples] == list(range(6030, 6101))
+        assert samples[0]['traffic_in'] == 6030
+
+    def test_merge_with_existing_block(self, store):
+        """测试重启后继续写入同一块时合并已有样本"""
+        store.append(1, make_sample(6000))
+        store.flush(include_open=True)
+
+        restarted = MetricsStore(block_seconds=60)
+        restarted.append(1, make_sample(6010))
+        restarted.flush(include_open=True)
+
+        assert [s['ts'] for s in restarted.query(1, 0, 7000)] == [6000, 6010]
+
+    def test_drop_expired(self, store, monkeypatch):
+        """测试按块删除超出保留期的数据"""
+        monkeypatch.setattr(Config, 'METRICS_RETENTION_DAYS', 1)
+        now = 10 * 86400
+        store.append(1, make_sample(now - 2 * 86400))
+        store.append(1, make_sample(now - 60))
+        store.flush(include_open=True)
+
+        assert store.drop_expired(now) == 1
+        assert [s['ts'] for s in store.query(1, 0, now)] == [now - 60]
+
+    def test_close_client(self, store):
+        """测试结束客户端当前块后可被写入"""
+        store.append(1, make_sample(6000))
+        store.close_client(1)
+        assert store.flush() == 1
+
+    def test_retention_uses_index(self, store, temp_db):
+        """测试过期删除使用 block_ts 索引"""
+        conn = sqlite3.connect(temp_db)
+        plan = ' '.join(
+            row[-1] for row in conn.execute('EXPLAIN QUERY PLAN DELETE FROM metric_blocks WHERE block_ts < 1')
+        )
+        conn.close()
+        assert 'idx_metric_blocks_block_ts' in plan
+
+
+class TestRollups:
+    """多精度汇总测试"""
+
+    @pytest.fixture
+    def store(self, temp_db):
+        return MetricsStore(block_seconds=60)
+
+    def test_summarize(self):
+        """测试按分钟汇总 min/max/avg/last"""
+        samples = [make_sample(6000 + i, traffic_in=i, rate_in=i) for i in range(120)]
+        buckets = summarize(samples, 60)
+        assert [b['ts'] for b in buckets] == [6000, 6060]
+        assert buckets[0]['samples'] == 60
+        assert (buckets[0]['rate_in_min'], buckets[0]['rate_in_max']) == (0, 59)
+        assert buckets[0]['rate_in_avg'] == 30
+        assert buckets[1]['rate_in_last'] == 119
+        assert buckets[1]['traffic_in_last'] == 119
+
+    def test_rebucket_matches_python(self):
+        """测试 NumPy 分桶与纯 Python 分桶结果一致"""
+        if metrics_store.np is None:
+            pytest.skip('未安装 NumPy')
+        samples = [make_sample(6000 + i * 7, rate_in=(i * 37) % 101, connections=i % 5) for i in range(500)]
+        buckets = summarize(samples, 60)
+        assert metrics_store._rebucket_numpy(buckets, 0, 600) == metrics_store._rebucket_python(buckets, 0, 600)
+
+    def test_rollups_maintained_on_flush(self, store):
+        """测试写入原始块时同步维护汇总"""
+        base = 86400 * 100
+        for ts in range(base, base + 7200, 10):
+            store.append(1, make_sample(ts, rate_in=ts - base))
+        store.flush(include_open=True)
+
+        minutes = store.query_rollups(1, 60, base - 1, base + 7200)
+        hours = store.query_rollups(1, 3600, base - 1, base + 7200)
+        assert len(minutes) == 120
+        assert all(b['samples'] == 6 for b in minutes)
+        assert [b['samples'] for b in hours] == [360, 360]
+        assert hours[1]['rate_in_min'] == 3600
+        assert hours[1]['rate_in_last'] == 7190
+
+    def test_rollups_merge_across_flushes(self, store):
+        """测试多次写入同一小时时汇总正确合并"""
+        base = 86400 * 100
+        store.append(1, make_sample(base, rate_in=10))
+        store.flush(include_open=True)
+        store.append(1, make_sample(base + 30, rate_in=30))
+        store.flush(include_open=True)
+
+        hour = store.query_rollups(1, 3600, base - 1, base + 3600)[0]
+        assert hour['samples'] == 2
+        assert (hour['rate_in_min'], hour['rate_in_max'], hour['rate_in_avg']) == (10, 30, 20)
+
+    def test_series_picks_resolution(self, store, monkeypatch):
+        """测试按 max_points 选择精度"""
+        now = 86400 * 100
+        monkeypatch.setattr(metrics_store.time, 'time', lambda: now)
+        for ts in range(now - 6 * 3600, now, 5):
+            store.append(1, make_sample(ts, rate_in=1))
+        store.flush()
+
+        assert store.query_series(1, now - 300, max_points=500)['resolution'] == 0
+        series = store.query_series(1, now - 3600, max_points=60)
+        assert series['resolution'] == 60
+        assert len(series['points']) == 60
+        series = store.query_series(1, now - 6 * 3600, max_points=6)
+        assert series['resolution'] == 3600
+        series = store.query_series(1, now - 6 * 3600, max_points=4)
+        assert series['resolution'] == 7200
+        assert len(series['points']) <= 4
+        assert sum(p['samples'] for p in series['points']) == 6 * 720
+
+        # 原始样本超出点数时按目标宽度重新分桶
+        series = store.query_series(1, now - 6 * 3600, max_points=500)
+        assert series['resolution'] == 44
+        assert len(series['points']) <= 500
+
+    def test_series_skips_expired_tiers(self, store, monkeypatch):
+        """测试原始数据已过期时使用汇总"""
+        monkeypatch.setattr(Config, 'METRICS_RETENTION_DAYS', 1)
+        now = 86400 * 100
+        monkeypatch.setattr(metrics_store.time, 'time', lambda: now)
+        series = store.query_series(1, now - 2 * 86400 - 100, now - 2 * 86400, max_points=500)
+        assert series['resolution'] == 60
@@ -0,0 +1,289 @@
+"""
+监控采集器测试
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import monitor
+from config import Config
+from services.collection_scheduler import CollectionScheduler
+from services.live_metrics import LiveMetricsPublisher
+from services.metrics_store import MetricsStore
+
+
+@pytest.fixture(autouse=True)
+def reset_monitor(monkeypatch, temp_db):
+    """每个测试使用独立的采集状态和数据库"""
+    monkeypatch.setattr(Config, 'MONITOR_CONCURRENCY', 64)
+    monkeypatch.setattr(monitor, 'metrics_store', MetricsStore())
+    monitor.metrics_cache.clear()
+    yield
+    monitor.stop_monitor_thread()
+    monitor.metrics_cache.clear()
+
+
+STATUS = {
+    'tcp': [
+        {'name': 'ssh', 'today_traffic_in': 100, 'today_traffic_out': 200, 'cur_conns': 2},
+        {'name': 'web', 'today_traffic_in': 50, 'today_traffic_out': 50, 'cur_conns': 1},
+    ],
+    'udp': [],
+}
+
+
+class TestParseStatus:
+    """admin API 响应解析测试"""
+
+    def test_sums_all_proxy_types(self):
+        """测试汇总所有代理类型"""
+        data = monitor.parse_status(STATUS)
+        assert data['traffic_in'] == 150
+        assert data['traffic_out'] == 250
+        assert data['connections_active'] == 3
+        assert data['status'] == 'running'
+
+    def test_no_proxies(self):
+        """测试没有代理时视为停止，但 admin 接口可访问"""
+        data = monitor.parse_status({'tcp': []})
+        assert data['status'] == 'stopped'
+        assert data['reachable'] is True
+
+    def test_reachability_passed_to_rules(self, monkeypatch):
+        """测试规则引擎和调度器收到的可访问状态来自采集结果，而不是代理状态"""
+        events = []
+        monkeypatch.setattr(monitor.rules_engine, 'observe', lambda source, cid, fields: events.append(fields))
+        monkeypatch.setattr(monitor, 'fetch_metrics_from_admin', lambda cid: monitor.parse_status({'tcp': []}))
+        assert monitor._poll_client(1)[0] is True
+        assert events[-1]['reachable'] is True
+
+        monkeypatch.setattr(monitor, 'fetch_metrics_from_admin', lambda cid: monitor._empty_metrics('stopped', False))
+        assert monitor._poll_client(1)[0] is False
+        assert events[-1]['reachable'] is False
+
+
+class TestCollectOnce:
+    """并发采集测试"""
+
+    def test_sweep_is_concurrent(self, monkeypatch):
+        """测试一轮采集的耗时约为单个目标的耗时"""
+        def slow_fetch(client_id):
+            time.sleep(0.2)
+            return monitor.parse_status(STATUS)
+
+        monkeypatch.setattr(monitor, 'fetch_metrics_from_admin', slow_fetch)
+        started = time.time()
+        stats = monitor.collect_once(range(1, 65), timeout=5)
+        elapsed = time.time() - started
+
+        assert stats == {'submitted': 64, 'completed': 64, 'pending': 0, 'skipped': 0}
+        assert elapsed < 1.5
+        assert len(monitor.get_latest_metrics()) == 64
+
+    def test_stalled_target_does_not_block_sweep(self, monkeypatch):
+        """测试无响应的目标不阻塞本轮，并在下一轮被跳过"""
+        release = threading.Event()
+
+        def fetch(client_id):
+            if client_id == 1:
+                release.wait(5)
+            return monitor.parse_status(STATUS)
+
+        monkeypatch.setattr(monitor, 'fetch_metrics_from_admin', fetch)
+        started = time.time()
+        stats = monitor.collect_once([1, 2, 3], timeout=0.3)
+        assert time.time() - started < 1
+        assert stats['completed'] == 2
+        assert stats['pending'] == 1
+
+        stats = monitor.collect_once([1, 2, 3], timeout=0.3)
+        assert stats['skipped'] == 1
+        assert stats['submitted'] == 2
+        release.set()
+
+    def test_rates_and_history(self, monkeypatch):
+        """测试根据相邻样本计算速率并写入历史"""
+        monitor._record_sample(1, monitor.parse_status(STATUS), 1000.0)
+        data = monitor.parse_status(STATUS)
+        data['traffic_in'] += 1000
+        monitor._record_sample(1, data, 1002.0)
+
+        latest = monitor.metrics_cache[1]
+        assert latest['rate_in'] == 500
+        assert latest['rate_out'] == 0
+        assert [s['rate_in'] for s in monitor.metrics_store.query(1, 0, 2000)] == [0, 500]
+
+    def test_history_window(self):
+        """测试历史数据按时间范围过滤"""
+        now = time.time()
+        monitor._record_sample(1, monitor.parse_status(STATUS), now - 7200)
+        monitor._record_sample(1, monitor.parse_status(STATUS), now)
+
+        assert len(monitor.get_metrics_history(1, hours=1)) == 1
+        assert len(monitor.get_metrics_history(1, hours=3)) == 2
+        assert monitor.get_metrics_history(2) == []
+
+    def test_stop_persists_open_blocks(self):
+        """测试停止采集时写入未结束的块"""
+        monitor._record_sample(1, monitor.parse_status(STATUS), time.time())
+        monitor.stop_monitor_thread()
+
+        assert MetricsStore().query(1, 0)[0]['traffic_in'] == 150
+
+
+class TestCadence:
+    """采集节奏测试"""
+
+    def _dispatch_and_wait(self, sched):
+        submitted = monitor._dispatch_due()
+        deadline = time.time() + 2
+        while sched.snapshot()['in_flight'] and time.time() < deadline:
+            time.sleep(0.01)
+        return submitted
+
+    def test_dispatch_records_outcome(self, monkeypatch):
+        """测试到期的客户端被提交，并按采集结果和订阅重新调度"""
+        sched = CollectionScheduler()
+        publisher = LiveMetricsPublisher()
+        monkeypatch.setattr(monitor, 'scheduler', sched)
+        monkeypatch.setattr(monitor, 'publisher', publisher)
+        monkeypatch.setattr(monitor, 'fetch_metrics_from_admin', lambda cid: monitor.parse_status(STATUS))
+        publisher.subscribe('sid', 'client:1')
+
+        sched.sync([1, 2])
+        assert self._dispatch_and_wait(sched) == 2
+        reasons = {e['client_id']: e['reason'] for e in sched.snapshot()['entries']}
+        assert reasons == {1: 'watched', 2: 'changing'}
+
+        # 尚未到期时不会重复提交
+        assert monitor._dispatch_due() == 0
+
+    def test_in_flight_client_is_deferred(self, monkeypatch):
+        """测试正在被 collect_once 采集的客户端稍后重新调度"""
+        sched = CollectionScheduler()
+        monkeypatch.setattr(monitor, 'scheduler', sched)
+        sched.sync([1])
+        with monitor._in_flight_lock:
+            monitor._in_flight.add(1)
+        try:
+            assert monitor._dispatch_due() == 0
+        finally:
+            with monitor._in_flight_lock:
+                monitor._in_flight.discard(1)
+        entry = sched.snapshot()['entries'][0]
+        assert entry['reason'] == 'new'
+        assert not entry['in_flight']
+        assert 0 < entry['next_due_in'] <= monitor.TICK_INTERVAL
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """模拟 frpc admin API"""
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+
+    def do_GET(self):
+        StatusHandler.connections.add(self.client_address)
+        body = json.dumps(STATUS).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAdminApi:
+    """admin API 访问测试"""
+
+    def test_fetch_reuses_connection(self, monkeypatch):
+        """测试多轮采集复用同一条连接"""
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        StatusHandler.connections = set()
+        try:
+            monkeypatch.setattr(Config, 'FRPC_ADMIN_HOST', '127.0.0.1')
+            monkeypatch.setattr(Config, 'FRPC_ADMIN_PORT_BASE', server.server_address[1] - 1)
+
+            for _ in range(3):
+                assert monitor.fetch_metrics_from_admin(1)['traffic_in'] == 150
+            assert len(StatusHandler.connections) == 1
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_thread_sessions_share_connections(self, monkeypatch):
+        """测试每个线程使用自己的会话，但复用同一个连接池中的连接"""
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        StatusHandler.connections = set()
+        try:
+            monkeypatch.setattr(Config, 'FRPC_ADMIN_HOST', '127.0.0.1')
+            monkeypatch.setattr(Config, 'FRPC_ADMIN_PORT_BASE', server.server_address[1] - 1)
+
+            sessions = []
+            for _ in range(3):
+                thread = threading.Thread(target=lambda: (sessions.append(monitor.get_session()),
+                                                          monitor.fetch_metrics_from_admin(1)))
+                thread.start()
+                thread.join()
+            assert len({id(session) for session in sessions}) == 3
+            assert len({id(session.adapters['http://']) for session in sessions}) == 1
+            assert len(StatusHandler.connections) == 1
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_refused_connection_means_stopped(self, monkeypatch):
+        """测试连接被拒绝时返回停止状态"""
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+        port = server.server_address[1]
+        server.server_close()
+        monkeypatch.setattr(Config, 'FRPC_ADMIN_HOST', '127.0.0.1')
+        monkeypatch.setattr(Config, 'FRPC_ADMIN_PORT_BASE', port - 1)
+
+        data = monitor.fetch_metrics_from_admin(1)
+        assert data['status'] == 'stopped'
+        assert data['reachable'] is False
+
+
+class TestMonitorRoutes:
+    """监控路由测试"""
+
+    def test_requires_login(self, test_client):
+        """测试未登录时拒绝访问"""
+        assert test_client.get('/api/monitor/metrics').status_code == 401
+
+    def test_history_route(self, test_client):
+        """测试历史数据路由"""
+        monitor._record_sample(5, monitor.parse_status(STATUS), time.time())
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+            sess['username'] = 'test_admin'
+
+        assert test_client.get('/api/monitor/metrics/5').get_json()['traffic_in'] == 150
+        history = test_client.get('/api/monitor/metrics/5/history?hours=1').get_json()
+        assert history['resolution'] == 0
+        assert history['points'][0]['rate_in_max'] == 0
+        assert test_client.get('/api/monitor/metrics/5/history?max_points=0').status_code == 400
+        assert test_client.get('/api/monitor/metrics/6').status_code == 404
+        assert test_client.get('/api/monitor/metrics/5/history?hours=0').status_code == 400
+
+    def test_scheduler_route(self, test_client, monkeypatch):
+        """测试调度器内省接口"""
+        sched = CollectionScheduler()
+        monkeypatch.setattr('services.collection_scheduler.scheduler', sched)
+        sched.sync([1, 2, 3])
+        assert test_client.get('/api/monitor/scheduler').status_code == 401
+
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+            sess['username'] = 'test_admin'
+        data = test_client.get('/api/monitor/scheduler?limit=2').get_json()
+        assert data['clients'] == 3
+        assert len(data['entries']) == 2
+        assert data['entries'][0]['reason'] == 'new'
@@ -0,0 +1,151 @@
+"""
+采样分析测试
+"""
+import threading
+
+import pytest
+
+from config import Config
+from utils import profiler
+
+
+@pytest.fixture(autouse=True)
+def reset_profiler(monkeypatch):
+    monkeypatch.setattr(Config, 'PROFILER_COOLDOWN', 60)
+    profiler.reset_cooldown()
+    yield
+    profiler.reset_cooldown()
+
+
+def busy_loop_for_profiler(stop):
+    """供采样的忙碌函数"""
+    while not stop.is_set():
+        sum(range(100))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop_for_profiler, args=(stop,), name='busy-worker')
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+@pytest.fixture
+def idle_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait, name='idle-worker')
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+class TestSamplingProfiler:
+    """采样器测试"""
+
+    def test_collapsed_stacks(self, busy_thread):
+        """测试折叠栈包含线程名和从根到叶的函数"""
+        sampler = profiler.SamplingProfiler(interval=0.002)
+        sampler.run(0.2)
+
+        assert sampler.samples > 10
+        lines = sampler.collapsed().splitlines()
+        busy = [line for line in lines if line.startswith('busy-worker;')]
+        assert busy
+        stack, count = busy[0].rsplit(' ', 1)
+        assert int(count) > 0
+        frames = stack.split(';')
+        assert frames[1].startswith('_bootstrap ')
+        assert any(frame.startswith('busy_loop_for_profiler (') for frame in frames)
+
+    def test_idle_threads_skipped(self, idle_thread):
+        """测试默认跳过空闲线程"""
+        sampler = profiler.SamplingProfiler(interval=0.005)
+        sampler.run(0.05)
+        assert not any(stack.startswith('idle-worker;') for stack in sampler.stacks)
+
+        sampler = profiler.SamplingProfiler(interval=0.005, include_idle=True)
+        sampler.run(0.05)
+        assert any(stack.startswith('idle-worker;') for stack in sampler.stacks)
+
+    def test_own_thread_excluded(self):
+        """测试不采样执行采样的线程"""
+        sampler = profiler.SamplingProfiler(interval=0.005, include_idle=True)
+        sampler.run(0.05)
+        assert not any('SamplingProfiler' in stack or 'run (utils/profiler.py' in stack
+                       for stack in sampler.stacks)
+
+
+class TestRateLimit:
+    """并发和频率限制测试"""
+
+    def test_cooldown(self):
+        """测试冷却时间内拒绝再次采样"""
+        profiler.profile(0.1, 0.01)
+        with pytest.raises(profiler.ProfilerBusy) as excinfo:
+            profiler.profile(0.1, 0.01)
+        assert excinfo.value.retry_after > 0
+
+    def test_single_run(self, monkeypatch):
+        """测试同一时间只允许一次采样"""
+        monkeypatch.setattr(Config, 'PROFILER_COOLDOWN', 0)
+        started = threading.Event()
+        original_run = profiler.SamplingProfiler.run
+
+        def slow_run(self, duration):
+            started.set()
+            original_run(self, duration)
+
+        monkeypatch.setattr(profiler.SamplingProfiler, 'run', slow_run)
+        thread = threading.Thread(target=profiler.profile, args=(0.3, 0.01))
+        thread.start()
+        started.wait(1)
+        with pytest.raises(profiler.ProfilerBusy):
+            profiler.profile(0.1, 0.01)
+        thread.join()
+
+    def test_duration_capped(self, monkeypatch):
+        """测试采样时长不超过上限"""
+        monkeypatch.setattr(Config, 'PROFILER_MAX_SECONDS', 0.1)
+        _, elapsed = profiler.profile(60, 0.01)
+        assert elapsed < 0.5
+
+
+class TestProfileRoute:
+    """采样路由测试"""
+
+    def _login(self, client, role):
+        with client.session_transaction() as sess:
+            sess['logged_in'] = True
+            sess['username'] = 'test_admin'
+            sess['user_role'] = role
+
+    def test_requires_admin(self, test_client):
+        """测试非管理员无法采样"""
+        # 未登录时 login_required 重定向到登录页
+        assert test_client.get('/api/diagnostics/profile').status_code == 302
+        self._login(test_client, 'viewer')
+        assert test_client.get('/api/diagnostics/profile').status_code == 403
+
+    def test_profile_and_rate_limit(self, test_client, temp_db, busy_thread):
+        """测试返回折叠栈，冷却期内返回 429"""
+        self._login(test_client, 'admin')
+        response = test_client.get('/api/diagnostics/profile?seconds=0.2&interval_ms=5')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert int(response.headers['X-Profile-Samples']) > 0
+        assert 'busy_loop_for_profiler' in response.get_data(as_text=True)
+
+        response = test_client.get('/api/diagnostics/profile?seconds=0.2')
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) > 0
+
+    def test_json_format(self, test_client, temp_db):
+        """测试 JSON 格式输出"""
+        self._login(test_client, 'admin')
+        data = test_client.get('/api/diagnostics/profile?seconds=0.1&format=json&idle=true').get_json()
+        assert data['samples'] > 0
+        assert isinstance(data['stacks'], dict)
@@ -0,0 +1,176 @@
+"""
+配置拉取记录测试
+"""
+import pytest
+
+from config import Config
+from models.database import get_db_connection
+from services.pull_tracker import PullTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def tracker(temp_db, clock, monkeypatch):
+    tracker = PullTracker(clock=clock)
+    # 测试中手动 flush，不启动后台线程
+    monkeypatch.setattr(tracker, '_ensure_flusher', lambda: None)
+    return tracker
+
+
+def add_client(name='node', version=1):
+    conn = get_db_connection()
+    cursor = conn.execute('INSERT INTO clients (name, config_content, version) VALUES (?, ?, ?)',
+                          (name, '[common]', version))
+    conn.commit()
+    conn.close()
+    return cursor.lastrowid
+
+
+def pull_rows():
+    conn = get_db_connection()
+    rows = {row['client_id']: dict(row) for row in conn.execute('SELECT * FROM client_pulls')}
+    conn.close()
+    return rows
+
+
+class TestPullTracker:
+    """拉取记录测试"""
+
+    def test_record_is_buffered(self, tracker, clock):
+        """测试拉取只更新内存，flush 时批量写入"""
+        first, second = add_client('a'), add_client('b')
+        for _ in range(3):
+            tracker.record(first, '10.0.0.1', 1)
+            clock.now += 60
+        tracker.record(second, '10.0.0.2', 1)
+
+        assert pull_rows() == {}
+        assert tracker.get(first)['pull_count'] == 3
+
+        assert tracker.flush() == 2
+        rows = pull_rows()
+        assert rows[first]['pull_count'] == 3
+        assert rows[first]['last_ip'] == '10.0.0.1'
+        assert rows[second]['last_pull_at'] == int(clock.now)
+        # 没有新拉取时不重复写入
+        assert tracker.flush() == 0
+
+    def test_pull_rate(self, tracker, clock):
+        """测试按平均拉取间隔计算每小时拉取次数"""
+        client_id = add_client()
+        for _ in range(10):
+            tracker.record(client_id, '10.0.0.1', 1)
+            clock.now += 30
+        assert tracker.get(client_id)['pulls_per_hour'] == 120
+
+    def test_stale_and_outdated(self, tracker, clock, monkeypatch):
+        """测试失联标记和版本落后标记"""
+        monkeypatch.setattr(Config, 'PULL_STALE_SECONDS', 600)
+        pulled, never = add_client('pulled', version=3), add_client('never')
+        tracker.record(pulled, '10.0.0.1', 2)
+
+        clients = tracker.annotate([{'id': pulled, 'version': 3}, {'id': never, 'version': 1}])
+        assert clients[0]['pull_stale'] is False
+        assert clients[0]['config_outdated'] is True
+        assert clients[1]['last_pull_at'] is None
+        assert clients[1]['pull_stale'] is False
+
+        clock.now += 601
+        assert tracker.annotate([{'id': pulled, 'version': 3}])[0]['pull_stale'] is True
+
+    def test_restored_after_restart(self, tracker, clock):
+        """测试重启后从数据库恢复记录"""
+        client_id = add_client()
+        tracker.record(client_id, '10.0.0.1', 1)
+        clock.now += 100
+        tracker.record(client_id, '10.0.0.1', 1)
+        tracker.flush()
+
+        restarted = PullTracker(clock=clock)
+        summary = restarted.get(client_id)
+        assert summary['pull_count'] == 2
+        assert summary['pulls_per_hour'] == 36
+
+    def test_deleted_client_skipped(self, tracker):
+        """测试已删除客户端的记录不写入"""
+        client_id = add_client()
+        tracker.record(client_id, '10.0.0.1', 1)
+        conn = get_db_connection()
+        conn.execute('DELETE FROM clients WHERE id = ?', (client_id,))
+        conn.commit()
+        conn.close()
+
+        tracker.flush()
+        assert pull_rows() == {}
+
+
+class TestPullRoutes:
+    """拉取接口测试"""
+
+    def test_export_records_pull(self, test_client, tracker, monkeypatch):
+        """测试导出配置时记录拉取，客户端列表返回拉取摘要"""
+        import api.routes.clients as clients_routes
+        import services.client_service as client_service
+        monkeypatch.setattr(clients_routes, 'pull_tracker', tracker)
+        monkeypatch.setattr(client_service, 'pull_tracker', tracker)
+        monkeypatch.setattr(Config, 'API_TOKEN', 'pull-token')
+        client_id = add_client(version=4)
+
+        response = test_client.get(f'/api/configs/{client_id}/export',
+                                   headers={'Authorization': 'Bearer pull-token'},
+                                   environ_base={'REMOTE_ADDR': '192.0.2.7'})
+        assert response.status_code == 200
+        assert pull_rows() == {}
+
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+        client = test_client.get('/api/clients').get_json()[0]
+        assert client['last_pull_ip'] == '192.0.2.7'
+        assert client['last_pull_version'] == 4
+        assert client['pull_count'] == 1
+        assert client['config_outdated'] is False
+
+    def test_template_change_marks_outdated(self, test_client, test_app, tracker, monkeypatch):
+        """测试模板客户端按有效版本（客户端版本 + 模板版本）比较，模板修改后标记为落后"""
+        import api.routes.clients as clients_routes
+        import services.client_service as client_service
+        from services.client_service import ClientService
+        from services.template_service import TemplateService
+        monkeypatch.setattr(clients_routes, 'pull_tracker', tracker)
+        monkeypatch.setattr(client_service, 'pull_tracker', tracker)
+        monkeypatch.setattr(Config, 'API_TOKEN', 'pull-token')
+
+        with test_app.test_request_context():
+            success, result = ClientService.create_client({
+                'name': 'form-client', 'server_addr': 'frp.example.com', 'server_port': 7000,
+                'token': 'secret-token', 'user': 'tester', 'local_port': 22, 'remote_port': 6022,
+            })
+            assert success, result
+            client_id = result['id']
+
+        test_client.get(f'/api/configs/{client_id}/export', headers={'Authorization': 'Bearer pull-token'})
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+        client = test_client.get('/api/clients').get_json()[0]
+        assert client['last_pull_version'] == client['version'] + client['template_version']
+        assert client['config_outdated'] is False
+
+        with test_app.test_request_context():
+            template = TemplateService.get_template(client['template_id'])
+            success, _ = TemplateService.update_template(template['id'], {
+                'content': template['content'].replace('tls_enable = false', 'tls_enable = true')
+            })
+            assert success
+        assert test_client.get('/api/clients').get_json()[0]['config_outdated'] is True
@@ -0,0 +1,143 @@
+"""
+配置修订历史测试
+"""
+import pytest
+
+
+BASE_CONFIG = """[common]
+server_addr = "frp.example.com"
+server_port = 7000
+
+[proxy]
+type = "tcp"
+local_port = 8080
+remote_port = 9000
+"""
+
+
+def edit(config, n):
+    """生成第 n 次编辑后的配置"""
+    return config.replace('remote_port = 9000', f'remote_port = {9000 + n}')
+
+
+class TestDelta:
+    """差异编码测试"""
+
+    def test_delta_roundtrip(self):
+        """测试差异可以还原新版本"""
+        from services.revision_service import make_delta, apply_delta
+
+        old = BASE_CONFIG
+        new = edit(BASE_CONFIG, 1) + 'log_level = "debug"\n'
+        assert apply_delta(old, make_delta(old, new)) == new
+
+    def test_delta_roundtrip_without_trailing_newline(self):
+        """测试末行没有换行符的情况"""
+        from services.revision_service import make_delta, apply_delta
+
+        old = 'a\nb\nc'
+        new = 'a\nc\nd'
+        assert apply_delta(old, make_delta(old, new)) == new
+
+
+class TestConfigRevisionService:
+    """修订历史服务测试"""
+
+    def _create_client(self):
+        from services.client_service import ClientService
+        success, result = ClientService.create_client({'name': 'rev-client', 'config_content': BASE_CONFIG})
+        assert success, result
+        return result['id']
+
+    def test_every_version_is_reconstructable(self, test_app, temp_db):
+        """测试每个版本都能重建，且只有部分版本是完整快照"""
+        from services.client_service import ClientService
+        from services.revision_service import ConfigRevisionService
+
+        with test_app.test_request_context():
+            client_id = self._create_client()
+            for n in range(1, 15):
+                success, _ = ClientService.update_client_config(client_id, edit(BASE_CONFIG, n))
+                assert success
+
+            revisions = ConfigRevisionService.list_revisions(client_id)
+            assert [r['revision'] for r in revisions] == list(range(15, 0, -1))
+            snapshots = [r['revision'] for r in revisions if r['is_snapshot']]
+            assert snapshots == [11, 1]
+
+            assert ConfigRevisionService.get_revision_content(client_id, 1) == BASE_CONFIG
+            for n in range(1, 15):
+                assert ConfigRevisionService.get_revision_content(client_id, n + 1) == edit(BASE_CONFIG, n)
+
+    def test_retention_keeps_oldest_as_snapshot(self, test_app, temp_db, monkeypatch):
+        """测试超出保留数量后删除旧版本，最旧保留版本仍可重建"""
+        from config import Config
+        from services.client_service import ClientService
+        from services.revision_service import ConfigRevisionService
+
+        monkeypatch.setattr(Config, 'CONFIG_REVISION_RETENTION', 5)
+        with test_app.test_request_context():
+            client_id = self._create_client()
+            for n in range(1, 9):
+                ClientService.update_client_config(client_id, edit(BASE_CONFIG, n))
+
+            revisions = ConfigRevisionService.list_revisions(client_id)
+            assert [r['revision'] for r in revisions] == [9, 8, 7, 6, 5]
+            assert revisions[-1]['is_snapshot']
+            assert ConfigRevisionService.get_revision_content(client_id, 5) == edit(BASE_CONFIG, 4)
+            assert ConfigRevisionService.get_revision_content(client_id, 9) == edit(BASE_CONFIG, 8)
+
+    def test_diff_and_rollback(self, test_app, temp_db):
+        """测试版本对比和回滚"""
+        from services.client_service import ClientService
+        from services.revision_service import ConfigRevisionService
+
+        with test_app.test_request_context():
+            client_id = self._create_client()
+            ClientService.update_client_config(client_id, edit(BASE_CONFIG, 1))
+
+            success, result = ConfigRevisionService.diff_revisions(client_id, 1, 2)
+            assert success
+            assert '-remote_port = 9000' in result['diff']
+            assert '+remote_port = 9001' in result['diff']
+
+            success, result = ClientService.rollback_client_config(client_id, 1)
+            assert success
+            assert result['revision'] == 3
+
+            success, config = ClientService.get_client_config(client_id)
+            assert config['config'] == BASE_CONFIG
+
+    def test_baseline_for_existing_client(self, test_app, temp_db):
+        """测试升级前创建的客户端首次修改时先把原配置记为第 1 版"""
+        from models.database import get_db_connection
+        from services.client_service import ClientService
+        from services.revision_service import ConfigRevisionService
+
+        conn = get_db_connection()
+        cursor = conn.execute('INSERT INTO clients (name, config_content) VALUES (?, ?)', ('legacy', BASE_CONFIG))
+        client_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+
+        with test_app.test_request_context():
+            success, result = ClientService.update_client_config(client_id, edit(BASE_CONFIG, 1))
+            assert success
+            assert result['revision'] == 2
+            assert ConfigRevisionService.get_revision_content(client_id, 1) == BASE_CONFIG
+
+            success, _ = ClientService.rollback_client_config(client_id, 1)
+            assert success
+            success, config = ClientService.get_client_config(client_id)
+            assert config['config'] == BASE_CONFIG
+
+    def test_missing_revision(self, test_app, temp_db):
+        """测试不存在的版本"""
+        from services.client_service import ClientService
+        from services.revision_service import ConfigRevisionService
+
+        with test_app.test_request_context():
+            client_id = self._create_client()
+            assert ConfigRevisionService.get_revision_content(client_id, 42) is None
+            success, _ = ClientService.rollback_client_config(client_id, 42)
+            assert not success
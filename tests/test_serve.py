@@ -0,0 +1,89 @@
+"""
+生产服务启动配置测试
+"""
+import os
+import runpy
+import sys
+
+import pytest
+
+from config import Config
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+CONF_PATH = os.path.join(APP_DIR, 'gunicorn.conf.py')
+
+
+@pytest.fixture
+def load_conf(monkeypatch, tmp_path):
+    """按当前 Config 加载 gunicorn.conf.py，并在测试后恢复其修改的设置"""
+    monkeypatch.setattr(Config, 'SOCKETIO_ASYNC_MODE', Config.SOCKETIO_ASYNC_MODE)
+    monkeypatch.setattr(Config, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('SOCKETIO_ASYNC_MODE', Config.SOCKETIO_ASYNC_MODE)
+    return lambda: runpy.run_path(CONF_PATH)
+
+
+class TestGunicornConf:
+    """gunicorn 配置测试"""
+
+    @pytest.mark.parametrize('worker_class, async_mode', [
+        ('gthread', 'threading'), ('eventlet', 'eventlet'), ('gevent', 'gevent')
+    ])
+    def test_worker_model(self, load_conf, monkeypatch, worker_class, async_mode):
+        """测试工作模型决定 Socket.IO 的 async_mode，进程和线程数来自 Config"""
+        monkeypatch.setattr(Config, 'SERVER_WORKER_CLASS', worker_class)
+        monkeypatch.setattr(Config, 'SERVER_WORKERS', 3)
+        monkeypatch.setattr(Config, 'SERVER_THREADS', 12)
+        conf = load_conf()
+
+        assert conf['worker_class'] == worker_class
+        assert conf['workers'] == 3
+        assert conf['threads'] == 12
+        assert conf['bind'] == [f'0.0.0.0:{Config.PORT}']
+        assert conf['preload_app'] is False
+        assert Config.SOCKETIO_ASYNC_MODE == async_mode
+        assert os.environ['SOCKETIO_ASYNC_MODE'] == async_mode
+
+    def test_invalid_worker_class(self, load_conf, monkeypatch):
+        monkeypatch.setattr(Config, 'SERVER_WORKER_CLASS', 'sync')
+        with pytest.raises(ValueError):
+            load_conf()
+
+    def test_background_services_in_one_worker(self, load_conf, monkeypatch):
+        """测试只有取得文件锁的工作进程启动后台任务"""
+        # gunicorn 下 app 为 app/app.py，测试中为 app 包
+        started = []
+        monkeypatch.setattr(sys.modules['app'], 'start_background_services',
+                            lambda: started.append(True), raising=False)
+
+        class Worker:
+            pid = 1234
+
+        first, second = load_conf(), load_conf()
+        first['post_worker_init'](Worker())
+        second['post_worker_init'](Worker())
+        assert started == [True]
+
+        # 持有锁的进程退出后，新的工作进程接管
+        first['post_worker_init'].__globals__['_background_lock'].close()
+        load_conf()['post_worker_init'](Worker())
+        assert started == [True, True]
+
+
+class TestLauncher:
+    """启动入口测试"""
+
+    def test_missing_dependencies(self, monkeypatch):
+        import serve
+
+        available = {'gunicorn', 'eventlet'}
+        monkeypatch.setattr(serve.importlib.util, 'find_spec',
+                            lambda name: object() if name in available else None)
+        assert serve.missing_dependencies('gthread') == []
+        assert serve.missing_dependencies('eventlet') == []
+        assert serve.missing_dependencies('gevent') == ['gevent']
+
+    def test_invalid_worker_class(self, monkeypatch):
+        import serve
+
+        monkeypatch.setattr(Config, 'SERVER_WORKER_CLASS', 'sync')
+        assert serve.main() == 2
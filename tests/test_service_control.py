@@ -0,0 +1,210 @@
+"""
+frpc 服务控制任务测试
+systemctl 由临时目录中的脚本代替：记录参数，按环境变量休眠、输出错误和退出
+"""
+import os
+import stat
+import time
+
+import pytest
+
+from config import Config
+from services.service_control import ServiceControl
+
+FAKE_SYSTEMCTL = '''#!/bin/sh
+echo "$@" >> "$FAKE_SYSTEMCTL_LOG"
+if [ -n "$FAKE_SYSTEMCTL_STDERR" ]; then
+    echo "$FAKE_SYSTEMCTL_STDERR" >&2
+fi
+if [ -n "$FAKE_SYSTEMCTL_SLEEP" ]; then
+    exec sleep "$FAKE_SYSTEMCTL_SLEEP"
+fi
+exit "${FAKE_SYSTEMCTL_EXIT:-0}"
+'''
+
+
+@pytest.fixture
+def systemctl(tmp_path, monkeypatch):
+    """替换 systemctl，返回调用记录文件"""
+    script = tmp_path / 'systemctl'
+    script.write_text(FAKE_SYSTEMCTL)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    log = tmp_path / 'calls.log'
+    monkeypatch.setenv('FAKE_SYSTEMCTL_LOG', str(log))
+    monkeypatch.setattr(Config, 'SYSTEMCTL_PATH', str(script))
+    monkeypatch.setattr(Config, 'FRPC_SERVICE_UNIT', 'frpc')
+    monkeypatch.setattr(Config, 'SERVICE_ACTION_TIMEOUT', 5)
+    monkeypatch.setattr(Config, 'SERVICE_RESTART_COOLDOWN', 10)
+    monkeypatch.setattr(Config, 'SERVICE_RESTART_LIMIT', 3)
+    return log
+
+
+def calls(log):
+    return log.read_text().splitlines() if os.path.exists(log) else []
+
+
+@pytest.fixture
+def control(monkeypatch):
+    """替换路由使用的全局实例，记录推送的事件"""
+    from api.routes import service
+
+    events = []
+    control = ServiceControl(emit=lambda event, data: events.append((event, data)))
+    control.events = events
+    monkeypatch.setattr(service, 'service_control', control)
+    return control
+
+
+@pytest.fixture
+def client(test_client):
+    with test_client.session_transaction() as sess:
+        sess['logged_in'] = True
+        sess['csrf_token'] = 'token'
+    return test_client
+
+
+def post(client, url, json=None):
+    return client.post(url, json=json, headers={'X-CSRF-Token': 'token'})
+
+
+class TestServiceControl:
+    """后台任务测试"""
+
+    def test_success(self, systemctl, control):
+        """测试任务在后台执行 systemctl，开始和结束时各推送一次状态"""
+        submitted, job = control.submit('restart')
+        assert submitted is True
+        assert job['status'] == 'running'
+        assert control.wait(job['id'], 5)
+
+        job = control.get_job(job['id'])
+        assert job['status'] == 'succeeded'
+        assert job['returncode'] == 0
+        assert job['finished_at'] is not None
+        assert calls(systemctl) == ['restart frpc']
+        assert [(event, data['status']) for event, data in control.events] == [
+            ('service_job', 'running'), ('service_job', 'succeeded')
+        ]
+
+    def test_failure(self, systemctl, control, monkeypatch):
+        """测试 systemctl 非零退出时任务失败并带上错误输出"""
+        monkeypatch.setenv('FAKE_SYSTEMCTL_EXIT', '1')
+        monkeypatch.setenv('FAKE_SYSTEMCTL_STDERR', 'Unit frpc.service not found.')
+        _, job = control.submit('start')
+        control.wait(job['id'], 5)
+
+        job = control.get_job(job['id'])
+        assert job['status'] == 'failed'
+        assert job['returncode'] == 1
+        assert job['error'] == 'Unit frpc.service not found.'
+
+    def test_timeout(self, systemctl, control, monkeypatch):
+        """测试超时的 systemctl 被终止，服务单元随后可以再次操作"""
+        monkeypatch.setattr(Config, 'SERVICE_ACTION_TIMEOUT', 0.2)
+        monkeypatch.setenv('FAKE_SYSTEMCTL_SLEEP', '5')
+        start = time.monotonic()
+        _, job = control.submit('stop')
+        assert control.wait(job['id'], 5)
+        assert time.monotonic() - start < 3
+        assert control.get_job(job['id'])['status'] == 'timeout'
+
+        monkeypatch.delenv('FAKE_SYSTEMCTL_SLEEP')
+        submitted, _ = control.submit('stop')
+        assert submitted is True
+
+    def test_missing_systemctl(self, control, monkeypatch, tmp_path):
+        monkeypatch.setattr(Config, 'SYSTEMCTL_PATH', str(tmp_path / 'missing'))
+        _, job = control.submit('stop')
+        control.wait(job['id'], 5)
+        assert control.get_job(job['id'])['status'] == 'failed'
+
+    def test_one_job_per_unit(self, systemctl, control, monkeypatch):
+        """测试任务运行期间同一服务单元的其他操作被拒绝"""
+        monkeypatch.setenv('FAKE_SYSTEMCTL_SLEEP', '0.3')
+        submitted, job = control.submit('stop')
+        assert submitted is True
+
+        submitted, result = control.submit('start')
+        assert submitted is False
+        assert result['reason'] == 'busy'
+        assert result['job']['id'] == job['id']
+
+        control.wait(job['id'], 5)
+        assert calls(systemctl) == ['stop frpc']
+
+    def test_restart_limit(self, systemctl, control, monkeypatch):
+        """测试冷却时间和失败次数限制，force 忽略限制；stop 不受限制"""
+        _, job = control.submit('restart')
+        control.wait(job['id'], 5)
+        submitted, result = control.submit('restart')
+        assert submitted is False
+        assert result['reason'] == 'limited'
+        assert '重启过于频繁' in result['error']
+
+        submitted, job = control.submit('stop')
+        assert submitted is True
+        control.wait(job['id'], 5)
+
+        monkeypatch.setattr(Config, 'SERVICE_RESTART_COOLDOWN', 0)
+        monkeypatch.setenv('FAKE_SYSTEMCTL_EXIT', '1')
+        for _ in range(3):
+            submitted, job = control.submit('start')
+            assert submitted is True
+            control.wait(job['id'], 5)
+        submitted, result = control.submit('start')
+        assert submitted is False
+        assert '重启次数已达上限' in result['error']
+
+        submitted, job = control.submit('start', force=True)
+        assert submitted is True
+        control.wait(job['id'], 5)
+
+    def test_job_history(self, systemctl, control, monkeypatch):
+        monkeypatch.setattr('services.service_control.MAX_JOBS', 2)
+        ids = []
+        for _ in range(3):
+            _, job = control.submit('stop')
+            control.wait(job['id'], 5)
+            ids.append(job['id'])
+        assert [job['id'] for job in control.list_jobs()] == [ids[2], ids[1]]
+        assert control.get_job(ids[0]) is None
+
+
+class TestServiceRoutes:
+    """接口测试"""
+
+    def test_submit_and_poll(self, client, systemctl, control):
+        """测试操作立即返回 202 和任务，之后可查询结果"""
+        response = post(client, '/api/service/restart')
+        assert response.status_code == 202
+        job = response.get_json()['job']
+        assert job['action'] == 'restart'
+        control.wait(job['id'], 5)
+
+        response = client.get(f"/api/service/jobs/{job['id']}")
+        assert response.get_json()['job']['status'] == 'succeeded'
+        assert [item['id'] for item in client.get('/api/service/jobs').get_json()['jobs']] == [job['id']]
+        assert client.get('/api/service/jobs/999').status_code == 404
+
+    def test_conflict_and_limit(self, client, systemctl, control, monkeypatch):
+        monkeypatch.setenv('FAKE_SYSTEMCTL_SLEEP', '0.3')
+        job = post(client, '/api/service/restart').get_json()['job']
+        response = post(client, '/api/service/stop')
+        assert response.status_code == 409
+        assert response.get_json()['job']['id'] == job['id']
+        control.wait(job['id'], 5)
+
+        monkeypatch.delenv('FAKE_SYSTEMCTL_SLEEP')
+        assert post(client, '/api/service/restart').status_code == 429
+        response = post(client, '/api/service/restart', json={'force': True})
+        assert response.status_code == 202
+        control.wait(response.get_json()['job']['id'], 5)
+
+    def test_requires_login_and_csrf(self, test_client, systemctl, control):
+        assert test_client.post('/api/service/start').status_code == 401
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+            sess['csrf_token'] = 'token'
+        assert test_client.post('/api/service/start').status_code == 403
+        assert post(test_client, '/api/service/reload').status_code in (404, 405)
+        assert calls(systemctl) == []
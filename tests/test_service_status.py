@@ -0,0 +1,182 @@
+"""
+frpc 服务状态缓存测试
+systemctl 由临时目录中的脚本代替：记录参数，输出 FAKE_SYSTEMCTL_SHOW 文件的内容
+"""
+import stat
+import time
+
+import pytest
+
+from config import Config
+from services import service_status as service_status_module
+from services.service_status import ServiceStatusWatcher, parse_show
+
+FAKE_SYSTEMCTL = '''#!/bin/sh
+echo "$@" >> "$FAKE_SYSTEMCTL_LOG"
+cat "$FAKE_SYSTEMCTL_SHOW"
+exit "${FAKE_SYSTEMCTL_EXIT:-0}"
+'''
+
+ACTIVE = '''Id=frpc.service
+LoadState=loaded
+ActiveState=active
+SubState=running
+MainPID=1234
+ActiveEnterTimestamp=Thu 2026-10-15 08:00:00 UTC
+'''
+
+INACTIVE = '''Id=frpc.service
+LoadState=loaded
+ActiveState=inactive
+SubState=dead
+MainPID=0
+ActiveEnterTimestamp=
+'''
+
+
+class FakeSystemctl:
+    def __init__(self, tmp_path):
+        self.show = tmp_path / 'show.txt'
+        self.log = tmp_path / 'calls.log'
+
+    def set(self, *blocks):
+        self.show.write_text('\n'.join(blocks))
+
+    def calls(self):
+        return self.log.read_text().splitlines() if self.log.exists() else []
+
+
+@pytest.fixture
+def systemctl(tmp_path, monkeypatch):
+    script = tmp_path / 'systemctl'
+    script.write_text(FAKE_SYSTEMCTL)
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    fake = FakeSystemctl(tmp_path)
+    fake.set(ACTIVE)
+    monkeypatch.setenv('FAKE_SYSTEMCTL_LOG', str(fake.log))
+    monkeypatch.setenv('FAKE_SYSTEMCTL_SHOW', str(fake.show))
+    monkeypatch.setattr(Config, 'SYSTEMCTL_PATH', str(script))
+    monkeypatch.setattr(Config, 'FRPC_SERVICE_UNIT', 'frpc')
+    monkeypatch.setattr(Config, 'SERVICE_STATUS_INTERVAL', 60)
+    return fake
+
+
+@pytest.fixture
+def watcher(monkeypatch):
+    """替换全局实例（路由和服务控制任务使用），记录推送的事件"""
+    from api.routes import service
+
+    events = []
+    watcher = ServiceStatusWatcher(emit=lambda event, data: events.append((event, data)))
+    watcher.events = events
+    monkeypatch.setattr(service, 'service_status', watcher)
+    monkeypatch.setattr('services.service_control.service_status', watcher)
+    yield watcher
+    watcher.stop()
+
+
+def test_parse_show():
+    units = parse_show(ACTIVE + '\n' + INACTIVE, ['frpc', 'frpc-backup'])
+    assert units['frpc']['ActiveState'] == 'active'
+    assert units['frpc-backup']['SubState'] == 'dead'
+    assert units['frpc-backup']['ActiveEnterTimestamp'] == ''
+    with pytest.raises(ValueError):
+        parse_show(ACTIVE, ['frpc', 'frpc-backup'])
+
+
+class TestWatcher:
+    """状态缓存测试"""
+
+    def test_served_from_cache(self, systemctl, watcher):
+        """测试多次查询只调用一次 systemctl，返回检查时间"""
+        for _ in range(5):
+            status = watcher.get_status()
+        assert status['status'] == 'running'
+        assert status['active'] is True
+        assert status['main_pid'] == 1234
+        assert status['since'] == 'Thu 2026-10-15 08:00:00 UTC'
+        assert time.time() - status['checked_at'] < 5
+        assert status['age'] >= 0
+        assert len(systemctl.calls()) == 1
+        assert systemctl.calls()[0].startswith('show --property=')
+
+    def test_single_call_for_all_units(self, systemctl, watcher, monkeypatch):
+        monkeypatch.setattr(service_status_module, 'managed_units', lambda: ['frpc', 'frpc-backup'])
+        systemctl.set(ACTIVE, INACTIVE)
+        watcher.refresh()
+        assert systemctl.calls()[0].endswith(' frpc frpc-backup')
+        assert watcher.get_status('frpc-backup')['status'] == 'stopped'
+        assert len(systemctl.calls()) == 1
+
+    def test_push_on_change(self, systemctl, watcher):
+        """测试只在状态变化时推送"""
+        watcher.refresh()
+        watcher.refresh()
+        systemctl.set(INACTIVE)
+        watcher.refresh()
+        assert [(event, data['active_state']) for event, data in watcher.events] == [
+            ('service_status', 'active'), ('service_status', 'inactive')
+        ]
+        assert watcher.events[1][1]['main_pid'] is None
+
+    def test_error(self, systemctl, watcher, monkeypatch):
+        monkeypatch.setenv('FAKE_SYSTEMCTL_EXIT', '1')
+        status = watcher.get_status()
+        assert status['status'] == 'unknown'
+        assert status['active'] is False
+        assert status['error']
+
+    def test_background_refresh_and_wake(self, systemctl, watcher, monkeypatch):
+        """测试后台线程刷新缓存（首次检查完成前查询等待其结果），wake() 立即刷新"""
+        watcher.start()
+        assert watcher.get_status()['active'] is True
+        assert len(systemctl.calls()) == 1
+
+        systemctl.set(INACTIVE)
+        watcher.wake()
+        for _ in range(100):
+            if watcher.get_status()['active'] is False:
+                break
+            time.sleep(0.02)
+        assert watcher.get_status()['status'] == 'stopped'
+        assert len(systemctl.calls()) == 2
+
+    def test_wake_without_thread_invalidates(self, systemctl, watcher):
+        watcher.get_status()
+        systemctl.set(INACTIVE)
+        assert watcher.get_status()['active'] is True
+        watcher.wake()
+        assert watcher.get_status()['active'] is False
+
+
+class TestRoutes:
+    """接口测试"""
+
+    def test_status(self, test_client, systemctl, watcher):
+        assert test_client.get('/api/service/status').status_code == 401
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+
+        data = test_client.get('/api/service/status').get_json()
+        assert data['status'] == 'running'
+        assert data['active'] is True
+        assert 'checked_at' in data
+        test_client.get('/api/service/status')
+        assert len(systemctl.calls()) == 1
+
+    def test_refreshed_after_service_action(self, test_client, systemctl, watcher, monkeypatch):
+        """测试服务操作任务结束后状态立即刷新"""
+        from api.routes import service
+        from services.service_control import ServiceControl
+
+        control = ServiceControl()
+        monkeypatch.setattr(service, 'service_control', control)
+        with test_client.session_transaction() as sess:
+            sess['logged_in'] = True
+            sess['csrf_token'] = 'token'
+
+        assert test_client.get('/api/service/status').get_json()['active'] is True
+        systemctl.set(INACTIVE)
+        job = test_client.post('/api/service/stop', headers={'X-CSRF-Token': 'token'}).get_json()['job']
+        control.wait(job['id'], 5)
+        assert test_client.get('/api/service/status').get_json()['active'] is False
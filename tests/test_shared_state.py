@@ -0,0 +1,156 @@
+"""
+共享状态测试
+"""
+import multiprocessing
+
+import pytest
+
+from config import Config
+from utils import shared_state
+from utils.shared_state import MemoryState, SQLiteState, SharedDict
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def state(request, tmp_path, monkeypatch):
+    """替换全局共享状态后端"""
+    backend = MemoryState() if request.param == 'memory' else SQLiteState(str(tmp_path / 'shared_state.db'))
+    monkeypatch.setattr(shared_state, '_state', backend)
+    return backend
+
+
+def increment(record):
+    record = record or {'count': 0}
+    record['count'] += 1
+    return record
+
+
+def increment_many(path, times):
+    """在子进程中通过独立连接累加计数"""
+    backend = SQLiteState(path)
+    for _ in range(times):
+        backend.update('counters', 'hits', increment)
+
+
+class TestBackends:
+    """后端测试"""
+
+    def test_update_and_delete(self, state):
+        """测试读-改-写、返回 None 删除记录，以及命名空间隔离"""
+        assert state.get('a', 'x') is None
+        assert state.update('a', 'x', increment) == {'count': 1}
+        assert state.update('a', 'x', increment) == {'count': 2}
+        state.update('b', 'x', increment)
+
+        assert state.get('a', 'x') == {'count': 2}
+        assert state.update('a', 'x', lambda record: None) is None
+        assert state.get('a', 'x') is None
+        assert state.get('b', 'x') == {'count': 1}
+
+    def test_returned_records_are_copies(self, state):
+        """测试修改 get() 的返回值不影响已保存的记录"""
+        state.update('a', 'x', increment)
+        record = state.get('a', 'x')
+        record['count'] = 100
+        assert state.get('a', 'x') == {'count': 1}
+
+    def test_keys_keep_type(self, state):
+        """测试整数键和字符串键都能原样取回"""
+        state.update('a', 1, increment)
+        state.update('a', '10.0.0.1', increment)
+        assert sorted(state.keys('a'), key=str) == [1, '10.0.0.1']
+        state.clear('a')
+        assert state.keys('a') == []
+
+    def test_failed_update_keeps_record(self, state):
+        """测试 updater 抛出异常时记录保持不变"""
+        state.update('a', 'x', increment)
+
+        def fail(record):
+            record['count'] = 99
+            raise RuntimeError('boom')
+
+        with pytest.raises(RuntimeError):
+            state.update('a', 'x', fail)
+        assert state.get('a', 'x') == {'count': 1}
+        assert state.update('a', 'x', increment) == {'count': 2}
+
+    def test_sqlite_updates_are_atomic_across_processes(self, tmp_path):
+        """测试多个进程同时累加同一条记录不丢失更新"""
+        # fork 前父进程不能打开该数据库，否则子进程继承 SQLite 的进程内锁状态
+        path = str(tmp_path / 'shared_state.db')
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=increment_many, args=(path, 50)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            assert process.exitcode == 0
+        assert SQLiteState(path).get('counters', 'hits') == {'count': 200}
+
+
+class TestSharedDict:
+    """字典视图测试"""
+
+    def test_mapping_interface(self, state):
+        records = SharedDict('records')
+        records[1] = {'count': 1}
+        records[2] = {'count': 2}
+        assert 1 in records and 3 not in records
+        assert records[1] == {'count': 1}
+        assert sorted(records) == [1, 2]
+        assert len(records) == 2
+
+        del records[1]
+        with pytest.raises(KeyError):
+            records[1]
+        with pytest.raises(KeyError):
+            del records[1]
+        assert records.pop(2) == {'count': 2}
+
+        records.update_record(3, increment)
+        records.clear()
+        assert len(records) == 0
+
+    def test_backend_from_config(self, tmp_path, monkeypatch):
+        """测试按配置创建后端"""
+        monkeypatch.setattr(shared_state, '_state', None)
+        monkeypatch.setattr(Config, 'SHARED_STATE_BACKEND', 'sqlite')
+        monkeypatch.setattr(Config, 'SHARED_STATE_PATH', str(tmp_path / 'state' / 'shared.db'))
+        assert isinstance(shared_state.get_shared_state(), SQLiteState)
+
+        monkeypatch.setattr(shared_state, '_state', None)
+        monkeypatch.setattr(Config, 'SHARED_STATE_BACKEND', 'redis')
+        with pytest.raises(ValueError):
+            shared_state.get_shared_state()
+
+
+class TestRateLimitsAcrossWorkers:
+    """限流记录在多个工作进程之间共享"""
+
+    def test_login_lockout_shared(self, tmp_path, monkeypatch):
+        """测试两个进程各自记录的失败次数累加，锁定对两个进程都生效"""
+        from utils.helpers import check_login_rate_limit, record_login_attempt
+
+        path = str(tmp_path / 'shared_state.db')
+        worker_a, worker_b = SQLiteState(path), SQLiteState(path)
+        for backend in (worker_a, worker_b, worker_a):
+            monkeypatch.setattr(shared_state, '_state', backend)
+            record_login_attempt('10.0.0.1', False, max_attempts=3)
+
+        monkeypatch.setattr(shared_state, '_state', worker_b)
+        allowed, message = check_login_rate_limit('10.0.0.1', max_attempts=3)
+        assert allowed is False
+        assert '登录失败次数过多' in message
+
+    def test_restart_limit_shared(self, tmp_path, monkeypatch):
+        """测试一个进程记录的重启在另一个进程的冷却检查中生效"""
+        from utils.helpers import check_restart_limit, record_restart, restart_records
+
+        path = str(tmp_path / 'shared_state.db')
+        monkeypatch.setattr(shared_state, '_state', SQLiteState(path))
+        record_restart(7, success=False)
+
+        monkeypatch.setattr(shared_state, '_state', SQLiteState(path))
+        allowed, message = check_restart_limit(7, cooldown=60)
+        assert allowed is False
+        assert restart_records[7]['consecutive_failures'] == 1
@@ -0,0 +1,199 @@
+"""
+配置模板服务测试
+"""
+import json
+
+
+FORM_DATA = {
+    'name': 'form-client',
+    'server_addr': 'frp.example.com',
+    'server_port': 7000,
+    'token': 'secret-token',
+    'user': 'tester',
+    'local_port': 22,
+    'remote_port': 6022,
+}
+
+
+class TestTemplateRendering:
+    """模板渲染测试"""
+
+    def test_render_template_substitutes_variables(self):
+        """测试变量替换"""
+        from services.template_service import render_template
+
+        success, rendered = render_template('[common]\nserver_addr = ${addr}\n', {'addr': 'a.example.com'})
+        assert success
+        assert 'server_addr = a.example.com' in rendered
+
+    def test_render_template_missing_variable(self):
+        """测试缺少变量时返回错误"""
+        from services.template_service import render_template
+
+        success, message = render_template('[common]\nuser = ${user}\n', {})
+        assert not success
+        assert 'user' in message
+
+
+class TestTemplateService:
+    """模板服务测试"""
+
+    def test_form_mode_stores_only_variables(self, test_app, temp_db):
+        """测试表单模式只保存变量，导出时渲染配置"""
+        from services.client_service import ClientService
+
+        with test_app.test_request_context():
+            success, result = ClientService.create_client(dict(FORM_DATA))
+            assert success, result
+
+            client = ClientService.get_client(result['id'])
+            assert client['config_content'] == ''
+            assert client['template_id'] is not None
+            assert json.loads(client['template_vars'])['token'] == 'secret-token'
+
+            success, config = ClientService.get_client_config(result['id'])
+            assert success
+            assert 'server_addr = frp.example.com' in config['config']
+            assert 'remote_port = 6022' in config['config']
+
+    def test_render_cache_hit_and_version_invalidation(self, test_app, temp_db):
+        """测试渲染缓存命中，模板更新后全部客户端使用新版本"""
+        from services.client_service import ClientService
+        from services.template_service import TemplateService, clear_render_cache, render_cache_stats
+
+        with test_app.test_request_context():
+            clear_render_cache()
+            success, result = ClientService.create_client(dict(FORM_DATA))
+            assert success, result
+            client_id = result['id']
+
+            ClientService.get_client_config(client_id)
+            ClientService.get_client_config(client_id)
+            assert render_cache_stats['misses'] == 1
+            assert render_cache_stats['hits'] == 1
+
+            template_id = ClientService.get_client(client_id)['template_id']
+            template = TemplateService.get_template(template_id)
+            success, _ = TemplateService.update_template(template_id, {
+                'content': template['content'].replace('tls_enable = false', 'tls_enable = true')
+            })
+            assert success
+            assert TemplateService.get_template(template_id)['version'] == template['version'] + 1
+
+            success, config = ClientService.get_client_config(client_id)
+            assert success
+            assert 'tls_enable = true' in config['config']
+
+    def test_create_template_with_missing_section_rejected(self, test_app, temp_db):
+        """测试无效模板被拒绝"""
+        from services.template_service import TemplateService
+
+        with test_app.test_request_context():
+            success, result = TemplateService.create_template({'name': 'bad', 'content': 'user = ${user}'})
+            assert not success
+            assert 'error' in result
+
+    def test_delete_template_in_use_rejected(self, test_app, temp_db):
+        """测试删除仍在使用的模板被拒绝"""
+        from services.client_service import ClientService
+        from services.template_service import TemplateService
+
+        with test_app.test_request_context():
+            success, result = ClientService.create_client(dict(FORM_DATA))
+            assert success, result
+            template_id = ClientService.get_client(result['id'])['template_id']
+
+            success, result = TemplateService.delete_template(template_id)
+            assert not success
+
+    def test_raw_config_update_detaches_template(self, test_app, temp_db):
+        """测试直接编辑配置后客户端脱离模板"""
+        from services.client_service import ClientService
+
+        with test_app.test_request_context():
+            success, result = ClientService.create_client(dict(FORM_DATA))
+            assert success, result
+            client_id = result['id']
+
+            success, _ = ClientService.update_client_config(client_id, '[common]\nserver_addr = "x"\n')
+            assert success
+
+            client = ClientService.get_client(client_id)
+            assert client['template_id'] is None
+            success, config = ClientService.get_client_config(client_id)
+            assert config['config'] == '[common]\nserver_addr = "x"\n'
+
+    def test_update_template_rejected_when_clients_cannot_render(self, test_app, temp_db):
+        """测试新增变量导致现有客户端无法渲染时拒绝更新，并列出这些客户端"""
+        from services.client_service import ClientService
+        from services.template_service import TemplateService
+
+        with test_app.test_request_context():
+            success, result = ClientService.create_client(dict(FORM_DATA))
+            assert success, result
+            client_id = result['id']
+            template_id = ClientService.get_client(client_id)['template_id']
+            template = TemplateService.get_template(template_id)
+
+            success, result = TemplateService.update_template(template_id, {
+                'content': template['content'] + 'metadatas.owner = ${owner}\n'
+            })
+            assert not success
+            assert [client['id'] for client in result['clients']] == [client_id]
+            assert 'owner' in result['clients'][0]['error']
+            assert TemplateService.get_template(template_id)['version'] == template['version']
+
+            success, config = ClientService.get_client_config(client_id)
+            assert success
+
+    def test_update_template_refreshes_client_ports(self, test_app, temp_db):
+        """测试模板更新后客户端的地址和端口列随渲染结果更新"""
+        from services.client_service import ClientService
+        from services.template_service import TemplateService
+
+        with test_app.test_request_context():
+            success, result = ClientService.create_client(dict(FORM_DATA))
+            client_id = result['id']
+            template_id = ClientService.get_client(client_id)['template_id']
+            template = TemplateService.get_template(template_id)
+
+            success, _ = TemplateService.update_template(template_id, {
+                'content': template['content'].replace('remote_port = ${remote_port}', 'remote_port = 9000')
+            })
+            assert success
+            assert ClientService.get_client(client_id)['remote_port'] == 9000
+
+    def test_update_template_vars(self, test_app, temp_db):
+        """测试更新模板变量时先渲染校验，更新地址和端口列并记录修订"""
+        from services.client_service import ClientService
+        from services.revision_service import ConfigRevisionService
+
+        with test_app.test_request_context():
+            success, result = ClientService.create_client(dict(FORM_DATA))
+            client_id = result['id']
+
+            success, result = ClientService.update_client(client_id, {'template_vars': {'remote_port': 7022}})
+            assert success, result
+            client = ClientService.get_client(client_id)
+            assert client['remote_port'] == 7022
+            assert json.loads(client['template_vars'])['remote_port'] == 7022
+            revisions = ConfigRevisionService.list_revisions(client_id)
+            assert [r['revision'] for r in revisions] == [2, 1]
+            assert 'remote_port = 7022' in ConfigRevisionService.get_revision_content(client_id, 2)
+
+            # GET /api/clients 返回的 JSON 字符串原样提交
+            success, result = ClientService.update_client(client_id, {'template_vars': client['template_vars']})
+            assert not success
+            assert '模板变量' in result['error']
+
+            success, result = ClientService.update_client(client_id, {'template_vars': {'token': 'x\n= broken'}})
+            assert not success
+            assert ClientService.get_client(client_id)['version'] == client['version']
+
+    def test_create_client_rejects_non_object_template_vars(self, test_app, temp_db):
+        from services.client_service import ClientService
+
+        with test_app.test_request_context():
+            success, result = ClientService.create_client(dict(FORM_DATA, template_vars='{"a": 1}'))
+            assert not success
+            assert '模板变量' in result['error']
@@ -0,0 +1,108 @@
+"""
+请求追踪测试
+"""
+import pytest
+
+from config import Config
+from utils import tracing
+
+
+@pytest.fixture
+def traced_client(monkeypatch, temp_db):
+    """开启追踪的测试客户端"""
+    from app.app import create_app
+    monkeypatch.setattr(tracing, 'enabled', False)
+    monkeypatch.setattr(Config, 'TRACING_ENABLED', True)
+    tracing.reset()
+    app = create_app(testing=True)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['logged_in'] = True
+        sess['username'] = 'test_admin'
+        sess['user_role'] = 'admin'
+    tracing.reset()
+    yield client
+    tracing.reset()
+
+
+def parse_server_timing(header):
+    """解析 Server-Timing 响应头为 名称 -> 参数"""
+    metrics = {}
+    for part in header.split(','):
+        name, *params = [item.strip() for item in part.split(';')]
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+class TestNormalizeSql:
+    """SQL 规范化测试"""
+
+    def test_literals_and_whitespace(self):
+        """测试合并空白并替换字面量"""
+        sql = "SELECT *\n  FROM clients WHERE id = 42 AND name = 'it''s'"
+        assert tracing.normalize_sql(sql) == 'SELECT * FROM clients WHERE id = ? AND name = ?'
+
+    def test_in_list_collapsed(self):
+        """测试不同长度的 IN 列表规范化为同一文本"""
+        short = tracing.normalize_sql('DELETE FROM alerts WHERE id IN (?, ?)')
+        long = tracing.normalize_sql('DELETE FROM alerts WHERE id IN (?,?,?,?)')
+        assert short == long == 'DELETE FROM alerts WHERE id IN (?...)'
+
+    def test_identifiers_with_digits_kept(self):
+        """测试标识符中的数字不被替换"""
+        assert tracing.normalize_sql('SELECT col1 FROM t2') == 'SELECT col1 FROM t2'
+
+
+class TestRequestTracing:
+    """请求追踪中间件测试"""
+
+    def test_server_timing_header(self, traced_client):
+        """测试响应头包含各阶段耗时"""
+        response = traced_client.get('/api/clients')
+        assert response.status_code == 200
+
+        timing = parse_server_timing(response.headers['Server-Timing'])
+        assert {'total', 'db', 'json', 'session', 'app'} <= set(timing)
+        assert int(timing['db']['desc'].strip('"').split()[0]) >= 1
+        parts = sum(float(timing[name]['dur']) for name in ('db', 'json', 'session', 'app'))
+        assert parts == pytest.approx(float(timing['total']['dur']), abs=0.05)
+
+    def test_slowest_records(self, traced_client):
+        """测试记录最慢的请求和规范化后的 SQL"""
+        traced_client.get('/api/clients')
+        traced_client.get('/api/templates')
+
+        data = traced_client.get('/api/diagnostics/traces?limit=5').get_json()
+        assert data['enabled'] is True
+        endpoints = {item['endpoint'] for item in data['requests']}
+        assert {'clients.get_clients', 'templates.get_templates'} <= endpoints
+        durations = [item['duration_ms'] for item in data['requests']]
+        assert durations == sorted(durations, reverse=True)
+        assert any(query['endpoint'] == 'clients.get_clients' for query in data['queries'])
+        assert all('\n' not in query['sql'] for query in data['queries'])
+
+    def test_disabled_by_default(self, test_client, temp_db):
+        """测试未开启时不添加响应头"""
+        assert 'Server-Timing' not in test_client.get('/api/clients').headers
+
+
+class TestTracesRoute:
+    """追踪记录路由测试"""
+
+    def test_requires_admin(self, traced_client):
+        """测试非管理员无法访问"""
+        with traced_client.session_transaction() as sess:
+            sess['user_role'] = 'viewer'
+        assert traced_client.get('/api/diagnostics/traces').status_code == 403
+
+    def test_clear_requires_csrf(self, traced_client):
+        """测试清空记录需要 CSRF Token"""
+        traced_client.get('/api/clients')
+        assert traced_client.delete('/api/diagnostics/traces').status_code == 403
+
+        with traced_client.session_transaction() as sess:
+            sess['csrf_token'] = 'token'
+        response = traced_client.delete('/api/diagnostics/traces', headers={'X-CSRF-Token': 'token'})
+        assert response.status_code == 200
+        # 只剩清空请求本身
+        assert [item['endpoint'] for item in tracing.slowest()['requests']] == ['diagnostics.clear_traces']
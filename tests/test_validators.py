@@ -0,0 +1,86 @@
+"""
+验证器模块测试
+"""
+from utils.validators import (
+    iter_lines,
+    optional,
+    required,
+    validate_client_payload,
+    validate_email,
+    validate_port,
+    validate_schema,
+    validate_server_addr,
+    validate_toml_config,
+)
+
+
+class TestIterLines:
+    """逐行迭代测试"""
+
+    def test_matches_split(self):
+        """测试与 str.split 的结果一致"""
+        text = 'a\n\nb = 1\n[c]'
+        assert [line for _, line in iter_lines(text)] == text.split('\n')
+
+    def test_trailing_newline(self):
+        """测试末尾换行不产生多余空行"""
+        assert list(iter_lines('a\nb\n')) == [(1, 'a'), (2, 'b')]
+
+
+class TestFieldValidators:
+    """单字段验证器测试"""
+
+    def test_email(self):
+        """测试邮箱格式"""
+        assert validate_email('admin@example.com')[0]
+        assert not validate_email('admin@example.com\n')[0]
+        assert not validate_email('not-an-email')[0]
+
+    def test_server_addr(self):
+        """测试服务器地址"""
+        for addr in ['frp.example.com', 'a.example.com', '10.0.0.1', 'localhost']:
+            assert validate_server_addr(addr)[0], addr
+        for addr in ['-bad.example.com', 'bad_host.com', 'a..b', 8080]:
+            assert not validate_server_addr(addr)[0], addr
+
+    def test_bool_is_not_port(self):
+        """测试布尔值不被当作端口"""
+        assert not validate_port(True)[0]
+
+    def test_toml_empty_key(self):
+        """测试键名为空的行"""
+        valid, message = validate_toml_config('[common]\n = 1\n')
+        assert not valid
+        assert '第 2 行' in message
+
+    def test_toml_whitespace_only(self):
+        """测试只有空白的配置"""
+        assert not validate_toml_config('  \n\t\n')[0]
+
+
+class TestSchema:
+    """组合验证器测试"""
+
+    def test_required_and_optional(self):
+        """测试 required / optional 组合"""
+        schema = {
+            'port': required(validate_port, '端口不能为空'),
+            'email': optional(validate_email),
+        }
+        assert validate_schema({'port': 80}, schema) == (True, '')
+        assert validate_schema({}, schema) == (False, '端口不能为空')
+        assert not validate_schema({'port': 80, 'email': 'x'}, schema)[0]
+        assert not validate_schema(['port'], schema)[0]
+
+    def test_client_form_payload(self):
+        """测试表单模式的请求数据"""
+        payload = {'name': 'web', 'server_addr': 'frp.example.com', 'local_port': 80, 'remote_port': 8080}
+        assert validate_client_payload(payload)[0]
+        assert not validate_client_payload({**payload, 'remote_port': 70000})[0]
+        assert not validate_client_payload({**payload, 'server_addr': ''})[0]
+        assert not validate_client_payload({**payload, 'name': 'bad name'})[0]
+
+    def test_client_config_payload(self):
+        """测试粘贴配置模式的请求数据"""
+        assert validate_client_payload({'name': 'web', 'config_content': '[common]\nserver_addr = "x"\n'})[0]
+        assert not validate_client_payload({'name': 'web', 'config_content': 'server_addr = "x"'})[0]
@@ -0,0 +1,63 @@
+"""
+验证器性能基准测试（需要 pytest-benchmark）
+
+运行: pytest tests/test_validators_benchmark.py --benchmark-only
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from utils.validators import validate_client_payload, validate_toml_config
+
+
+def build_config(size: int) -> str:
+    """构造约 size 字节、包含大量代理节的配置"""
+    parts = ['[common]\nserver_addr = "frp.example.com"\nserver_port = 7000\n# 公共配置\n']
+    total = len(parts[0])
+    index = 0
+    while total < size:
+        section = (
+            f'\n[proxy-{index}]\ntype = "tcp"\nlocal_ip = "127.0.0.1"\n'
+            f'local_port = {1024 + index % 60000}\nremote_port = {2048 + index % 60000}\n'
+        )
+        parts.append(section)
+        total += len(section)
+        index += 1
+    return ''.join(parts)
+
+
+LARGE_CONFIG = build_config(1024 * 1024)
+
+FORM_PAYLOADS = [
+    {
+        'name': f'client-{i}',
+        'server_addr': f'node{i % 50}.frp.example.com',
+        'server_port': 7000,
+        'local_port': 1024 + i,
+        'remote_port': 20000 + i,
+    }
+    for i in range(1000)
+]
+
+
+def validate_all(payloads):
+    for payload in payloads:
+        validate_client_payload(payload)
+
+
+def test_large_config(benchmark):
+    """1 MB 配置校验"""
+    valid, message = benchmark(validate_toml_config, LARGE_CONFIG)
+    assert valid, message
+
+
+def test_large_invalid_config_fails_fast(benchmark):
+    """错误位于开头的 1 MB 配置应立即返回"""
+    config = '[common]\n = broken\n' + LARGE_CONFIG
+    valid, _ = benchmark(validate_toml_config, config)
+    assert not valid
+
+
+def test_form_payload_rate(benchmark):
+    """批量校验 1000 个表单请求"""
+    benchmark(validate_all, FORM_PAYLOADS)